@@ -0,0 +1,137 @@
+"""Benchmark legacy per-row dict demo aggregation vs. columnar event tables.
+
+Builds a synthetic demoparser2-like ``player_hurt`` / ``player_death`` table and
+runs each pipeline in a fresh child process, so peak RSS is measured in
+isolation.
+
+Usage:
+    python -m scripts.benchmark_demo_parsing --rows 200000
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import resource
+import time
+from argparse import ArgumentParser
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+PLAYERS = [f"player_{i}" for i in range(10)]
+EXTRA_COLUMNS = 24  # demoparser2 frames carry many columns the analyzer ignores
+
+
+def build_frames(rows: int, seed: int = 7) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    names = np.array(PLAYERS, dtype=object)
+
+    damage: Dict[str, Any] = {
+        "attacker_name": names[rng.integers(0, len(names), rows)],
+        "user_name": names[rng.integers(0, len(names), rows)],
+        "dmg_health": rng.integers(1, 100, rows),
+        "total_rounds_played": np.sort(rng.integers(0, 30, rows)),
+        "tick": np.arange(rows) * 8,
+    }
+    for idx in range(EXTRA_COLUMNS):
+        damage[f"extra_{idx}"] = rng.random(rows)
+
+    kill_rows = max(1, rows // 20)
+    kills: Dict[str, Any] = {
+        "attacker_name": names[rng.integers(0, len(names), kill_rows)],
+        "victim_name": names[rng.integers(0, len(names), kill_rows)],
+        "headshot": rng.random(kill_rows) < 0.45,
+        "total_rounds_played": np.sort(rng.integers(0, 30, kill_rows)),
+        "tick": np.arange(kill_rows) * 160,
+    }
+    for idx in range(EXTRA_COLUMNS):
+        kills[f"extra_{idx}"] = rng.random(kill_rows)
+
+    return {"kills": pd.DataFrame(kills), "damage": pd.DataFrame(damage)}
+
+
+def run_legacy(frames: Dict[str, pd.DataFrame], player: str) -> Dict[str, float]:
+    """Mirror of the previous _to_records + pd.DataFrame(records) pipeline."""
+    kills_records = frames["kills"].to_dict("records")
+    damage_records = frames["damage"].to_dict("records")
+
+    df_kills = pd.DataFrame(kills_records)
+    df_damage = pd.DataFrame(damage_records)
+    player_kills = df_kills[df_kills["attacker_name"] == player]
+    return {
+        "kills": float(len(player_kills)),
+        "headshots": float((player_kills["headshot"] == True).sum()),  # noqa: E712
+        "deaths": float((df_kills["victim_name"] == player).sum()),
+        "damage": float(df_damage[df_damage["attacker_name"] == player]["dmg_health"].sum()),
+    }
+
+
+def run_columnar(frames: Dict[str, pd.DataFrame], player: str) -> Dict[str, float]:
+    from src.server.features.demo_analyzer.columnar import ColumnarDemo
+
+    events = ColumnarDemo.from_parser_output(kills=frames["kills"], damage=frames["damage"])
+    stats = events.player_stats(player)
+    events.player_rounds(player, 30)
+    return {
+        "kills": float(stats["kills"]),
+        "headshots": float(stats["headshots"]),
+        "deaths": float(stats["deaths"]),
+        "damage": float(stats["total_damage"]),
+    }
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _child(mode: str, rows: int, queue: Any) -> None:
+    frames = build_frames(rows)
+    baseline = _max_rss_mb()
+    runner = run_legacy if mode == "legacy" else run_columnar
+
+    start = time.perf_counter()
+    result = runner(frames, PLAYERS[0])
+    elapsed = time.perf_counter() - start
+
+    queue.put(
+        {
+            "mode": mode,
+            "seconds": elapsed,
+            "peak_rss_mb": _max_rss_mb(),
+            "delta_rss_mb": _max_rss_mb() - baseline,
+            "result": result,
+        }
+    )
+
+
+def measure(mode: str, rows: int) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(mode, rows, queue))
+    proc.start()
+    report = queue.get()
+    proc.join()
+    return report
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark demo event aggregation pipelines")
+    parser.add_argument("--rows", type=int, default=200_000, help="player_hurt rows to generate")
+    args = parser.parse_args()
+
+    reports = [measure("legacy", args.rows), measure("columnar", args.rows)]
+    if reports[0]["result"] != reports[1]["result"]:
+        raise SystemExit(f"Pipelines disagree: {reports[0]['result']} vs {reports[1]['result']}")
+
+    print(f"rows={args.rows}")
+    for report in reports:
+        print(
+            f"{report['mode']:>9}: {report['seconds'] * 1000:9.1f} ms  "
+            f"peak_rss={report['peak_rss_mb']:8.1f} MB  "
+            f"delta_rss={report['delta_rss_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
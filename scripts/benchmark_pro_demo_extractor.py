@@ -0,0 +1,120 @@
+"""Benchmark per-player mask loops vs. groupby aggregation for pro demo features.
+
+Builds synthetic demoparser2-like kill and damage tables and times the
+previous extractor (one boolean mask per player over every table) against
+``compute_player_feature_rows``. For the grouped extractor the marginal cost
+per added event (time difference between consecutive sizes divided by the
+event difference) stays flat, i.e. it is linear in event count, and it does
+not depend on the number of distinct players; the legacy loop grows with
+players x events.
+
+Usage:
+    python -m scripts.benchmark_pro_demo_extractor --events 100000 400000 1600000
+"""
+from __future__ import annotations
+
+import time
+from argparse import ArgumentParser
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.ml.features.pro_demo_extractor import compute_player_feature_rows
+
+
+def build_frames(events: int, players: int, seed: int = 7) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    names = np.array([f"player_{i}" for i in range(players)], dtype=object)
+
+    kill_rows = max(1, events // 10)
+    kills = pd.DataFrame(
+        {
+            "attackername": names[rng.integers(0, players, kill_rows)],
+            "victimname": names[rng.integers(0, players, kill_rows)],
+            "assistername": np.where(
+                rng.random(kill_rows) < 0.3, names[rng.integers(0, players, kill_rows)], None
+            ),
+            "headshot": rng.random(kill_rows) < 0.45,
+            "assistedflash": rng.random(kill_rows) < 0.05,
+            "total_rounds_played": np.sort(rng.integers(0, 30, kill_rows)),
+            "tick": np.sort(rng.integers(0, 30 * 64 * 115, kill_rows)),
+        }
+    )
+    damage = pd.DataFrame(
+        {
+            "attackername": names[rng.integers(0, players, events)],
+            "hp_damage": rng.integers(1, 100, events),
+        }
+    )
+    return kills, damage
+
+
+def legacy_rows(kills_df: pd.DataFrame, damage_df: pd.DataFrame, total_rounds: int) -> List[Dict]:
+    """Mirror of the previous extractor: full-table masks for every player."""
+    players = set(kills_df["attackername"].dropna().unique())
+    players.update(kills_df["victimname"].dropna().unique())
+    players.update(damage_df["attackername"].dropna().unique())
+
+    rows: List[Dict] = []
+    for name in players:
+        attacker_mask = kills_df["attackername"] == name
+        kills = int(attacker_mask.sum())
+        headshots = int(kills_df.loc[attacker_mask & (kills_df["headshot"] == True)].shape[0])  # noqa: E712
+        deaths = int((kills_df["victimname"] == name).sum())
+        player_damage = damage_df[damage_df["attackername"] == name]
+        total_damage = float(player_damage["hp_damage"].sum()) if not player_damage.empty else 0.0
+        rows.append(
+            {
+                "steam_id": str(name),
+                "kills": kills,
+                "deaths": deaths,
+                "headshots": headshots,
+                "damage": total_damage,
+                "adr": total_damage / float(total_rounds),
+            }
+        )
+    return rows
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, nargs="+", default=[100_000, 400_000, 1_600_000])
+    parser.add_argument("--players", type=int, nargs="+", default=[10, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'players':>8} {'events':>9} {'legacy ms':>10} {'grouped ms':>11} "
+        f"{'marginal ns/event':>18} {'speedup':>8}"
+    )
+    for players in args.players:
+        previous = None
+        for events in sorted(args.events):
+            kills, damage = build_frames(events, players)
+            total = len(kills) + len(damage)
+
+            legacy = timed(lambda: legacy_rows(kills, damage, 30), args.repeat)
+            grouped = timed(lambda: compute_player_feature_rows(kills, damage, 30), args.repeat)
+
+            marginal = "-"
+            if previous is not None:
+                marginal = f"{(grouped - previous[1]) / (total - previous[0]) * 1e9:.1f}"
+            previous = (total, grouped)
+            print(
+                f"{players:>8} {total:>9} {legacy * 1000:>10.1f} {grouped * 1000:>11.1f} "
+                f"{marginal:>18} {legacy / grouped:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
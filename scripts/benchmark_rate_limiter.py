@@ -0,0 +1,134 @@
+"""Benchmark the in-memory rate limiter fallback with many distinct client IPs.
+
+Compares the previous per-IP timestamp lists with the bucketed ring buffer
+counters. Each implementation runs in a fresh child process, so peak RSS is
+measured in isolation.
+
+Usage:
+    python -m scripts.benchmark_rate_limiter --ips 1000000
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import resource
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Any, Dict, List
+
+
+def _ip(idx: int) -> str:
+    return f"10.{(idx >> 16) & 255}.{(idx >> 8) & 255}.{idx & 255}"
+
+
+class LegacyLimiter:
+    """Mirror of the previous defaultdict(list) implementation."""
+
+    def __init__(self, per_minute: int, per_hour: int) -> None:
+        self.per_minute = per_minute
+        self.per_hour = per_hour
+        self.minute_requests: Dict[str, list] = defaultdict(list)
+        self.hour_requests: Dict[str, list] = defaultdict(list)
+
+    @staticmethod
+    def _clean(requests_list: list, window: int, now: float) -> list:
+        return [(ts, count) for ts, count in requests_list if now - ts < window]
+
+    def hit(self, key: str, now: float) -> bool:
+        self.minute_requests[key] = self._clean(self.minute_requests[key], 60, now)
+        self.hour_requests[key] = self._clean(self.hour_requests[key], 3600, now)
+        minute_count = sum(count for _, count in self.minute_requests[key])
+        hour_count = sum(count for _, count in self.hour_requests[key])
+        if minute_count >= self.per_minute or hour_count >= self.per_hour:
+            return False
+        self.minute_requests[key].append((now, 1))
+        self.hour_requests[key].append((now, 1))
+        return True
+
+
+class BucketedLimiter:
+    def __init__(self, per_minute: int, per_hour: int, max_keys: int) -> None:
+        from src.server.services.rate_limit_backend import BucketedWindowCounter
+
+        self.per_minute = per_minute
+        self.per_hour = per_hour
+        self.minute_requests = BucketedWindowCounter(60, buckets=12, max_keys=max_keys)
+        self.hour_requests = BucketedWindowCounter(3600, buckets=60, max_keys=max_keys)
+
+    def hit(self, key: str, now: float) -> bool:
+        minute_count = self.minute_requests.count(key, now)
+        hour_count = self.hour_requests.count(key, now)
+        if minute_count >= self.per_minute or hour_count >= self.per_hour:
+            return False
+        self.minute_requests.add(key, now)
+        self.hour_requests.add(key, now)
+        return True
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _child(mode: str, ips: int, hot_requests: int, max_keys: int, queue: Any) -> None:
+    keys: List[str] = [_ip(idx) for idx in range(ips)]
+    baseline = _max_rss_mb()
+    limiter = (
+        LegacyLimiter(60, 1000) if mode == "legacy" else BucketedLimiter(60, 1000, max_keys)
+    )
+
+    # One request from every distinct IP, spread over ten minutes
+    start = time.perf_counter()
+    step = 600.0 / ips
+    for idx, key in enumerate(keys):
+        limiter.hit(key, 1_000_000.0 + idx * step)
+    distinct_seconds = time.perf_counter() - start
+
+    # A single busy client hammering the limiter for half an hour
+    start = time.perf_counter()
+    hot_step = 1800.0 / hot_requests
+    allowed = 0
+    for idx in range(hot_requests):
+        allowed += limiter.hit("203.0.113.7", 1_000_600.0 + idx * hot_step)
+    hot_seconds = time.perf_counter() - start
+
+    queue.put(
+        {
+            "mode": mode,
+            "distinct_us": distinct_seconds / ips * 1e6,
+            "hot_us": hot_seconds / hot_requests * 1e6,
+            "hot_allowed": allowed,
+            "delta_rss_mb": _max_rss_mb() - baseline,
+        }
+    )
+
+
+def measure(mode: str, ips: int, hot_requests: int, max_keys: int) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(mode, ips, hot_requests, max_keys, queue))
+    proc.start()
+    report = queue.get()
+    proc.join()
+    return report
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark in-memory rate limiter implementations")
+    parser.add_argument("--ips", type=int, default=1_000_000, help="distinct client IPs")
+    parser.add_argument("--hot-requests", type=int, default=200_000, help="requests from one IP")
+    parser.add_argument("--max-keys", type=int, default=100_000, help="bucketed limiter key cap")
+    args = parser.parse_args()
+
+    print(f"ips={args.ips} hot_requests={args.hot_requests} max_keys={args.max_keys}")
+    for mode in ("legacy", "bucketed"):
+        report = measure(mode, args.ips, args.hot_requests, args.max_keys)
+        print(
+            f"{report['mode']:>9}: distinct={report['distinct_us']:7.2f} us/req  "
+            f"hot={report['hot_us']:7.2f} us/req  allowed={report['hot_allowed']:6d}  "
+            f"delta_rss={report['delta_rss_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
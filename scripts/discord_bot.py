@@ -14,6 +14,7 @@ from prometheus_client import Counter, Histogram, start_http_server
 from src.server.database.connection import SessionLocal
 from src.server.database.models import User, Subscription, SubscriptionTier
 from src.server.features.player_analysis.service import PlayerAnalysisService
+from src.server.features.tasks.client import DEMO_SUMMARY_FIELDS, wait_for_task
 from src.server.features.teammates.models import TeammatePreferences
 from src.server.features.teammates.service import TeammateService
 from src.server.config.settings import settings
@@ -300,73 +301,64 @@ async def submit_demo_url_analysis(
             return
 
         max_wait_seconds = int(os.getenv("BOT_DEMO_URL_MAX_WAIT_SECONDS", "480"))
-        poll_interval = float(os.getenv("BOT_DEMO_URL_POLL_SECONDS", "3"))
-        deadline = time.time() + max_wait_seconds
 
-        while time.time() < deadline:
-            try:
-                status_resp = await client_http.get(
-                    f"{TASK_STATUS_API_URL}/tasks/status/{task_id}"
-                )
-            except Exception:
-                logger.exception("Discord demo url status check failed")
-                await interaction.followup.send(
-                    "Не удалось получить статус задачи анализа.",
-                    ephemeral=True,
-                )
-                return
+        # Server-sent status events: no polling of the result backend
+        try:
+            status_payload = await wait_for_task(
+                client_http,
+                TASK_STATUS_API_URL,
+                task_id,
+                max_wait_seconds,
+                fields=DEMO_SUMMARY_FIELDS,
+            )
+        except Exception:
+            logger.exception("Discord demo url status stream failed")
+            await interaction.followup.send(
+                "Не удалось получить статус задачи анализа.",
+                ephemeral=True,
+            )
+            return
 
-            if status_resp.status_code >= 400:
+        celery_status = (status_payload or {}).get("status")
+        if celery_status in {"SUCCESS", "FAILURE", "REVOKED"}:
+            if celery_status != "SUCCESS":
                 await interaction.followup.send(
-                    "Не удалось получить статус задачи анализа.",
+                    "Анализ не удался. Попробуй другую демку/ссылку.",
                     ephemeral=True,
                 )
                 return
 
-            status_payload = status_resp.json()
-            celery_status = status_payload.get("status")
-
-            if celery_status in {"SUCCESS", "FAILURE", "REVOKED"}:
-                if celery_status != "SUCCESS":
-                    await interaction.followup.send(
-                        "Анализ не удался. Попробуй другую демку/ссылку.",
-                        ephemeral=True,
-                    )
-                    return
+            result = ((status_payload or {}).get("result") or {})
+            analysis = ((result.get("analysis") or {}) if isinstance(result, dict) else {})
+            metadata = analysis.get("metadata") or {}
+            coach = analysis.get("coach_report") or {}
 
-                result = (status_payload.get("result") or {})
-                analysis = ((result.get("analysis") or {}) if isinstance(result, dict) else {})
-                metadata = analysis.get("metadata") or {}
-                coach = analysis.get("coach_report") or {}
+            embed = discord.Embed(
+                title=f"Анализ демки: {metadata.get('map_name', 'unknown')}",
+                description=f"Матч {metadata.get('match_id', 'unknown')}",
+                color=discord.Color.blue(),
+            )
+            embed.add_field(name="Счёт", value=str(metadata.get("score", {})), inline=False)
 
-                embed = discord.Embed(
-                    title=f"Анализ демки: {metadata.get('map_name', 'unknown')}",
-                    description=f"Матч {metadata.get('match_id', 'unknown')}",
-                    color=discord.Color.blue(),
+            summary = coach.get("summary") if isinstance(coach, dict) else None
+            if summary:
+                embed.add_field(
+                    name="Краткий вывод коуча",
+                    value=str(summary)[:1024],
+                    inline=False,
                 )
-                embed.add_field(name="Счёт", value=str(metadata.get("score", {})), inline=False)
-
-                summary = coach.get("summary") if isinstance(coach, dict) else None
-                if summary:
+            else:
+                recs = analysis.get("recommendations") or []
+                if recs:
+                    joined = "\n".join([str(r) for r in recs[:5]])
                     embed.add_field(
-                        name="Краткий вывод коуча",
-                        value=str(summary)[:1024],
+                        name="Рекомендации",
+                        value=joined[:1024],
                         inline=False,
                     )
-                else:
-                    recs = analysis.get("recommendations") or []
-                    if recs:
-                        joined = "\n".join([str(r) for r in recs[:5]])
-                        embed.add_field(
-                            name="Рекомендации",
-                            value=joined[:1024],
-                            inline=False,
-                        )
-
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                return
 
-            await asyncio.sleep(poll_interval)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
 
         await interaction.followup.send(
             f"Анализ ещё выполняется. Task ID: {task_id}",
@@ -1,16 +1,69 @@
+"""Download demos for queued pro_demos records.
+
+Downloads run concurrently (``--concurrency``) over one pooled aiohttp
+session and are written in large buffered chunks to ``<name>.part``. An
+interrupted transfer keeps its ``.part`` file and the next attempt (or run)
+resumes it with an HTTP ``Range`` request. The ETag (or Last-Modified) of
+the response that started the file is kept in ``<name>.part.meta`` and sent
+as ``If-Range``, so an object that changed in between comes back whole
+instead of being spliced onto the old prefix; a ``.part`` without a usable
+validator is downloaded again from scratch. Before a demo is marked
+``DOWNLOADED`` the received size is checked against Content-Length /
+Content-Range, the bytes are checked against any checksum header the storage
+sends (Backblaze, S3, GCS, Content-MD5), ``.zst`` / ``.bz2`` / ``.gz``
+sources are decompressed, and the result must start with a demo header. The
+final ``.dem`` only appears via an atomic rename, so an existing file is
+always complete.
+"""
 from __future__ import annotations
 
 import asyncio
+import base64
+import binascii
+import bz2
+import hashlib
+import json
+import os
+import zlib
 from argparse import ArgumentParser
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Callable, Mapping, Optional, Sequence, Tuple
+from urllib.parse import urlparse
 
 import aiohttp
+from sqlalchemy.orm import Session
 
 from src.server.database.connection import SessionLocal
 from src.server.database.models import ProDemo, ProDemoStatus
 from src.server.integrations.faceit_client import FaceitAPIClient
 
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+MAX_ATTEMPTS = 3
+# Final statuses are committed in groups rather than one commit per change
+COMMIT_EVERY = 20
+
+COMPRESSED_SUFFIXES = (".zst", ".bz2", ".gz")
+# CS2 (Source 2) and CS:GO demo file headers
+DEMO_MAGICS = (b"PBDEMS2\x00", b"HL2DEMO\x00")
+
+
+class DownloadError(Exception):
+    """A demo could not be downloaded or failed verification."""
+
+
+@dataclass
+class DownloadResult:
+    path: Path
+    size: int
+    sha256: str
+    resumed_from: int = 0
+
 
 def parse_args() -> ArgumentParser:
     parser = ArgumentParser(
@@ -28,14 +81,285 @@ def parse_args() -> ArgumentParser:
         default=100,
         help="Maximum number of queued demos to process in one run.",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of demos downloaded at the same time.",
+    )
     return parser
 
 
-async def download_pending_pro_demos(output_dir: Path, limit: int) -> None:
+def demo_filename(url: str, fallback: str) -> str:
+    """File name of ``url`` without query string or compression suffix."""
+    name = urlparse(url).path.rstrip("/").split("/")[-1] or fallback
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)] or fallback
+    return name
+
+
+def _compression(url: str) -> Optional[str]:
+    path = urlparse(url).path
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            return suffix
+    return None
+
+
+def _decompressor(suffix: str) -> Any:
+    if suffix == ".bz2":
+        return bz2.BZ2Decompressor()
+    if suffix == ".gz":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if zstandard is None:
+        raise DownloadError("zstandard is required to unpack .zst demos")
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def expected_digest(headers: Mapping[str, str], full_response: bool) -> Optional[Tuple[str, str]]:
+    """``(hashlib name, hex digest)`` of the whole object from storage headers."""
+    value = headers.get("x-bz-content-sha1")
+    if value and value != "none" and not value.startswith("unverified"):
+        return "sha1", value.lower()
+    try:
+        value = headers.get("x-amz-checksum-sha256")
+        if value:
+            return "sha256", base64.b64decode(value).hex()
+        for part in (headers.get("x-goog-hash") or "").split(","):
+            algo, _, encoded = part.strip().partition("=")
+            if algo == "md5" and encoded:
+                return "md5", base64.b64decode(encoded).hex()
+        value = headers.get("Content-MD5")
+        # Content-MD5 of a 206 response only covers the returned range
+        if value and full_response:
+            return "md5", base64.b64decode(value).hex()
+    except (binascii.Error, ValueError):
+        return None
+    return None
+
+
+def _expected_size(status: int, headers: Mapping[str, str]) -> Optional[int]:
+    try:
+        if status == 206:
+            total = (headers.get("Content-Range") or "").rpartition("/")[2]
+            return int(total) if total and total != "*" else None
+        length = headers.get("Content-Length")
+        return int(length) if length else None
+    except ValueError:
+        return None
+
+
+def _validator(headers: Mapping[str, str]) -> Optional[str]:
+    """Value for ``If-Range``: a strong ETag, else Last-Modified."""
+    etag = headers.get("ETag")
+    # If-Range only accepts strong ETags
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified") or None
+
+
+def _read_validator(meta_path: Path) -> Optional[str]:
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8")).get("validator") or None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _write_validator(meta_path: Path, validator: Optional[str]) -> None:
+    if validator is None:
+        meta_path.unlink(missing_ok=True)
+    else:
+        meta_path.write_text(json.dumps({"validator": validator}), encoding="utf-8")
+
+
+def _discard_part(part_path: Path) -> None:
+    part_path.unlink(missing_ok=True)
+    part_path.with_name(part_path.name + ".meta").unlink(missing_ok=True)
+
+
+def _file_digest(path: Path, algorithm: str) -> str:
+    digest = hashlib.new(algorithm)
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _finalize(
+    part_path: Path,
+    dest_path: Path,
+    compression: Optional[str],
+    digest: Optional[Tuple[str, str]],
+) -> Tuple[int, str]:
+    """Verify ``part_path``, unpack it if needed and rename it to ``dest_path``."""
+    if digest is not None:
+        algorithm, expected = digest
+        actual = _file_digest(part_path, algorithm)
+        if actual != expected:
+            part_path.unlink()
+            raise DownloadError(f"{algorithm} mismatch: expected {expected}, got {actual}")
+
+    if compression is None:
+        ready = part_path
+    else:
+        ready = dest_path.with_name(dest_path.name + ".tmp")
+        decompressor = _decompressor(compression)
+        try:
+            with part_path.open("rb") as src, ready.open("wb") as dst:
+                for block in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dst.write(decompressor.decompress(block))
+                flush = getattr(decompressor, "flush", None)
+                if flush is not None:
+                    dst.write(flush())
+        except Exception as exc:
+            ready.unlink(missing_ok=True)
+            part_path.unlink(missing_ok=True)
+            raise DownloadError(f"cannot decompress {compression} demo: {exc}") from exc
+
+    with ready.open("rb") as f:
+        header = f.read(8)
+    if header not in DEMO_MAGICS:
+        ready.unlink(missing_ok=True)
+        part_path.unlink(missing_ok=True)
+        raise DownloadError("downloaded file is not a demo")
+
+    size = ready.stat().st_size
+    sha256 = _file_digest(ready, "sha256")
+    os.replace(ready, dest_path)
+    part_path.unlink(missing_ok=True)
+    return size, sha256
+
+
+async def download_file(
+    session: Any,
+    url: str,
+    dest_path: Path,
+    chunk_size: int = CHUNK_SIZE,
+    max_attempts: int = MAX_ATTEMPTS,
+) -> DownloadResult:
+    """Download ``url`` to ``dest_path``, resuming a leftover ``.part`` file."""
+    compression = _compression(url)
+    part_path = dest_path.with_name(dest_path.name + (compression or "") + ".part")
+    meta_path = part_path.with_name(part_path.name + ".meta")
+    resumed_from = part_path.stat().st_size if part_path.exists() else 0
+
+    attempt = 0
+    while True:
+        attempt += 1
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        validator = _read_validator(meta_path) if offset else None
+        if offset and validator is None:
+            # No way to tell whether the object changed since: start over
+            _discard_part(part_path)
+            offset = resumed_from = 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+        try:
+            async with session.get(url, headers=headers) as response:
+                status = response.status
+                response_headers = getattr(response, "headers", None) or {}
+                if status == 416 and offset:
+                    # Stale or oversized leftover: start over
+                    _discard_part(part_path)
+                    resumed_from = 0
+                    continue
+                if status not in (200, 206):
+                    raise DownloadError(f"HTTP {status}")
+                if status == 200:
+                    # Changed object, ignored Range or nothing to resume: rewrite
+                    offset = resumed_from = 0
+                    _write_validator(meta_path, _validator(response_headers))
+                elif _validator(response_headers) not in (None, validator):
+                    # A range of another version despite If-Range
+                    _discard_part(part_path)
+                    resumed_from = 0
+                    continue
+                expected_size = _expected_size(status, response_headers)
+                digest = expected_digest(response_headers, full_response=status == 200)
+
+                with part_path.open("ab" if offset else "wb", buffering=chunk_size) as f:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            if attempt >= max_attempts:
+                raise DownloadError(f"download interrupted: {exc}") from exc
+            await asyncio.sleep(attempt)
+            continue
+
+        received = part_path.stat().st_size
+        if expected_size is not None and received != expected_size:
+            if received < expected_size and attempt < max_attempts:
+                continue
+            _discard_part(part_path)
+            raise DownloadError(f"size mismatch: expected {expected_size} bytes, got {received}")
+
+        try:
+            size, sha256 = await asyncio.to_thread(_finalize, part_path, dest_path, compression, digest)
+        finally:
+            if not part_path.exists():
+                meta_path.unlink(missing_ok=True)
+        return DownloadResult(path=dest_path, size=size, sha256=sha256, resumed_from=resumed_from)
+
+
+async def _process_demo(
+    demo: ProDemo,
+    client: Any,
+    session: Any,
+    output_dir: Path,
+) -> bool:
+    """Fetch the demo URL and download it; updates ``demo`` in place."""
+    print(f"Processing match {demo.faceit_match_id}...")
+    try:
+        details = await client.get_match_details(demo.faceit_match_id)
+    except Exception as exc:
+        print(f"  {demo.faceit_match_id}: failed to get match details: {exc}")
+        return False
+
+    if not details:
+        print(f"  {demo.faceit_match_id}: empty match details response")
+        return False
+
+    demo_urls = details.get("demo_url") or []
+    if not demo_urls:
+        print(f"  {demo.faceit_match_id}: no demo_url found in match details")
+        return False
+
+    resource_url = demo_urls[0]
+    demo.demo_url = resource_url
+    dest_path = output_dir / demo_filename(resource_url, f"{demo.faceit_match_id}.dem")
+
+    if dest_path.exists():
+        # Only complete, verified downloads are renamed into place
+        print(f"  File already exists, skipping download: {dest_path}")
+        demo.storage_path = str(dest_path)
+        return True
+
+    try:
+        result = await download_file(session, resource_url, dest_path)
+    except Exception as exc:
+        print(f"  {demo.faceit_match_id}: error during download: {exc}")
+        return False
+
+    demo.storage_path = str(result.path)
+    resumed = f", resumed at {result.resumed_from} bytes" if result.resumed_from else ""
+    print(f"  Downloaded to {result.path} ({result.size} bytes, sha256 {result.sha256[:12]}{resumed})")
+    return True
+
+
+async def download_pending_pro_demos(
+    output_dir: Path,
+    limit: int,
+    concurrency: int = 4,
+    session_factory: Callable[[], Session] = SessionLocal,
+    client: Any = None,
+    http_session: Any = None,
+) -> Tuple[int, int]:
+    """Download up to ``limit`` queued demos; returns ``(downloaded, failed)``."""
     output_dir.mkdir(parents=True, exist_ok=True)
+    concurrency = max(1, concurrency)
 
-    db = SessionLocal()
-    client = FaceitAPIClient()
+    db = session_factory()
+    client = client or FaceitAPIClient()
 
     try:
         demos: Sequence[ProDemo] = (
@@ -48,78 +372,44 @@ async def download_pending_pro_demos(output_dir: Path, limit: int) -> None:
 
         if not demos:
             print("No queued pro_demos to process")
-            return
+            return 0, 0
 
-        async with aiohttp.ClientSession() as session:
-            downloaded = 0
-            failed = 0
+        for demo in demos:
+            demo.status = ProDemoStatus.DOWNLOADING
+        db.commit()
 
-            for demo in demos:
-                print(f"Processing match {demo.faceit_match_id}...")
-                demo.status = ProDemoStatus.DOWNLOADING
-                db.commit()
+        semaphore = asyncio.Semaphore(concurrency)
+        counts = {"downloaded": 0, "failed": 0, "uncommitted": 0}
 
+        async def run(demo: ProDemo, session: Any) -> None:
+            async with semaphore:
                 try:
-                    details = await client.get_match_details(demo.faceit_match_id)
+                    ok = await _process_demo(demo, client, session, output_dir)
                 except Exception as exc:
-                    print(f"  Failed to get match details: {exc}")
-                    demo.status = ProDemoStatus.FAILED
-                    db.commit()
-                    failed += 1
-                    continue
-
-                if not details:
-                    print("  Empty match details response")
-                    demo.status = ProDemoStatus.FAILED
-                    db.commit()
-                    failed += 1
-                    continue
-
-                demo_urls = details.get("demo_url") or []
-                if not demo_urls:
-                    print("  No demo_url found in match details")
-                    demo.status = ProDemoStatus.FAILED
-                    db.commit()
-                    failed += 1
-                    continue
-
-                resource_url = demo_urls[0]
-                demo.demo_url = resource_url
-
-                filename = resource_url.rstrip("/").split("/")[-1] or f"{demo.faceit_match_id}.dem"
-                dest_path = output_dir / filename
+                    print(f"  {demo.faceit_match_id}: unexpected error: {exc}")
+                    ok = False
+            demo.status = ProDemoStatus.DOWNLOADED if ok else ProDemoStatus.FAILED
+            counts["downloaded" if ok else "failed"] += 1
+            counts["uncommitted"] += 1
+            if counts["uncommitted"] >= COMMIT_EVERY:
+                db.commit()
+                counts["uncommitted"] = 0
 
-                if dest_path.exists():
-                    print(f"  File already exists, skipping download: {dest_path}")
-                    demo.storage_path = str(dest_path)
-                    demo.status = ProDemoStatus.DOWNLOADED
-                    db.commit()
-                    downloaded += 1
-                    continue
+        async def run_all(session: Any) -> None:
+            await asyncio.gather(*(run(demo, session) for demo in demos))
 
-                try:
-                    async with session.get(resource_url) as response:
-                        if response.status == 200:
-                            with dest_path.open("wb") as f:
-                                async for chunk in response.content.iter_chunked(8192):
-                                    f.write(chunk)
-                            demo.storage_path = str(dest_path)
-                            demo.status = ProDemoStatus.DOWNLOADED
-                            db.commit()
-                            downloaded += 1
-                            print(f"  Downloaded to {dest_path}")
-                        else:
-                            print(f"  Failed to download demo: HTTP {response.status}")
-                            demo.status = ProDemoStatus.FAILED
-                            db.commit()
-                            failed += 1
-                except Exception as exc:
-                    print(f"  Error during download: {exc}")
-                    demo.status = ProDemoStatus.FAILED
-                    db.commit()
-                    failed += 1
+        if http_session is not None:
+            await run_all(http_session)
+        else:
+            connector = aiohttp.TCPConnector(limit=concurrency)
+            # No total timeout: large demos on slow links take minutes
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                await run_all(session)
 
-        print(f"Finished: downloaded={downloaded}, failed={failed}")
+        db.commit()
+        print(f"Finished: downloaded={counts['downloaded']}, failed={counts['failed']}")
+        return counts["downloaded"], counts["failed"]
 
     finally:
         db.close()
@@ -130,7 +420,13 @@ def main() -> None:
     args = parser.parse_args()
 
     output_dir = Path(args.output_dir)
-    asyncio.run(download_pending_pro_demos(output_dir=output_dir, limit=args.limit))
+    asyncio.run(
+        download_pending_pro_demos(
+            output_dir=output_dir,
+            limit=args.limit,
+            concurrency=args.concurrency,
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -1,13 +1,37 @@
+"""Extract per-player features from downloaded pro demos into demo_features.
+
+Demos are claimed in batches with ``SELECT ... FOR UPDATE SKIP LOCKED`` and
+the claim transaction is held until the batch's features are written, so
+several copies of this script (on one host or many) can run against the same
+database without parsing a demo twice; a crashed run simply releases its
+rows. Parsing is CPU-bound and runs in a process pool, while the parent does
+one bulk INSERT per chunk of feature rows and one status UPDATE per outcome.
+If a parser process dies (demoparser2 is native code, so a crash or the OOM
+killer takes the whole worker down) the pool is recreated and the demos it
+had not finished are left unmarked for the next run instead of FAILED.
+
+On SQLite (tests, local runs) row locks are not available and batches are
+claimed without them.
+"""
 from __future__ import annotations
 
+import multiprocessing
 from argparse import ArgumentParser
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
 
 from src.server.database.connection import SessionLocal
 from src.server.database.models import DemoFeature, ProDemo, ProDemoStatus
 from src.ml.features.pro_demo_extractor import extract_player_feature_rows
 
+# Rows per INSERT statement; keeps bind parameter counts well below limits
+INSERT_CHUNK_ROWS = 1000
+
 
 def parse_args() -> ArgumentParser:
     parser = ArgumentParser(
@@ -28,84 +52,191 @@ def parse_args() -> ArgumentParser:
         default="pro",
         help="Source label to store in DemoFeature.source (e.g. 'pro').",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, (multiprocessing.cpu_count() or 2) - 1),
+        help="Parser processes (1 parses in this process).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Demos claimed per transaction (default: 2 x workers).",
+    )
     return parser
 
 
-def process_pro_demos(limit: int, source: str) -> None:
-    db = SessionLocal()
+def _extract_rows(demo_path: str) -> List[Dict[str, Any]]:
+    # Module-level so it can be pickled into worker processes
+    return extract_player_feature_rows(Path(demo_path))
 
-    try:
-        demos: Sequence[ProDemo] = (
-            db.query(ProDemo)
-            .filter(ProDemo.status == ProDemoStatus.DOWNLOADED)
-            .filter(~ProDemo.features.any())
-            .order_by(ProDemo.id.asc())
-            .limit(limit)
-            .all()
-        )
-
-        if not demos:
-            print("No downloaded pro_demos without features found")
-            return
-
-        processed = 0
-        failed = 0
-
-        for demo in demos:
-            if not demo.storage_path:
-                print(f"Skipping demo {demo.id}: no storage_path")
-                continue
-
-            demo_path = Path(demo.storage_path)
-            if not demo_path.is_file():
-                print(f"Skipping demo {demo.id}: file not found at {demo_path}")
-                demo.status = ProDemoStatus.FAILED
-                db.commit()
-                failed += 1
-                continue
 
-            print(f"Extracting features from demo {demo.id} ({demo_path})...")
+def claim_demos(db: Session, count: int, after_id: int) -> List[Tuple[int, Optional[str]]]:
+    """Lock up to ``count`` unparsed demos with id > ``after_id``.
 
-            try:
-                rows = extract_player_feature_rows(demo_path)
-            except Exception as exc:
-                print(f"  Failed to extract features: {exc}")
-                demo.status = ProDemoStatus.FAILED
-                db.commit()
-                failed += 1
-                continue
+    Rows locked by another run are skipped rather than waited on. The locks
+    last until ``db`` commits or rolls back.
+    """
+    query = (
+        db.query(ProDemo.id, ProDemo.storage_path)
+        .filter(ProDemo.status == ProDemoStatus.DOWNLOADED)
+        .filter(~ProDemo.features.any())
+        .filter(ProDemo.id > after_id)
+        .order_by(ProDemo.id.asc())
+        .limit(count)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True, of=ProDemo)
+    return [(demo_id, storage_path) for demo_id, storage_path in query.all()]
 
-            if not rows:
-                print("  No players/features extracted")
-                demo.status = ProDemoStatus.FAILED
-                db.commit()
-                failed += 1
-                continue
 
-            for row in rows:
-                feature = DemoFeature(
-                    pro_demo_id=demo.id,
-                    source=source,
-                    **row,
-                )
-                db.add(feature)
+def _set_status(db: Session, demo_ids: Sequence[int], status: ProDemoStatus) -> None:
+    if demo_ids:
+        db.execute(update(ProDemo).where(ProDemo.id.in_(demo_ids)).values(status=status))
+
+
+def _insert_features(db: Session, rows: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        db.execute(insert(DemoFeature), rows[start : start + INSERT_CHUNK_ROWS])
+
+
+def _make_executor(workers: int) -> Optional[Executor]:
+    if workers <= 1:
+        return None
+    # spawn: workers do not inherit the parent's DB connections
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
 
-            demo.status = ProDemoStatus.PARSED
-            db.commit()
-            processed += 1
-            print(f"  Saved {len(rows)} feature rows")
+def _parse_batch(
+    claimed: Sequence[Tuple[int, Path]],
+    executor: Optional[Executor],
+) -> Tuple[List[Tuple[int, Optional[List[Dict[str, Any]]], Optional[str]]], bool]:
+    """Return ``(demo_id, rows, error)`` per parsed demo, in order, and whether the pool broke.
 
-        print(f"Finished: processed={processed}, failed={failed}")
+    Demos lost to a broken pool are left out of the results: the crash says
+    nothing about which of them is at fault.
+    """
+    results: List[Tuple[int, Optional[List[Dict[str, Any]]], Optional[str]]] = []
+    if executor is None:
+        for demo_id, demo_path in claimed:
+            try:
+                results.append((demo_id, _extract_rows(str(demo_path)), None))
+            except Exception as exc:
+                results.append((demo_id, None, str(exc)))
+        return results, False
+
+    futures = [(demo_id, executor.submit(_extract_rows, str(demo_path))) for demo_id, demo_path in claimed]
+    broken = False
+    for demo_id, future in futures:
+        try:
+            results.append((demo_id, future.result(), None))
+        except BrokenProcessPool:
+            broken = True
+        except Exception as exc:
+            results.append((demo_id, None, str(exc)))
+    return results, broken
+
+
+def process_pro_demos(
+    limit: int,
+    source: str,
+    workers: int = 1,
+    batch_size: Optional[int] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Tuple[int, int]:
+    """Extract features for up to ``limit`` demos; returns ``(processed, failed)``."""
+    workers = max(1, workers)
+    batch_size = max(1, batch_size or workers * 2)
+    executor = _make_executor(workers)
+
+    processed = 0
+    failed = 0
+    claimed_total = 0
+    after_id = 0
 
+    try:
+        while claimed_total < limit:
+            db = session_factory()
+            try:
+                claimed = claim_demos(db, min(batch_size, limit - claimed_total), after_id)
+                if not claimed:
+                    if claimed_total == 0:
+                        print("No downloaded pro_demos without features found")
+                    break
+                claimed_total += len(claimed)
+                after_id = claimed[-1][0]
+
+                to_parse: List[Tuple[int, Path]] = []
+                failed_ids: List[int] = []
+                for demo_id, storage_path in claimed:
+                    if not storage_path:
+                        print(f"Skipping demo {demo_id}: no storage_path")
+                        continue
+                    demo_path = Path(storage_path)
+                    if not demo_path.is_file():
+                        print(f"Skipping demo {demo_id}: file not found at {demo_path}")
+                        failed_ids.append(demo_id)
+                        continue
+                    print(f"Extracting features from demo {demo_id} ({demo_path})...")
+                    to_parse.append((demo_id, demo_path))
+
+                results, pool_broken = _parse_batch(to_parse, executor)
+                if pool_broken:
+                    print(
+                        f"  Parser pool crashed; {len(to_parse) - len(results)} demos "
+                        "left for the next run"
+                    )
+                    if executor is not None:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                    executor = _make_executor(workers)
+
+                feature_rows: List[Dict[str, Any]] = []
+                parsed_ids: List[int] = []
+                for demo_id, rows, error in results:
+                    if error is not None:
+                        print(f"  Demo {demo_id}: failed to extract features: {error}")
+                        failed_ids.append(demo_id)
+                    elif not rows:
+                        print(f"  Demo {demo_id}: no players/features extracted")
+                        failed_ids.append(demo_id)
+                    else:
+                        feature_rows.extend({**row, "pro_demo_id": demo_id, "source": source} for row in rows)
+                        parsed_ids.append(demo_id)
+                        print(f"  Demo {demo_id}: extracted {len(rows)} feature rows")
+
+                _insert_features(db, feature_rows)
+                _set_status(db, parsed_ids, ProDemoStatus.PARSED)
+                _set_status(db, failed_ids, ProDemoStatus.FAILED)
+                db.commit()
+                processed += len(parsed_ids)
+                failed += len(failed_ids)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
     finally:
-        db.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    print(f"Finished: processed={processed}, failed={failed}")
+    return processed, failed
 
 
 def main() -> None:
     parser = parse_args()
     args = parser.parse_args()
 
-    process_pro_demos(limit=args.limit, source=args.source)
+    process_pro_demos(
+        limit=args.limit,
+        source=args.source,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
 
 
 if __name__ == "__main__":
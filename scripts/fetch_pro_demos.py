@@ -1,14 +1,33 @@
+"""Queue pro_demos records from the FACEIT match history of configured pros.
+
+Players are fetched concurrently (bounded by ``--concurrency``) and each
+history is paged until ``--limit`` matches or the end of the history.
+Fetching is incremental: only matches started after the newest
+``started_at`` already stored for the player are requested. New matches are
+written with one ``INSERT ... ON CONFLICT (faceit_match_id) DO NOTHING`` per
+batch instead of an existence check per match.
+"""
 from __future__ import annotations
 
 import asyncio
 import json
 from argparse import ArgumentParser
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from src.server.database.connection import SessionLocal
 from src.server.database.models import ProDemo, ProDemoStatus
 from src.server.integrations.faceit_client import FaceitAPIClient
 
+# FACEIT returns at most 100 history items per request
+HISTORY_PAGE_SIZE = 100
+UPSERT_BATCH_SIZE = 500
+
 
 def parse_args() -> ArgumentParser:
     parser = ArgumentParser(
@@ -24,12 +43,85 @@ def parse_args() -> ArgumentParser:
         "--limit",
         type=int,
         default=50,
-        help="Number of recent matches per player to fetch.",
+        help="Maximum number of new matches per player to fetch.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of players fetched at the same time.",
     )
     return parser
 
 
-async def fetch_pro_demos(config_path: Path, limit: int) -> None:
+def _started_at(item: Dict[str, Any]) -> Optional[datetime]:
+    value = item.get("started_at")
+    if not isinstance(value, (int, float)):
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+
+def latest_started_at(db: Session) -> Dict[str, datetime]:
+    """Newest stored ``started_at`` per FACEIT player id."""
+    rows = (
+        db.query(ProDemo.faceit_player_id, func.max(ProDemo.started_at))
+        .filter(ProDemo.faceit_player_id.isnot(None))
+        .filter(ProDemo.started_at.isnot(None))
+        .group_by(ProDemo.faceit_player_id)
+        .all()
+    )
+    return {player_id: started_at for player_id, started_at in rows}
+
+
+def upsert_pro_demos(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Insert ``rows`` skipping known match ids; returns the number inserted."""
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    statement = insert(ProDemo).values(rows).on_conflict_do_nothing(index_elements=["faceit_match_id"])
+    result = db.execute(statement)
+    db.commit()
+    return max(0, result.rowcount or 0)
+
+
+async def fetch_player_matches(
+    client: Any,
+    player_id: str,
+    limit: int,
+    since: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Page through a player's history, newest first, up to ``limit`` items."""
+    from_ts = None
+    if since is not None:
+        # Stored timestamps are naive UTC; +1s skips the newest known match
+        from_ts = int(since.replace(tzinfo=timezone.utc).timestamp()) + 1
+
+    items: List[Dict[str, Any]] = []
+    offset = 0
+    while len(items) < limit:
+        page_size = min(HISTORY_PAGE_SIZE, limit - len(items))
+        page = await client.get_match_history(
+            player_id=player_id,
+            limit=page_size,
+            offset=offset,
+            from_ts=from_ts,
+        )
+        page = [item for item in page or [] if isinstance(item, dict)]
+        items.extend(page)
+        if len(page) < page_size:
+            break
+        offset += len(page)
+    return items[:limit]
+
+
+async def fetch_pro_demos(
+    config_path: Path,
+    limit: int,
+    concurrency: int = 8,
+    session_factory: Callable[[], Session] = SessionLocal,
+    client: Any = None,
+) -> int:
     if not config_path.is_file():
         raise SystemExit(f"Config file not found: {config_path}")
 
@@ -39,76 +131,76 @@ async def fetch_pro_demos(config_path: Path, limit: int) -> None:
     if not isinstance(players, list):
         raise SystemExit("Config JSON must be a list of player objects")
 
-    client = FaceitAPIClient()
-    db = SessionLocal()
+    client = client or FaceitAPIClient()
+    db = session_factory()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pending: Dict[str, Dict[str, Any]] = {}
     created = 0
 
-    try:
-        for entry in players:
-            if not isinstance(entry, dict):
-                continue
-
-            nickname = entry.get("nickname")
-            player_id = entry.get("faceit_id")
+    def flush() -> None:
+        nonlocal created
+        rows = list(pending.values())
+        pending.clear()
+        created += upsert_pro_demos(db, rows)
 
-            if not nickname and not player_id:
-                continue
-
-            label = nickname or player_id
-            print(f"Fetching matches for {label}...")
+    async def fetch_player(entry: Dict[str, Any]) -> None:
+        nickname = entry.get("nickname")
+        player_id = entry.get("faceit_id")
 
+        async with semaphore:
             if not player_id and nickname:
                 try:
                     player_data = await client.get_player_by_nickname(nickname)
                 except Exception as exc:
                     print(f"Failed to get player by nickname {nickname}: {exc}")
-                    continue
+                    return
 
                 if not player_data:
-                    continue
+                    return
 
                 player_id = player_data.get("player_id")
 
             if not player_id:
-                continue
+                return
 
+            print(f"Fetching matches for {nickname or player_id}...")
             try:
-                history = await client.get_match_history(player_id=player_id, limit=limit)
+                history = await fetch_player_matches(client, player_id, limit, since.get(player_id))
             except Exception as exc:
                 print(f"Failed to get match history for {player_id}: {exc}")
-                continue
+                return
 
-            for item in history or []:
-                if not isinstance(item, dict):
-                    continue
-
-                match_id = item.get("match_id")
-                if not match_id:
-                    continue
-
-                exists = (
-                    db.query(ProDemo)
-                    .filter(ProDemo.faceit_match_id == match_id)
-                    .first()
-                )
-                if exists:
-                    continue
-
-                pro_demo = ProDemo(
-                    faceit_match_id=match_id,
-                    faceit_player_id=player_id,
-                    faceit_nickname=nickname,
-                    status=ProDemoStatus.QUEUED,
-                )
-                db.add(pro_demo)
-                created += 1
-
-            db.commit()
+        now = datetime.utcnow()
+        for item in history:
+            match_id = item.get("match_id")
+            if not match_id or match_id in pending:
+                continue
+            pending[match_id] = {
+                "faceit_match_id": match_id,
+                "faceit_player_id": player_id,
+                "faceit_nickname": nickname,
+                "started_at": _started_at(item),
+                "status": ProDemoStatus.QUEUED,
+                "created_at": now,
+                "updated_at": now,
+            }
+        if len(pending) >= UPSERT_BATCH_SIZE:
+            flush()
 
+    try:
+        since = latest_started_at(db)
+        entries = [
+            entry
+            for entry in players
+            if isinstance(entry, dict) and (entry.get("nickname") or entry.get("faceit_id"))
+        ]
+        await asyncio.gather(*(fetch_player(entry) for entry in entries))
+        flush()
     finally:
         db.close()
 
     print(f"Created {created} pro demo records")
+    return created
 
 
 def main() -> None:
@@ -116,7 +208,13 @@ def main() -> None:
     args = parser.parse_args()
 
     config_path = Path(args.config)
-    asyncio.run(fetch_pro_demos(config_path=config_path, limit=args.limit))
+    asyncio.run(
+        fetch_pro_demos(
+            config_path=config_path,
+            limit=args.limit,
+            concurrency=args.concurrency,
+        )
+    )
 
 
 if __name__ == "__main__":
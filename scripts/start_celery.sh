@@ -6,17 +6,34 @@ if [ -d "venv" ]; then
     source venv/bin/activate
 fi
 
-# Start Celery worker in background
+# Lightweight tasks (webhooks, emails, player analysis) get their own worker,
+# so long demo analyses cannot hold them up
 celery -A src.server.celery_app worker \
     --loglevel=info \
-    --concurrency=4 \
-    --queues=demo_analysis,notifications,webhooks \
+    --hostname=light@%h \
+    --concurrency=${CELERY_LIGHT_CONCURRENCY:-8} \
+    --queues=webhooks,notifications,default \
     --logfile=logs/celery_worker.log \
     --pidfile=logs/celery_worker.pid \
     --detach
 
 echo "Celery worker started"
 
+# Demo analyses: one task reserved per process, so queued demos stay in the
+# broker where subscriber priority applies
+celery -A src.server.celery_app worker \
+    --loglevel=info \
+    --hostname=demo@%h \
+    --concurrency=${CELERY_DEMO_CONCURRENCY:-2} \
+    --prefetch-multiplier=1 \
+    -O fair \
+    --queues=demo_analysis \
+    --logfile=logs/celery_worker_demo.log \
+    --pidfile=logs/celery_worker_demo.pid \
+    --detach
+
+echo "Celery demo worker started"
+
 # Start Celery beat scheduler in background
 celery -A src.server.celery_app beat \
     --loglevel=info \
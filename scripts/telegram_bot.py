@@ -33,6 +33,7 @@ from src.server.database.models import User, Subscription, SubscriptionTier
 from src.server.exceptions import DemoAnalysisException
 from src.server.features.player_analysis.service import PlayerAnalysisService
 from src.server.features.demo_analyzer.service import DemoAnalyzer
+from src.server.features.tasks.client import DEMO_SUMMARY_FIELDS, wait_for_task
 from src.server.features.teammates.models import TeammatePreferences
 from src.server.features.teammates.service import TeammateService
 from src.server.config.settings import settings
@@ -598,59 +599,52 @@ async def cmd_demo_analyze_url(update: Update, context: ContextTypes.DEFAULT_TYP
         await chat.send_message("Анализ запущен. Жду результат...")
 
         max_wait_seconds = int(os.getenv("BOT_DEMO_URL_MAX_WAIT_SECONDS", "480"))
-        poll_interval = float(os.getenv("BOT_DEMO_URL_POLL_SECONDS", "3"))
-        deadline = time.time() + max_wait_seconds
 
-        last_status: Optional[str] = None
-        while time.time() < deadline:
-            try:
-                status_resp = await client.get(f"{TASK_STATUS_API_URL}/tasks/status/{task_id}")
-            except Exception:
-                logger.exception("Telegram demo_analyze_url status check failed")
-                await chat.send_message("Не удалось получить статус задачи анализа.")
-                return
+        # Server-sent status events: no polling of the result backend
+        try:
+            status_payload = await wait_for_task(
+                client,
+                TASK_STATUS_API_URL,
+                task_id,
+                max_wait_seconds,
+                fields=DEMO_SUMMARY_FIELDS,
+            )
+        except Exception:
+            logger.exception("Telegram demo_analyze_url status stream failed")
+            await chat.send_message("Не удалось получить статус задачи анализа.")
+            return
 
-            if status_resp.status_code >= 400:
-                await chat.send_message("Не удалось получить статус задачи анализа.")
+        celery_status = (status_payload or {}).get("status")
+        if celery_status in {"SUCCESS", "FAILURE", "REVOKED"}:
+            if celery_status != "SUCCESS":
+                await chat.send_message("Анализ не удался. Попробуй другую демку/ссылку.")
                 return
 
-            status_payload = status_resp.json()
-            celery_status = status_payload.get("status")
-            if celery_status and celery_status != last_status:
-                last_status = celery_status
-
-            if celery_status in {"SUCCESS", "FAILURE", "REVOKED"}:
-                if celery_status != "SUCCESS":
-                    await chat.send_message("Анализ не удался. Попробуй другую демку/ссылку.")
-                    return
-
-                result = (status_payload.get("result") or {})
-                analysis = ((result.get("analysis") or {}) if isinstance(result, dict) else {})
-                metadata = analysis.get("metadata") or {}
-                coach = analysis.get("coach_report") or {}
-
-                lines = [
-                    f"Анализ демки {metadata.get('map_name', 'unknown')}",
-                    f"Матч: {metadata.get('match_id', 'unknown')}",
-                    f"Счёт: {metadata.get('score', {})}",
-                    "",
-                ]
-
-                summary = coach.get("summary") if isinstance(coach, dict) else None
-                if summary:
-                    lines.append("Краткий вывод коуча:")
-                    lines.append(str(summary)[:1000])
-                else:
-                    recs = analysis.get("recommendations") or []
-                    if recs:
-                        lines.append("Рекомендации:")
-                        for rec in recs[:5]:
-                            lines.append(f"- {rec}")
-
-                await chat.send_message("\n".join(lines))
-                return
+            result = ((status_payload or {}).get("result") or {})
+            analysis = ((result.get("analysis") or {}) if isinstance(result, dict) else {})
+            metadata = analysis.get("metadata") or {}
+            coach = analysis.get("coach_report") or {}
+
+            lines = [
+                f"Анализ демки {metadata.get('map_name', 'unknown')}",
+                f"Матч: {metadata.get('match_id', 'unknown')}",
+                f"Счёт: {metadata.get('score', {})}",
+                "",
+            ]
+
+            summary = coach.get("summary") if isinstance(coach, dict) else None
+            if summary:
+                lines.append("Краткий вывод коуча:")
+                lines.append(str(summary)[:1000])
+            else:
+                recs = analysis.get("recommendations") or []
+                if recs:
+                    lines.append("Рекомендации:")
+                    for rec in recs[:5]:
+                        lines.append(f"- {rec}")
 
-            await asyncio.sleep(poll_interval)
+            await chat.send_message("\n".join(lines))
+            return
 
         await chat.send_message(
             f"Анализ ещё выполняется. Task ID: {task_id}"
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     import pandas as pd  # type: ignore[import-untyped]
@@ -14,6 +14,180 @@ except ImportError:
     DemoParser = None
 
 
+# Column aliases across demoparser2 versions; the first one present is used
+_ATTACKER = ("attackername", "attacker_name", "attacker")
+_VICTIM = ("victimname", "victim_name", "victim")
+_ASSISTER = ("assistername", "assister_name", "assister")
+_FLASH_ASSIST = ("assistedflash", "assisted_flash", "flash_assist")
+_ROUND = ("round", "round_num", "round_number", "total_rounds_played")
+_TICK = ("tick",)
+_DAMAGE = ("hp_damage", "dmg_health", "damage")
+
+# A kill trades a teammate if the victim got a kill this recently (~5 s at 64 tick)
+TRADE_WINDOW_TICKS = 5 * 64
+
+_FEATURE_TEMPLATE: Dict[str, Any] = {
+    "steam_id": None,
+    "round_number": None,
+    "kills": 0,
+    "deaths": 0,
+    "assists": None,
+    "damage": 0.0,
+    "adr": 0.0,
+    "kast": None,
+    "rating_2_0": None,
+    "opening_duels_won": None,
+    "multikills": None,
+    "clutches_won": None,
+    "trade_kills": None,
+    "avg_distance_to_teammates": None,
+    "avg_distance_to_bombsite": None,
+    "time_in_aggressive_positions": None,
+    "time_in_passive_positions": None,
+    "early_round_pushes": None,
+    "late_round_rotations": None,
+    "save_rounds": None,
+    "suicidal_peeks": None,
+    "nades_thrown": None,
+    "flashes_thrown": None,
+    "flash_assists": None,
+    "smokes_thrown": None,
+    "smokes_blocking_time": None,
+    "molotovs_thrown": None,
+    "molotovs_area_denial_time": None,
+    "avg_money_spent": None,
+    "eco_rounds_played": None,
+    "force_buy_rounds": None,
+    "full_buy_rounds": None,
+    "weapon_tier_score": None,
+    "round_impact_score": 0.0,
+    "clutch_impact": None,
+    "entry_impact": None,
+}
+
+
+def _column(df: Any, aliases: Tuple[str, ...]) -> Optional[str]:
+    for name in aliases:
+        if name in df.columns:
+            return name
+    return None
+
+
+def _trade_kills(kills: Any, attacker: str, victim: str, round_col: str, tick_col: str) -> Any:
+    """Count, per player, kills on someone who had just killed another player.
+
+    One ``merge_asof`` over the kill feed: for every kill, find the victim's
+    own latest earlier kill (same round, within TRADE_WINDOW_TICKS, not on
+    the current killer).
+    """
+    feed = kills[[attacker, victim, round_col, tick_col]].dropna()
+    feed = feed.astype({tick_col: "int64"}).sort_values(tick_col, kind="stable")
+    previous = feed.rename(
+        columns={attacker: "_prev_killer", victim: "_prev_victim", round_col: "_prev_round", tick_col: "_prev_tick"}
+    )
+    merged = pd.merge_asof(
+        feed,
+        previous,
+        left_on=tick_col,
+        right_on="_prev_tick",
+        left_by=victim,
+        right_by="_prev_killer",
+        direction="backward",
+        allow_exact_matches=False,
+        tolerance=TRADE_WINDOW_TICKS,
+    )
+    traded = (
+        merged["_prev_tick"].notna()
+        & (merged["_prev_round"] == merged[round_col])
+        & (merged["_prev_victim"] != merged[attacker])
+    )
+    return merged.loc[traded, attacker].value_counts()
+
+
+def compute_player_feature_rows(
+    kills_df: Any,
+    damage_df: Any,
+    total_rounds: int,
+) -> List[Dict]:
+    """Aggregate per-player features from kill and damage tables.
+
+    Every statistic is a groupby/value_counts over a whole table, so the cost
+    is linear in the number of events regardless of how many players there
+    are. Per-round columns (multikills, opening duels, trade kills) need a
+    round column in the kill feed and stay None without one; flash assists
+    and assists likewise need their columns.
+    """
+    attacker = _column(kills_df, _ATTACKER) if not kills_df.empty else None
+    victim = _column(kills_df, _VICTIM) if not kills_df.empty else None
+    dmg_attacker = _column(damage_df, _ATTACKER) if not damage_df.empty else None
+    dmg_value = _column(damage_df, _DAMAGE) if not damage_df.empty else None
+
+    stats: Dict[str, Any] = {}
+    if attacker:
+        stats["kills"] = kills_df[attacker].value_counts()
+    if victim:
+        stats["deaths"] = kills_df[victim].value_counts()
+    if dmg_attacker and dmg_value:
+        stats["damage"] = damage_df.groupby(dmg_attacker, sort=False)[dmg_value].sum()
+
+    assister = _column(kills_df, _ASSISTER) if not kills_df.empty else None
+    if assister:
+        stats["assists"] = kills_df[assister].value_counts()
+        flash = _column(kills_df, _FLASH_ASSIST)
+        if flash:
+            stats["flash_assists"] = kills_df.loc[kills_df[flash] == True, assister].value_counts()  # noqa: E712
+
+    round_col = _column(kills_df, _ROUND) if attacker else None
+    if round_col:
+        per_round = kills_df.groupby([attacker, round_col], sort=False).size()
+        stats["multikills"] = (per_round >= 2).groupby(level=0).sum()
+
+        tick_col = _column(kills_df, _TICK)
+        order = [round_col, tick_col] if tick_col else [round_col]
+        first_kills = kills_df.sort_values(order, kind="stable").drop_duplicates(round_col)
+        stats["opening_duels_won"] = first_kills[attacker].value_counts()
+
+        if tick_col and victim:
+            stats["trade_kills"] = _trade_kills(kills_df, attacker, victim, round_col, tick_col)
+
+    seen = set()
+    for key in ("kills", "deaths", "damage"):
+        if key in stats:
+            seen.update(stats[key].index.dropna())
+    players = sorted({str(name) for name in seen if name})
+    if not players:
+        return []
+
+    table = pd.DataFrame(index=pd.Index(players, dtype=object))
+    for key, series in stats.items():
+        series = series[series.index.notna()]
+        series.index = series.index.astype(str)
+        table[key] = series.reindex(table.index).fillna(0)
+
+    rows: List[Dict] = []
+    rounds = float(total_rounds) if total_rounds > 0 else 0.0
+    for name, values in zip(players, table.to_dict("records")):
+        kills = int(values.get("kills", 0))
+        total_damage = float(values.get("damage", 0.0))
+
+        row = dict(_FEATURE_TEMPLATE)
+        row.update(
+            steam_id=name,
+            kills=kills,
+            deaths=int(values.get("deaths", 0)),
+            damage=total_damage,
+            adr=total_damage / rounds if rounds else 0.0,
+            # Simple impact proxy: more kills and damage -> higher impact.
+            round_impact_score=float(kills) + 0.003 * total_damage,
+        )
+        for key in ("assists", "opening_duels_won", "multikills", "trade_kills", "flash_assists"):
+            if key in values:
+                row[key] = int(values[key])
+        rows.append(row)
+
+    return rows
+
+
 def extract_player_feature_rows(demo_path: Path) -> List[Dict]:
     """Extract basic per-player features from a CS2 demo file.
 
@@ -50,93 +224,4 @@ def extract_player_feature_rows(demo_path: Path) -> List[Dict]:
         duration = int(header.get("duration", 0) or 0)
         total_rounds = max(1, duration // 75)  # ~75s per round heuristic
 
-    players = set()
-
-    if not kills_df.empty:
-        if "attackername" in kills_df.columns:
-            players.update(kills_df["attackername"].dropna().unique())
-        if "victimname" in kills_df.columns:
-            players.update(kills_df["victimname"].dropna().unique())
-
-    if not damage_df.empty and "attackername" in damage_df.columns:
-        players.update(damage_df["attackername"].dropna().unique())
-
-    rows: List[Dict] = []
-
-    for name in players:
-        if not name:
-            continue
-
-        kills = 0
-        deaths = 0
-        headshots = 0
-        total_damage = 0.0
-
-        if not kills_df.empty:
-            if "attackername" in kills_df.columns:
-                attacker_mask = kills_df["attackername"] == name
-                kills = int(attacker_mask.sum())
-
-                if "headshot" in kills_df.columns:
-                    headshots = int(
-                        kills_df.loc[attacker_mask & (kills_df["headshot"] == True)].shape[0]  # noqa: E712
-                    )
-
-            if "victimname" in kills_df.columns:
-                deaths = int((kills_df["victimname"] == name).sum())
-
-        if not damage_df.empty and {
-            "attackername",
-            "hp_damage",
-        }.issubset(set(damage_df.columns)):
-            player_damage = damage_df[damage_df["attackername"] == name]
-            total_damage = float(player_damage["hp_damage"].sum()) if not player_damage.empty else 0.0
-
-        adr = total_damage / float(total_rounds) if total_rounds > 0 else 0.0
-        headshot_pct = (headshots / kills * 100.0) if kills > 0 else None
-
-        # Simple impact proxy: more kills and damage -> higher impact.
-        round_impact_score = float(kills) + 0.003 * float(total_damage)
-
-        rows.append(
-            {
-                "steam_id": str(name),
-                "round_number": None,
-                "kills": kills,
-                "deaths": deaths,
-                "assists": None,
-                "damage": total_damage,
-                "adr": adr,
-                "kast": None,
-                "rating_2_0": None,
-                "opening_duels_won": None,
-                "multikills": None,
-                "clutches_won": None,
-                "trade_kills": None,
-                "avg_distance_to_teammates": None,
-                "avg_distance_to_bombsite": None,
-                "time_in_aggressive_positions": None,
-                "time_in_passive_positions": None,
-                "early_round_pushes": None,
-                "late_round_rotations": None,
-                "save_rounds": None,
-                "suicidal_peeks": None,
-                "nades_thrown": None,
-                "flashes_thrown": None,
-                "flash_assists": None,
-                "smokes_thrown": None,
-                "smokes_blocking_time": None,
-                "molotovs_thrown": None,
-                "molotovs_area_denial_time": None,
-                "avg_money_spent": None,
-                "eco_rounds_played": None,
-                "force_buy_rounds": None,
-                "full_buy_rounds": None,
-                "weapon_tier_score": None,
-                "round_impact_score": round_impact_score,
-                "clutch_impact": None,
-                "entry_impact": None,
-            }
-        )
-
-    return rows
+    return compute_player_feature_rows(kills_df, damage_df, total_rounds)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, AsyncIterator, Tuple
+
+from pydantic import ValidationError
 
 from .groq_service import GroqService
 from src.server.features.demo_analyzer.models import (
@@ -53,3 +55,27 @@ class DemoCoachModel:
         if not result:
             return CoachReport()
         return CoachReport.model_validate(result)
+
+    async def stream_coach_report(
+        self,
+        demo_input: DemoAnalysisInput,
+        language: str = "ru",
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield validated CoachReport sections as the model produces them.
+
+        Unknown keys and sections that do not match the CoachReport schema
+        are dropped.
+        """
+        lang = language or demo_input.language
+        payload = demo_input.model_dump()
+        async for name, value in self._service.stream_demo_coach_report(
+            demo_input=payload,
+            language=lang,
+        ):
+            if name not in CoachReport.model_fields:
+                continue
+            try:
+                section = CoachReport.model_validate({name: value})
+            except ValidationError:
+                continue
+            yield name, getattr(section, name)
@@ -2,17 +2,25 @@
 Groq Integration Service
 Service for Groq AI models
 """
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 import logging
+import time
 from urllib.parse import urlparse
-import aiohttp
 import json
 from ..config.settings import settings
+from .json_sections import JSONSectionParser
+from .llm_cache import estimate_tokens, llm_response_cache, request_cache_key
+from .llm_transport import LLMResponse, LLMStreamError, LLMStreamIncomplete, llm_transport
 from .sample_store import append_sample
 
 logger = logging.getLogger(__name__)
 
 
+def _looks_like_json_object(content: str) -> bool:
+    start = content.find("{")
+    return start != -1 and content.rfind("}") > start
+
+
 class GroqService:
     """Service for Groq API"""
 
@@ -70,7 +78,11 @@ class GroqService:
         language: str,
         input_payload: Dict,
         output_payload,
+        cached: bool = False,
     ) -> None:
+        if cached:
+            # Cached replies are already in the sample store
+            return
         try:
             record = {
                 "task": task,
@@ -88,6 +100,46 @@ class GroqService:
         except Exception:
             logger.exception("Failed to log AI sample")
 
+    async def _complete(
+        self,
+        task: str,
+        headers: Dict,
+        payload: Dict,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> LLMResponse:
+        """Call the LLM via the shared transport, serving repeated prompts from cache.
+
+        Only 200 responses whose content passes ``accept`` are cached.
+        """
+        cache = llm_response_cache
+        key = request_cache_key(f"{self.provider}:{task}", payload)
+        if cache is not None:
+            data = await cache.get(key, task)
+            if data is not None:
+                return LLMResponse(status=200, data=data, cached=True)
+
+        started = time.perf_counter()
+        response = await llm_transport.post_json(self.groq_base_url, headers, payload)
+        if cache is None or response.status != 200:
+            return response
+
+        try:
+            content = str(response.data["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, TypeError):
+            return response
+        if content.strip() and (accept is None or accept(content)):
+            data = {
+                "choices": [{"message": {"content": content}}],
+                "usage": response.data.get("usage") or {},
+            }
+            await cache.set(
+                key,
+                data,
+                tokens=estimate_tokens(payload, response.data),
+                latency=time.perf_counter() - started,
+            )
+        return response
+
     async def analyze_player_performance(
         self,
         stats: Dict,
@@ -155,36 +207,35 @@ class GroqService:
                 "max_tokens": 300
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.groq_base_url,
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        raw_content = data["choices"][0]["message"]["content"]
-                        content = str(raw_content)
-                        self._log_sample(
-                            task="analysis",
-                            language=lang,
-                            input_payload={
-                                "stats": stats,
-                                "match_history": match_history or [],
-                            },
-                            output_payload=content,
-                        )
-                        return content
-                    else:
-                        error_text = await response.text()
-                        logger.error(
-                            f"Groq API error: {response.status} - "
-                            f"{error_text}"
-                        )
-                        return (
-                            f"Error analyzing performance: "
-                            f"{response.status}"
-                        )
+            response = await self._complete(
+                "analysis",
+                headers,
+                payload,
+            )
+            if response.status == 200:
+                data = response.data
+                raw_content = data["choices"][0]["message"]["content"]
+                content = str(raw_content)
+                self._log_sample(
+                    task="analysis",
+                    language=lang,
+                    input_payload={
+                        "stats": stats,
+                        "match_history": match_history or [],
+                    },
+                    output_payload=content,
+                    cached=response.cached,
+                )
+                return content
+            else:
+                logger.error(
+                    f"Groq API error: {response.status} - "
+                    f"{response.text}"
+                )
+                return (
+                    f"Error analyzing performance: "
+                    f"{response.status}"
+                )
 
         except Exception as e:
             logger.error(f"Groq API error: {str(e)}")
@@ -192,15 +243,8 @@ class GroqService:
                 f"Error analyzing performance: {str(e)}"
             )
 
-    async def generate_demo_coach_report(
-        self,
-        demo_input: Dict,
-        language: str = "ru",
-    ) -> Dict:
-        lang = self._normalize_language(language)
-        if not self.api_key and getattr(self, "provider", None) != "local":
-            return {}
-
+    def _demo_coach_request(self, demo_input: Dict, lang: str) -> Tuple[Dict, Dict]:
+        """Headers and chat payload for a demo coach report in ``lang``."""
         if lang == "en":
             system_content = (
                 "You are a professional CS2 coach. Based on the structured match "
@@ -265,25 +309,36 @@ class GroqService:
             "max_tokens": 800,
         }
 
+        return headers, payload
+
+    async def generate_demo_coach_report(
+        self,
+        demo_input: Dict,
+        language: str = "ru",
+    ) -> Dict:
+        lang = self._normalize_language(language)
+        if not self.api_key and getattr(self, "provider", None) != "local":
+            return {}
+
+        headers, payload = self._demo_coach_request(demo_input, lang)
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.groq_base_url,
-                    headers=headers,
-                    json=payload,
-                ) as response:
-                    if response.status != 200:
-                        text = await response.text()
-                        logger.error(
-                            "Groq demo coach error: %s - %s",
-                            response.status,
-                            text,
-                        )
-                        return {}
-                    data = await response.json()
-                    content = data["choices"][0]["message"][
-                        "content"
-                    ]
+            response = await self._complete(
+                "demo_coach_report",
+                headers,
+                payload,
+                accept=_looks_like_json_object,
+            )
+            if response.status != 200:
+                logger.error(
+                    "Groq demo coach error: %s - %s",
+                    response.status,
+                    response.text,
+                )
+                return {}
+            content = response.data["choices"][0]["message"][
+                "content"
+            ]
 
             text = content.strip()
             if text.startswith("```"):
@@ -318,6 +373,7 @@ class GroqService:
                     language=lang,
                     input_payload={"demo_input": demo_input},
                     output_payload=report,
+                    cached=response.cached,
                 )
                 return report
 
@@ -326,6 +382,68 @@ class GroqService:
             logger.exception("Error in generate_demo_coach_report")
             return {}
 
+    async def stream_demo_coach_report(
+        self,
+        demo_input: Dict,
+        language: str = "ru",
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ``(section, value)`` pairs of a demo coach report as they stream in.
+
+        Uses the provider's streaming API and shares the response cache with
+        ``generate_demo_coach_report``. Yields nothing without an API key.
+        Raises ``LLMStreamIncomplete`` when the stream fails or ends before
+        the report is complete, so callers can tell a cut-off report from a
+        finished one.
+        """
+        lang = self._normalize_language(language)
+        if not self.api_key and getattr(self, "provider", None) != "local":
+            return
+
+        headers, payload = self._demo_coach_request(demo_input, lang)
+        parser = JSONSectionParser()
+        cache = llm_response_cache
+        key = request_cache_key(f"{self.provider}:demo_coach_report", payload)
+
+        if cache is not None:
+            data = await cache.get(key, "demo_coach_report")
+            if data is not None:
+                for section in parser.feed(str(data["choices"][0]["message"]["content"])):
+                    yield section
+                return
+
+        started = time.perf_counter()
+        chunks: List[str] = []
+        report: Dict = {}
+        try:
+            async for delta in llm_transport.stream_chat(self.groq_base_url, headers, payload):
+                chunks.append(delta)
+                for name, value in parser.feed(delta):
+                    report[name] = value
+                    yield name, value
+        except LLMStreamError as exc:
+            logger.error("Groq demo coach stream error: %s - %s", exc.status, exc.text)
+            raise LLMStreamIncomplete(f"Stream failed with status {exc.status}") from exc
+        except Exception as exc:
+            logger.exception("Error in stream_demo_coach_report")
+            raise LLMStreamIncomplete("Stream failed") from exc
+
+        if not parser.done or not report:
+            raise LLMStreamIncomplete("Stream ended before the report was complete")
+        self._log_sample(
+            task="demo_coach_report",
+            language=lang,
+            input_payload={"demo_input": demo_input},
+            output_payload=report,
+        )
+        if cache is not None:
+            content = "".join(chunks)
+            await cache.set(
+                key,
+                {"choices": [{"message": {"content": content}}], "usage": {}},
+                tokens=estimate_tokens(payload, {"choices": [{"message": {"content": content}}]}),
+                latency=time.perf_counter() - started,
+            )
+
     async def generate_training_plan(
         self,
         player_stats: Dict,
@@ -439,75 +557,75 @@ class GroqService:
                 "max_tokens": 300
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.groq_base_url,
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data["choices"][0]["message"][
-                            "content"
-                        ]
-
-                        # Try to parse JSON strictly first
-                        text = content.strip()
-
-                        # Remove optional markdown code fences
-                        if text.startswith("```"):
-                            lines = text.splitlines()
-                            cleaned_lines = [
-                                line
-                                for line in lines
-                                if not line.strip().startswith("```")
-                            ]
-                            text = "\n".join(cleaned_lines).strip()
-
-                        plan: Dict | None = None
+            response = await self._complete(
+                "training_plan",
+                headers,
+                payload,
+                accept=_looks_like_json_object,
+            )
+            if response.status == 200:
+                content = response.data["choices"][0]["message"][
+                    "content"
+                ]
+
+                # Try to parse JSON strictly first
+                text = content.strip()
 
+                # Remove optional markdown code fences
+                if text.startswith("```"):
+                    lines = text.splitlines()
+                    cleaned_lines = [
+                        line
+                        for line in lines
+                        if not line.strip().startswith("```")
+                    ]
+                    text = "\n".join(cleaned_lines).strip()
+
+                plan: Dict | None = None
+
+                try:
+                    plan = json.loads(text)
+                except json.JSONDecodeError:
+                    start = text.find("{")
+                    end = text.rfind("}")
+                    if start != -1 and end != -1 and end > start:
+                        candidate_span = text[start : end + 1]
                         try:
-                            plan = json.loads(text)
+                            plan = json.loads(candidate_span)
                         except json.JSONDecodeError:
-                            start = text.find("{")
-                            end = text.rfind("}")
-                            if start != -1 and end != -1 and end > start:
-                                candidate_span = text[start : end + 1]
-                                try:
-                                    plan = json.loads(candidate_span)
-                                except json.JSONDecodeError:
-                                    brace_level = 0
-                                    for idx, ch in enumerate(text[start:], start):
-                                        if ch == "{":
-                                            brace_level += 1
-                                        elif ch == "}":
-                                            brace_level -= 1
-                                            if brace_level == 0:
-                                                candidate = text[start : idx + 1]
-                                                try:
-                                                    plan = json.loads(candidate)
-                                                    break
-                                                except json.JSONDecodeError:
-                                                    continue
-
-                        if plan is None:
-                            logger.error(
-                                "Failed to parse Groq training plan JSON",
-                            )
-                            return self._get_default_training_plan(lang)
-
-                        self._log_sample(
-                            task="training_plan",
-                            language=lang,
-                            input_payload={
-                                "player_stats": player_stats,
-                                "focus_areas": focus_areas,
-                            },
-                            output_payload=plan,
-                        )
-                        return plan
-                    else:
-                        return self._get_default_training_plan(lang)
+                            brace_level = 0
+                            for idx, ch in enumerate(text[start:], start):
+                                if ch == "{":
+                                    brace_level += 1
+                                elif ch == "}":
+                                    brace_level -= 1
+                                    if brace_level == 0:
+                                        candidate = text[start : idx + 1]
+                                        try:
+                                            plan = json.loads(candidate)
+                                            break
+                                        except json.JSONDecodeError:
+                                            continue
+
+                if plan is None:
+                    logger.error(
+                        "Failed to parse Groq training plan JSON",
+                    )
+                    return self._get_default_training_plan(lang)
+
+                self._log_sample(
+                    task="training_plan",
+                    language=lang,
+                    input_payload={
+                        "player_stats": player_stats,
+                        "focus_areas": focus_areas,
+                    },
+                    output_payload=plan,
+                    cached=response.cached,
+                )
+                return plan
+            else:
+                return self._get_default_training_plan(lang)
 
         except Exception as e:
             logger.error(f"Error generating training plan: {str(e)}")
@@ -572,24 +690,22 @@ class GroqService:
                 "max_tokens": 400,
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.groq_base_url,
-                    headers=headers,
-                    json=request_payload,
-                ) as response:
-                    if response.status != 200:
-                        text = await response.text()
-                        logger.error(
-                            "Groq teammate match error: %s - %s",
-                            response.status,
-                            text,
-                        )
-                        return {}
-                    data = await response.json()
-                    content = data["choices"][0]["message"][
-                        "content"
-                    ]
+            response = await self._complete(
+                "teammates",
+                headers,
+                request_payload,
+                accept=_looks_like_json_object,
+            )
+            if response.status != 200:
+                logger.error(
+                    "Groq teammate match error: %s - %s",
+                    response.status,
+                    response.text,
+                )
+                return {}
+            content = response.data["choices"][0]["message"][
+                "content"
+            ]
 
             text = content.strip()
             if text.startswith("```"):
@@ -609,6 +725,7 @@ class GroqService:
                         language=lang,
                         input_payload=payload,
                         output_payload=parsed,
+                        cached=response.cached,
                     )
                     return parsed
                 return {}
@@ -624,6 +741,7 @@ class GroqService:
                                 language=lang,
                                 input_payload=payload,
                                 output_payload=parsed,
+                                cached=response.cached,
                             )
                             return parsed
                     except json.JSONDecodeError:
@@ -0,0 +1,82 @@
+"""Incremental parser for the top-level members of a streamed JSON object.
+
+LLM coach reports arrive token by token. ``JSONSectionParser`` tracks string
+and nesting state across chunks and hands back each ``(key, value)`` pair as
+soon as its closing ``,`` or ``}`` is seen, so callers can forward finished
+sections while the model is still writing the rest. Text before the opening
+brace (e.g. a ```json fence) is ignored.
+"""
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JSONSectionParser:
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume ``chunk`` and return the members completed by it."""
+        if self.done or not chunk:
+            return []
+        self._buffer += chunk
+        sections: List[Tuple[str, Any]] = []
+
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._member_start is None:
+                if char == "{":
+                    self._depth = 1
+                    self._member_start = pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    sections.extend(self._member(buffer[self._member_start:pos]))
+                    self.done = True
+                    break
+            elif char == "," and self._depth == 1:
+                sections.extend(self._member(buffer[self._member_start:pos]))
+                self._member_start = pos + 1
+            pos += 1
+
+        # Drop consumed text so long reports do not grow the buffer
+        if self._member_start is not None and not self.done:
+            self._buffer = buffer[self._member_start:]
+            self._pos = pos - self._member_start
+            self._member_start = 0
+        else:
+            self._buffer = ""
+            self._pos = 0
+        return sections
+
+    @staticmethod
+    def _member(text: str) -> List[Tuple[str, Any]]:
+        text = text.strip()
+        if not text:
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except ValueError:
+            logger.warning("Skipping malformed JSON section: %.200s", text)
+            return []
@@ -0,0 +1,219 @@
+"""Response cache for LLM chat completions.
+
+Keys are a hash of the canonicalized request: model, sampling parameters and
+the messages with whitespace collapsed and decimal numbers rounded to
+buckets, so prompts built from near-identical stats (K/D 1.21 vs 1.22, same
+language and flags) share one cached answer.
+
+Entries live in a small per-process LRU and in Redis. Redis keeps a sorted
+set of last-access times and trims the oldest entries beyond
+``LLM_CACHE_MAX_ENTRIES``.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter
+
+from ..config.settings import settings
+from ..services.cache_service import LocalLRUCache
+
+try:
+    import redis.asyncio as redis  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+LLM_CACHE_VERSION = "1"
+
+# Decimal numbers in prompts are rounded to this step before hashing
+FLOAT_BUCKET_STEP = 0.05
+
+
+LLM_CACHE_REQUESTS_TOTAL = Counter(
+    "llm_cache_requests_total",
+    "LLM response cache lookups by result",
+    ["task", "result"],
+)
+
+
+LLM_CACHE_SAVED_TOKENS_TOTAL = Counter(
+    "llm_cache_saved_tokens_total",
+    "LLM tokens not spent thanks to cache hits",
+    ["task"],
+)
+
+
+LLM_CACHE_SAVED_SECONDS_TOTAL = Counter(
+    "llm_cache_saved_seconds_total",
+    "Upstream LLM latency avoided thanks to cache hits",
+    ["task"],
+)
+
+
+_DECIMAL_RE = re.compile(r"-?\d+\.\d+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _bucket(match: "re.Match[str]") -> str:
+    value = round(float(match.group(0)) / FLOAT_BUCKET_STEP) * FLOAT_BUCKET_STEP
+    return f"{value:.2f}"
+
+
+def canonicalize_prompt(text: str) -> str:
+    """Collapse whitespace and round decimal numbers to buckets."""
+    return _DECIMAL_RE.sub(_bucket, _WHITESPACE_RE.sub(" ", text).strip())
+
+
+def request_cache_key(task: str, payload: Dict[str, Any]) -> str:
+    """Cache key for a chat-completion request payload."""
+    canonical = {
+        "task": task,
+        "model": payload.get("model"),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+        "messages": [
+            [message.get("role"), canonicalize_prompt(str(message.get("content", "")))]
+            for message in payload.get("messages", [])
+        ],
+    }
+    raw = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return f"llm:cache:v{LLM_CACHE_VERSION}:{digest}"
+
+
+def estimate_tokens(payload: Dict[str, Any], data: Dict[str, Any]) -> int:
+    """Tokens used by a completion: provider ``usage`` or a chars/4 estimate."""
+    usage = data.get("usage") or {}
+    total = usage.get("total_tokens")
+    if isinstance(total, (int, float)):
+        return int(total)
+    chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+    try:
+        chars += len(str(data["choices"][0]["message"]["content"]))
+    except (KeyError, IndexError, TypeError):
+        pass
+    return chars // 4
+
+
+class LLMResponseCache:
+    """Two-tier (process LRU + Redis) cache of successful LLM responses."""
+
+    INDEX_KEY = "llm:cache:lru"
+
+    def __init__(
+        self,
+        redis_url: Optional[str],
+        ttl_seconds: int,
+        max_entries: int,
+        local_items: int = 256,
+    ) -> None:
+        self.redis_url = redis_url if redis is not None else None
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.local = LocalLRUCache(local_items, ttl_seconds)
+        # redis.asyncio clients are bound to the loop they were created on
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _get_client(self) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = redis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+            self._clients[loop] = client
+        return client
+
+    @staticmethod
+    def _record(task: str, result: str, entry: Optional[Dict[str, Any]] = None) -> None:
+        try:
+            LLM_CACHE_REQUESTS_TOTAL.labels(task=task, result=result).inc()
+            if entry is not None:
+                LLM_CACHE_SAVED_TOKENS_TOTAL.labels(task=task).inc(entry.get("tokens", 0))
+                LLM_CACHE_SAVED_SECONDS_TOTAL.labels(task=task).inc(entry.get("latency", 0.0))
+        except Exception:
+            # Metrics must not affect LLM call behavior
+            pass
+
+    async def get(self, key: str, task: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response ``data`` for ``key`` or None."""
+        raw = self.local.get(key)
+        if raw is None and self.redis_url:
+            try:
+                client = self._get_client()
+                pipe = client.pipeline(transaction=False)
+                pipe.get(key)
+                # Refresh LRU position only if the entry is still indexed
+                pipe.zadd(self.INDEX_KEY, {key: time.time()}, xx=True)
+                raw, _ = await pipe.execute()
+            except Exception:
+                logger.warning("LLM cache read failed", exc_info=True)
+                raw = None
+            if raw is not None:
+                self.local.set(key, raw, self.ttl_seconds)
+
+        entry: Optional[Dict[str, Any]] = None
+        if raw is not None:
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                entry = None
+        self._record(task, "hit" if entry is not None else "miss", entry)
+        return entry["data"] if entry is not None else None
+
+    async def set(
+        self,
+        key: str,
+        data: Dict[str, Any],
+        tokens: int,
+        latency: float,
+    ) -> None:
+        raw = json.dumps(
+            {"data": data, "tokens": tokens, "latency": round(latency, 3)},
+            ensure_ascii=False,
+        )
+        self.local.set(key, raw, self.ttl_seconds)
+        if not self.redis_url:
+            return
+        try:
+            client = self._get_client()
+            pipe = client.pipeline(transaction=False)
+            pipe.set(key, raw, ex=self.ttl_seconds)
+            pipe.zadd(self.INDEX_KEY, {key: time.time()})
+            pipe.zcard(self.INDEX_KEY)
+            _, _, size = await pipe.execute()
+            overflow = int(size) - self.max_entries
+            if overflow > 0:
+                evicted = await client.zpopmin(self.INDEX_KEY, overflow)
+                if evicted:
+                    await client.delete(*(member for member, _ in evicted))
+        except Exception:
+            logger.warning("LLM cache write failed", exc_info=True)
+
+    def clear_local(self) -> None:
+        self.local.clear()
+
+
+def _build_cache() -> Optional[LLMResponseCache]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return LLMResponseCache(
+        redis_url=settings.REDIS_URL or os.getenv("REDIS_URL"),
+        ttl_seconds=int(settings.LLM_CACHE_TTL_SECONDS),
+        max_entries=int(settings.LLM_CACHE_MAX_ENTRIES),
+        local_items=int(settings.LLM_CACHE_L1_ITEMS),
+    )
+
+
+llm_response_cache = _build_cache()
@@ -0,0 +1,366 @@
+"""Shared HTTP transport for LLM chat-completion calls.
+
+All GroqService calls (Groq, OpenRouter or a local OpenAI-compatible server)
+go through one ``LLMTransport``:
+
+* one pooled keep-alive aiohttp session per event loop;
+* a cap on concurrent upstream requests;
+* a process-wide token bucket; a provider ``Retry-After`` pauses the bucket
+  for every caller, not just the one that got the 429;
+* retries with full-jitter exponential backoff on 429/5xx and network errors;
+* identical in-flight requests coalesced into one upstream call.
+
+``stream_chat`` sends ``stream: true`` requests and yields content deltas
+from the provider's server-sent events as they arrive.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Mapping, Optional, Tuple
+
+import aiohttp
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..config.settings import settings
+from ..core.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+LLM_HTTP_IN_FLIGHT = Gauge(
+    "llm_http_requests_in_flight",
+    "LLM API requests currently holding a concurrency slot",
+)
+
+
+LLM_HTTP_WAIT_SECONDS = Histogram(
+    "llm_http_wait_seconds",
+    "Time spent waiting for the LLM rate limiter and a concurrency slot",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+LLM_HTTP_RETRIES_TOTAL = Counter(
+    "llm_http_retries_total",
+    "LLM API requests retried",
+    ["reason"],
+)
+
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass
+class LLMResponse:
+    status: int
+    data: Any = None
+    text: str = ""
+    # True when served from the response cache instead of the provider
+    cached: bool = False
+
+
+class LLMStreamError(Exception):
+    """A streamed completion could not be started (final HTTP status)."""
+
+    def __init__(self, status: int, text: str = "") -> None:
+        super().__init__(f"LLM stream failed with status {status}")
+        self.status = status
+        self.text = text
+
+
+class LLMStreamIncomplete(Exception):
+    """A streamed completion ended before the response was complete."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket working on reservations.
+
+    ``reserve`` takes a token immediately and returns how long the caller has
+    to wait before using it, so it works from any event loop (or thread).
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._not_before - now)
+            if self.rate <= 0:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def pause_for(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds`` (e.g. provider Retry-After)."""
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_key(url: str, headers: Mapping[str, str], payload: Any) -> str:
+    raw = json.dumps(
+        {"url": url, "headers": dict(headers), "payload": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def iter_sse_deltas(lines: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Yield ``choices[0].delta.content`` from OpenAI-style SSE lines."""
+    async for raw in lines:
+        line = raw.strip()
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return
+        try:
+            chunk = json.loads(data)
+            delta = chunk["choices"][0].get("delta") or {}
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            logger.debug("Skipping malformed LLM stream chunk: %r", data[:200])
+            continue
+        content = delta.get("content")
+        if content:
+            yield content
+
+
+class LLMTransport:
+    """Pooled, rate-limited, retrying POST transport for LLM APIs."""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0,
+        max_retry_after: float = 60.0,
+    ) -> None:
+        self.max_concurrency = max(
+            1, int(settings.LLM_MAX_CONCURRENCY if max_concurrency is None else max_concurrency)
+        )
+        self.max_retries = max(
+            0, int(settings.LLM_MAX_RETRIES if max_retries is None else max_retries)
+        )
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_retry_after = max_retry_after
+        self.bucket = TokenBucket(
+            settings.LLM_RATE_PER_SECOND if rate_per_second is None else rate_per_second,
+            settings.LLM_BURST if burst is None else burst,
+        )
+        self._flight = SingleFlight("llm")
+        # aiohttp sessions and asyncio semaphores are bound to one loop
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Any, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _get(self) -> Tuple[Any, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is not None and not getattr(entry[0], "closed", False):
+            return entry
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            keepalive_timeout=30,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.LLM_TIMEOUT_SECONDS),
+        )
+        entry = (session, asyncio.Semaphore(self.max_concurrency))
+        self._sessions[loop] = entry
+        return entry
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[Any]:
+        session, semaphore = self._get()
+        started = time.perf_counter()
+        delay = self.bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                LLM_HTTP_WAIT_SECONDS.observe(time.perf_counter() - started)
+                LLM_HTTP_IN_FLIGHT.inc()
+            except Exception:
+                # Metrics must not affect LLM call behavior
+                pass
+            try:
+                yield session
+            finally:
+                try:
+                    LLM_HTTP_IN_FLIGHT.dec()
+                except Exception:
+                    pass
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads out callers that failed at the same moment
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _record_retry(reason: str) -> None:
+        try:
+            LLM_HTTP_RETRIES_TOTAL.labels(reason=reason).inc()
+        except Exception:
+            pass
+
+    async def post_json(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        dedup: bool = True,
+    ) -> LLMResponse:
+        """POST ``payload`` and return status plus parsed JSON (200) or error text.
+
+        Network errors are raised once retries are exhausted; HTTP errors are
+        returned as ``LLMResponse`` with the final status.
+        """
+        if not dedup:
+            return await self._post_with_retries(url, headers, payload)
+        key = _request_key(url, headers, payload)
+        return await self._flight.do(key, lambda: self._post_with_retries(url, headers, payload))
+
+    async def _post_with_retries(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+    ) -> LLMResponse:
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            try:
+                async with self._slot() as session:
+                    async with session.post(url, headers=headers, json=payload) as response:
+                        status = response.status
+                        if status == 200:
+                            return LLMResponse(status=status, data=await response.json())
+                        text = await response.text()
+                        response_headers = getattr(response, "headers", None) or {}
+                        retry_after = parse_retry_after(response_headers.get("Retry-After"))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if attempt >= self.max_retries:
+                    raise
+                self._record_retry("network")
+                logger.warning("LLM request failed (%s), retrying", exc)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if not self._should_retry(status, retry_after, attempt):
+                return LLMResponse(status=status, text=text)
+            if retry_after is None:
+                await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _should_retry(self, status: int, retry_after: Optional[float], attempt: int) -> bool:
+        if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+            return False
+        if retry_after is not None and retry_after > self.max_retry_after:
+            logger.warning("LLM provider asked to retry after %.0fs, giving up", retry_after)
+            return False
+
+        self._record_retry(str(status))
+        if retry_after is not None:
+            # Provider-wide limit: hold back every caller, not just this one
+            self.bucket.pause_for(retry_after)
+        return True
+
+    async def stream_chat(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        """POST ``payload`` with ``stream: true`` and yield content deltas.
+
+        Retries like ``post_json`` until the first delta arrives; after that a
+        failure propagates, since the caller has already consumed output.
+        Raises ``LLMStreamError`` when the final status is not 200.
+        """
+        body = dict(payload, stream=True)
+        attempt = 0
+        started = False
+        while True:
+            retry_after: Optional[float] = None
+            try:
+                async with self._slot() as session:
+                    async with session.post(url, headers=headers, json=body) as response:
+                        status = response.status
+                        if status == 200:
+                            async for delta in iter_sse_deltas(response.content):
+                                started = True
+                                yield delta
+                            return
+                        text = await response.text()
+                        response_headers = getattr(response, "headers", None) or {}
+                        retry_after = parse_retry_after(response_headers.get("Retry-After"))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if started or attempt >= self.max_retries:
+                    raise
+                self._record_retry("network")
+                logger.warning("LLM stream failed (%s), retrying", exc)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if not self._should_retry(status, retry_after, attempt):
+                raise LLMStreamError(status, text)
+            if retry_after is None:
+                await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def close(self) -> None:
+        """Close the session owned by the running loop (call on shutdown)."""
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.pop(loop, None)
+        if entry is None:
+            return
+        close = getattr(entry[0], "close", None)
+        if close is not None:
+            await close()
+
+
+llm_transport = LLMTransport()
@@ -1,21 +1,301 @@
+"""JSONL store of AI training samples.
+
+``append_sample`` is called on the request path after every LLM reply, so it
+only serializes the record and puts it on a bounded in-memory queue. A
+background thread drains the queue and appends whole batches to
+``ai_samples.jsonl``, flushing when a batch is full or every
+``AI_SAMPLES_FLUSH_SECONDS``. When the queue is full the sample is dropped
+and counted instead of blocking the caller.
+
+The active file is rotated when it grows past ``AI_SAMPLES_MAX_BYTES`` or a
+new UTC day starts. Closed segments (``ai_samples-<timestamp>.jsonl``) are
+compressed with zstd if ``zstandard`` is installed, gzip otherwise.
+
+Every API and Celery process has its own writer on the same file, so the
+rotation check and the append happen under an exclusive ``flock`` on
+``ai_samples.jsonl.lock``: only one process rotates, and nobody appends to a
+segment after it has been renamed for compression.
+"""
+import atexit
+from contextlib import contextmanager
+import gzip
 import json
 import logging
 import os
+import queue
+import shutil
 import threading
-from typing import Any, Dict
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from prometheus_client import Counter
 
 from ..config.settings import settings
 
-logger = logging.getLogger(__name__)
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
 
-_lock = threading.Lock()
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 AI_SAMPLES_DIR = getattr(settings, "AI_SAMPLES_DIR", "data")
 AI_SAMPLES_FILENAME = "ai_samples.jsonl"
 
 
+AI_SAMPLES_WRITTEN_TOTAL = Counter(
+    "ai_samples_written_total",
+    "AI training samples written to the JSONL store",
+)
+
+
+AI_SAMPLES_DROPPED_TOTAL = Counter(
+    "ai_samples_dropped_total",
+    "AI training samples dropped before reaching the JSONL store",
+    ["reason"],
+)
+
+
+def _record_dropped(reason: str, count: int = 1) -> None:
+    try:
+        AI_SAMPLES_DROPPED_TOTAL.labels(reason=reason).inc(count)
+    except Exception:
+        # Metrics must not affect sample logging behavior
+        pass
+
+
+def _utc_day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y%m%d")
+
+
+class _Flush:
+    """Queue marker: set once every line queued before it is on disk."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class SampleWriter:
+    def __init__(
+        self,
+        directory: str,
+        filename: str = AI_SAMPLES_FILENAME,
+        max_queue: int = 10_000,
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_daily: bool = True,
+        compress: bool = True,
+    ) -> None:
+        self.directory = directory
+        self.filename = filename
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Any]" = queue.Queue(self.max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, self.filename)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # A forked child (Celery prefork) inherits the queue but not the thread
+            self._queue = queue.Queue(self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(self._queue,),
+                name="ai-sample-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def append(self, record: Dict[str, Any]) -> bool:
+        """Queue ``record`` for writing; returns False if it was dropped."""
+        if self._closed:
+            _record_dropped("closed")
+            return False
+        try:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+        except Exception:
+            logger.exception("Failed to serialize AI sample")
+            _record_dropped("serialize")
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            _record_dropped("queue_full")
+            return False
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is written (or ``timeout``)."""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush pending samples and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("AI sample queue still full on shutdown")
+            return
+        thread.join(timeout)
+
+    def _run(self, lines: "queue.Queue[Any]") -> None:
+        batch: List[str] = []
+        markers: List[_Flush] = []
+        deadline = time.monotonic() + self.flush_interval
+        stop = False
+        while not stop:
+            try:
+                item = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = _Flush()
+            if item is None:
+                stop = True
+            elif isinstance(item, _Flush):
+                markers.append(item)
+            else:
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch:
+                self._write(batch)
+                batch = []
+            for marker in markers:
+                marker.done.set()
+            markers = []
+            deadline = time.monotonic() + self.flush_interval
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock shared by all processes writing this store."""
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _write(self, batch: List[str]) -> None:
+        segment = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._file_lock():
+                segment = self._maybe_rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(batch) + "\n")
+        except Exception:
+            # Never break main flow because of logging issues
+            logger.exception("Failed to append AI samples to JSONL store")
+            _record_dropped("write_error", len(batch))
+        else:
+            try:
+                AI_SAMPLES_WRITTEN_TOTAL.inc(len(batch))
+            except Exception:
+                pass
+        # Outside the lock: the renamed segment is no longer appended to
+        if segment is not None and self.compress:
+            self._compress_segment(segment)
+
+    def _maybe_rotate(self) -> Optional[str]:
+        """Rename the active file if due; returns the closed segment. Call under ``_file_lock``."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        too_big = self.max_bytes > 0 and stat.st_size >= self.max_bytes
+        new_day = self.rotate_daily and _utc_day(stat.st_mtime) != _utc_day(now)
+        if not (too_big or new_day):
+            return None
+
+        stem, ext = os.path.splitext(self.filename)
+        stamp = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y%m%d-%H%M%S")
+        segment = os.path.join(self.directory, f"{stem}-{stamp}{ext}")
+        suffix = 1
+        while os.path.exists(segment) or os.path.exists(segment + ".zst") or os.path.exists(segment + ".gz"):
+            segment = os.path.join(self.directory, f"{stem}-{stamp}-{suffix}{ext}")
+            suffix += 1
+        os.replace(self.path, segment)
+        return segment
+
+    @staticmethod
+    def _compress_segment(segment: str) -> None:
+        try:
+            if zstandard is not None:
+                target = segment + ".zst"
+                with open(segment, "rb") as src, open(target, "wb") as dst:
+                    zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+            else:
+                target = segment + ".gz"
+                with open(segment, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst)
+            os.unlink(segment)
+        except Exception:
+            # The uncompressed segment is kept
+            logger.exception("Failed to compress AI sample segment %s", segment)
+
+
+_sample_writer: Optional[SampleWriter] = None
+_sample_writer_lock = threading.Lock()
+
+
+def get_sample_writer() -> SampleWriter:
+    """Return the process-wide sample writer (created on first use)."""
+    global _sample_writer
+    with _sample_writer_lock:
+        if _sample_writer is None:
+            _sample_writer = SampleWriter(
+                directory=AI_SAMPLES_DIR,
+                max_queue=int(settings.AI_SAMPLES_QUEUE_SIZE),
+                batch_size=int(settings.AI_SAMPLES_BATCH_SIZE),
+                flush_interval=float(settings.AI_SAMPLES_FLUSH_SECONDS),
+                max_bytes=int(settings.AI_SAMPLES_MAX_MB) * 1024 * 1024,
+                rotate_daily=bool(settings.AI_SAMPLES_ROTATE_DAILY),
+                compress=bool(settings.AI_SAMPLES_COMPRESS),
+            )
+            atexit.register(_sample_writer.close)
+        return _sample_writer
+
+
 def append_sample(record: Dict[str, Any]) -> None:
-    """Append a single AI training sample to a local JSONL file.
+    """Queue a single AI training sample for the local JSONL store.
 
     Each line is a standalone JSON object with at least keys:
     - task: str
@@ -24,13 +304,13 @@ def append_sample(record: Dict[str, Any]) -> None:
     - output: any (string or structured JSON)
     """
     try:
-        os.makedirs(AI_SAMPLES_DIR, exist_ok=True)
-        path = os.path.join(AI_SAMPLES_DIR, AI_SAMPLES_FILENAME)
-        line = json.dumps(record, ensure_ascii=False, default=str)
-
-        with _lock:
-            with open(path, "a", encoding="utf-8") as f:
-                f.write(line + "\n")
+        get_sample_writer().append(record)
     except Exception:
         # Never break main flow because of logging issues
-        logger.exception("Failed to append AI sample to JSONL store")
+        logger.exception("Failed to queue AI sample")
+
+
+def close_sample_store(timeout: float = 5.0) -> None:
+    """Write out queued samples; call on shutdown."""
+    if _sample_writer is not None:
+        _sample_writer.close(timeout)
@@ -1,5 +1,6 @@
 """Celery configuration"""
 from celery import Celery
+from kombu import Queue
 import os
 
 # Redis connection
@@ -13,6 +14,20 @@ celery_app = Celery(
     include=["src.server.tasks"]
 )
 
+# Queues: demo analyses take minutes, everything else milliseconds, so they
+# are consumed by separate workers (see docker-compose) and a burst of demo
+# uploads cannot delay webhooks. Lightweight queues are listed in the order
+# a worker drains them.
+DEMO_QUEUE = "demo_analysis"
+WEBHOOKS_QUEUE = "webhooks"
+NOTIFICATIONS_QUEUE = "notifications"
+DEFAULT_QUEUE = "default"
+
+# Redis broker priorities: lower is consumed first; anything in between is
+# rounded to one of these steps
+PRIORITY_STEPS = [0, 3, 6, 9]
+LOWEST_PRIORITY = PRIORITY_STEPS[-1]
+
 # Configuration
 celery_app.conf.update(
     task_serializer="json",
@@ -27,11 +42,24 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
     task_acks_late=True,
     task_reject_on_worker_lost=True,
+    task_default_queue=DEFAULT_QUEUE,
+    task_queues=(
+        Queue(WEBHOOKS_QUEUE, routing_key=WEBHOOKS_QUEUE),
+        Queue(NOTIFICATIONS_QUEUE, routing_key=NOTIFICATIONS_QUEUE),
+        Queue(DEFAULT_QUEUE, routing_key=DEFAULT_QUEUE),
+        Queue(DEMO_QUEUE, routing_key=DEMO_QUEUE),
+    ),
+    broker_transport_options={
+        "priority_steps": PRIORITY_STEPS,
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
 )
 
 # Task routes
 celery_app.conf.task_routes = {
-    "src.server.tasks.analyze_demo_task": {"queue": "demo_analysis"},
-    "src.server.tasks.send_email_task": {"queue": "notifications"},
-    "src.server.tasks.process_webhook_task": {"queue": "webhooks"},
+    "src.server.tasks.analyze_demo_task": {"queue": DEMO_QUEUE, "priority": LOWEST_PRIORITY},
+    "src.server.tasks.send_email_task": {"queue": NOTIFICATIONS_QUEUE},
+    "src.server.tasks.process_webhook_task": {"queue": WEBHOOKS_QUEUE},
+    "src.server.tasks.analyze_player_task": {"queue": DEFAULT_QUEUE},
 }
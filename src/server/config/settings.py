@@ -29,6 +29,14 @@ class Settings(BaseSettings):
     FACEIT_CLIENT_ID: Optional[str] = None
     FACEIT_CLIENT_SECRET: Optional[str] = None
 
+    # Faceit API connection pool (shared keep-alive session)
+    FACEIT_HTTP_POOL_LIMIT: int = 100
+    FACEIT_HTTP_LIMIT_PER_HOST: int = 20
+    FACEIT_HTTP_KEEPALIVE_SECONDS: int = 30
+    FACEIT_HTTP_MAX_CONCURRENCY: int = 20
+    # Coalesce identical Faceit lookups across workers via a Redis lock
+    FACEIT_SINGLE_FLIGHT_REDIS: bool = False
+
     # Steam Web API settings
     STEAM_WEB_API_KEY: Optional[str] = None
 
@@ -48,6 +56,18 @@ class Settings(BaseSettings):
     LOCAL_LLM_MODEL: Optional[str] = None
     LOCAL_LLM_API_KEY: Optional[str] = None
 
+    # Shared LLM transport: concurrency cap, token bucket and retries
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_RATE_PER_SECOND: float = 2.0
+    LLM_BURST: int = 4
+    LLM_MAX_RETRIES: int = 3
+    LLM_TIMEOUT_SECONDS: int = 120
+    # Cache of LLM replies keyed by canonicalized prompt (process LRU + Redis)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    LLM_CACHE_L1_ITEMS: int = 256
+
     # Security settings
     SECRET_KEY: str = "change-me-in-production-min-32-characters-long"
     ALGORITHM: str = "HS256"
@@ -71,6 +91,8 @@ class Settings(BaseSettings):
     RATE_LIMIT_BAN_WINDOW_SECONDS: int = 600
     RATE_LIMIT_BAN_TTL_SECONDS: int = 3600
     RATE_LIMIT_BYPASS_USER_ID: Optional[int] = None
+    # Max identities tracked by the in-memory limiter when Redis is unavailable
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100_000
 
     # Payment settings
     WEBSITE_URL: str = "http://localhost:3000"
@@ -200,9 +222,63 @@ class Settings(BaseSettings):
 
     # Directory for storing AI training samples (JSONL)
     AI_SAMPLES_DIR: str = "data"
+    # Background sample writer: queue bound (full queue drops samples),
+    # batch size / flush interval, and segment rotation by size or UTC day
+    AI_SAMPLES_QUEUE_SIZE: int = 10000
+    AI_SAMPLES_BATCH_SIZE: int = 200
+    AI_SAMPLES_FLUSH_SECONDS: float = 2.0
+    AI_SAMPLES_MAX_MB: int = 64
+    AI_SAMPLES_ROTATE_DAILY: bool = True
+    AI_SAMPLES_COMPRESS: bool = True
 
     # Demo upload limits
     MAX_DEMO_FILE_MB: int = 700
+    # Largest single chunk accepted by the resumable upload API
+    DEMO_UPLOAD_CHUNK_MAX_MB: int = 32
+
+    # Demo parsing pool: worker processes (0 = parse in a thread) and how many
+    # demos may wait for a free worker before new uploads get 503
+    DEMO_PARSE_WORKERS: int = 2
+    DEMO_PARSE_QUEUE_DEPTH: int = 4
+
+    # In-process L1 cache in front of Redis (CacheService)
+    CACHE_L1_MAX_ITEMS: int = 1024
+    CACHE_L1_TTL_SECONDS: int = 30
+
+    # Player analysis cache: fresh TTL and stale-while-revalidate window
+    PLAYER_ANALYSIS_CACHE_TTL_SECONDS: int = 600
+    PLAYER_ANALYSIS_CACHE_STALE_SECONDS: int = 1800
+
+    # Demo analysis cache keyed by file hash: "redis", "disk" or "none"
+    DEMO_RESULT_CACHE_BACKEND: str = "redis"
+    DEMO_RESULT_CACHE_DIR: str = "data/demo_cache"
+    DEMO_RESULT_CACHE_MAX_MB: int = 512
+    DEMO_RESULT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Precomputed dynamic sitemap: changed rows are picked up every
+    # SITEMAP_REFRESH_SECONDS, a full rebuild (drops deleted players) runs
+    # every SITEMAP_REBUILD_SECONDS. Sitemap URLs use SITEMAP_BASE_URL
+    # (e.g. https://example.com); without it they follow the request host
+    SITEMAP_REFRESH_SECONDS: int = 60
+    SITEMAP_REBUILD_SECONDS: int = 24 * 3600
+    SITEMAP_BASE_URL: Optional[str] = None
+
+    # Task results larger than TASK_RESULT_OFFLOAD_MIN_KB are stored
+    # compressed outside Celery ("redis", "disk" or "none"); keep the TTL in
+    # line with Celery's result_expires
+    TASK_RESULT_STORE_BACKEND: str = "redis"
+    TASK_RESULT_STORE_DIR: str = "data/task_results"
+    TASK_RESULT_OFFLOAD_MIN_KB: int = 16
+    TASK_RESULT_TTL_SECONDS: int = 24 * 3600
+
+    # Demo analysis queue backpressure: submissions get 503 + Retry-After once
+    # this many demos are waiting (0 disables); paid tiers have their own
+    # limit. The ETA assumes DEMO_ANALYSIS_EXPECTED_SECONDS per demo spread
+    # over CELERY_DEMO_CONCURRENCY worker processes
+    DEMO_QUEUE_MAX_DEPTH: int = 40
+    DEMO_QUEUE_PAID_MAX_DEPTH: int = 120
+    DEMO_ANALYSIS_EXPECTED_SECONDS: int = 90
+    CELERY_DEMO_CONCURRENCY: int = 2
 
     # Test settings
     TEST_ENV: bool = False
@@ -0,0 +1,92 @@
+"""Tag index for Redis cache invalidation without KEYS.
+
+Every cached entry is added to one Redis sorted set per tag (e.g.
+``user:42`` or ``route:/players/{nickname}/stats``), scored by the entry's
+expiry time. Invalidating a tag pops its members in batches and unlinks
+them, pipelining each UNLINK with the next ZPOPMIN, so the cost is
+proportional to the number of affected entries rather than to the size of
+the keyspace. Each write drops members whose entries have already expired,
+so busy tags (``all``, hot routes) that never go idle long enough to expire
+stay as large as their live entries. A tag set expires together with its
+newest entry.
+
+Helpers take the Redis client explicitly and exist in sync and async
+variants, because both redis-py client flavours are used in this codebase.
+"""
+import time
+from typing import Any, Iterable, Optional
+
+TAG_BATCH_SIZE = 500
+
+
+def tag_key(prefix: str, tag: str) -> str:
+    # "tags" rather than "tag": the old plain-set keys would fail with WRONGTYPE
+    return f"{prefix}:tags:{tag}"
+
+
+def register_tags(
+    pipe: Any,
+    key: str,
+    tag_keys: Iterable[str],
+    ttl: int,
+    now: Optional[float] = None,
+) -> None:
+    """Queue ZADD/EXPIRE commands for ``key`` on an open pipeline.
+
+    Members of already expired entries are pruned from each tag first.
+    """
+    now = time.time() if now is None else now
+    for tkey in tag_keys:
+        pipe.zremrangebyscore(tkey, "-inf", now)
+        pipe.zadd(tkey, {key: now + ttl})
+        pipe.expire(tkey, ttl)
+
+
+def _members(popped: Any) -> list:
+    return [member for member, _score in popped or []]
+
+
+def invalidate_tag_sync(client: Any, tkey: str, batch_size: int = TAG_BATCH_SIZE) -> int:
+    """Delete all entries registered under ``tkey``; returns removed entry count."""
+    removed = 0
+    members = _members(client.zpopmin(tkey, batch_size))
+    while members:
+        pipe = client.pipeline(transaction=False)
+        pipe.unlink(*members)
+        pipe.zpopmin(tkey, batch_size)
+        unlinked, popped = pipe.execute()
+        removed += int(unlinked or 0)
+        members = _members(popped)
+    return removed
+
+
+async def invalidate_tag(client: Any, tkey: str, batch_size: int = TAG_BATCH_SIZE) -> int:
+    """Async variant of :func:`invalidate_tag_sync`."""
+    removed = 0
+    members = _members(await client.zpopmin(tkey, batch_size))
+    while members:
+        pipe = client.pipeline(transaction=False)
+        pipe.unlink(*members)
+        pipe.zpopmin(tkey, batch_size)
+        unlinked, popped = await pipe.execute()
+        removed += int(unlinked or 0)
+        members = _members(popped)
+    return removed
+
+
+def scan_delete_sync(client: Any, pattern: str, batch_size: int = TAG_BATCH_SIZE) -> int:
+    """Delete keys matching ``pattern`` using SCAN and batched UNLINK.
+
+    Still walks the whole keyspace, but incrementally and without blocking
+    Redis the way KEYS does. Prefer tags where possible.
+    """
+    removed = 0
+    batch = []
+    for key in client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            removed += int(client.unlink(*batch) or 0)
+            batch = []
+    if batch:
+        removed += int(client.unlink(*batch) or 0)
+    return removed
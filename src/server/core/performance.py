@@ -3,16 +3,24 @@
 import json
 import logging
 from functools import wraps
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Iterable, Optional
 
 import redis
 from sqlalchemy.orm import Session
 
+from .cache_tags import invalidate_tag_sync, register_tags, scan_delete_sync, tag_key
+
 logger = logging.getLogger(__name__)
 
 
 class CacheManager:
-    """Manages Redis caching for application data."""
+    """Manages Redis caching for application data.
+
+    Entries can be tagged on ``set`` (e.g. ``user:42``) and dropped with
+    ``invalidate_tags`` without scanning the keyspace.
+    """
+
+    TAG_PREFIX = "cache"
 
     def __init__(self, redis_url: str = "redis://localhost:6379/0"):
         """Initialize Redis connection."""
@@ -46,17 +54,21 @@ class CacheManager:
         key: str,
         value: Any,
         ttl: int = 3600,
+        tags: Iterable[str] = (),
     ) -> bool:
-        """Set value in cache with TTL."""
+        """Set value in cache with TTL, registering it under ``tags``."""
         if not self.redis_client:
             return False
 
         try:
-            self.redis_client.setex(
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.setex(
                 key,
                 ttl,
                 json.dumps(value, default=str),
             )
+            register_tags(pipe, key, [tag_key(self.TAG_PREFIX, tag) for tag in tags], ttl)
+            pipe.execute()
             return True
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {str(e)}")
@@ -74,16 +86,26 @@ class CacheManager:
             logger.error(f"Cache delete error for key {key}: {str(e)}")
             return False
 
+    def invalidate_tags(self, *tags: str) -> int:
+        """Delete all entries registered under any of ``tags``."""
+        if not self.redis_client:
+            return 0
+
+        removed = 0
+        for tag in tags:
+            try:
+                removed += invalidate_tag_sync(self.redis_client, tag_key(self.TAG_PREFIX, tag))
+            except Exception as e:
+                logger.error(f"Cache invalidate tag error for {tag}: {str(e)}")
+        return removed
+
     def clear_pattern(self, pattern: str) -> int:
-        """Clear all keys matching pattern."""
+        """Clear all keys matching pattern (incremental SCAN, prefer tags)."""
         if not self.redis_client:
             return 0
 
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-            return 0
+            return scan_delete_sync(self.redis_client, pattern)
         except Exception as e:
             logger.error(f"Cache clear pattern error: {str(e)}")
             return 0
@@ -93,8 +115,17 @@ class CacheManager:
 cache_manager = CacheManager()
 
 
-def cached(ttl: int = 3600, key_prefix: str = ""):
-    """Decorator to cache function results."""
+def cached(
+    ttl: int = 3600,
+    key_prefix: str = "",
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+):
+    """Decorator to cache function results.
+
+    ``tags`` receives the call's arguments and returns the tags to register
+    the entry under, e.g. ``tags=lambda user_id: [f"user:{user_id}"]`` so
+    that ``invalidate_user_cache`` drops it.
+    """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
@@ -108,7 +139,8 @@ def cached(ttl: int = 3600, key_prefix: str = ""):
             result = func(*args, **kwargs)
 
             if result is not None:
-                cache_manager.set(cache_key, result, ttl)
+                entry_tags = tags(*args, **kwargs) if tags is not None else ()
+                cache_manager.set(cache_key, result, ttl, tags=entry_tags)
 
             return result
 
@@ -158,11 +190,11 @@ class QueryOptimizer:
 
 def invalidate_user_cache(user_id: int) -> None:
     """Invalidate all cache entries for a user."""
-    cache_manager.clear_pattern(f"*user:{user_id}*")
+    cache_manager.invalidate_tags(f"user:{user_id}")
     logger.info(f"Invalidated cache for user {user_id}")
 
 
 def invalidate_subscription_cache(user_id: int) -> None:
     """Invalidate subscription cache for a user."""
-    cache_manager.clear_pattern(f"*subscription:*user:{user_id}*")
+    cache_manager.invalidate_tags(f"subscription:user:{user_id}")
     logger.info(f"Invalidated subscription cache for user {user_id}")
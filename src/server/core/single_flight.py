@@ -0,0 +1,185 @@
+"""Request coalescing ("single-flight") for expensive async lookups.
+
+Concurrent callers asking for the same key share one in-flight call instead of
+each hitting the upstream service. ``RedisSingleFlight`` additionally
+coalesces across processes (uvicorn workers, Celery) with a short Redis lock:
+the lock holder publishes its result under a result key that the other
+processes poll for.
+"""
+import asyncio
+import copy
+import json
+import logging
+import os
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+
+SINGLE_FLIGHT_COALESCED_TOTAL = Counter(
+    "single_flight_coalesced_total",
+    "Calls served by another caller's in-flight request",
+    ["name", "scope"],
+)
+
+
+SINGLE_FLIGHT_CALLS_TOTAL = Counter(
+    "single_flight_calls_total",
+    "Calls that went to the upstream service",
+    ["name"],
+)
+
+
+def _record_coalesced(name: str, scope: str) -> None:
+    try:
+        SINGLE_FLIGHT_COALESCED_TOTAL.labels(name=name, scope=scope).inc()
+    except Exception:
+        # Metrics must not affect request behavior
+        pass
+
+
+def _record_call(name: str) -> None:
+    try:
+        SINGLE_FLIGHT_CALLS_TOTAL.labels(name=name).inc()
+    except Exception:
+        pass
+
+
+class SingleFlight:
+    """In-process single-flight keyed by string.
+
+    The shared call runs as a separate task, so a caller that gets cancelled
+    does not cancel the request for the others. Every caller receives its own
+    deep copy of the result so callers cannot mutate each other's data.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        # asyncio tasks belong to one loop; the API and the Celery worker
+        # runtime (or a script) may run separate loops in one process
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _calls(self) -> Dict[str, "asyncio.Task[Any]"]:
+        loop = asyncio.get_running_loop()
+        calls = self._inflight.get(loop)
+        if calls is None:
+            calls = {}
+            self._inflight[loop] = calls
+        return calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        calls = self._calls()
+        task = calls.get(key)
+        if task is not None:
+            _record_coalesced(self.name, "local")
+            return copy.deepcopy(await asyncio.shield(task))
+
+        _record_call(self.name)
+        task = asyncio.ensure_future(fn())
+        calls[key] = task
+        task.add_done_callback(lambda _t: calls.pop(key, None) if calls.get(key) is _t else None)
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def inflight(self) -> int:
+        """Number of distinct keys currently in flight on the running loop."""
+        return len(self._calls())
+
+
+class RedisSingleFlight(SingleFlight):
+    """Single-flight that also coalesces across processes through Redis.
+
+    Only JSON-serializable results are shared between processes. If Redis is
+    unavailable, or the lock holder fails, callers fall back to doing the
+    call themselves.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_url: Optional[str] = None,
+        lock_ttl_ms: int = 10_000,
+        result_ttl_ms: int = 2_000,
+        poll_interval: float = 0.05,
+    ) -> None:
+        super().__init__(name)
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.lock_ttl_ms = lock_ttl_ms
+        self.result_ttl_ms = result_ttl_ms
+        self.poll_interval = poll_interval
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _get_client(self) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = redis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+            self._clients[loop] = client
+        return client
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if redis is None:
+            return await super().do(key, fn)
+        # Coalesce inside the process first, then across processes
+        return await super().do(key, lambda: self._do_distributed(key, fn))
+
+    async def _do_distributed(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"sf:{self.name}:lock:{key}"
+        result_key = f"sf:{self.name}:result:{key}"
+        token = uuid.uuid4().hex
+
+        try:
+            client = self._get_client()
+            cached = await client.get(result_key)
+            if cached is not None:
+                _record_coalesced(self.name, "redis")
+                return json.loads(cached)
+            acquired = await client.set(lock_key, token, nx=True, px=self.lock_ttl_ms)
+        except Exception:
+            logger.warning("Redis single-flight unavailable for %s", self.name, exc_info=True)
+            return await fn()
+
+        if acquired:
+            try:
+                result = await fn()
+                try:
+                    await client.set(result_key, json.dumps(result), px=self.result_ttl_ms)
+                except (TypeError, ValueError):
+                    pass
+                except Exception:
+                    logger.warning("Failed to publish single-flight result", exc_info=True)
+                return result
+            finally:
+                try:
+                    if await client.get(lock_key) == token:
+                        await client.delete(lock_key)
+                except Exception:
+                    pass
+
+        # Another process is fetching: wait for its result or for the lock to go away
+        deadline = asyncio.get_running_loop().time() + self.lock_ttl_ms / 1000.0
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cached = await client.get(result_key)
+                if cached is not None:
+                    _record_coalesced(self.name, "redis")
+                    return json.loads(cached)
+                if not await client.exists(lock_key):
+                    break
+            except Exception:
+                break
+
+        return await fn()
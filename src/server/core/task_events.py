@@ -0,0 +1,210 @@
+"""Celery task state changes over Redis pub/sub.
+
+Workers publish ``{"task_id", "state"}`` to ``task-events:<task_id>`` from
+``CallbackTask`` hooks. The API keeps one pattern subscription per event loop
+(``TaskEventHub``) and fans messages out to the requests waiting on a task,
+so waiting clients cost no result-backend reads until something happens.
+
+Pub/sub is fire-and-forget: a message sent while the hub is reconnecting is
+lost, so waiters still re-check the result backend now and then.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from prometheus_client import Counter
+
+try:
+    import redis  # type: ignore
+    import redis.asyncio as redis_async  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+    redis_async = None
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_PREFIX = "task-events:"
+TERMINAL_STATES = frozenset({"SUCCESS", "FAILURE", "REVOKED"})
+
+
+TASK_EVENTS_PUBLISHED_TOTAL = Counter(
+    "task_events_published_total",
+    "Celery task state changes published to Redis",
+    ["state"],
+)
+
+
+def task_channel(task_id: str) -> str:
+    return f"{TASK_EVENTS_PREFIX}{task_id}"
+
+
+def _default_redis_url() -> str:
+    return os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class TaskEventPublisher:
+    """Synchronous publisher used from Celery worker processes."""
+
+    def __init__(self, redis_url: Optional[str] = None) -> None:
+        self.redis_url = redis_url or _default_redis_url()
+        self._client: Any = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> Any:
+        # Prefork children must not share the parent's socket
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = redis.Redis.from_url(
+                        self.redis_url, socket_timeout=2, socket_connect_timeout=2
+                    )
+                    self._pid = os.getpid()
+        return self._client
+
+    def publish(self, task_id: str, state: str) -> None:
+        if redis is None:
+            return
+        message = json.dumps({"task_id": task_id, "state": state})
+        try:
+            self._get_client().publish(task_channel(task_id), message)
+        except Exception:
+            # Waiters fall back to re-checking the result backend
+            logger.warning("Failed to publish task event for %s", task_id, exc_info=True)
+            return
+        try:
+            TASK_EVENTS_PUBLISHED_TOTAL.labels(state=state).inc()
+        except Exception:
+            # Metrics must not affect task behavior
+            pass
+
+
+class _LoopHub:
+    def __init__(self) -> None:
+        self.waiters: Dict[str, Set["asyncio.Queue[str]"]] = {}
+        self.ready = asyncio.Event()
+        self.reader: Optional["asyncio.Task[None]"] = None
+
+
+class TaskEventHub:
+    """One Redis pattern subscription per event loop, fanned out to waiters."""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        connect_timeout: float = 2.0,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        self.redis_url = redis_url or _default_redis_url()
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self._hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopHub]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _hub(self) -> _LoopHub:
+        loop = asyncio.get_running_loop()
+        hub = self._hubs.get(loop)
+        if hub is None:
+            hub = _LoopHub()
+            self._hubs[loop] = hub
+        if redis_async is not None and (hub.reader is None or hub.reader.done()):
+            hub.reader = loop.create_task(self._run(hub))
+        return hub
+
+    @property
+    def connected(self) -> bool:
+        """True while this loop's subscription is active."""
+        try:
+            hub = self._hubs.get(asyncio.get_running_loop())
+        except RuntimeError:
+            return False
+        return hub is not None and hub.ready.is_set()
+
+    def _client(self) -> Any:
+        return redis_async.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+
+    async def _run(self, hub: _LoopHub) -> None:
+        while True:
+            client = None
+            pubsub = None
+            try:
+                client = self._client()
+                pubsub = client.pubsub()
+                await pubsub.psubscribe(f"{TASK_EVENTS_PREFIX}*")
+                hub.ready.set()
+                async for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        self._dispatch(hub, message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Task event subscription lost, reconnecting", exc_info=True)
+            finally:
+                hub.ready.clear()
+                for resource in (pubsub, client):
+                    close = getattr(resource, "aclose", None) or getattr(resource, "close", None)
+                    if close is not None:
+                        try:
+                            await close()
+                        except Exception:
+                            pass
+            await asyncio.sleep(self.reconnect_delay)
+
+    @staticmethod
+    def _dispatch(hub: _LoopHub, data: Any) -> None:
+        try:
+            event = json.loads(data)
+            task_id = event["task_id"]
+            state = event["state"]
+        except (TypeError, ValueError, KeyError):
+            logger.debug("Ignoring malformed task event: %r", data)
+            return
+        for queue in hub.waiters.get(task_id, ()):
+            queue.put_nowait(state)
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: str) -> AsyncIterator["asyncio.Queue[str]"]:
+        """Queue of states published for ``task_id`` while the block runs.
+
+        Waits (up to ``connect_timeout``) for the subscription to be active,
+        so a status read done inside the block cannot miss a later event.
+        """
+        hub = self._hub()
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        hub.waiters.setdefault(task_id, set()).add(queue)
+        try:
+            if hub.reader is not None and not hub.ready.is_set():
+                try:
+                    await asyncio.wait_for(hub.ready.wait(), self.connect_timeout)
+                except asyncio.TimeoutError:
+                    pass
+            yield queue
+        finally:
+            waiters = hub.waiters.get(task_id)
+            if waiters is not None:
+                waiters.discard(queue)
+                if not waiters:
+                    del hub.waiters[task_id]
+
+    async def close(self) -> None:
+        """Stop the subscription owned by the running loop (call on shutdown)."""
+        hub = self._hubs.pop(asyncio.get_running_loop(), None)
+        if hub is None or hub.reader is None:
+            return
+        hub.reader.cancel()
+        try:
+            await hub.reader
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+task_event_publisher = TaskEventPublisher()
+task_event_hub = TaskEventHub()
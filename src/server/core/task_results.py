@@ -0,0 +1,340 @@
+"""Out-of-band storage for large Celery task results.
+
+A demo analysis result (rounds, ``demo_input``, coach report) is far larger
+than what callers usually need. Instead of letting Celery JSON-encode it into
+the result backend, ``TaskResultStore.offload`` splits it into sections (dict keys up
+to ``SECTION_DEPTH`` levels deep, e.g. ``analysis.metadata``), compresses
+each one and stores them in Redis (one hash per task) or on disk. The Celery
+result only carries a small pointer.
+
+``TaskResultStore.load`` expands a pointer again and, given field paths, reads and
+decodes only the sections those paths need, so ``?fields=analysis.metadata``
+never touches the per-round data.
+
+Sections are msgpack-encoded when ``msgpack`` is installed (JSON otherwise)
+and compressed with zstd when ``zstandard`` is installed (zlib otherwise); a
+one-byte header records the codec so either side can read old entries.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import quote
+
+from prometheus_client import Counter
+
+from ..config.settings import settings
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import redis  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RESULT_REF_KEY = "result_ref"
+SECTION_DEPTH = 2
+
+# Codec header: serializer x compressor
+_JSON_ZLIB = 1
+_JSON_ZSTD = 2
+_MSGPACK_ZLIB = 3
+_MSGPACK_ZSTD = 4
+
+
+TASK_RESULTS_OFFLOADED_TOTAL = Counter(
+    "task_results_offloaded_total",
+    "Task results moved out of the Celery result backend",
+)
+
+
+TASK_RESULTS_OFFLOADED_BYTES_TOTAL = Counter(
+    "task_results_offloaded_bytes_total",
+    "Compressed bytes written for offloaded task results",
+)
+
+
+def encode_section(value: Any) -> bytes:
+    if msgpack is not None:
+        raw = msgpack.packb(value, use_bin_type=True)
+        codec = _MSGPACK_ZSTD if zstandard is not None else _MSGPACK_ZLIB
+    else:
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        codec = _JSON_ZSTD if zstandard is not None else _JSON_ZLIB
+    if zstandard is not None:
+        packed = zstandard.ZstdCompressor(level=6).compress(raw)
+    else:
+        packed = zlib.compress(raw, 6)
+    return bytes([codec]) + packed
+
+
+def decode_section(data: bytes) -> Any:
+    codec, packed = data[0], data[1:]
+    if codec in (_JSON_ZSTD, _MSGPACK_ZSTD):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this task result")
+        raw = zstandard.ZstdDecompressor().decompress(packed)
+    else:
+        raw = zlib.decompress(packed)
+    if codec in (_MSGPACK_ZLIB, _MSGPACK_ZSTD):
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read this task result")
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+
+def split_sections(value: Dict[str, Any], depth: int = SECTION_DEPTH) -> Dict[str, Any]:
+    """Flatten nested dicts ``depth`` levels deep into ``{"a.b": value}``."""
+    sections: Dict[str, Any] = {}
+
+    def walk(prefix: str, node: Any, level: int) -> None:
+        if level < depth and isinstance(node, dict) and node:
+            for key, child in node.items():
+                walk(f"{prefix}.{key}" if prefix else str(key), child, level + 1)
+        else:
+            sections[prefix] = node
+
+    walk("", value, 0)
+    return sections
+
+
+def join_sections(sections: Dict[str, Any]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for name, value in sections.items():
+        parts = name.split(".")
+        node = result
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return result
+
+
+def project(value: Any, fields: Sequence[str]) -> Dict[str, Any]:
+    """Keep only the dotted ``fields`` of ``value`` (missing ones are left out)."""
+    result: Dict[str, Any] = {}
+    for field in fields:
+        parts = [part for part in field.split(".") if part]
+        node = value
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                break
+            node = node[part]
+        else:
+            if not parts:
+                continue
+            target = result
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = node
+    return result
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """``"a.b, c"`` -> ``["a.b", "c"]``; ``None`` when nothing was asked for."""
+    if not fields:
+        return None
+    parsed = [field.strip() for field in fields.split(",") if field.strip()]
+    return parsed or None
+
+
+def _needed_sections(names: Iterable[str], fields: Sequence[str]) -> List[str]:
+    needed = []
+    for name in names:
+        for field in fields:
+            if field == name or field.startswith(name + ".") or name.startswith(field + "."):
+                needed.append(name)
+                break
+    return needed
+
+
+class RedisTaskResultBackend:
+    """One hash per task: section name -> encoded section."""
+
+    def __init__(self, redis_url: str) -> None:
+        self.redis_url = redis_url
+        self._client: Any = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> Any:
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = redis.Redis.from_url(self.redis_url, socket_timeout=5)
+                    self._pid = os.getpid()
+        return self._client
+
+    def put(self, key: str, sections: Dict[str, bytes], ttl_seconds: int) -> None:
+        pipe = self._get_client().pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=sections)
+        if ttl_seconds > 0:
+            pipe.expire(key, ttl_seconds)
+        pipe.execute()
+
+    def get(self, key: str, names: Sequence[str]) -> Dict[str, bytes]:
+        client = self._get_client()
+        values = client.hmget(key, list(names)) if names else []
+        return {name: value for name, value in zip(names, values) if value is not None}
+
+
+class DiskTaskResultBackend:
+    """One directory per task, one file per section."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def put(self, key: str, sections: Dict[str, bytes], ttl_seconds: int) -> None:
+        target = self._dir(key)
+        tmp_dir = f"{target}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        for name, data in sections.items():
+            with open(os.path.join(tmp_dir, quote(name, safe="") + ".bin"), "wb") as fh:
+                fh.write(data)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_dir, target)
+        if ttl_seconds > 0:
+            self._expire(ttl_seconds)
+
+    def _expire(self, ttl_seconds: int) -> None:
+        cutoff = time.time() - ttl_seconds
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                except FileNotFoundError:
+                    continue
+
+    def get(self, key: str, names: Sequence[str]) -> Dict[str, bytes]:
+        target = self._dir(key)
+        sections: Dict[str, bytes] = {}
+        for name in names:
+            try:
+                with open(os.path.join(target, quote(name, safe="") + ".bin"), "rb") as fh:
+                    sections[name] = fh.read()
+            except FileNotFoundError:
+                continue
+        return sections
+
+
+class TaskResultStore:
+    def __init__(self, backend: Any | None, min_bytes: int, ttl_seconds: int) -> None:
+        self.backend = backend
+        self.min_bytes = min_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def offload(self, task_id: Optional[str], result: Any) -> Any:
+        """Store a large dict ``result`` and return the pointer to keep in Celery.
+
+        Small or non-dict results, and any storage error, return ``result``
+        unchanged.
+        """
+        if self.backend is None or not isinstance(result, dict):
+            return result
+        try:
+            size = len(json.dumps(result, default=str).encode("utf-8"))
+        except (TypeError, ValueError):
+            return result
+        if size < self.min_bytes:
+            return result
+
+        key = f"task-result:{task_id or uuid.uuid4().hex}"
+        try:
+            sections = {name: encode_section(value) for name, value in split_sections(result).items()}
+            self.backend.put(key, sections, self.ttl_seconds)
+        except Exception:
+            logger.warning("Failed to offload task result %s, keeping it inline", key, exc_info=True)
+            return result
+
+        stored = sum(len(data) for data in sections.values())
+        try:
+            TASK_RESULTS_OFFLOADED_TOTAL.inc()
+            TASK_RESULTS_OFFLOADED_BYTES_TOTAL.inc(stored)
+        except Exception:
+            # Metrics must not affect task behavior
+            pass
+        return {
+            RESULT_REF_KEY: {
+                "key": key,
+                "sections": sorted(sections),
+                "bytes": stored,
+                "json_bytes": size,
+            }
+        }
+
+    def load(self, result: Any, fields: Optional[Sequence[str]] = None) -> Any:
+        """Expand a pointer made by ``offload`` and apply ``fields``.
+
+        Inline results are projected as they are. Raises ``LookupError`` when
+        the stored sections are gone (expired or evicted).
+        """
+        ref = result.get(RESULT_REF_KEY) if isinstance(result, dict) else None
+        if not isinstance(ref, dict):
+            return project(result, fields) if fields else result
+        if self.backend is None:
+            raise LookupError("Task result store is disabled")
+
+        names = list(ref.get("sections") or [])
+        if fields:
+            names = _needed_sections(names, fields)
+        stored = self.backend.get(ref["key"], names)
+        if len(stored) < len(names):
+            raise LookupError(f"Task result {ref['key']} has expired")
+        full = join_sections({name: decode_section(data) for name, data in stored.items()})
+        return project(full, fields) if fields else full
+
+
+def _build_backend() -> Any | None:
+    backend = (settings.TASK_RESULT_STORE_BACKEND or "").lower()
+
+    if backend == "redis":
+        redis_url = settings.REDIS_URL or os.getenv("REDIS_URL")
+        if redis is None or not redis_url:
+            logger.warning("Task result store: Redis unavailable, using disk backend")
+        else:
+            return RedisTaskResultBackend(redis_url)
+        backend = "disk"
+
+    if backend == "disk":
+        return DiskTaskResultBackend(settings.TASK_RESULT_STORE_DIR)
+
+    return None
+
+
+_task_result_store: Optional[TaskResultStore] = None
+_task_result_store_lock = threading.Lock()
+
+
+def get_task_result_store() -> TaskResultStore:
+    """Return the process-wide task result store (created on first use)."""
+    global _task_result_store
+    with _task_result_store_lock:
+        if _task_result_store is None:
+            _task_result_store = TaskResultStore(
+                _build_backend(),
+                min_bytes=int(settings.TASK_RESULT_OFFLOAD_MIN_KB) * 1024,
+                ttl_seconds=int(settings.TASK_RESULT_TTL_SECONDS),
+            )
+        return _task_result_store
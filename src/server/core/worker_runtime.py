@@ -0,0 +1,127 @@
+"""Long-lived asyncio runtime for Celery worker processes.
+
+Celery tasks are synchronous, so each task used to wrap its coroutine in
+``asyncio.run``: a new event loop per task, and with it new aiohttp sessions
+(the LLM transport and FACEIT pools are per loop) plus a fresh
+``DemoAnalyzer``. ``WorkerRuntime`` keeps one loop running in a background
+thread per worker process and one analyzer, so pooled keep-alive
+connections and warmed-up clients carry over between tasks.
+
+Started from ``worker_process_init`` (lazily on first use otherwise, e.g. the
+solo pool or eager mode) and stopped from ``worker_process_shutdown``.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._analyzer: Any = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        assert self._loop is not None
+        return self._loop
+
+    def start(self) -> None:
+        """Start the loop thread for this process (no-op if running)."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            # A forked child inherits the attributes but not the thread
+            self._analyzer = None
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=self._serve,
+                args=(loop,),
+                name="worker-asyncio",
+                daemon=True,
+            )
+            thread.start()
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run ``coro`` on the worker loop and block until it finishes."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)  # type: ignore[arg-type]
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timeouts and Celery's SoftTimeLimitExceeded land here
+            future.cancel()
+            raise
+
+    def analyzer(self) -> Any:
+        """The process-wide ``DemoAnalyzer`` (created on first use)."""
+        self.start()
+        if self._analyzer is None:
+            with self._lock:
+                if self._analyzer is None:
+                    from ..features.demo_analyzer.service import DemoAnalyzer
+
+                    self._analyzer = DemoAnalyzer()
+        return self._analyzer
+
+    async def _close_pools(self) -> None:
+        from ..ai.llm_transport import llm_transport
+        from ..integrations.faceit_client import faceit_http_pool
+
+        for close in (llm_transport.close, faceit_http_pool.close):
+            try:
+                await close()
+            except Exception:
+                logger.warning("Failed to close HTTP pool on worker shutdown", exc_info=True)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Close pooled sessions and stop the loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or thread is None or self._pid != os.getpid() or not thread.is_alive():
+                return
+            self._loop = None
+            self._thread = None
+            self._analyzer = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_pools(), loop).result(timeout)
+        except Exception:
+            logger.warning("Worker runtime did not close cleanly", exc_info=True)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+
+_worker_runtime: Optional[WorkerRuntime] = None
+_worker_runtime_lock = threading.Lock()
+
+
+def get_worker_runtime() -> WorkerRuntime:
+    """Return the process-wide worker runtime (created on first use)."""
+    global _worker_runtime
+    with _worker_runtime_lock:
+        if _worker_runtime is None:
+            _worker_runtime = WorkerRuntime()
+        return _worker_runtime
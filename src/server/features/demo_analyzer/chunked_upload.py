@@ -0,0 +1,107 @@
+"""Resumable chunked demo uploads for upload sessions (tus-like).
+
+The client creates the upload with its total length, then appends chunks at
+the offset the server reports; after a dropped connection it asks for the
+offset again and continues from there instead of starting over.
+
+Chunks are hashed as they are written, so the SHA-256 of the demo is ready
+the moment the last byte lands. That requires chunks in order: a chunk past
+the stored offset is refused, and a retried chunk overlapping stored bytes is
+trimmed to the new part.
+
+The hash state lives in the API process that took the previous chunk. When a
+chunk reaches another worker (or the API restarted in between) the state is
+rebuilt once by re-reading the stored prefix.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Tuple
+
+READ_BLOCK_BYTES = 1024 * 1024
+
+
+class ChunkTooLarge(Exception):
+    """The chunk runs past the declared upload length or the chunk limit."""
+
+
+def hash_prefix(path: str, length: int) -> Any:
+    """SHA-256 state after the first ``length`` bytes of ``path``."""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, "rb") as fh:
+        while remaining > 0:
+            block = fh.read(min(READ_BLOCK_BYTES, remaining))
+            if not block:
+                raise ValueError(f"{path} is shorter than {length} bytes")
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+class UploadHashes:
+    """Bounded per-process map: session key -> (offset, SHA-256 state)."""
+
+    def __init__(self, max_items: int = 256) -> None:
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+
+    def at(self, key: str, path: str, offset: int) -> Any:
+        """A hash state for the first ``offset`` bytes, safe to update."""
+        with self._lock:
+            cached = self._states.get(key)
+            if cached is not None and cached[0] == offset:
+                self._states.move_to_end(key)
+                return cached[1].copy()
+        return hash_prefix(path, offset)
+
+    def store(self, key: str, offset: int, digest: Any) -> None:
+        with self._lock:
+            self._states[key] = (offset, digest)
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_items:
+                self._states.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._states.pop(key, None)
+
+
+upload_hashes = UploadHashes()
+
+
+async def write_chunk(
+    path: str,
+    offset: int,
+    skip: int,
+    body: AsyncIterator[bytes],
+    max_bytes: int,
+    digest: Any,
+) -> int:
+    """Write ``body`` at ``offset`` after dropping its first ``skip`` bytes.
+
+    ``digest`` is updated with the written bytes. Anything left past the end
+    of the chunk by an earlier failed attempt is truncated. Returns the
+    number of bytes written; raises ``ChunkTooLarge`` once more than
+    ``max_bytes`` would be written.
+    """
+    written = 0
+    with open(path, "r+b") as fh:
+        fh.seek(offset)
+        async for piece in body:
+            if skip:
+                if len(piece) <= skip:
+                    skip -= len(piece)
+                    continue
+                piece = piece[skip:]
+                skip = 0
+            if written + len(piece) > max_bytes:
+                raise ChunkTooLarge(f"Chunk exceeds {max_bytes} bytes")
+            fh.write(piece)
+            digest.update(piece)
+            written += len(piece)
+        fh.truncate()
+    return written
@@ -0,0 +1,314 @@
+"""Columnar representation of parsed demo events.
+
+demoparser2 returns one DataFrame per event type with dozens of columns per
+row. The analyzer only needs a handful of them, so instead of turning every
+frame into a list of per-row dicts we keep one typed array per needed column,
+with column names normalized once at parse time.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy приходит вместе с pandas, но может отсутствовать
+    np = None  # type: ignore[assignment]
+
+
+# canonical column -> (aliases used by demoparser2 versions/forks, dtype kind)
+KILL_COLUMNS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "attacker_name": (("attackername", "attacker_name", "attacker", "attackerName"), "str"),
+    "victim_name": (("victimname", "victim_name", "victim", "victimName"), "str"),
+    "assister_name": (("assistername", "assister_name", "assister", "assisterName"), "str"),
+    "headshot": (("headshot", "is_headshot", "isHeadshot"), "bool"),
+    "round": (
+        ("round", "round_num", "roundnum", "round_number", "roundNumber", "total_rounds_played"),
+        "int",
+    ),
+    "tick": (("tick",), "int"),
+}
+
+DAMAGE_COLUMNS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "attacker_name": (("attackername", "attacker_name", "attacker", "attackerName"), "str"),
+    "damage": (("hp_damage", "dmg_health", "hpDamage", "damage"), "float"),
+    "round": (
+        ("round", "round_num", "roundnum", "round_number", "roundNumber", "total_rounds_played"),
+        "int",
+    ),
+}
+
+ROUND_COLUMNS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "winner": (("winning_team", "winner", "winningteam", "winner_side"), "str"),
+    "round": (
+        ("round", "round_num", "roundnum", "round_number", "roundNumber", "total_rounds_played"),
+        "int",
+    ),
+}
+
+
+def _numpy_dtype(kind: str) -> Any:
+    if kind == "int":
+        return np.int32
+    if kind == "float":
+        return np.float32
+    if kind == "bool":
+        return np.bool_
+    return object
+
+
+def _coerce(values: Any, kind: str) -> Any:
+    """Convert a column (Series/array/list) to a typed numpy array."""
+    if hasattr(values, "to_numpy"):
+        try:
+            values = values.to_numpy()
+        except TypeError:
+            values = values.to_numpy(zero_copy_only=False)  # polars/pyarrow
+
+    arr = np.asarray(values)
+    if kind == "str":
+        return arr.astype(object, copy=False)
+
+    if kind == "bool":
+        if arr.dtype == np.bool_:
+            return arr
+        # Object columns may hold None/NaN next to bools
+        return np.fromiter((v is True or v == 1 for v in arr), dtype=np.bool_, count=len(arr))
+
+    if arr.dtype == object:
+        converted = np.empty(len(arr), dtype=np.float64)
+        for idx, value in enumerate(arr):
+            try:
+                converted[idx] = float(value)
+            except (TypeError, ValueError):
+                converted[idx] = np.nan
+        arr = converted
+    if kind == "int":
+        arr = np.nan_to_num(arr.astype(np.float64, copy=False), nan=0.0)
+    return arr.astype(_numpy_dtype(kind), copy=False)
+
+
+def _frame_columns(value: Any) -> List[str]:
+    columns = getattr(value, "columns", None)
+    if columns is None:
+        return []
+    return [str(c) for c in columns]
+
+
+@dataclass
+class EventTable:
+    """A set of equally long typed arrays keyed by canonical column name."""
+
+    columns: Dict[str, Any] = field(default_factory=dict)
+    length: int = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __bool__(self) -> bool:
+        return self.length > 0
+
+    def has(self, name: str) -> bool:
+        return name in self.columns
+
+    def get(self, name: str) -> Optional[Any]:
+        return self.columns.get(name)
+
+    @classmethod
+    def empty(cls) -> "EventTable":
+        return cls()
+
+    @classmethod
+    def from_any(
+        cls,
+        value: Any,
+        spec: Mapping[str, Tuple[Tuple[str, ...], str]],
+    ) -> "EventTable":
+        """Build a table from a demoparser2 result.
+
+        Accepts pandas/polars DataFrames (columns are sliced without copying
+        rows), a dict of column lists, or a legacy list of row dicts.
+        """
+        if value is None or np is None:
+            return cls.empty()
+
+        if isinstance(value, list):
+            return cls._from_records(value, spec)
+
+        if isinstance(value, Mapping):
+            available = [str(k) for k in value.keys()]
+            getter = value.__getitem__
+        else:
+            available = _frame_columns(value)
+            if not available:
+                return cls.empty()
+            getter = value.__getitem__
+
+        columns: Dict[str, Any] = {}
+        for canonical, (aliases, kind) in spec.items():
+            source = next((a for a in aliases if a in available), None)
+            if source is None:
+                continue
+            columns[canonical] = _coerce(getter(source), kind)
+
+        length = len(next(iter(columns.values()))) if columns else _frame_length(value)
+        return cls(columns=columns, length=length)
+
+    @classmethod
+    def _from_records(
+        cls,
+        records: Iterable[Any],
+        spec: Mapping[str, Tuple[Tuple[str, ...], str]],
+    ) -> "EventTable":
+        rows = [r for r in records if isinstance(r, dict)]
+        if not rows:
+            return cls.empty()
+
+        keys = set()
+        for row in rows[:64]:
+            keys.update(row.keys())
+
+        columns: Dict[str, Any] = {}
+        for canonical, (aliases, kind) in spec.items():
+            source = next((a for a in aliases if a in keys), None)
+            if source is None:
+                continue
+            columns[canonical] = _coerce([row.get(source) for row in rows], kind)
+
+        return cls(columns=columns, length=len(rows))
+
+    def mask_equals(self, name: str, value: Any) -> Optional[Any]:
+        column = self.columns.get(name)
+        if column is None:
+            return None
+        return column == value
+
+    def max_int(self, name: str) -> int:
+        column = self.columns.get(name)
+        if column is None or len(column) == 0:
+            return 0
+        return max(0, int(column.max()))
+
+    def per_round_counts(self, mask: Any, total_rounds: int) -> Optional[Any]:
+        """Count rows matching ``mask`` per round (index 0 = round 1)."""
+        rounds = self.columns.get("round")
+        if rounds is None or mask is None or total_rounds <= 0:
+            return None
+        selected = rounds[mask]
+        # demoparser2 "total_rounds_played" is 0-based, explicit round numbers are 1-based
+        offset = 1 if len(rounds) and int(rounds.min()) == 0 else 0
+        selected = selected.astype(np.int64) + offset
+        selected = selected[(selected >= 1) & (selected <= total_rounds)]
+        return np.bincount(selected - 1, minlength=total_rounds)[:total_rounds]
+
+
+def _frame_length(value: Any) -> int:
+    try:
+        return int(len(value))
+    except TypeError:
+        return 0
+
+
+@dataclass
+class ColumnarDemo:
+    """Per-event columnar tables extracted from one demo file."""
+
+    kills: EventTable = field(default_factory=EventTable.empty)
+    damage: EventTable = field(default_factory=EventTable.empty)
+    rounds: EventTable = field(default_factory=EventTable.empty)
+
+    @classmethod
+    def from_parser_output(
+        cls,
+        kills: Any = None,
+        damage: Any = None,
+        rounds: Any = None,
+    ) -> "ColumnarDemo":
+        return cls(
+            kills=EventTable.from_any(kills, KILL_COLUMNS),
+            damage=EventTable.from_any(damage, DAMAGE_COLUMNS),
+            rounds=EventTable.from_any(rounds, ROUND_COLUMNS),
+        )
+
+    def max_round(self) -> int:
+        best = max(self.kills.max_int("round"), self.damage.max_int("round"))
+        kills_rounds = self.kills.get("round")
+        if kills_rounds is not None and len(kills_rounds) and int(kills_rounds.min()) == 0:
+            best += 1
+        return best
+
+    def rounds_won_by(self, side: str) -> int:
+        winners = self.rounds.get("winner")
+        if winners is None:
+            return 0
+        return int((winners == side).sum())
+
+    def player_stats(self, player: str) -> Dict[str, float | int]:
+        """Aggregate kills/deaths/headshots/assists/damage for one player."""
+        stats: Dict[str, float | int] = {
+            "kills": 0,
+            "deaths": 0,
+            "headshots": 0,
+            "total_damage": 0,
+            "assists": 0,
+            "utility_damage": 0,
+        }
+
+        kill_mask = self.kills.mask_equals("attacker_name", player)
+        if kill_mask is not None:
+            stats["kills"] = int(kill_mask.sum())
+            headshots = self.kills.get("headshot")
+            if headshots is not None and stats["kills"]:
+                stats["headshots"] = int((headshots & kill_mask).sum())
+
+        death_mask = self.kills.mask_equals("victim_name", player)
+        if death_mask is not None:
+            stats["deaths"] = int(death_mask.sum())
+
+        assist_mask = self.kills.mask_equals("assister_name", player)
+        if assist_mask is not None:
+            stats["assists"] = int(assist_mask.sum())
+
+        damage = self.damage.get("damage")
+        damage_mask = self.damage.mask_equals("attacker_name", player)
+        if damage is not None and damage_mask is not None:
+            stats["total_damage"] = float(damage[damage_mask].sum(dtype=np.float64))
+
+        return stats
+
+    def player_rounds(self, player: str, total_rounds: int) -> Optional[Dict[str, Any]]:
+        """Per-round kill/death counts for one player, or None without round data."""
+        kills = self.kills.per_round_counts(
+            self.kills.mask_equals("attacker_name", player), total_rounds
+        )
+        deaths = self.kills.per_round_counts(
+            self.kills.mask_equals("victim_name", player), total_rounds
+        )
+        if kills is None and deaths is None:
+            return None
+        zeros = np.zeros(total_rounds, dtype=np.int64)
+        return {
+            "kills": kills if kills is not None else zeros,
+            "deaths": deaths if deaths is not None else zeros,
+        }
+
+    def opening_duels(self, player: str) -> Tuple[int, int]:
+        """Return (first_kills, first_deaths) using the earliest kill of each round."""
+        rounds = self.kills.get("round")
+        if rounds is None or not len(rounds):
+            return 0, 0
+        attackers = self.kills.get("attacker_name")
+        victims = self.kills.get("victim_name")
+        if attackers is None or victims is None:
+            return 0, 0
+
+        ticks = self.kills.get("tick")
+        order = np.lexsort((ticks, rounds)) if ticks is not None else np.argsort(rounds, kind="stable")
+        sorted_rounds = rounds[order]
+        first = np.ones(len(sorted_rounds), dtype=np.bool_)
+        first[1:] = sorted_rounds[1:] != sorted_rounds[:-1]
+        first_idx = order[first]
+        return (
+            int((attackers[first_idx] == player).sum()),
+            int((victims[first_idx] == player).sum()),
+        )
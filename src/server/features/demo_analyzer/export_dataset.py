@@ -11,62 +11,69 @@ Usage:
 
 This script processes all .dem files in the input directory, analyzes them using DemoAnalyzer,
 builds training samples, and appends them to the specified JSONL file.
+
+Demos are processed --workers at a time (parsing runs in a process pool) with
+LLM requests capped by --llm-concurrency. Finished files are recorded in a
+checkpoint manifest (<output-jsonl>.manifest.jsonl by default); rerunning the
+same command skips them, so an interrupted export resumes where it stopped.
 """
 
 import argparse
 import asyncio
+import json
 import logging
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 # Add project root to path for imports
 project_root = Path(__file__).parent.parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.server.ai.llm_transport import llm_transport
+from src.server.config.settings import settings
 from src.server.features.demo_analyzer.service import DemoAnalyzer
 from src.server.features.demo_analyzer.dataset import build_training_sample_from_demo, append_samples_to_jsonl
 from src.server.features.demo_analyzer.models import DemoTrainingSample
 
 
 class MockUploadFile:
-    """Mock UploadFile for CLI usage that mimics FastAPI's UploadFile interface."""
+    """Mock UploadFile for CLI usage that mimics FastAPI's UploadFile interface.
+
+    Reads are served from an open file object, so a demo is never held in
+    memory as a whole.
+    """
 
-    def __init__(self, filename: str, file_data: bytes):
+    def __init__(self, filename: str, file: BinaryIO):
         self.filename = filename
-        self._data = file_data
-        self._position = 0
+        self.file = file
         self.content_type = "application/octet-stream"
 
     async def read(self, size: int = -1) -> bytes:
         """Read data from file. If size is -1, read all remaining data."""
-        if size == -1:
-            result = self._data[self._position:]
-            self._position = len(self._data)
-            return result
-        else:
-            result = self._data[self._position:self._position + size]
-            self._position += len(result)
-            return result
+        return self.file.read(size)
 
     async def close(self):
-        pass
+        self.file.close()
 
 
-async def process_demo_file(demo_path: Path, analyzer: DemoAnalyzer, source: str) -> Optional[DemoTrainingSample]:
+async def process_demo_file(
+    demo_path: Path,
+    analyzer: DemoAnalyzer,
+    source: str,
+    language: str = "ru",
+) -> Optional[DemoTrainingSample]:
     """Process a single .dem file and return training sample."""
     print(f"Processing {demo_path}...")
 
     try:
-        # Read file in chunks to avoid loading entire large file into memory
         with open(demo_path, 'rb') as f:
-            file_data = f.read()
+            upload_file = MockUploadFile(demo_path.name, f)
 
-        upload_file = MockUploadFile(demo_path.name, file_data)
-
-        # Analyze demo (this calls all the AI services)
-        analysis = await analyzer.analyze_demo(upload_file, language="ru")
+            # Analyze demo (this calls all the AI services)
+            analysis = await analyzer.analyze_demo(upload_file, language=language)
 
         # Build training sample
         sample = build_training_sample_from_demo(analysis, source=source)
@@ -84,6 +91,105 @@ async def process_demo_file(demo_path: Path, analyzer: DemoAnalyzer, source: str
         return None
 
 
+def _manifest_key(demo_path: Path) -> str:
+    """Identify a demo by path, size and mtime, so replaced files are redone."""
+    stat = demo_path.stat()
+    return f"{demo_path.resolve()}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def load_manifest(manifest_path: Path) -> Dict[str, str]:
+    """Return {manifest key: status} from a checkpoint manifest (last entry wins)."""
+    done: Dict[str, str] = {}
+    if not manifest_path.exists():
+        return done
+    with manifest_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                done[entry["key"]] = entry["status"]
+            except (ValueError, KeyError, TypeError):
+                # A crash can leave a truncated last line
+                continue
+    return done
+
+
+def _append_manifest(manifest_path: Path, demo_path: Path, key: str, status: str) -> None:
+    entry = {"key": key, "file": demo_path.name, "status": status, "at": int(time.time())}
+    with manifest_path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+async def export_demos(
+    demo_files: List[Path],
+    output_jsonl: Path,
+    analyzer: Any,
+    source: str,
+    manifest_path: Path,
+    workers: int = 4,
+    language: str = "ru",
+) -> Tuple[int, int, int]:
+    """Export ``demo_files`` with ``workers`` demos in flight.
+
+    Files recorded as done in the manifest are skipped; every finished file
+    is appended to the manifest right after its sample is written, so a
+    crashed run resumes where it stopped. Returns (processed, errors, skipped).
+    """
+    done = load_manifest(manifest_path)
+    pending: "asyncio.Queue[Tuple[Path, str]]" = asyncio.Queue()
+    skipped = 0
+    for demo_path in demo_files:
+        key = _manifest_key(demo_path)
+        if done.get(key) == "ok":
+            skipped += 1
+        else:
+            pending.put_nowait((demo_path, key))
+
+    total = pending.qsize()
+    if skipped:
+        print(f"Resuming: {skipped} files already exported, {total} left")
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    if manifest_path.exists() and manifest_path.stat().st_size:
+        with manifest_path.open("rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Terminate a line truncated by a crash before appending
+                f.write(b"\n")
+
+    processed = 0
+    errors = 0
+    started = time.monotonic()
+
+    async def _worker() -> None:
+        nonlocal processed, errors
+        while True:
+            try:
+                demo_path, key = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            sample = await process_demo_file(demo_path, analyzer, source, language=language)
+            # Sample first, then manifest: a crash in between redoes one file
+            if sample is not None:
+                append_samples_to_jsonl([sample], output_jsonl)
+                processed += 1
+            else:
+                errors += 1
+            _append_manifest(manifest_path, demo_path, key, "ok" if sample else "error")
+
+            finished = processed + errors
+            minutes = max(time.monotonic() - started, 1e-6) / 60
+            rate = finished / minutes
+            eta = (total - finished) / rate if rate else 0.0
+            print(
+                f"[{finished}/{total}] {demo_path.name}: "
+                f"{rate:.1f} demos/min, ETA {eta:.1f} min"
+            )
+
+    await asyncio.gather(*(_worker() for _ in range(max(1, min(workers, total or 1)))))
+    return processed, errors, skipped
+
+
 async def main():
     parser = argparse.ArgumentParser(description="Export demo dataset to JSONL")
     parser.add_argument(
@@ -110,17 +216,42 @@ async def main():
         default=None,
         help="Maximum number of files to process (for testing)"
     )
+    parser.add_argument(
+        "--language",
+        type=str,
+        default="ru",
+        help="Target language for coach reports (default: ru)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 4,
+        help="Demos processed concurrently; also the number of parse processes (default: CPU count)"
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=4,
+        help="Maximum concurrent LLM requests (default: 4)"
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Checkpoint manifest path (default: <output-jsonl>.manifest.jsonl)"
+    )
 
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
     output_jsonl = Path(args.output_jsonl)
+    manifest_path = Path(args.manifest) if args.manifest else Path(f"{output_jsonl}.manifest.jsonl")
 
     if not input_dir.exists() or not input_dir.is_dir():
         print(f"Error: Input directory {input_dir} does not exist or is not a directory")
         sys.exit(1)
 
-    demo_files = list(input_dir.glob("*.dem"))
+    demo_files = sorted(input_dir.glob("*.dem"))
     if not demo_files:
         print(f"No .dem files found in {input_dir}")
         sys.exit(1)
@@ -130,36 +261,34 @@ async def main():
         print(f"Limited to {len(demo_files)} files for testing")
 
     print(f"Found {len(demo_files)} .dem files")
-    print(f"Output will be written to {output_jsonl}")
+    print(f"Output will be written to {output_jsonl}, checkpoints to {manifest_path}")
+
+    # Parsing runs in the shared process pool (one process per worker, no
+    # queue rejections); LLM calls are capped independently. Both are read
+    # lazily, so they must be set before the first demo is analyzed.
+    workers = max(1, args.workers)
+    settings.DEMO_PARSE_WORKERS = workers
+    settings.DEMO_PARSE_QUEUE_DEPTH = workers
+    llm_transport.max_concurrency = max(1, args.llm_concurrency)
 
     # Initialize analyzer (loads AI services)
     print("Initializing DemoAnalyzer...")
     analyzer = DemoAnalyzer()
 
-    samples: list[Any] = []
-    processed = 0
-    errors = 0
-
-    for demo_path in demo_files:
-        sample = await process_demo_file(demo_path, analyzer, args.source)
-        if sample:
-            samples.append(sample)
-            processed += 1
-        else:
-            errors += 1
-
-        # Periodically save to avoid memory issues
-        if len(samples) >= 10:
-            append_samples_to_jsonl(samples, output_jsonl)
-            print(f"Saved {len(samples)} samples to {output_jsonl}")
-            samples = []
-
-    # Save remaining samples
-    if samples:
-        append_samples_to_jsonl(samples, output_jsonl)
-        print(f"Saved final {len(samples)} samples to {output_jsonl}")
+    started = time.monotonic()
+    processed, errors, skipped = await export_demos(
+        demo_files,
+        output_jsonl,
+        analyzer,
+        source=args.source,
+        manifest_path=manifest_path,
+        workers=workers,
+        language=args.language,
+    )
+    minutes = max(time.monotonic() - started, 1e-6) / 60
 
-    print(f"\nDone! Processed: {processed}, Errors: {errors}")
+    print(f"\nDone! Processed: {processed}, Errors: {errors}, Skipped (already done): {skipped}")
+    print(f"Throughput: {(processed + errors) / minutes:.1f} demos/min")
     print(f"Total samples in {output_jsonl}: check with 'wc -l {output_jsonl}'")
 
 
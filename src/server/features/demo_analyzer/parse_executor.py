@@ -0,0 +1,266 @@
+"""Bounded executor for CPU-heavy demoparser2 parsing.
+
+demoparser2 is synchronous and a large demo keeps the CPU busy for seconds,
+so parsing runs in a process pool instead of on the event loop. The number of
+demos waiting for a free worker is capped; when the queue is full new parses
+are rejected immediately instead of piling up in memory.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .columnar import ColumnarDemo
+from ...config.settings import settings
+from ...exceptions import DemoAnalysisException
+
+try:
+    from demoparser2 import DemoParser  # type: ignore[import-not-found]
+except ImportError:  # demoparser2 может быть не установлен (особенно на Python 3.14)
+    DemoParser = None
+
+logger = logging.getLogger(__name__)
+
+
+DEMO_PARSE_QUEUE_WAIT_SECONDS = Histogram(
+    "demo_parse_queue_wait_seconds",
+    "Time a demo waited for a free parse worker",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+
+DEMO_PARSE_DURATION_SECONDS = Histogram(
+    "demo_parse_duration_seconds",
+    "demoparser2 parse time per demo",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+
+
+DEMO_PARSE_REJECTED_TOTAL = Counter(
+    "demo_parse_rejected_total",
+    "Demo parses rejected because the parse queue was full",
+)
+
+
+DEMO_PARSE_IN_FLIGHT = Gauge(
+    "demo_parse_in_flight",
+    "Demo parses running or waiting in the parse queue",
+)
+
+
+def _call_parser(
+    parser: Any,
+    *,
+    method_name: str,
+    args: tuple[Any, ...] = (),
+    kwargs: Dict[str, Any] | None = None,
+) -> Any:
+    method = getattr(parser, method_name, None)
+    if method is None:
+        return None
+    try:
+        return method(*args, **(kwargs or {}))
+    except Exception:
+        return None
+
+
+def _parse_event(parser: Any, event_name: str) -> Any:
+    attempts: Tuple[Tuple[str, tuple[Any, ...], Dict[str, Any]], ...] = (
+        # Ask for the round counter so events can be bucketed per round
+        ("parse_event", (event_name,), {"other": ["total_rounds_played"]}),
+        ("parse_event", (event_name,), {}),
+        ("parse_event", (), {"event": event_name}),
+        ("parse_events", ([event_name],), {}),
+        ("parse_events", (), {"events": [event_name]}),
+        ("parse_events", (event_name,), {}),
+    )
+    for method_name, args, kwargs in attempts:
+        value = _call_parser(parser, method_name=method_name, args=args, kwargs=kwargs)
+        if value is not None:
+            return value
+    return None
+
+
+def parse_demo_path(path: str) -> Dict[str, Any]:
+    """Parse a .dem file from disk into header fields and columnar events.
+
+    Runs inside a pool worker, so it must stay a picklable module-level
+    function and return only picklable data.
+    """
+    if DemoParser is None:
+        raise RuntimeError("demoparser2 is not installed")
+
+    parser = DemoParser(path)
+
+    header = parser.parse_header()
+
+    # Parse rounds for score and total_rounds
+    rounds_data = _call_parser(parser, method_name="parse_rounds")
+    if rounds_data is None:
+        rounds_data = _parse_event(parser, "round_end")
+    if rounds_data is None:
+        rounds_data = _parse_event(parser, "round_officially_ended")
+
+    kills_data = _call_parser(parser, method_name="parse_kills")
+    if kills_data is None:
+        kills_data = _parse_event(parser, "player_death")
+
+    damage_data = _call_parser(parser, method_name="parse_damage")
+    if damage_data is None:
+        damage_data = _parse_event(parser, "player_hurt")
+
+    # Keep only the needed columns as typed arrays, no per-row dicts
+    events = ColumnarDemo.from_parser_output(
+        kills=kills_data,
+        damage=damage_data,
+        rounds=rounds_data,
+    )
+
+    return {
+        "map": header.get("mapname", "unknown"),
+        "tickrate": header.get("tickrate", 128),
+        "duration": int(header.get("duration", 0)),
+        "header_match_id": header.get("matchid"),
+        "events": events,
+    }
+
+
+def _timed_parse(path: str) -> Tuple[Dict[str, Any], float, float]:
+    """Return (result, started_at, parse_seconds) measured inside the worker."""
+    started_at = time.time()
+    try:
+        result = parse_demo_path(path)
+    except Exception as exc:
+        # demoparser2 exception classes cannot be pickled back to the parent
+        raise RuntimeError(f"{type(exc).__name__}: {exc}") from None
+    return result, started_at, time.time() - started_at
+
+
+class DemoParseExecutor:
+    """Process pool for demo parsing with a bounded wait queue."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        queue_depth: Optional[int] = None,
+    ) -> None:
+        self.max_workers = max(
+            0, int(settings.DEMO_PARSE_WORKERS if max_workers is None else max_workers)
+        )
+        self.queue_depth = max(
+            0, int(settings.DEMO_PARSE_QUEUE_DEPTH if queue_depth is None else queue_depth)
+        )
+        # threading primitives: callers wait on the slots from whichever
+        # thread or event loop they run on (API loop, Celery worker runtime)
+        self._slots = threading.BoundedSemaphore(max(1, self.max_workers) + self.queue_depth)
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def _create_executor(self) -> Executor:
+        if self.max_workers <= 0:
+            # Local development / tests: parse in a thread of this process
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix="demo-parse")
+        if multiprocessing.current_process().daemon:
+            # Daemonic processes (e.g. Celery prefork children) cannot fork workers
+            return ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="demo-parse"
+            )
+        try:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        except Exception:
+            logger.warning(
+                "Process pool unavailable for demo parsing, using threads",
+                exc_info=True,
+            )
+            return ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="demo-parse"
+            )
+
+    def _reset_executor(self, broken: Executor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def parse(self, path: str) -> Dict[str, Any]:
+        """Parse ``path`` in the pool, raising 503 if the parse queue is full."""
+        if not self._slots.acquire(blocking=False):
+            try:
+                DEMO_PARSE_REJECTED_TOTAL.inc()
+            except Exception:
+                # Metrics must not affect parsing behavior
+                pass
+            raise DemoAnalysisException(
+                detail="Demo parsing queue is full. Please try again later.",
+                error_code="PARSE_QUEUE_FULL",
+                status_code=503,
+            )
+
+        try:
+            DEMO_PARSE_IN_FLIGHT.inc()
+        except Exception:
+            pass
+
+        executor = self._get_executor()
+        submitted_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, parse_seconds = await loop.run_in_executor(
+                executor, _timed_parse, path
+            )
+        except BrokenProcessPool:
+            logger.error("Demo parse worker died, recreating process pool")
+            self._reset_executor(executor)
+            raise
+        finally:
+            self._slots.release()
+            try:
+                DEMO_PARSE_IN_FLIGHT.dec()
+            except Exception:
+                pass
+
+        try:
+            DEMO_PARSE_QUEUE_WAIT_SECONDS.observe(max(0.0, started_at - submitted_at))
+            DEMO_PARSE_DURATION_SECONDS.observe(parse_seconds)
+        except Exception:
+            # Metrics must not affect parsing behavior
+            pass
+
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_parse_executor: Optional[DemoParseExecutor] = None
+_parse_executor_lock = threading.Lock()
+
+
+def get_parse_executor() -> DemoParseExecutor:
+    """Return the process-wide demo parse executor, creating it on first use."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            _parse_executor = DemoParseExecutor()
+        return _parse_executor
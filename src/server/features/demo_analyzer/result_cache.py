@@ -0,0 +1,388 @@
+"""Content-addressed cache for demo analysis results.
+
+Entries are keyed by the SHA-256 of the uploaded .dem bytes, so re-uploads
+and the same demo submitted by several bots share one analysis. Two kinds of
+entries are stored:
+
+* the final ``DemoAnalysis`` per (file, player, language);
+* the language-independent parse result (header fields + ``ColumnarDemo``),
+  so a request in another language skips demoparser2 and only re-runs the
+  analysis/LLM part. It is stored as JSON header fields followed by the
+  event arrays in ``np.savez`` format and read back with
+  ``allow_pickle=False``, so whoever can write to the cache cannot make the
+  readers run code.
+
+Bump ``DEMO_ANALYZER_VERSION`` whenever parsing or analysis output changes.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import weakref
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from .columnar import ColumnarDemo, EventTable
+from .models import DemoAnalysis
+from ...config.settings import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore[assignment]
+
+try:
+    import redis.asyncio as redis  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+DEMO_ANALYZER_VERSION = "1"
+
+
+DEMO_RESULT_CACHE_HITS_TOTAL = Counter(
+    "demo_result_cache_hits_total",
+    "Demo result cache hits",
+    ["kind"],
+)
+
+
+DEMO_RESULT_CACHE_MISSES_TOTAL = Counter(
+    "demo_result_cache_misses_total",
+    "Demo result cache misses",
+    ["kind"],
+)
+
+
+def analysis_key(digest: str, language: str, main_player: str) -> str:
+    return f"demo:analysis:v{DEMO_ANALYZER_VERSION}:{digest}:{language}:{main_player}"
+
+
+def parsed_key(digest: str) -> str:
+    return f"demo:parsed:v{DEMO_ANALYZER_VERSION}:{digest}"
+
+
+_EVENT_TABLES = ("kills", "damage", "rounds")
+# Suffix of the array marking None entries of a string column
+_NULLS = ":null"
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def encode_parsed(parsed: Dict[str, Any]) -> bytes:
+    """Serialize a parse result without pickle: JSON header + ``np.savez`` arrays."""
+    events: ColumnarDemo = parsed["events"]
+    header = {key: value for key, value in parsed.items() if key != "events"}
+    header["__lengths"] = {name: len(getattr(events, name)) for name in _EVENT_TABLES}
+
+    arrays: Dict[str, Any] = {}
+    for name in _EVENT_TABLES:
+        for column, values in getattr(events, name).columns.items():
+            key = f"{name}.{column}"
+            if values.dtype == object:
+                # Object arrays would need pickle; store text plus a None mask
+                nulls = np.fromiter((_is_null(v) for v in values), dtype=np.bool_, count=len(values))
+                arrays[key] = np.array(
+                    ["" if null else str(v) for v, null in zip(values, nulls)], dtype=np.str_
+                )
+                if nulls.any():
+                    arrays[key + _NULLS] = nulls
+            else:
+                arrays[key] = values
+
+    meta = json.dumps(header, default=str).encode("utf-8")
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return zlib.compress(len(meta).to_bytes(4, "big") + meta + buf.getvalue())
+
+
+def decode_parsed(raw: bytes) -> Dict[str, Any]:
+    data = zlib.decompress(raw)
+    size = int.from_bytes(data[:4], "big")
+    parsed = json.loads(data[4 : 4 + size])
+    lengths = parsed.pop("__lengths")
+
+    columns: Dict[str, Dict[str, Any]] = {name: {} for name in _EVENT_TABLES}
+    with np.load(io.BytesIO(data[4 + size :]), allow_pickle=False) as arrays:
+        for key in arrays.files:
+            if key.endswith(_NULLS):
+                continue
+            name, column = key.split(".", 1)
+            values = arrays[key]
+            if values.dtype.kind == "U":
+                values = values.astype(object)
+                if key + _NULLS in arrays.files:
+                    values[arrays[key + _NULLS]] = None
+            columns[name][column] = values
+
+    parsed["events"] = ColumnarDemo(
+        **{name: EventTable(columns=columns[name], length=int(lengths[name])) for name in _EVENT_TABLES}
+    )
+    return parsed
+
+
+class RedisDemoCacheBackend:
+    """Redis backend with LRU eviction once stored bytes exceed ``max_bytes``.
+
+    A sorted set keeps last access time per key and a hash keeps entry sizes,
+    so eviction never needs KEYS/SCAN.
+    """
+
+    INDEX_KEY = "demo:cache:lru"
+    SIZES_KEY = "demo:cache:sizes"
+    TOTAL_KEY = "demo:cache:total_bytes"
+
+    def __init__(self, redis_url: str, max_bytes: int, ttl_seconds: int) -> None:
+        self.redis_url = redis_url
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # redis.asyncio clients are bound to the loop they were created on;
+        # one process may run several loops (the API loop, the Celery worker
+        # runtime, scripts like export_dataset)
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _get_client(self) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = redis.from_url(self.redis_url, decode_responses=False)
+            self._clients[loop] = client
+        return client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        client = self._get_client()
+        value = await client.get(key)
+        if value is None:
+            return None
+        await client.zadd(self.INDEX_KEY, {key: time.time()})
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        client = self._get_client()
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        previous = await client.hget(self.SIZES_KEY, key)
+        pipe = client.pipeline()
+        pipe.set(key, value, ex=self.ttl_seconds)
+        pipe.zadd(self.INDEX_KEY, {key: time.time()})
+        pipe.hset(self.SIZES_KEY, key, size)
+        pipe.incrby(self.TOTAL_KEY, size - int(previous or 0))
+        results = await pipe.execute()
+        total = int(results[-1])
+
+        while total > self.max_bytes:
+            oldest = await client.zpopmin(self.INDEX_KEY, 1)
+            if not oldest:
+                break
+            victim = oldest[0][0]
+            victim_size = int(await client.hget(self.SIZES_KEY, victim) or 0)
+            pipe = client.pipeline()
+            pipe.delete(victim)
+            pipe.hdel(self.SIZES_KEY, victim)
+            pipe.decrby(self.TOTAL_KEY, victim_size)
+            results = await pipe.execute()
+            total = int(results[-1])
+
+
+class DiskDemoCacheBackend:
+    """Directory backend; least recently used files are removed past ``max_bytes``."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _get_sync(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if self.ttl_seconds and time.time() - stat.st_mtime > self.ttl_seconds:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        try:
+            with open(path, "rb") as fh:
+                value = fh.read()
+        except FileNotFoundError:
+            return None
+        # mtime doubles as "last used" for LRU eviction
+        os.utime(path, None)
+        return value
+
+    def _set_sync(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(value)
+        os.replace(tmp_path, path)
+        self._evict_sync()
+
+    def _evict_sync(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await asyncio.to_thread(self._set_sync, key, value)
+
+
+class DemoResultCache:
+    """Stores analyses and parse results; backend errors are treated as misses."""
+
+    def __init__(self, backend: Any | None) -> None:
+        self.backend = backend
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        if self.backend is None:
+            return None
+        try:
+            return await self.backend.get(key)
+        except Exception:
+            logger.warning("Demo result cache read failed for %s", key, exc_info=True)
+            return None
+
+    async def _set(self, key: str, value: bytes) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(key, value)
+        except Exception:
+            logger.warning("Demo result cache write failed for %s", key, exc_info=True)
+
+    @staticmethod
+    def _record(kind: str, hit: bool) -> None:
+        try:
+            if hit:
+                DEMO_RESULT_CACHE_HITS_TOTAL.labels(kind=kind).inc()
+            else:
+                DEMO_RESULT_CACHE_MISSES_TOTAL.labels(kind=kind).inc()
+        except Exception:
+            # Metrics must not affect caching behavior
+            pass
+
+    async def get_analysis(
+        self, digest: str, language: str, main_player: str
+    ) -> Optional[DemoAnalysis]:
+        raw = await self._get(analysis_key(digest, language, main_player))
+        analysis: Optional[DemoAnalysis] = None
+        if raw is not None:
+            try:
+                analysis = DemoAnalysis.model_validate_json(zlib.decompress(raw))
+            except Exception:
+                logger.warning("Corrupted cached demo analysis for %s", digest)
+        self._record("analysis", analysis is not None)
+        return analysis
+
+    async def set_analysis(
+        self, digest: str, language: str, main_player: str, analysis: DemoAnalysis
+    ) -> None:
+        payload = zlib.compress(analysis.model_dump_json().encode("utf-8"))
+        await self._set(analysis_key(digest, language, main_player), payload)
+
+    async def get_parsed(self, digest: str) -> Optional[Dict[str, Any]]:
+        if np is None:
+            return None
+        raw = await self._get(parsed_key(digest))
+        parsed: Optional[Dict[str, Any]] = None
+        if raw is not None:
+            try:
+                parsed = decode_parsed(raw)
+            except Exception:
+                logger.warning("Corrupted cached demo parse result for %s", digest)
+        self._record("parsed", parsed is not None)
+        return parsed
+
+    async def set_parsed(self, digest: str, parsed: Dict[str, Any]) -> None:
+        if np is None:
+            return
+        try:
+            payload = encode_parsed(parsed)
+        except Exception:
+            logger.warning("Failed to serialize demo parse result for %s", digest, exc_info=True)
+            return
+        await self._set(parsed_key(digest), payload)
+
+
+def _build_backend() -> Any | None:
+    backend = (settings.DEMO_RESULT_CACHE_BACKEND or "").lower()
+    max_bytes = int(settings.DEMO_RESULT_CACHE_MAX_MB) * 1024 * 1024
+    ttl = int(settings.DEMO_RESULT_CACHE_TTL_SECONDS)
+
+    if backend == "redis":
+        redis_url = settings.REDIS_URL or os.getenv("REDIS_URL")
+        if redis is None or not redis_url:
+            logger.warning("Demo result cache: Redis unavailable, using disk backend")
+        else:
+            return RedisDemoCacheBackend(redis_url, max_bytes, ttl)
+        backend = "disk"
+
+    if backend == "disk":
+        return DiskDemoCacheBackend(settings.DEMO_RESULT_CACHE_DIR, max_bytes, ttl)
+
+    return None
+
+
+_result_cache: Optional[DemoResultCache] = None
+
+
+def get_demo_result_cache() -> DemoResultCache:
+    """Return the process-wide demo result cache, creating it on first use."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = DemoResultCache(_build_backend())
+    return _result_cache
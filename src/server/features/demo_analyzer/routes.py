@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import json
 import os
+import shutil
 import tempfile
 import socket
 import ipaddress
@@ -8,13 +10,15 @@ import hashlib
 import secrets
 import time
 from urllib.parse import urlparse
-from typing import Optional, Union
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
 
 from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, status, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import httpx
 
+from ..demo_analyzer.chunked_upload import ChunkTooLarge, upload_hashes, write_chunk
 from ..demo_analyzer.service import DemoAnalyzer
 from ..demo_analyzer.models import DemoAnalysis
 from ...auth.dependencies import get_optional_current_user
@@ -24,7 +28,13 @@ from ...middleware.rate_limiter import rate_limiter
 from ...services.rate_limit_service import rate_limit_service
 from ...exceptions import DemoAnalysisException
 from ...config.settings import settings
-from ...tasks import analyze_demo_task
+from ..tasks.demo_queue import (
+    DemoQueueFull,
+    check_demo_queue,
+    queue_full_http_exception,
+    submit_demo_analysis,
+    subscription_tier,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(
@@ -39,6 +49,18 @@ MAX_DEMO_SIZE_MB = settings.MAX_DEMO_FILE_MB
 MAX_DEMO_SIZE_BYTES = MAX_DEMO_SIZE_MB * 1024 * 1024
 _SNIFF_BYTES = 4096
 _SHARED_TMP_DIR = "/tmp_demos"
+_SUSPICIOUS_MARKERS = (
+    b"<html",
+    b"<script",
+    b"<?php",
+    b"#!/bin/bash",
+    b"#!/usr/bin/env",
+    b"import os",
+    b"import sys",
+)
+_CHUNK_MAX_BYTES = settings.DEMO_UPLOAD_CHUNK_MAX_MB * 1024 * 1024
+# Held while one chunk is written; long enough for a slow chunk
+_CHUNK_LOCK_SECONDS = 600
 
 _UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", "1200"))
 _BOT_UPLOAD_SESSION_SECRET = os.getenv("BOT_UPLOAD_SESSION_SECRET")
@@ -48,6 +70,11 @@ _DEMO_PUBLIC_BASE_URL = os.getenv(
 ).rstrip("/")
 
 
+def _looks_like_script(first_bytes: bytes) -> bool:
+    lowered_sniff = (first_bytes or b"").lower()
+    return any(marker in lowered_sniff for marker in _SUSPICIOUS_MARKERS)
+
+
 def _upload_session_key(token: str) -> str:
     digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
     return f"upload_session:{digest}"
@@ -110,6 +137,8 @@ class CreateUploadSessionRequest(BaseModel):
     platform: str
     platform_user_id: str
     language: str = "ru"
+    # Start the analysis as soon as a chunked upload completes
+    auto_analyze: bool = False
 
 
 class UploadDemoResponse(BaseModel):
@@ -250,6 +279,47 @@ async def _download_demo_to_shared_tmp(url: str) -> str:
         )
 
 
+async def _check_demo_upload(demo: UploadFile) -> None:
+    """Reject non-.dem, empty and obviously textual uploads, then rewind."""
+    filename = (demo.filename or "").lower()
+    if not filename.endswith(".dem"):
+        raise DemoAnalysisException(
+            detail="Invalid file format. Only .dem files are supported.",
+            error_code="INVALID_FILE_FORMAT",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    sniff = await demo.read(_SNIFF_BYTES)
+
+    if not sniff:
+        raise DemoAnalysisException(
+            detail="Empty file. Please upload a valid CS2 demo.",
+            error_code="EMPTY_FILE",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Very basic content sanity check: reject obviously textual/script files
+    lowered_sniff = sniff.lower()
+    suspicious_markers = [
+        b"<html",
+        b"<script",
+        b"<?php",
+        b"#!/bin/bash",
+        b"#!/usr/bin/env",
+        b"import os",
+        b"import sys",
+    ]
+    if any(marker in lowered_sniff for marker in suspicious_markers):
+        raise DemoAnalysisException(
+            detail="Invalid file content. Expected a binary CS2 demo file.",
+            error_code="INVALID_FILE_CONTENT",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Rewind file so DemoAnalyzer can read it from the beginning
+    demo.file.seek(0)
+
+
 @router.post(
     "/analyze",
     response_model=DemoAnalysis,
@@ -291,45 +361,57 @@ async def analyze_demo(
     including player performance, round analysis and recommendations.
     """
 
-    filename = (demo.filename or "").lower()
-    if not filename.endswith(".dem"):
-        raise DemoAnalysisException(
-            detail="Invalid file format. Only .dem files are supported.",
-            error_code="INVALID_FILE_FORMAT",
-            status_code=status.HTTP_400_BAD_REQUEST,
-        )
+    await _check_demo_upload(demo)
+    return await demo_analyzer.analyze_demo(demo, language=language)
 
-    sniff = await demo.read(_SNIFF_BYTES)
 
-    if not sniff:
-        raise DemoAnalysisException(
-            detail="Empty file. Please upload a valid CS2 demo.",
-            error_code="EMPTY_FILE",
-            status_code=status.HTTP_400_BAD_REQUEST,
-        )
+def _sse(event: str, data: Any) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
 
-    # Very basic content sanity check: reject obviously textual/script files
-    lowered_sniff = sniff.lower()
-    suspicious_markers = [
-        b"<html",
-        b"<script",
-        b"<?php",
-        b"#!/bin/bash",
-        b"#!/usr/bin/env",
-        b"import os",
-        b"import sys",
-    ]
-    if any(marker in lowered_sniff for marker in suspicious_markers):
-        raise DemoAnalysisException(
-            detail="Invalid file content. Expected a binary CS2 demo file.",
-            error_code="INVALID_FILE_CONTENT",
-            status_code=status.HTTP_400_BAD_REQUEST,
+
+async def _sse_events(
+    first: Tuple[str, Any],
+    events: AsyncIterator[Tuple[str, Any]],
+) -> AsyncIterator[bytes]:
+    yield _sse(*first)
+    try:
+        async for event, data in events:
+            yield _sse(event, data)
+    except DemoAnalysisException as exc:
+        yield _sse("error", exc.detail)
+    except Exception:
+        logger.exception("Demo analysis stream failed")
+        yield _sse(
+            "error",
+            {"error": "Internal server error during demo analysis", "error_code": "INTERNAL_ERROR"},
         )
 
-    # Rewind file so DemoAnalyzer can read it from the beginning
-    demo.file.seek(0)
 
-    return await demo_analyzer.analyze_demo(demo, language=language)
+@router.post(
+    "/analyze/stream",
+    summary="Demo file analysis with streamed coach report",
+    description=(
+        "Server-sent events: `analysis` (stats, rounds, recommendations) "
+        "once the demo is parsed, one `section` per coach report field as "
+        "the model writes it, then `done` with the full coach report"
+    ),
+)
+async def analyze_demo_stream(
+    demo: UploadFile = File(...),
+    language: str = "ru",
+    _: None = Depends(rate_limiter),
+    __: None = Depends(enforce_demo_analyze_rate_limit),
+):
+    await _check_demo_upload(demo)
+    events = demo_analyzer.analyze_demo_stream(demo, language=language)
+    # Parse before answering, so upload and parse errors keep their HTTP status
+    first = await events.__anext__()
+    return StreamingResponse(
+        _sse_events(first, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post(
@@ -351,6 +433,12 @@ async def analyze_demo_background(
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
+    tier = subscription_tier(current_user)
+    try:
+        check_demo_queue(tier)
+    except DemoQueueFull as exc:
+        raise queue_full_http_exception(exc)
+
     tmp_path: Optional[str] = None
     try:
         os.makedirs(_SHARED_TMP_DIR, exist_ok=True)
@@ -386,17 +474,7 @@ async def analyze_demo_background(
                 status_code=status.HTTP_400_BAD_REQUEST,
             )
 
-        lowered_sniff = (first_bytes or b"").lower()
-        suspicious_markers = [
-            b"<html",
-            b"<script",
-            b"<?php",
-            b"#!/bin/bash",
-            b"#!/usr/bin/env",
-            b"import os",
-            b"import sys",
-        ]
-        if any(marker in lowered_sniff for marker in suspicious_markers):
+        if _looks_like_script(first_bytes):
             raise DemoAnalysisException(
                 detail="Invalid file content. Expected a binary CS2 demo file.",
                 error_code="INVALID_FILE_CONTENT",
@@ -407,16 +485,24 @@ async def analyze_demo_background(
         if current_user is not None and current_user.id is not None:
             user_id_value = str(current_user.id)
 
-        task = analyze_demo_task.delay(
+        task = submit_demo_analysis(
             demo_file_path=tmp_path,
             user_id=user_id_value,
             language=language,
+            tier=tier,
         )
 
         return {
             "task_id": task.id,
             "status": "submitted",
         }
+    except DemoQueueFull as exc:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.unlink(tmp_path)
+            except Exception:
+                pass
+        raise queue_full_http_exception(exc)
     except Exception:
         logger.exception("Failed to submit demo analysis task")
         if tmp_path is not None and os.path.exists(tmp_path):
@@ -451,6 +537,7 @@ async def create_upload_session(
         "platform": payload.platform,
         "platform_user_id": payload.platform_user_id,
         "language": language,
+        "auto_analyze": payload.auto_analyze,
         "created_at": int(time.time()),
     }
     await redis_client.setex(key, _UPLOAD_SESSION_TTL_SECONDS, json.dumps(value))
@@ -480,18 +567,29 @@ async def claim_upload_session(
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid session")
     if data.get("status") != "ready":
+        if data.get("status") == "uploading":
+            return {
+                "status": "uploading",
+                "offset": int(data.get("offset", 0)),
+                "length": int(data.get("upload_length", 0)),
+            }
         return {"status": data.get("status", "pending")}
     demo_url = data.get("demo_url")
     if not demo_url:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing demo_url")
     await redis_client.delete(key)
-    return {
+    claimed = {
         "status": "ready",
         "demo_url": demo_url,
         "language": data.get("language", "ru"),
         "platform": data.get("platform"),
         "platform_user_id": data.get("platform_user_id"),
     }
+    # Chunked uploads: analysis may already be running
+    for name in ("task_id", "file_hash"):
+        if data.get(name):
+            claimed[name] = data[name]
+    return claimed
 
 
 @router.post(
@@ -564,17 +662,7 @@ async def upload_demo_file(
                     )
                 tmp_file.write(chunk)
 
-        lowered_sniff = (first_bytes or b"").lower()
-        suspicious_markers = [
-            b"<html",
-            b"<script",
-            b"<?php",
-            b"#!/bin/bash",
-            b"#!/usr/bin/env",
-            b"import os",
-            b"import sys",
-        ]
-        if any(marker in lowered_sniff for marker in suspicious_markers):
+        if _looks_like_script(first_bytes):
             raise DemoAnalysisException(
                 detail="Invalid file content. Expected a binary CS2 demo file.",
                 error_code="INVALID_FILE_CONTENT",
@@ -616,6 +704,287 @@ async def upload_demo_file(
         )
 
 
+async def _load_upload_session(redis_client: Any, token: str) -> Tuple[str, Dict[str, Any]]:
+    key = _upload_session_key(token)
+    raw = await redis_client.get(key)
+    if not raw:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    try:
+        return key, json.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid session")
+
+
+def _chunked_upload_state(session: Dict[str, Any]) -> Dict[str, Any]:
+    offset = int(session.get("offset", 0))
+    state: Dict[str, Any] = {
+        "status": session.get("status", "pending"),
+        "offset": offset,
+        "length": int(session.get("upload_length", 0)),
+        # Chunks are appended in order, so the received bytes are one range
+        "ranges": [[0, offset]] if offset else [],
+    }
+    for name in ("demo_url", "task_id"):
+        if session.get(name):
+            state[name] = session[name]
+    return state
+
+
+def _chunked_upload_response(session: Dict[str, Any], status_code: int = status.HTTP_200_OK) -> JSONResponse:
+    state = _chunked_upload_state(session)
+    return JSONResponse(
+        status_code=status_code,
+        content=state,
+        headers={
+            "Upload-Offset": str(state["offset"]),
+            "Upload-Length": str(state["length"]),
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+def _int_header(request: Request, name: str) -> int:
+    try:
+        value = int(request.headers.get(name, ""))
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing or invalid {name} header",
+        )
+    return value
+
+
+def _finish_chunked_upload(session: Dict[str, Any], file_hash: str) -> None:
+    """Validate the completed file, publish it and optionally start analysis."""
+    tmp_path = session["tmp_path"]
+    with open(tmp_path, "rb") as fh:
+        first_bytes = fh.read(_SNIFF_BYTES)
+    if _looks_like_script(first_bytes):
+        _remove_shared_tmp(tmp_path)
+        session["status"] = "failed"
+        raise DemoAnalysisException(
+            detail="Invalid file content. Expected a binary CS2 demo file.",
+            error_code="INVALID_FILE_CONTENT",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    os.chmod(tmp_path, 0o644)
+    session.update(
+        status="ready",
+        demo_url=f"{_DEMO_PUBLIC_BASE_URL}/{os.path.basename(tmp_path)}",
+        file_hash=file_hash,
+        ready_at=int(time.time()),
+    )
+    if not session.get("auto_analyze"):
+        return
+
+    # The task deletes its input, the published file has to stay
+    root, ext = os.path.splitext(tmp_path)
+    analysis_path = f"{root}.analysis{ext}"
+    try:
+        os.link(tmp_path, analysis_path)
+    except OSError:
+        shutil.copyfile(tmp_path, analysis_path)
+    try:
+        task = submit_demo_analysis(
+            demo_file_path=analysis_path,
+            user_id=session.get("platform_user_id"),
+            language=session.get("language", "ru"),
+            file_hash=file_hash,
+        )
+    except DemoQueueFull as exc:
+        # The upload still succeeds; the client can submit demo_url later
+        _remove_shared_tmp(analysis_path)
+        session["analysis_retry_after"] = exc.retry_after
+        return
+    except Exception:
+        logger.exception("Failed to start analysis for chunked upload")
+        _remove_shared_tmp(analysis_path)
+        return
+    session["task_id"] = task.id
+
+
+def _remove_shared_tmp(path: Optional[str]) -> None:
+    if path is not None and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except Exception:
+            pass
+
+
+@router.post(
+    "/uploads/{token}",
+    summary="Start a resumable chunked demo upload (token required)",
+)
+async def create_chunked_upload(
+    token: str,
+    http_request: Request,
+    filename: str = "demo.dem",
+    _: None = Depends(rate_limiter),
+):
+    """Declare the total size in ``Upload-Length``, then ``PATCH`` chunks.
+
+    Repeating the call for an upload in progress returns its current offset.
+    """
+    length = _int_header(http_request, "Upload-Length")
+    if length == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Empty file. Please upload a valid CS2 demo.",
+        )
+    if length > MAX_DEMO_SIZE_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Maximum allowed size is {MAX_DEMO_SIZE_MB} MB.",
+        )
+    if not filename.lower().endswith(".dem"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file format. Only .dem files are supported.",
+        )
+
+    redis_client = await _get_redis_client()
+    key, session = await _load_upload_session(redis_client, token)
+    if session.get("status") == "uploading" and int(session.get("upload_length", 0)) == length:
+        return _chunked_upload_response(session)
+    if session.get("status") != "pending":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Session is not pending",
+        )
+
+    os.makedirs(_SHARED_TMP_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=_SHARED_TMP_DIR,
+        prefix="demo_upload_",
+        suffix=".dem",
+        delete=False,
+    ) as tmp_file:
+        tmp_path = tmp_file.name
+
+    session.update(
+        status="uploading",
+        upload_length=length,
+        offset=0,
+        tmp_path=tmp_path,
+        filename=os.path.basename(filename),
+        started_at=int(time.time()),
+    )
+    try:
+        await redis_client.setex(key, _UPLOAD_SESSION_TTL_SECONDS, json.dumps(session))
+    except Exception:
+        _remove_shared_tmp(tmp_path)
+        raise
+    return _chunked_upload_response(session, status.HTTP_201_CREATED)
+
+
+@router.api_route(
+    "/uploads/{token}",
+    methods=["GET", "HEAD"],
+    summary="Offset to resume a chunked demo upload from",
+)
+async def get_chunked_upload(
+    token: str,
+    _: None = Depends(rate_limiter),
+):
+    redis_client = await _get_redis_client()
+    _, session = await _load_upload_session(redis_client, token)
+    return _chunked_upload_response(session)
+
+
+@router.patch(
+    "/uploads/{token}",
+    summary="Append a chunk to a chunked demo upload",
+)
+async def upload_demo_chunk(
+    token: str,
+    http_request: Request,
+    _: None = Depends(rate_limiter),
+):
+    """Raw chunk body written at ``Upload-Offset``.
+
+    The offset must not be past the stored one; bytes of a retried chunk
+    that are already stored are skipped. The last chunk completes the
+    upload (and starts the analysis for ``auto_analyze`` sessions).
+    """
+    offset = _int_header(http_request, "Upload-Offset")
+    redis_client = await _get_redis_client()
+    key, session = await _load_upload_session(redis_client, token)
+    if session.get("status") == "ready":
+        # Already complete (e.g. the response to the last chunk was lost)
+        return _chunked_upload_response(session)
+    if session.get("status") != "uploading":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload is not in progress",
+        )
+
+    lock_key = f"{key}:lock"
+    lock_token = secrets.token_hex(16)
+    if not await redis_client.set(lock_key, lock_token, nx=True, ex=_CHUNK_LOCK_SECONDS):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another chunk is being uploaded",
+        )
+    try:
+        # Re-read under the lock: a concurrent chunk may have moved the offset
+        key, session = await _load_upload_session(redis_client, token)
+        current = int(session.get("offset", 0))
+        length = int(session.get("upload_length", 0))
+        tmp_path = session.get("tmp_path") or ""
+        if session.get("status") != "uploading" or offset > current:
+            return _chunked_upload_response(session, status.HTTP_409_CONFLICT)
+
+        try:
+            digest = await asyncio.to_thread(upload_hashes.at, key, tmp_path, current)
+            written = await write_chunk(
+                tmp_path,
+                current,
+                current - offset,
+                http_request.stream(),
+                min(length - current, _CHUNK_MAX_BYTES),
+                digest,
+            )
+        except ChunkTooLarge:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=(
+                    "Chunk runs past the upload length or exceeds "
+                    f"{settings.DEMO_UPLOAD_CHUNK_MAX_MB} MB"
+                ),
+                headers={"Upload-Offset": str(current)},
+            )
+        except (FileNotFoundError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Upload data is gone, start a new session",
+            )
+
+        session["offset"] = current + written
+        if session["offset"] >= length:
+            upload_hashes.discard(key)
+            try:
+                await asyncio.to_thread(_finish_chunked_upload, session, digest.hexdigest())
+            except DemoAnalysisException as exc:
+                await redis_client.setex(key, _UPLOAD_SESSION_TTL_SECONDS, json.dumps(session))
+                raise HTTPException(
+                    status_code=getattr(exc, "status_code", status.HTTP_400_BAD_REQUEST),
+                    detail=getattr(exc, "detail", "Upload failed"),
+                )
+        else:
+            upload_hashes.store(key, session["offset"], digest)
+        # Every chunk extends the session, so slow uploads do not expire midway
+        await redis_client.setex(key, _UPLOAD_SESSION_TTL_SECONDS, json.dumps(session))
+    finally:
+        # Only release our own lock: it may have expired and been taken since
+        if await redis_client.get(lock_key) == lock_token:
+            await redis_client.delete(lock_key)
+
+    return _chunked_upload_response(session)
+
+
 @router.post(
     "/analyze/url/background",
     summary="Demo URL analysis in background",
@@ -626,13 +995,15 @@ async def analyze_demo_url_background(
 ):
     tmp_path: Optional[str] = None
     try:
+        # Bot users have no account here, so they queue at the free tier
+        check_demo_queue()
         tmp_path = await _download_demo_to_shared_tmp(request.url)
 
         user_id_value: Optional[str] = None
         if request.user_id is not None:
             user_id_value = str(request.user_id)
 
-        task = analyze_demo_task.delay(
+        task = submit_demo_analysis(
             demo_file_path=tmp_path,
             user_id=user_id_value,
             language=request.language,
@@ -641,6 +1012,13 @@ async def analyze_demo_url_background(
             "task_id": task.id,
             "status": "submitted",
         }
+    except DemoQueueFull as exc:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.unlink(tmp_path)
+            except Exception:
+                pass
+        raise queue_full_http_exception(exc)
     except DemoAnalysisException as exc:
         raise HTTPException(
             status_code=getattr(exc, "status_code", status.HTTP_400_BAD_REQUEST),
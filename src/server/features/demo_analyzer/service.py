@@ -1,10 +1,13 @@
+import hashlib
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from fastapi import UploadFile
  
+from .columnar import ColumnarDemo
 from .models import (
     CoachReport,
     DemoAnalysis,
@@ -13,27 +16,39 @@ from .models import (
     PlayerPerformance,
     RoundAnalysis,
 )
+from .parse_executor import get_parse_executor
+from .result_cache import get_demo_result_cache
 from ...exceptions import DemoAnalysisException
 from ...config.settings import settings
  
 import tempfile
 import os
 
-try:
-    import pandas as pd  # type: ignore[import-untyped]
-except ImportError:
-    pd = None
-
-try:
-    from demoparser2 import DemoParser  # type: ignore[import-not-found]
-except ImportError:  # demoparser2 может быть не установлен (особенно на Python 3.14)
-    DemoParser = None
-
 from ...ai.demo_coach_model import DemoCoachModel
 
 logger = logging.getLogger(__name__)
 
 
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except Exception:
+        pass
+
+
+@dataclass
+class _PreparedAnalysis:
+    """Demo analysis before the coach report is attached."""
+
+    analysis: DemoAnalysis
+    file_hash: str
+    main_player: str
+    language: str
+    # False for fallback parses, which are not worth caching
+    cacheable: bool
+    from_cache: bool = False
+
+
 class DemoAnalyzer:
     def __init__(self):
         # AI services initialization
@@ -51,64 +66,25 @@ class DemoAnalyzer:
         self,
         demo_file: UploadFile,
         language: str = "ru",
+        stored_file: Optional[Tuple[str, int, str]] = None,
     ) -> DemoAnalysis:
-        try:
-            # File validation
-            if (not demo_file.filename or
-                    not demo_file.filename.endswith('.dem')):
-                raise DemoAnalysisException(
-                    detail=(
-                        "Invalid file format. "
-                        "Only .dem files are supported"
-                    ),
-                    error_code="INVALID_FILE_FORMAT"
-                )
-
-            # Read and parse demo file
-            demo_data = await self._parse_demo_file(demo_file)
-
-            # Player performance analysis
-            player_performances = (
-                await self._analyze_player_performance(demo_data)
-            )
-
-            # Round analysis
-            round_analysis = await self._analyze_rounds(
-                demo_data,
-                player_performances
-            )
+        """Analyze an uploaded demo.
 
-            # Identify key moments
-            key_moments = await self._identify_key_moments(demo_data)
-
-            # Generate recommendations
-            recommendations = (
-                await self._generate_recommendations(
-                    demo_data,
-                    player_performances,
-                    round_analysis,
-                    key_moments,
-                    language=language,
-                )
-            )
-
-            improvement_areas = (
-                await self._identify_improvement_areas(
-                    player_performances
-                )
-            )
-
-            demo_input = self._build_demo_analysis_input(
-                demo_data=demo_data,
-                player_performances=player_performances,
-                round_analysis=round_analysis,
-                key_moments=key_moments,
-                language=language,
-            )
+        ``stored_file`` is ``(path, size, sha256 hex digest)`` of a demo that
+        is already on local disk with a known hash (chunked uploads): it is
+        parsed in place and removed afterwards instead of being copied and
+        hashed again.
+        """
+        try:
+            prepared = await self._prepare_analysis(demo_file, language, stored_file)
+            if prepared.from_cache:
+                return prepared.analysis
 
+            analysis = prepared.analysis
+            coach_report_from_model = True
             try:
                 coach_report = await self.demo_coach_model.generate_coach_report(
-                    demo_input=demo_input,
+                    demo_input=analysis.demo_input,
                     language=language,
                 )
 
@@ -124,204 +100,325 @@ class DemoAnalyzer:
                     "DemoCoachModel failed, falling back to stub coach report",
                     exc_info=True,
                 )
-                stub_payload = self._build_coach_report_stub(
-                    demo_input=demo_input,
-                    player_performances=player_performances,
-                    improvement_areas=improvement_areas,
-                    recommendations=recommendations,
-                    language=language,
-                )
-                coach_report = CoachReport.model_validate(stub_payload)
-
-            metadata = DemoMetadata(
-                match_id=demo_data["match_id"],
-                map_name=demo_data["map"],
-                game_mode=demo_data["mode"],
-                date_played=datetime.now(),
-                duration=int(demo_data["duration"]),
-                score=dict(demo_data["score"]),
-            )
+                coach_report = self._stub_coach_report(analysis, language)
+                coach_report_from_model = False
 
-            return DemoAnalysis(
-                demo_id=demo_data["match_id"],
-                metadata=metadata,
-                overall_performance=player_performances,
-                round_analysis=round_analysis,
-                key_moments=key_moments,
-                recommendations=recommendations,
-                improvement_areas=improvement_areas,
-                coach_report=coach_report,
-                demo_input=demo_input,
-            )
+            return await self._finish_analysis(prepared, coach_report, coach_report_from_model)
 
         except DemoAnalysisException:
             raise
         except Exception:
             logger.exception("Failed to analyze demo")
+            raise self._internal_error()
+
+    async def analyze_demo_stream(
+        self,
+        demo_file: UploadFile,
+        language: str = "ru",
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Analyze a demo and yield ``(event, data)`` pairs for SSE.
+
+        ``analysis`` (everything except the coach report) is yielded as soon
+        as the demo is parsed, then one ``section`` per coach report field as
+        the model streams it, then ``done`` with the complete report.
+        """
+        try:
+            prepared = await self._prepare_analysis(demo_file, language)
+        except DemoAnalysisException:
+            raise
+        except Exception:
+            logger.exception("Failed to analyze demo")
+            raise self._internal_error()
+
+        analysis = prepared.analysis
+        yield "analysis", analysis.model_dump(mode="json", exclude={"coach_report"})
+
+        if prepared.from_cache and analysis.coach_report is not None:
+            report = analysis.coach_report
+            for name, value in report.model_dump(mode="json", exclude_none=True).items():
+                yield "section", {"name": name, "value": value}
+            yield "done", {"coach_report": report.model_dump(mode="json"), "source": "cache"}
+            return
+
+        sections: Dict[str, Any] = {}
+        complete = False
+        try:
+            async for name, value in self.demo_coach_model.stream_coach_report(
+                demo_input=analysis.demo_input,
+                language=language,
+            ):
+                sections[name] = value
+                yield "section", {"name": name, "value": value}
+            complete = True
+        except Exception:
+            # Includes LLMStreamIncomplete: the report was cut off
+            logger.warning("DemoCoachModel stream failed", exc_info=True)
+
+        # Only a finished stream counts as a model report (and gets cached)
+        coach_report_from_model = complete and bool(sections.get("overview") or sections.get("summary"))
+        source = "model" if coach_report_from_model else ("partial" if sections else "stub")
+        if not coach_report_from_model:
+            logger.warning("Incomplete streamed coach report, filling in stub sections")
+            stub = self._stub_coach_report(analysis, language)
+            for name, value in stub.model_dump(mode="json", exclude_none=True).items():
+                if name not in sections:
+                    sections[name] = value
+                    yield "section", {"name": name, "value": value}
+
+        coach_report = CoachReport.model_validate(sections)
+        await self._finish_analysis(prepared, coach_report, coach_report_from_model)
+        yield "done", {
+            "coach_report": coach_report.model_dump(mode="json"),
+            "source": source,
+        }
+
+    async def _prepare_analysis(
+        self,
+        demo_file: UploadFile,
+        language: str,
+        stored_file: Optional[Tuple[str, int, str]] = None,
+    ) -> _PreparedAnalysis:
+        """Parse the demo and build everything except the coach report."""
+        # File validation
+        if (not demo_file.filename or
+                not demo_file.filename.endswith('.dem')):
             raise DemoAnalysisException(
                 detail=(
-                    "Internal server error during demo analysis"
+                    "Invalid file format. "
+                    "Only .dem files are supported"
                 ),
-                error_code="INTERNAL_ERROR",
-                status_code=500
+                error_code="INVALID_FILE_FORMAT"
             )
 
-    async def _parse_demo_file(
+        stem, main_player = self._demo_identity(demo_file)
+        result_cache = get_demo_result_cache()
+
+        # Read and parse demo file; identical bytes reuse a stored analysis
+        spooled = stored_file or await self._spool_demo_file(demo_file)
+        file_hash = spooled[2]
+        try:
+            cached = await result_cache.get_analysis(file_hash, language, main_player)
+            if cached is not None:
+                analysis = cached.model_copy(
+                    update={
+                        "demo_id": stem,
+                        "metadata": cached.metadata.model_copy(update={"match_id": stem}),
+                    }
+                )
+                return _PreparedAnalysis(
+                    analysis=analysis,
+                    file_hash=file_hash,
+                    main_player=main_player,
+                    language=language,
+                    cacheable=False,
+                    from_cache=True,
+                )
+            demo_data = await self._parse_demo_file(demo_file, spooled=spooled)
+        finally:
+            _remove_file(spooled[0])
+
+        # Player performance analysis
+        player_performances = (
+            await self._analyze_player_performance(demo_data)
+        )
+
+        # Round analysis
+        round_analysis = await self._analyze_rounds(
+            demo_data,
+            player_performances
+        )
+
+        # Identify key moments
+        key_moments = await self._identify_key_moments(demo_data)
+
+        # Generate recommendations
+        recommendations = (
+            await self._generate_recommendations(
+                demo_data,
+                player_performances,
+                round_analysis,
+                key_moments,
+                language=language,
+            )
+        )
+
+        improvement_areas = (
+            await self._identify_improvement_areas(
+                player_performances
+            )
+        )
+
+        demo_input = self._build_demo_analysis_input(
+            demo_data=demo_data,
+            player_performances=player_performances,
+            round_analysis=round_analysis,
+            key_moments=key_moments,
+            language=language,
+        )
+
+        metadata = DemoMetadata(
+            match_id=demo_data["match_id"],
+            map_name=demo_data["map"],
+            game_mode=demo_data["mode"],
+            date_played=datetime.now(),
+            duration=int(demo_data["duration"]),
+            score=dict(demo_data["score"]),
+        )
+
+        analysis = DemoAnalysis(
+            demo_id=demo_data["match_id"],
+            metadata=metadata,
+            overall_performance=player_performances,
+            round_analysis=round_analysis,
+            key_moments=key_moments,
+            recommendations=recommendations,
+            improvement_areas=improvement_areas,
+            demo_input=demo_input,
+        )
+
+        return _PreparedAnalysis(
+            analysis=analysis,
+            file_hash=file_hash,
+            main_player=main_player,
+            language=language,
+            cacheable="events" in demo_data,
+        )
+
+    async def _finish_analysis(
         self,
-        demo_file: UploadFile
-    ) -> Dict:
-        """Parse CS2 demo file using demoparser2"""
+        prepared: _PreparedAnalysis,
+        coach_report: CoachReport,
+        coach_report_from_model: bool,
+    ) -> DemoAnalysis:
+        analysis = prepared.analysis.model_copy(update={"coach_report": coach_report})
+
+        # Fallback parses and stub reports are not worth pinning in the cache
+        if prepared.cacheable and coach_report_from_model:
+            await get_demo_result_cache().set_analysis(
+                prepared.file_hash,
+                prepared.language,
+                prepared.main_player,
+                analysis,
+            )
+        return analysis
+
+    def _stub_coach_report(self, analysis: DemoAnalysis, language: str) -> CoachReport:
+        stub_payload = self._build_coach_report_stub(
+            demo_input=analysis.demo_input,
+            player_performances=analysis.overall_performance,
+            improvement_areas=analysis.improvement_areas,
+            recommendations=analysis.recommendations,
+            language=language,
+        )
+        return CoachReport.model_validate(stub_payload)
+
+    @staticmethod
+    def _internal_error() -> DemoAnalysisException:
+        return DemoAnalysisException(
+            detail=(
+                "Internal server error during demo analysis"
+            ),
+            error_code="INTERNAL_ERROR",
+            status_code=500
+        )
+
+    @staticmethod
+    def _demo_identity(demo_file: UploadFile) -> Tuple[str, str]:
+        """Return (match stem, main player) derived from the upload filename."""
         filename = demo_file.filename or "unknown_match.dem"
         stem = Path(filename).stem
         main_player = stem.split("_")[0] if stem else "Player"
+        return stem, main_player
+
+    async def _spool_demo_file(
+        self,
+        demo_file: UploadFile
+    ) -> Tuple[str, int, str]:
+        """Stream the upload to a temp file, hashing it on the way.
 
+        Returns (tmp_path, size, sha256 hex digest); the caller removes the file.
+        """
         max_demo_size_bytes = int(settings.MAX_DEMO_FILE_MB) * 1024 * 1024
         size = 0
+        digest = hashlib.sha256()
 
-        # Create temporary file for parsing
         with tempfile.NamedTemporaryFile(suffix='.dem', delete=False) as tmp_file:
             tmp_path = tmp_file.name
-            while True:
-                chunk = await demo_file.read(1024 * 1024)
-                if not chunk:
-                    break
-                size += len(chunk)
-                if size > max_demo_size_bytes:
-                    raise DemoAnalysisException(
-                        detail=(
-                            "File too large. Maximum allowed size is "
-                            f"{settings.MAX_DEMO_FILE_MB} MB."
-                        ),
-                        error_code="FILE_TOO_LARGE",
-                    )
-                tmp_file.write(chunk)
+            try:
+                while True:
+                    chunk = await demo_file.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_demo_size_bytes:
+                        raise DemoAnalysisException(
+                            detail=(
+                                "File too large. Maximum allowed size is "
+                                f"{settings.MAX_DEMO_FILE_MB} MB."
+                            ),
+                            error_code="FILE_TOO_LARGE",
+                        )
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+            except BaseException:
+                tmp_file.close()
+                _remove_file(tmp_path)
+                raise
+
+        return tmp_path, size, digest.hexdigest()
 
-        try:
-            if DemoParser is None:
-                # Принудительно уйти в fallback-парсинг ниже
-                raise RuntimeError("demoparser2 is not installed")
-
-            def _to_records(value: Any) -> List[Dict[str, Any]]:
-                if value is None:
-                    return []
-                if isinstance(value, list):
-                    return [v for v in value if isinstance(v, dict)]
-                if hasattr(value, "to_dict"):
-                    try:
-                        records = value.to_dict("records")
-                        return [v for v in records if isinstance(v, dict)]
-                    except TypeError:
-                        pass
-                if hasattr(value, "to_dicts"):
-                    try:
-                        records = value.to_dicts()
-                        return [v for v in records if isinstance(v, dict)]
-                    except Exception:
-                        return []
-                return []
-
-            def _call_parser(*, method_name: str, args: tuple[Any, ...] = (), kwargs: Dict[str, Any] | None = None) -> Any:
-                kwargs = kwargs or {}
-                method = getattr(parser, method_name, None)
-                if method is None:
-                    return None
-                try:
-                    return method(*args, **kwargs)
-                except TypeError:
-                    return None
-                except Exception:
-                    return None
-
-            def _parse_event(event_name: str) -> Any:
-                value = _call_parser(method_name="parse_event", args=(event_name,))
-                if value is not None:
-                    return value
-                value = _call_parser(method_name="parse_event", kwargs={"event": event_name})
-                if value is not None:
-                    return value
-                value = _call_parser(method_name="parse_events", args=([event_name],))
-                if value is not None:
-                    return value
-                value = _call_parser(method_name="parse_events", kwargs={"events": [event_name]})
-                if value is not None:
-                    return value
-                value = _call_parser(method_name="parse_events", args=(event_name,))
-                if value is not None:
-                    return value
-                return None
-
-            parser = DemoParser(tmp_path)
-
-            # Parse header
-            header = parser.parse_header()
-            map_name = header.get('mapname', 'unknown')
-            tickrate = header.get('tickrate', 128)
-            duration = int(header.get('duration', 0))
-
-            # Parse rounds for score and total_rounds
-            rounds_data = _call_parser(method_name="parse_rounds")
-            if rounds_data is None:
-                rounds_data = _parse_event("round_end")
-            if rounds_data is None:
-                rounds_data = _parse_event("round_officially_ended")
-            rounds_records = _to_records(rounds_data)
-            total_rounds = len(rounds_records)
-
-            # Parse kills for player stats
-            kills_data = _call_parser(method_name="parse_kills")
-            if kills_data is None:
-                kills_data = _parse_event("player_death")
-            kills_records = _to_records(kills_data)
-
-            # Parse damage
-            damage_data = _call_parser(method_name="parse_damage")
-            if damage_data is None:
-                damage_data = _parse_event("player_hurt")
-            damage_records = _to_records(damage_data)
+    async def _parse_demo_file(
+        self,
+        demo_file: UploadFile,
+        spooled: Optional[Tuple[str, int, str]] = None,
+    ) -> Dict:
+        """Parse CS2 demo file using demoparser2"""
+        stem, main_player = self._demo_identity(demo_file)
 
+        owns_spool = spooled is None
+        if spooled is None:
+            spooled = await self._spool_demo_file(demo_file)
+        tmp_path, size, file_hash = spooled
+
+        try:
+            result_cache = get_demo_result_cache()
+            parsed = await result_cache.get_parsed(file_hash)
+            if parsed is None:
+                # demoparser2 is CPU-bound: parse in the pool, off the event loop
+                parsed = await get_parse_executor().parse(tmp_path)
+                await result_cache.set_parsed(file_hash, parsed)
+            events: ColumnarDemo = parsed['events']
+
+            total_rounds = len(events.rounds)
             if total_rounds <= 0:
-                def _max_round(records: List[Dict[str, Any]]) -> int:
-                    candidates = ("round", "round_num", "roundnum", "round_number", "roundNumber")
-                    best = 0
-                    for rec in records:
-                        for key in candidates:
-                            value = rec.get(key)
-                            if isinstance(value, int) and value > best:
-                                best = value
-                            elif isinstance(value, str) and value.isdigit():
-                                best = max(best, int(value))
-                    return best
-
-                total_rounds = max(_max_round(kills_records), _max_round(damage_records))
-
-            team1_rounds = sum(
-                1
-                for r in rounds_records
-                if (r.get("winning_team") or r.get("winner") or r.get("winningteam") or r.get("winner_side")) == "T"
-            ) if rounds_records else 0
+                total_rounds = events.max_round()
+
+            team1_rounds = events.rounds_won_by("T")
 
             if team1_rounds <= 0 and total_rounds > 0:
                 team1_rounds = max(0, (total_rounds + 1) // 2)
             team2_rounds = max(0, total_rounds - team1_rounds)
     
             # Match ID from filename or header
-            match_id = stem or header.get('matchid', 'unknown_match')
+            match_id = stem or parsed.get('header_match_id') or 'unknown_match'
     
             return {
                 'match_id': match_id,
-                'map': map_name,
+                'map': parsed['map'],
                 'mode': 'competitive',  # Assume for now
-                'duration': duration,
+                'duration': parsed['duration'],
                 'score': {'team1': team1_rounds, 'team2': team2_rounds},
                 'main_player': main_player,
                 'total_rounds': total_rounds,
                 'file_size': size,
-                'tickrate': tickrate,
-                'kills_data': kills_records,
-                'rounds_data': rounds_records,
-                'damage_data': damage_records,
+                'tickrate': parsed['tickrate'],
+                'events': events,
+                'file_hash': file_hash,
             }
     
+        except DemoAnalysisException:
+            # Parse queue is full: surface 503 instead of a fake analysis
+            raise
         except Exception as e:
             logger.warning(f"Demo parsing failed, using fallback: {e}")
             # Fallback to old fake parsing
@@ -342,11 +439,8 @@ class DemoAnalyzer:
                 'file_size': size
             }
         finally:
-            if 'tmp_path' in locals():
-                try:
-                    os.unlink(tmp_path)
-                except Exception:
-                    pass
+            if owns_spool:
+                _remove_file(tmp_path)
 
     async def _analyze_player_performance(
         self,
@@ -381,7 +475,8 @@ class DemoAnalyzer:
         )
         
         # Approximate other metrics
-        entry_kills = int(kills * 0.2)  # First kills approximation
+        # First kills from the demo when round data is present, else approximation
+        entry_kills = int(demo_stats.get('first_kills', kills * 0.2))
         clutches_won = int(kills * 0.05)
         utility_damage = float(demo_stats.get('utility_damage', 20.0))
         flash_assists = int(total_rounds * 0.1)
@@ -411,70 +506,29 @@ class DemoAnalyzer:
     
     def _aggregate_demo_stats(self, demo_data: Dict) -> Dict[str, float | int]:
         """Aggregate statistics from parsed demo data"""
-        kills_data = demo_data.get('kills_data', [])
-        damage_data = demo_data.get('damage_data', [])
+        events = demo_data.get('events')
         main_player = demo_data.get('main_player', 'Player')
-        
-        stats: Dict[str, float | int] = {
-            'kills': 0,
-            'deaths': 0,
-            'headshots': 0,
-            'total_damage': 0,
-            'assists': 0,
-            'utility_damage': 0,
-        }
-        
-        try:
-            import pandas as pd
-        except ImportError:
-            pd = None
-        
-        if kills_data and pd is not None:
-            df_kills = pd.DataFrame(kills_data)
-            attacker_col = next(
-                (c for c in ("attackername", "attacker_name", "attacker", "attackerName") if c in df_kills.columns),
-                None,
-            )
-            victim_col = next(
-                (c for c in ("victimname", "victim_name", "victim", "victimName") if c in df_kills.columns),
-                None,
-            )
-            headshot_col = next(
-                (c for c in ("headshot", "is_headshot", "isHeadshot") if c in df_kills.columns),
-                None,
-            )
 
-            if attacker_col is not None:
-                player_kills = df_kills[df_kills[attacker_col] == main_player]
-                stats['kills'] = len(player_kills)
-                if headshot_col is not None and not player_kills.empty:
-                    stats['headshots'] = int((player_kills[headshot_col] == True).sum())
-
-            if victim_col is not None:
-                player_deaths = df_kills[df_kills[victim_col] == main_player]
-                stats['deaths'] = len(player_deaths)
-
-        if damage_data and pd is not None:
-            df_damage = pd.DataFrame(damage_data)
-            attacker_col = next(
-                (c for c in ("attackername", "attacker_name", "attacker", "attackerName") if c in df_damage.columns),
-                None,
-            )
-            dmg_col = next(
-                (c for c in ("hp_damage", "dmg_health", "hpDamage", "damage") if c in df_damage.columns),
-                None,
-            )
+        if isinstance(events, ColumnarDemo):
+            stats = events.player_stats(main_player)
+            if events.kills.has('round'):
+                first_kills, first_deaths = events.opening_duels(main_player)
+                stats['first_kills'] = first_kills
+                stats['first_deaths'] = first_deaths
+        else:
+            stats = {
+                'kills': 0,
+                'deaths': 0,
+                'headshots': 0,
+                'total_damage': 0,
+                'assists': 0,
+                'utility_damage': 0,
+            }
 
-            if attacker_col is not None and dmg_col is not None:
-                player_damage = df_damage[df_damage[attacker_col] == main_player]
-                stats['total_damage'] = (
-                    float(player_damage[dmg_col].sum()) if not player_damage.empty else 0
-                )
-        
         # Headshot percentage
         if stats['kills'] > 0:
             stats['headshot_percentage'] = (stats['headshots'] / stats['kills']) * 100
-        
+
         return stats
 
     async def _analyze_rounds(
@@ -510,6 +564,13 @@ class DemoAnalyzer:
         deaths_per_round = max(0, main_perf.deaths // total_rounds)
         assists_per_round = max(0, main_perf.assists // total_rounds)
 
+        events = demo_data.get('events')
+        per_round = (
+            events.player_rounds(main_player_id, total_rounds)
+            if isinstance(events, ColumnarDemo)
+            else None
+        )
+
         for number in range(1, total_rounds + 1):
             if team1_left > 0 and (team2_left == 0 or number % 2 == 1):
                 winner_team = 'team1'
@@ -546,10 +607,17 @@ class DemoAnalyzer:
                     }
                 )
 
+            if per_round is not None:
+                round_kills = int(per_round['kills'][number - 1])
+                round_deaths = int(per_round['deaths'][number - 1])
+            else:
+                round_kills = kills_per_round + (1 if number % 4 == 0 else 0)
+                round_deaths = deaths_per_round + (1 if number % 6 == 0 else 0)
+
             per_round_performance = PlayerPerformance(
                 player_id=main_player_id,
-                kills=kills_per_round + (1 if number % 4 == 0 else 0),
-                deaths=deaths_per_round + (1 if number % 6 == 0 else 0),
+                kills=round_kills,
+                deaths=round_deaths,
                 assists=assists_per_round,
                 headshot_percentage=main_perf.headshot_percentage,
                 entry_kills=1 if number % 5 == 0 else 0,
@@ -902,6 +970,16 @@ class DemoAnalyzer:
         damage_per_round = main_perf.damage_per_round if main_perf else 0.0
         clutches_won = main_perf.clutches_won if main_perf else 0
 
+        first_kills = 0
+        first_deaths = 0
+        multi_kill_rounds = 0
+        events = demo_data.get("events")
+        if isinstance(events, ColumnarDemo) and events.kills.has("round"):
+            first_kills, first_deaths = events.opening_duels(str(main_player_id))
+            per_round = events.player_rounds(str(main_player_id), total_rounds)
+            if per_round is not None:
+                multi_kill_rounds = int((per_round["kills"] >= 2).sum())
+
         flags: List[str] = []
         if kd_ratio < 0.9:
             flags.append("low_kd_ratio")
@@ -952,10 +1030,10 @@ class DemoAnalyzer:
                 "kd": kd_ratio,
                 "adr": damage_per_round,
                 "hs_percent": hs_percentage,
-                "first_kills": 0,
-                "first_deaths": 0,
+                "first_kills": first_kills,
+                "first_deaths": first_deaths,
                 "first_deaths_no_trade": 0,
-                "multi_kill_rounds": 0,
+                "multi_kill_rounds": multi_kill_rounds,
                 "clutches_total": 0,
                 "clutches_won": clutches_won,
                 "opening_duels_taken": 0,
@@ -10,6 +10,7 @@ from fastapi import HTTPException
 
 from ...integrations.faceit_client import FaceitAPIClient
 from ...services.ai_service import AIService
+from ...config.settings import settings
 from ...services.cache_service import cache_service
 from .schemas import (
     PlayerAnalysisResponse,
@@ -44,11 +45,38 @@ class PlayerAnalysisService:
             Detailed analysis or None
         """
         try:
-            # NOTE: Redis caching for player analysis is temporarily disabled
-            # to avoid returning stale data while AI logic is actively evolving.
-            logger.info(
-                f"Analyzing player {nickname} (no cache)"
+            async def _load() -> Optional[Dict]:
+                analysis = await self._analyze_player_uncached(nickname, language)
+                return analysis.model_dump(mode="json") if analysis else None
+
+            # Stale-while-revalidate keeps hot profiles fast while the AI
+            # analysis is refreshed in the background
+            cached = await cache_service.get_or_set(
+                cache_service.get_player_cache_key(nickname, language),
+                _load,
+                ttl=settings.PLAYER_ANALYSIS_CACHE_TTL_SECONDS,
+                stale_ttl=settings.PLAYER_ANALYSIS_CACHE_STALE_SECONDS,
             )
+            if cached is None:
+                return None
+            return PlayerAnalysisResponse.model_validate(cached)
+
+        except HTTPException:
+            raise
+        except Exception:
+            logger.exception(
+                f"Error analyzing player {nickname}"
+            )
+            return None
+
+    async def _analyze_player_uncached(
+        self,
+        nickname: str,
+        language: str = "ru",
+    ) -> Optional[PlayerAnalysisResponse]:
+        """Run the full Faceit + AI analysis without touching the cache"""
+        try:
+            logger.info(f"Analyzing player {nickname}")
 
             # Fetch player data
             player = (
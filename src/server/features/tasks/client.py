@@ -0,0 +1,70 @@
+"""Client helper for waiting on background tasks (used by the bots)."""
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import httpx
+
+from ...core.task_events import TERMINAL_STATES
+
+# What the bots show from a demo analysis (the full result is much larger)
+DEMO_SUMMARY_FIELDS = (
+    "analysis.metadata",
+    "analysis.coach_report.summary",
+    "analysis.recommendations",
+)
+
+
+class TaskWaitError(Exception):
+    """The task status stream could not be read."""
+
+
+async def wait_for_task(
+    client: httpx.AsyncClient,
+    base_url: str,
+    task_id: str,
+    max_wait: float,
+    fields: Optional[Sequence[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Follow ``/tasks/events/{task_id}`` until the task finishes.
+
+    Returns the final status payload, or the last one seen (``None`` if none)
+    when ``max_wait`` runs out first. A dropped stream is reopened while time
+    remains. ``fields`` limits the result to those dotted paths.
+    """
+    deadline = time.monotonic() + max_wait
+    status: Optional[Dict[str, Any]] = None
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return status
+
+        params: Dict[str, Any] = {"timeout": remaining}
+        if fields:
+            params["fields"] = ",".join(fields)
+
+        async with client.stream(
+            "GET",
+            f"{base_url}/tasks/events/{task_id}",
+            params=params,
+        ) as response:
+            if response.status_code >= 400:
+                raise TaskWaitError(f"HTTP {response.status_code}")
+
+            event: Optional[str] = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "error":
+                        raise TaskWaitError(str(data.get("error") or data))
+                    if event == "status":
+                        status = data
+                        if status.get("status") in TERMINAL_STATES:
+                            return status
+
+        # Stream ended early (proxy timeout, API restart): reconnect
+        await asyncio.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
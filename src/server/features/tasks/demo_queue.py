@@ -0,0 +1,199 @@
+"""Admission to the demo analysis queue: subscriber priority and backpressure.
+
+Demo analyses run on their own Celery queue (``celery_app.DEMO_QUEUE``).
+Paying subscribers are enqueued with a higher broker priority, so their demos
+overtake free ones waiting in the same queue. Once the number of waiting
+demos passes ``DEMO_QUEUE_MAX_DEPTH`` (``DEMO_QUEUE_PAID_MAX_DEPTH`` for paid
+tiers) new submissions are refused with ``DemoQueueFull``, which carries an
+estimate of when the backlog will have drained enough to retry.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+from kombu.exceptions import ChannelError
+from prometheus_client import Counter, Gauge
+
+from ...celery_app import DEMO_QUEUE, LOWEST_PRIORITY, celery_app
+from ...config.settings import settings
+from ...database.models import SubscriptionTier
+from ...tasks import analyze_demo_task
+
+logger = logging.getLogger(__name__)
+
+TIER_PRIORITY: Dict[SubscriptionTier, int] = {
+    SubscriptionTier.ELITE: 0,
+    SubscriptionTier.PRO: 3,
+    SubscriptionTier.BASIC: 6,
+    SubscriptionTier.FREE: LOWEST_PRIORITY,
+}
+
+
+DEMO_QUEUE_DEPTH = Gauge(
+    "demo_queue_depth",
+    "Demo analyses waiting in the broker queue (last sampled)",
+)
+
+
+DEMO_SUBMISSIONS_TOTAL = Counter(
+    "demo_submissions_total",
+    "Demo analysis submissions by subscription tier and outcome",
+    ["tier", "outcome"],
+)
+
+
+class DemoQueueFull(Exception):
+    """Too many demos are waiting; retry after ``retry_after`` seconds."""
+
+    def __init__(self, depth: int, retry_after: int) -> None:
+        super().__init__(f"Demo analysis queue is full ({depth} waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+def subscription_tier(user: Any) -> SubscriptionTier:
+    """Best active subscription tier of ``user`` (``FREE`` for anonymous)."""
+    if user is None:
+        return SubscriptionTier.FREE
+    try:
+        subscriptions = user.subscription or []
+    except Exception:
+        logger.warning("Failed to load subscriptions for demo priority", exc_info=True)
+        return SubscriptionTier.FREE
+
+    now = datetime.utcnow()
+    best = SubscriptionTier.FREE
+    for subscription in subscriptions:
+        tier = subscription.tier or SubscriptionTier.FREE
+        if not subscription.is_active:
+            continue
+        if subscription.expires_at is not None and subscription.expires_at < now:
+            continue
+        if TIER_PRIORITY[tier] < TIER_PRIORITY[best]:
+            best = tier
+    return best
+
+
+class DemoQueueMonitor:
+    """Samples the demo queue depth from the broker, at most every ``cache_seconds``."""
+
+    def __init__(self, queue: str = DEMO_QUEUE, cache_seconds: float = 2.0) -> None:
+        self.queue = queue
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._depth: Optional[int] = None
+        self._sampled_at = 0.0
+
+    def _read_depth(self) -> int:
+        with celery_app.connection_for_read() as conn:
+            # Fail fast instead of kombu's default of retrying forever
+            conn.ensure_connection(max_retries=1)
+            try:
+                return int(conn.default_channel.queue_declare(queue=self.queue, passive=True).message_count)
+            except ChannelError:
+                # Redis drops the list once it is empty
+                return 0
+
+    def depth(self) -> Optional[int]:
+        """Waiting demos, or ``None`` when the broker cannot be asked."""
+        with self._lock:
+            if self._depth is not None and time.monotonic() - self._sampled_at < self.cache_seconds:
+                return self._depth
+            try:
+                self._depth = self._read_depth()
+            except Exception:
+                logger.warning("Failed to read demo queue depth", exc_info=True)
+                self._depth = None
+            self._sampled_at = time.monotonic()
+            depth = self._depth
+
+        if depth is not None:
+            try:
+                DEMO_QUEUE_DEPTH.set(depth)
+            except Exception:
+                # Metrics must not affect submission behavior
+                pass
+        return depth
+
+    @staticmethod
+    def max_depth(tier: SubscriptionTier) -> int:
+        if tier is SubscriptionTier.FREE:
+            return int(settings.DEMO_QUEUE_MAX_DEPTH)
+        return int(settings.DEMO_QUEUE_PAID_MAX_DEPTH)
+
+    @staticmethod
+    def retry_after(depth: int, max_depth: int) -> int:
+        """Seconds until the backlog is expected to be back under ``max_depth``."""
+        excess = depth - max_depth + 1
+        workers = max(1, int(settings.CELERY_DEMO_CONCURRENCY))
+        return max(1, math.ceil(excess * float(settings.DEMO_ANALYSIS_EXPECTED_SECONDS) / workers))
+
+    def admit(self, tier: SubscriptionTier) -> None:
+        """Raise ``DemoQueueFull`` if a ``tier`` submission must wait."""
+        depth = self.depth()
+        if depth is None:
+            # Unknown depth: let the broker take it rather than refuse everyone
+            return
+        max_depth = self.max_depth(tier)
+        if max_depth > 0 and depth >= max_depth:
+            raise DemoQueueFull(depth, self.retry_after(depth, max_depth))
+
+
+demo_queue_monitor = DemoQueueMonitor()
+
+
+def _record_submission(tier: SubscriptionTier, outcome: str) -> None:
+    try:
+        DEMO_SUBMISSIONS_TOTAL.labels(tier=tier.value, outcome=outcome).inc()
+    except Exception:
+        # Metrics must not affect submission behavior
+        pass
+
+
+def check_demo_queue(tier: SubscriptionTier = SubscriptionTier.FREE) -> None:
+    """Raise ``DemoQueueFull`` early, before a large upload is read."""
+    try:
+        demo_queue_monitor.admit(tier)
+    except DemoQueueFull:
+        _record_submission(tier, "rejected")
+        raise
+
+
+def submit_demo_analysis(
+    demo_file_path: str,
+    user_id: Optional[str] = None,
+    language: str = "ru",
+    tier: SubscriptionTier = SubscriptionTier.FREE,
+    file_hash: Optional[str] = None,
+) -> Any:
+    """Enqueue ``analyze_demo_task`` with the priority of ``tier``.
+
+    Raises ``DemoQueueFull`` instead of enqueueing when the queue is too deep.
+    """
+    check_demo_queue(tier)
+
+    kwargs: Dict[str, Any] = {
+        "demo_file_path": demo_file_path,
+        "user_id": user_id,
+        "language": language,
+    }
+    if file_hash:
+        kwargs["file_hash"] = file_hash
+    task = analyze_demo_task.apply_async(kwargs=kwargs, priority=TIER_PRIORITY[tier])
+    _record_submission(tier, "accepted")
+    return task
+
+
+def queue_full_http_exception(exc: DemoQueueFull) -> HTTPException:
+    """503 with ``Retry-After`` for a refused submission."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Demo analysis queue is full, please retry in {exc.retry_after} seconds",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
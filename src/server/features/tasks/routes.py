@@ -1,18 +1,34 @@
 """Background tasks API endpoints"""
+import asyncio
+import json
 import logging
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 from pydantic import BaseModel
 from ...celery_app import celery_app
+from ...core.task_events import TERMINAL_STATES, task_event_hub, task_event_publisher
+from ...core.task_results import get_task_result_store, parse_fields
 from ...tasks import (
-    analyze_demo_task,
     analyze_player_task,
     send_email_task
 )
+from .demo_queue import DemoQueueFull, queue_full_http_exception, submit_demo_analysis
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/tasks", tags=["background-tasks"])
 
+# Waiters re-read the result backend this often in case a pub/sub message
+# was lost, and as often as bots used to poll when Redis is unavailable
+STATUS_RECHECK_SECONDS = 30.0
+STATUS_FALLBACK_POLL_SECONDS = 3.0
+SSE_HEARTBEAT_SECONDS = 15.0
+
+FIELDS_DESCRIPTION = (
+    "Comma-separated dotted paths to keep from the result, "
+    "e.g. analysis.metadata,analysis.coach_report.summary"
+)
+
 
 class TaskSubmitRequest(BaseModel):
     """Task submission request"""
@@ -45,7 +61,7 @@ async def submit_task(request: TaskSubmitRequest):
         params = request.params
 
         if task_type == "analyze_demo":
-            task = analyze_demo_task.delay(
+            task = submit_demo_analysis(
                 params.get("demo_path"),
                 params.get("user_id"),
             )
@@ -74,6 +90,8 @@ async def submit_task(request: TaskSubmitRequest):
     except HTTPException:
         # Preserve explicit HTTP errors (e.g. for unknown task types)
         raise
+    except DemoQueueFull as e:
+        raise queue_full_http_exception(e)
     except Exception as e:
         logger.exception(f"Task submission failed: {e}")
         raise HTTPException(
@@ -82,40 +100,158 @@ async def submit_task(request: TaskSubmitRequest):
         )
 
 
+def _task_status(task_id: str, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    result = celery_app.AsyncResult(task_id)
+
+    response: Dict[str, Any] = {
+        "task_id": task_id,
+        "taskId": task_id,
+        "status": result.status,
+        "state": result.status,
+    }
+
+    if result.ready():
+        if result.successful():
+            # Large results are stored out-of-band; only ``fields`` are read
+            try:
+                response["result"] = get_task_result_store().load(result.result, fields)
+            except LookupError as exc:
+                response["error"] = str(exc)
+        else:
+            response["error"] = str(result.info)
+
+    return response
+
+
+async def _watch_task(
+    task_id: str,
+    timeout: float,
+    fields: Optional[List[str]] = None,
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """Yield the task status, then every change until it finishes or ``timeout``.
+
+    ``None`` is yielded when nothing changed for ``SSE_HEARTBEAT_SECONDS``.
+    The result backend is read once up front, once per published state that
+    needs it, and on the periodic re-check.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    async with task_event_hub.subscribe(task_id) as events:
+        status = await asyncio.to_thread(_task_status, task_id, fields)
+        last_read = loop.time()
+        yield status
+
+        while status["status"] not in TERMINAL_STATES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            recheck = STATUS_RECHECK_SECONDS if task_event_hub.connected else STATUS_FALLBACK_POLL_SECONDS
+            try:
+                state = await asyncio.wait_for(
+                    events.get(),
+                    min(remaining, SSE_HEARTBEAT_SECONDS, max(0.0, last_read + recheck - loop.time())),
+                )
+            except asyncio.TimeoutError:
+                state = None
+
+            if state is not None and state not in TERMINAL_STATES:
+                # Intermediate states carry no result: skip the backend read
+                if state != status["status"]:
+                    status = dict(status, status=state, state=state)
+                    yield status
+                continue
+            if state is None and loop.time() - last_read < recheck:
+                yield None
+                continue
+
+            previous = status["status"]
+            status = await asyncio.to_thread(_task_status, task_id, fields)
+            last_read = loop.time()
+            yield status if status["status"] != previous or status["status"] in TERMINAL_STATES else None
+
+
 @router.get("/status/{task_id}", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str):
+async def get_task_status(
+    task_id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
     """Get task status by ID"""
     try:
-        result = celery_app.AsyncResult(task_id)
+        status = await asyncio.to_thread(_task_status, task_id, parse_fields(fields))
+        return TaskStatusResponse(**status)
 
-        response = {
-            "task_id": task_id,
-            "taskId": task_id,
-            "status": result.status,
-            "state": result.status,
-        }
+    except Exception as e:
+        logger.exception(f"Failed to get task status: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to get task status"
+        )
 
-        if result.ready():
-            if result.successful():
-                response["result"] = result.result
-            else:
-                response["error"] = str(result.info)
 
-        return TaskStatusResponse(**response)
+@router.get("/wait/{task_id}", response_model=TaskStatusResponse)
+async def wait_task_status(
+    task_id: str,
+    timeout: float = Query(25.0, ge=0, le=60),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    """Long-poll: return once the task finishes or after ``timeout`` seconds"""
+    try:
+        status: Optional[Dict[str, Any]] = None
+        async for update in _watch_task(task_id, timeout, parse_fields(fields)):
+            if update is not None:
+                status = update
+        return TaskStatusResponse(**(status or {}))
 
     except Exception as e:
-        logger.exception(f"Failed to get task status: {e}")
+        logger.exception(f"Failed to wait for task status: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to get task status"
         )
 
 
+def _sse(event: str, data: Any) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+async def _sse_status_events(
+    task_id: str,
+    timeout: float,
+    fields: Optional[List[str]] = None,
+) -> AsyncIterator[bytes]:
+    try:
+        async for update in _watch_task(task_id, timeout, fields):
+            if update is None:
+                yield b": keep-alive\n\n"
+            else:
+                yield _sse("status", TaskStatusResponse(**update).model_dump(mode="json"))
+    except Exception:
+        logger.exception("Task status stream failed for %s", task_id)
+        yield _sse("error", {"error": "Failed to get task status"})
+
+
+@router.get("/events/{task_id}")
+async def stream_task_status(
+    task_id: str,
+    timeout: float = Query(480.0, ge=0, le=1800),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    """Server-sent ``status`` events for a task until it finishes or ``timeout``"""
+    return StreamingResponse(
+        _sse_status_events(task_id, timeout, parse_fields(fields)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.delete("/cancel/{task_id}")
 async def cancel_task(task_id: str):
     """Cancel running task"""
     try:
         celery_app.control.revoke(task_id, terminate=True)
+        # Revoked tasks never reach CallbackTask hooks
+        await asyncio.to_thread(task_event_publisher.publish, task_id, "REVOKED")
 
         return {
             "task_id": task_id,
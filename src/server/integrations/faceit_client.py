@@ -2,10 +2,16 @@
 Faceit API Client
 Client for Faceit API integration
 """
+import asyncio
 import aiohttp
-from typing import Any, Dict, List, Optional, cast
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, cast
 import logging
+from prometheus_client import Counter, Gauge, Histogram
 from ..config.settings import settings
+from ..core.single_flight import RedisSingleFlight, SingleFlight
 from ..exceptions import (
     FaceitAPIError,
     PlayerNotFoundError,
@@ -16,6 +22,109 @@ from ..exceptions import (
 logger = logging.getLogger(__name__)
 
 
+FACEIT_HTTP_IN_FLIGHT = Gauge(
+    "faceit_http_requests_in_flight",
+    "Faceit API requests currently holding a pooled connection slot",
+)
+
+
+FACEIT_HTTP_SLOT_WAIT_SECONDS = Histogram(
+    "faceit_http_slot_wait_seconds",
+    "Time spent waiting for a Faceit API concurrency slot",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5),
+)
+
+
+FACEIT_HTTP_SESSIONS_CREATED_TOTAL = Counter(
+    "faceit_http_sessions_created_total",
+    "Pooled aiohttp sessions created for the Faceit API",
+)
+
+
+class FaceitHTTPPool:
+    """Long-lived aiohttp session shared by all FaceitAPIClient instances.
+
+    Keeps TCP/TLS connections alive between calls and caps concurrent
+    requests. aiohttp sessions are bound to an event loop, so one session is
+    kept per loop (the API loop, the Celery worker runtime loop, scripts).
+    """
+
+    def __init__(self) -> None:
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Any, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _get(self) -> Tuple[Any, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is not None and not getattr(entry[0], "closed", False):
+            return entry
+
+        connector = aiohttp.TCPConnector(
+            limit=settings.FACEIT_HTTP_POOL_LIMIT,
+            limit_per_host=settings.FACEIT_HTTP_LIMIT_PER_HOST,
+            keepalive_timeout=settings.FACEIT_HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        semaphore = asyncio.Semaphore(max(1, settings.FACEIT_HTTP_MAX_CONCURRENCY))
+        self._sessions[loop] = (session, semaphore)
+        try:
+            FACEIT_HTTP_SESSIONS_CREATED_TOTAL.inc()
+        except Exception:
+            # Metrics must not affect Faceit client behavior
+            pass
+        return session, semaphore
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Any]:
+        """Yield the shared session while holding a concurrency slot."""
+        session, semaphore = self._get()
+        started = time.perf_counter()
+        async with semaphore:
+            try:
+                FACEIT_HTTP_SLOT_WAIT_SECONDS.observe(time.perf_counter() - started)
+                FACEIT_HTTP_IN_FLIGHT.inc()
+            except Exception:
+                pass
+            try:
+                yield session
+            finally:
+                try:
+                    FACEIT_HTTP_IN_FLIGHT.dec()
+                except Exception:
+                    pass
+
+    async def close(self) -> None:
+        """Close the session owned by the running loop (call on shutdown)."""
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.pop(loop, None)
+        if entry is None:
+            return
+        close = getattr(entry[0], "close", None)
+        if close is not None:
+            await close()
+
+
+faceit_http_pool = FaceitHTTPPool()
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+
+
+def _single_flight(operation: str) -> SingleFlight:
+    """Per-operation single-flight so coalescing metrics are labelled by call."""
+    flight = _single_flights.get(operation)
+    if flight is None:
+        name = f"faceit_{operation}"
+        if settings.FACEIT_SINGLE_FLIGHT_REDIS:
+            flight = RedisSingleFlight(name, redis_url=settings.REDIS_URL)
+        else:
+            flight = SingleFlight(name)
+        _single_flights[operation] = flight
+    return flight
+
+
 class FaceitAPIClient:
     """Client for Faceit API"""
 
@@ -44,6 +153,15 @@ class FaceitAPIClient:
         }
 
     async def get_player_by_nickname(self, nickname: str) -> Optional[Dict]:
+        """Get player information by nickname (concurrent lookups are coalesced)"""
+        return cast(
+            Optional[Dict],
+            await _single_flight("player").do(
+                nickname, lambda: self._get_player_by_nickname(nickname)
+            ),
+        )
+
+    async def _get_player_by_nickname(self, nickname: str) -> Optional[Dict]:
         """
         Get player information by nickname
 
@@ -58,7 +176,7 @@ class FaceitAPIClient:
             raise FaceitAPIKeyMissingError()
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with faceit_http_pool.session() as session:
                 async with session.get(
                     f"{self.BASE_URL}/players",
                     headers=self.headers,
@@ -92,6 +210,17 @@ class FaceitAPIClient:
 
     async def get_player_stats(
         self, player_id: str, game: str = "cs2"
+    ) -> Optional[Dict]:
+        """Get player statistics (concurrent lookups are coalesced)"""
+        return cast(
+            Optional[Dict],
+            await _single_flight("player_stats").do(
+                f"{player_id}:{game}", lambda: self._get_player_stats(player_id, game)
+            ),
+        )
+
+    async def _get_player_stats(
+        self, player_id: str, game: str = "cs2"
     ) -> Optional[Dict]:
         """
         Get player statistics
@@ -107,7 +236,7 @@ class FaceitAPIClient:
             raise FaceitAPIKeyMissingError()
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with faceit_http_pool.session() as session:
                 async with session.get(
                     f"{self.BASE_URL}/players/{player_id}/stats/{game}",
                     headers=self.headers,
@@ -141,7 +270,26 @@ class FaceitAPIClient:
         self,
         player_id: str,
         game: str = "cs2",
-        limit: int = 20
+        limit: int = 20,
+        offset: int = 0,
+        from_ts: Optional[int] = None,
+    ) -> List[Dict]:
+        """Get player match history (concurrent lookups are coalesced)"""
+        return cast(
+            List[Dict],
+            await _single_flight("match_history").do(
+                f"{player_id}:{game}:{limit}:{offset}:{from_ts}",
+                lambda: self._get_match_history(player_id, game, limit, offset, from_ts),
+            ),
+        )
+
+    async def _get_match_history(
+        self,
+        player_id: str,
+        game: str = "cs2",
+        limit: int = 20,
+        offset: int = 0,
+        from_ts: Optional[int] = None,
     ) -> List[Dict]:
         """
         Get player match history
@@ -149,20 +297,28 @@ class FaceitAPIClient:
         Args:
             player_id: Player ID
             game: Game
-            limit: Number of matches
+            limit: Number of matches (one page, at most 100)
+            offset: Number of newest matches to skip
+            from_ts: Only matches started at or after this Unix timestamp
 
         Returns:
-            List of matches
+            List of matches, newest first
         """
         if not self.api_key:
             raise FaceitAPIKeyMissingError()
 
+        params: Dict[str, Any] = {"game": game, "limit": limit}
+        if offset:
+            params["offset"] = offset
+        if from_ts is not None:
+            params["from"] = from_ts
+
         try:
-            async with aiohttp.ClientSession() as session:
+            async with faceit_http_pool.session() as session:
                 async with session.get(
                     f"{self.BASE_URL}/players/{player_id}/history",
                     headers=self.headers,
-                    params={"game": game, "limit": limit},
+                    params=params,
                     timeout=aiohttp.ClientTimeout(total=15)
                 ) as response:
                     if response.status == 200:
@@ -188,6 +344,21 @@ class FaceitAPIClient:
         nickname: str,
         country: Optional[str] = None,
         limit: int = 20
+    ) -> List[Dict]:
+        """Search players by nickname (concurrent searches are coalesced)"""
+        return cast(
+            List[Dict],
+            await _single_flight("search_players").do(
+                f"{nickname}:{country or ''}:{limit}",
+                lambda: self._search_players(nickname, country, limit),
+            ),
+        )
+
+    async def _search_players(
+        self,
+        nickname: str,
+        country: Optional[str] = None,
+        limit: int = 20
     ) -> List[Dict]:
         """
         Search players by nickname
@@ -208,7 +379,7 @@ class FaceitAPIClient:
             if country:
                 params["country"] = country
 
-            async with aiohttp.ClientSession() as session:
+            async with faceit_http_pool.session() as session:
                 async with session.get(
                     f"{self.BASE_URL}/search/players",
                     headers=self.headers,
@@ -234,6 +405,15 @@ class FaceitAPIClient:
             return []
 
     async def get_match_details(self, match_id: str) -> Optional[Dict]:
+        """Retrieve match details (concurrent lookups are coalesced)"""
+        return cast(
+            Optional[Dict],
+            await _single_flight("match_details").do(
+                match_id, lambda: self._get_match_details(match_id)
+            ),
+        )
+
+    async def _get_match_details(self, match_id: str) -> Optional[Dict]:
         """Retrieve match details including demo URLs.
 
         This wraps the Data API endpoint `/matches/{match_id}`.
@@ -242,7 +422,7 @@ class FaceitAPIClient:
             raise FaceitAPIKeyMissingError()
 
         try:
-            async with aiohttp.ClientSession() as session:
+            async with faceit_http_pool.session() as session:
                 async with session.get(
                     f"{self.BASE_URL}/matches/{match_id}",
                     headers=self.headers,
@@ -1,5 +1,6 @@
 """Main FastAPI application entry point."""
 
+import asyncio
 import logging
 import os
 import sys
@@ -30,6 +31,11 @@ from .features.player_analysis.schemas import PlayerAnalysisResponse
 from .features.tasks.routes import router as tasks_router
 from .features.admin.routes import router as admin_router
 from .features.demo_analyzer.routes import router as demo_router
+from .features.demo_analyzer.parse_executor import get_parse_executor
+from .ai.llm_transport import llm_transport
+from .ai.sample_store import close_sample_store
+from .integrations.faceit_client import faceit_http_pool
+from .core.task_events import task_event_hub
 from .metrics_business import ANALYSIS_REQUESTS, ANALYSIS_DURATION, ACTIVE_USERS
 from .sitemap_routes import router as sitemap_router
 
@@ -144,8 +150,8 @@ app.add_middleware(StructuredLoggingMiddleware)
 # Add security middleware
 app.add_middleware(SecurityMiddleware)
 
-# Caching middleware temporarily disabled due to Content-Length issues
-# app.add_middleware(CacheMiddleware, cache_ttl=300)
+# Cache GET responses in Redis (compressed, with ETag revalidation)
+app.add_middleware(CacheMiddleware, cache_ttl=300)
 
 # Configure CORS
 app.add_middleware(
@@ -209,6 +215,18 @@ async def analyze_player_route(nickname: str):
         raise HTTPException(status_code=500, detail="Failed to analyze player")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close pooled keep-alive connections to external APIs
+    await faceit_http_pool.close()
+    await llm_transport.close()
+    await task_event_hub.close()
+    # Stop demo parser processes; parses still queued are cancelled
+    get_parse_executor().shutdown(wait=False)
+    # Write out AI samples still waiting in the background queue
+    await asyncio.to_thread(close_sample_store)
+
+
 @app.get("/", tags=["health"])
 def root():
     return {"message": "Faceit AI Bot service running", "status": "healthy"}
@@ -1,15 +1,53 @@
-"""Redis caching middleware for FastAPI"""
+"""Redis caching middleware for FastAPI
 
-import json
+Cached GET responses are stored as raw body bytes, compressed with zstd (if
+``zstandard`` is installed) or gzip, in a Redis hash next to the status,
+headers and ETag. Lookups go through the asyncio Redis client so they never
+block the event loop, and ``If-None-Match`` revalidations are answered with
+304 after reading only the stored ETag.
+
+Entries are tagged with ``all``, their route (``route:/players/{nickname}/stats``)
+and, for authenticated requests, their user (``user:42``), so invalidation
+never needs KEYS (see ``core.cache_tags``).
+"""
+
+import gzip
 import hashlib
+import json
+import logging
 import os
 from urllib.parse import urlparse
-from typing import cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 import redis
+import redis.asyncio as aioredis
 from fastapi import Request, Response
+from prometheus_client import Counter
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from ..auth.security import decode_access_token
+from ..core.cache_tags import (
+    invalidate_tag,
+    invalidate_tag_sync,
+    register_tags,
+    scan_delete_sync,
+    tag_key,
+)
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+API_CACHE_REQUESTS_TOTAL = Counter(
+    "api_cache_requests_total",
+    "Cacheable GET requests by cache outcome",
+    ["result"],
+)
+
 
 def _get_redis_config():
     """Parse Redis URL from environment.
@@ -30,9 +68,17 @@ def _get_redis_config():
     return host, port, password
 
 
-# Redis connection
+# Redis connections
 host, port, password = _get_redis_config()
-redis_client = redis.Redis(
+# Used by CacheMiddleware on the API event loop
+redis_client = aioredis.Redis(
+    host=host,
+    port=port,
+    password=password,
+    decode_responses=False,
+)
+# Blocking client for maintenance helpers called from sync code (Celery beat)
+sync_redis_client = redis.Redis(
     host=host,
     port=port,
     password=password,
@@ -40,91 +86,218 @@ redis_client = redis.Redis(
 )
 
 
+CACHE_PREFIX = "api_cache"
+
+# Bodies smaller than this are stored uncompressed
+MIN_COMPRESS_BYTES = 512
+
+# Headers that describe the stored representation rather than the resource
+_REPRESENTATION_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "etag"}
+
+
+def _record(result: str) -> None:
+    try:
+        API_CACHE_REQUESTS_TOTAL.labels(result=result).inc()
+    except Exception:
+        # Metrics must not affect request behavior
+        pass
+
+
+def _compress(body: bytes) -> Tuple[str, bytes]:
+    if len(body) < MIN_COMPRESS_BYTES:
+        return "identity", body
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(body)
+    return "gzip", gzip.compress(body, compresslevel=5)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "identity":
+        return data
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported cache codec: {codec}")
+
+
+def _accepts_encoding(request: Request, codec: str) -> bool:
+    accept = request.headers.get("accept-encoding") or ""
+    for item in accept.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() == codec:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
 class CacheMiddleware(BaseHTTPMiddleware):
     """Middleware for caching GET requests"""
 
-    def __init__(self, app, cache_ttl: int = 300):
+    # Path segments whose responses must always be fresh or are user-state
+    SKIP_SEGMENTS = frozenset(
+        {
+            "auth",
+            "health",
+            "metrics",
+            "docs",
+            "redoc",
+            "openapi.json",
+            "me",
+            "admin",
+            "tasks",
+            "payments",
+            "subscriptions",
+        }
+    )
+
+    def __init__(self, app, cache_ttl: int = 300, max_body_bytes: int = 1024 * 1024):
         super().__init__(app)
         self.cache_ttl = cache_ttl
+        self.max_body_bytes = max_body_bytes
+
+    def _should_skip(self, path: str) -> bool:
+        return any(segment in self.SKIP_SEGMENTS for segment in path.split("/"))
+
+    def _is_cacheable(self, response: Response) -> bool:
+        if response.status_code != 200:
+            return False
+        headers = response.headers
+        if "content-encoding" in headers or "set-cookie" in headers:
+            return False
+        cache_control = (headers.get("cache-control") or "").lower()
+        if any(token in cache_control for token in ("no-store", "no-cache", "private")):
+            return False
+        if (headers.get("content-type") or "").startswith("text/event-stream"):
+            return False
+        length = headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_body_bytes:
+            return False
+        return True
 
     async def dispatch(self, request: Request, call_next):
         # Only cache GET requests
         if request.method != "GET":
             return await call_next(request)
 
-        # Skip caching for auth endpoints and health checks
-        if any(path in str(request.url.path) for path in ["/auth", "/health", "/metrics", "/docs"]):
+        # Skip caching for auth, health, task/payment status and similar endpoints
+        if self._should_skip(request.url.path):
             return await call_next(request)
 
         # Create cache key from URL and query params
         cache_key = self._generate_cache_key(request)
+        if_none_match = request.headers.get("if-none-match")
 
         try:
-            # Try to get from cache
-            cached_response = redis_client.get(cache_key)
-            if isinstance(cached_response, str):
-                # Parse cached response
-                cached_data = json.loads(cached_response)
-                # Copy headers and drop Content-Length so it can be recalculated
-                headers = dict(cached_data["headers"])
-                headers.pop("content-length", None)
-                response = Response(
-                    content=json.dumps(cached_data["content"]),
-                    status_code=cached_data["status_code"],
-                    headers=headers,
-                )
-                response.headers["X-Cache"] = "HIT"
+            if if_none_match:
+                # Revalidation only needs the ETag, not the body
+                etag = await redis_client.hget(cache_key, "etag")
+                if etag is not None and _etag_matches(if_none_match, _text(etag)):
+                    _record("not_modified")
+                    return Response(
+                        status_code=304,
+                        headers={"ETag": _text(etag), "X-Cache": "HIT"},
+                    )
+
+            cached = await redis_client.hgetall(cache_key)
+            if cached:
+                response = self._build_cached_response(request, cached)
+                _record("hit")
                 return response
-
         except Exception:
             # If Redis fails, continue without caching
-            pass
+            logger.debug("API cache lookup failed for %s", request.url.path, exc_info=True)
 
         # Get response from handler
         response = await call_next(request)
 
-        # Cache successful GET responses
-        if response.status_code == 200:
-            try:
-                content = b""
-                async for chunk in response.body_iterator:
-                    content += chunk
-
-                # Create cache data
-                cache_data = {
-                    "content": json.loads(content.decode()),
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                }
-
-                # Store in cache
-                redis_client.setex(cache_key, self.cache_ttl, json.dumps(cache_data))
-
-                # Return response with cache header
-                headers = dict(response.headers)
-                headers["X-Cache"] = "MISS"
-                # Remove Content-Length so Starlette will recalculate it
-                headers.pop("content-length", None)
-                return Response(
-                    content=json.dumps(cache_data["content"]),
-                    status_code=response.status_code,
-                    headers=headers,
-                )
+        if not self._is_cacheable(response):
+            _record("bypass")
+            return response
 
-            except Exception:
-                # If caching fails, return original response
-                response.headers["X-Cache"] = "ERROR"
-                return response
-
-        return response
+        chunks = []
+        async for chunk in response.body_iterator:
+            chunks.append(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+        body = b"".join(chunks)
 
-    def _generate_cache_key(self, request: Request) -> str:
-        """Generate cache key from request"""
-        url = str(request.url)
-        query_params = str(request.query_params)
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() not in _REPRESENTATION_HEADERS
+        }
+        etag = response.headers.get("etag") or f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        cache_status = "MISS"
 
-        # Include a user-specific component so cached responses are not shared
-        # across different authenticated users.
+        if len(body) <= self.max_body_bytes:
+            try:
+                codec, payload = _compress(body)
+                pipe = redis_client.pipeline(transaction=True)
+                pipe.hset(
+                    cache_key,
+                    mapping={
+                        "status": str(response.status_code),
+                        "headers": json.dumps(headers),
+                        "etag": etag,
+                        "codec": codec,
+                        "body": payload,
+                    },
+                )
+                pipe.expire(cache_key, self.cache_ttl)
+                register_tags(
+                    pipe,
+                    cache_key,
+                    [tag_key(CACHE_PREFIX, tag) for tag in self._cache_tags(request)],
+                    self.cache_ttl,
+                )
+                await pipe.execute()
+                _record("miss")
+            except Exception:
+                logger.debug("API cache store failed for %s", request.url.path, exc_info=True)
+                _record("error")
+                cache_status = "ERROR"
+
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "X-Cache": cache_status})
+
+        headers["ETag"] = etag
+        headers["X-Cache"] = cache_status
+        # Starlette computes Content-Length for the new body
+        return Response(content=body, status_code=response.status_code, headers=headers)
+
+    def _build_cached_response(self, request: Request, cached: Dict[Any, Any]) -> Response:
+        fields = {_text(key): value for key, value in cached.items()}
+        codec = _text(fields["codec"])
+        body = fields["body"]
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        headers = cast(Dict[str, str], json.loads(fields["headers"]))
+        headers["ETag"] = _text(fields["etag"])
+        headers["X-Cache"] = "HIT"
+
+        if codec != "identity":
+            headers["Vary"] = "Accept-Encoding"
+            if _accepts_encoding(request, codec):
+                # Serve the stored bytes as-is, no recompression needed
+                headers["Content-Encoding"] = codec
+            else:
+                body = _decompress(codec, body)
+
+        return Response(content=body, status_code=int(fields["status"]), headers=headers)
+
+    @staticmethod
+    def _get_token(request: Request) -> str:
         auth_header = request.headers.get("Authorization") or ""
         user_token = ""
 
@@ -136,6 +309,32 @@ class CacheMiddleware(BaseHTTPMiddleware):
             if cookie_token:
                 user_token = cookie_token
 
+        return user_token
+
+    def _cache_tags(self, request: Request) -> List[str]:
+        """Tags for invalidation: everything, the matched route and the user."""
+        # The router stores the matched route in the shared scope
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or request.url.path
+        tags = ["all", f"route:{route_path}"]
+
+        token = self._get_token(request)
+        if token:
+            payload = decode_access_token(token)
+            sub = payload.get("sub") if payload else None
+            if sub is not None:
+                tags.append(f"user:{sub}")
+        return tags
+
+    def _generate_cache_key(self, request: Request) -> str:
+        """Generate cache key from request"""
+        url = str(request.url)
+        query_params = str(request.query_params)
+
+        # Include a user-specific component so cached responses are not shared
+        # across different authenticated users.
+        user_token = self._get_token(request)
+
         user_token_hash = ""
         if user_token:
             user_token_hash = hashlib.sha256(user_token.encode()).hexdigest()
@@ -144,32 +343,50 @@ class CacheMiddleware(BaseHTTPMiddleware):
         key_data = f"{url}:{query_params}:{user_token_hash}"
         key_hash = hashlib.sha256(key_data.encode()).hexdigest()
 
-        return f"api_cache:{key_hash}"
+        return f"{CACHE_PREFIX}:{key_hash}"
 
 
 # Cache invalidation functions
+def invalidate_cache_tags(*tags: str) -> int:
+    """Invalidate all cached responses carrying any of ``tags``."""
+    removed = 0
+    for tag in tags:
+        try:
+            removed += invalidate_tag_sync(sync_redis_client, tag_key(CACHE_PREFIX, tag))
+        except Exception:
+            logger.warning("API cache invalidation failed for tag %s", tag, exc_info=True)
+    return removed
+
+
+async def invalidate_cache_tags_async(*tags: str, client: Optional[Any] = None) -> int:
+    """Async variant of :func:`invalidate_cache_tags` for request handlers."""
+    removed = 0
+    for tag in tags:
+        try:
+            removed += await invalidate_tag(client or redis_client, tag_key(CACHE_PREFIX, tag))
+        except Exception:
+            logger.warning("API cache invalidation failed for tag %s", tag, exc_info=True)
+    return removed
+
+
 def invalidate_cache(pattern: str = "*"):
-    """Invalidate cache keys matching pattern"""
+    """Invalidate cache keys matching pattern (SCAN, prefer tags)"""
     try:
-        keys = cast(list[str], redis_client.keys(f"api_cache:{pattern}"))
-        if keys:
-            for key in keys:
-                redis_client.delete(key)
+        scan_delete_sync(sync_redis_client, f"{CACHE_PREFIX}:{pattern}")
     except Exception:
         pass
 
 
 def invalidate_user_cache(user_id: str):
     """Invalidate cache for specific user"""
-    invalidate_cache(f"*{user_id}*")
+    invalidate_cache_tags(f"user:{user_id}")
+
+
+def invalidate_route_cache(route_path: str):
+    """Invalidate cache for a route template, e.g. ``/players/{nickname}/stats``"""
+    invalidate_cache_tags(f"route:{route_path}")
 
 
 def clear_all_cache():
     """Clear all cached data"""
-    try:
-        keys = cast(list[str], redis_client.keys("api_cache:*"))
-        if keys:
-            for key in keys:
-                redis_client.delete(key)
-    except Exception:
-        pass
+    invalidate_cache_tags("all")
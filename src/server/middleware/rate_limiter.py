@@ -4,11 +4,15 @@ Request rate limiting
 """
 import time
 import logging
-from typing import Dict, Tuple
+from typing import Tuple
 from fastapi import Request, HTTPException
-from collections import defaultdict
 from prometheus_client import Counter
 from ..services.cache_service import cache_service
+from ..services.rate_limit_backend import (
+    BucketedWindowCounter,
+    RateLimitCounter,
+    run_rate_limit_script,
+)
 from ..auth.security import decode_access_token
 from ..config.settings import settings
 
@@ -44,22 +48,11 @@ class RateLimiter:
             cache_service.redis_client if getattr(cache_service, "enabled", False) else None
         )
 
-        # Request storage: {ip: [(timestamp, count)]}
-        self.minute_requests: Dict[str, list] = defaultdict(list)
-        self.hour_requests: Dict[str, list] = defaultdict(list)
-
-    def _clean_old_requests(
-        self,
-        requests_list: list,
-        time_window: int
-    ) -> list:
-        """Clean old requests"""
-        current_time = time.time()
-        return [
-            (timestamp, count)
-            for timestamp, count in requests_list
-            if current_time - timestamp < time_window
-        ]
+        # In-memory fallback: fixed-size ring buffer of counters per IP,
+        # 5 s buckets for the minute window and 1 min buckets for the hour
+        max_keys = settings.RATE_LIMIT_LOCAL_MAX_KEYS
+        self.minute_requests = BucketedWindowCounter(60, buckets=12, max_keys=max_keys)
+        self.hour_requests = BucketedWindowCounter(3600, buckets=60, max_keys=max_keys)
 
     def _get_client_ip(self, request: Request) -> str:
         """Get client IP"""
@@ -131,32 +124,6 @@ class RateLimiter:
             limit_type,
         )
 
-    async def _check_ban(self, client_ip: str, user_id: str | None) -> Tuple[bool, str | None]:
-        """Check if IP or user is temporarily banned due to rate limit violations"""
-        if self.redis_client is None or not settings.RATE_LIMIT_BAN_ENABLED:
-            return False, None
-
-        try:
-            ban_keys: list[Tuple[str, str]] = [(f"rate:ban:ip:{client_ip}", "ip")]
-            if user_id is not None:
-                ban_keys.append((f"rate:ban:user:{user_id}", "user"))
-
-            for key, label in ban_keys:
-                exists = await self.redis_client.exists(key)
-                if exists:
-                    ttl = await self.redis_client.ttl(key)
-                    logger.warning(
-                        "Rate limit ban active for %s=%s ttl=%s",
-                        label,
-                        client_ip if label == "ip" else user_id,
-                        ttl,
-                    )
-                    return True, "Too many requests, access temporarily blocked"
-        except Exception as e:
-            logger.error("Rate limit ban check error: %s", e)
-
-        return False, None
-
     async def _register_violation_and_maybe_ban(
         self,
         client_ip: str,
@@ -166,44 +133,38 @@ class RateLimiter:
         if self.redis_client is None or not settings.RATE_LIMIT_BAN_ENABLED:
             return
 
-        try:
-            max_count = 0
-
-            ip_key = f"rate:viol:ip:{client_ip}"
-            ip_count = await self.redis_client.incr(ip_key)
-            if ip_count == 1:
-                await self.redis_client.expire(ip_key, settings.RATE_LIMIT_BAN_WINDOW_SECONDS)
-            max_count = max(max_count, ip_count)
+        identities = [("ip", client_ip)]
+        if user_id is not None:
+            identities.append(("user", user_id))
 
-            user_key = None
-            user_count = None
-            if user_id is not None:
-                user_key = f"rate:viol:user:{user_id}"
-                user_count = await self.redis_client.incr(user_key)
-                if user_count == 1:
-                    await self.redis_client.expire(user_key, settings.RATE_LIMIT_BAN_WINDOW_SECONDS)
-                max_count = max(max_count, user_count)
-
-            if max_count >= settings.RATE_LIMIT_BAN_THRESHOLD:
-                ban_ttl = settings.RATE_LIMIT_BAN_TTL_SECONDS
-                await self.redis_client.setex(f"rate:ban:ip:{client_ip}", ban_ttl, "1")
-                if user_id is not None:
-                    await self.redis_client.setex(f"rate:ban:user:{user_id}", ban_ttl, "1")
-                logger.warning(
-                    "Rate limit autoban applied: ip=%s user_id=%s violations=%s",
-                    client_ip,
-                    user_id,
-                    max_count,
-                )
-
-                scope = "ip_and_user" if user_id is not None else "ip"
-                try:
-                    RATE_LIMIT_BANS_TOTAL.labels(scope=scope).inc()
-                except Exception:
-                    logger.exception("Failed to increment rate limit ban metric")
+        try:
+            result = await run_rate_limit_script(
+                self.redis_client,
+                [],
+                ban_keys=[f"rate:ban:{label}:{value}" for label, value in identities],
+                violation_keys=[f"rate:viol:{label}:{value}" for label, value in identities],
+                violation_window=settings.RATE_LIMIT_BAN_WINDOW_SECONDS,
+                ban_threshold=settings.RATE_LIMIT_BAN_THRESHOLD,
+                ban_ttl=settings.RATE_LIMIT_BAN_TTL_SECONDS,
+                force_violation=True,
+            )
+            if result.banned_now:
+                self._record_ban(client_ip, user_id)
         except Exception as e:
             logger.error("Rate limit violation registration error: %s", e)
 
+    def _record_ban(self, client_ip: str, user_id: str | None) -> None:
+        logger.warning(
+            "Rate limit autoban applied: ip=%s user_id=%s",
+            client_ip,
+            user_id,
+        )
+        scope = "ip_and_user" if user_id is not None else "ip"
+        try:
+            RATE_LIMIT_BANS_TOTAL.labels(scope=scope).inc()
+        except Exception:
+            logger.exception("Failed to increment rate limit ban metric")
+
     async def check_rate_limit(self, request: Request) -> Tuple[bool, str]:
         """
         Check rate limit
@@ -219,42 +180,44 @@ class RateLimiter:
             return True, "OK"
 
         if self.redis_client is not None:
-            # Check active ban first
-            banned, ban_message = await self._check_ban(client_ip, user_id)
-            if banned:
-                return False, ban_message or "Too many requests"
-
-            try:
-                minute_key_ip = f"rate:ip:{client_ip}:minute"
-                hour_key_ip = f"rate:ip:{client_ip}:hour"
-
-                minute_count_ip = await self.redis_client.incr(minute_key_ip)
-                if minute_count_ip == 1:
-                    await self.redis_client.expire(minute_key_ip, 60)
-
-                hour_count_ip = await self.redis_client.incr(hour_key_ip)
-                if hour_count_ip == 1:
-                    await self.redis_client.expire(hour_key_ip, 3600)
-
-                minute_count = minute_count_ip
-                hour_count = hour_count_ip
-
-                if user_id is not None:
-                    minute_key_user = f"rate:user:{user_id}:minute"
-                    hour_key_user = f"rate:user:{user_id}:hour"
+            ban_enabled = bool(settings.RATE_LIMIT_BAN_ENABLED)
+            identities = [("ip", client_ip)]
+            if user_id is not None:
+                identities.append(("user", user_id))
 
-                    minute_count_user = await self.redis_client.incr(minute_key_user)
-                    if minute_count_user == 1:
-                        await self.redis_client.expire(minute_key_user, 60)
+            counters: list[RateLimitCounter] = []
+            for label, value in identities:
+                counters.append(RateLimitCounter(f"rate:{label}:{value}:minute", 60, self.requests_per_minute))
+                counters.append(RateLimitCounter(f"rate:{label}:{value}:hour", 3600, self.requests_per_hour))
 
-                    hour_count_user = await self.redis_client.incr(hour_key_user)
-                    if hour_count_user == 1:
-                        await self.redis_client.expire(hour_key_user, 3600)
+            try:
+                # Ban check, counters and autoban in one atomic round trip
+                result = await run_rate_limit_script(
+                    self.redis_client,
+                    counters,
+                    ban_keys=[f"rate:ban:{label}:{value}" for label, value in identities] if ban_enabled else (),
+                    violation_keys=[f"rate:viol:{label}:{value}" for label, value in identities] if ban_enabled else (),
+                    violation_window=settings.RATE_LIMIT_BAN_WINDOW_SECONDS,
+                    ban_threshold=settings.RATE_LIMIT_BAN_THRESHOLD,
+                    ban_ttl=settings.RATE_LIMIT_BAN_TTL_SECONDS,
+                )
+            except Exception as e:
+                logger.error(f"Redis rate limit error: {e}")
+                self.redis_client = None
+            else:
+                if result.banned:
+                    logger.warning(
+                        "Rate limit ban active for ip=%s user_id=%s ttl=%s",
+                        client_ip,
+                        user_id,
+                        result.ban_ttl,
+                    )
+                    return False, "Too many requests, access temporarily blocked"
 
-                    minute_count = max(minute_count_ip, minute_count_user)
-                    hour_count = max(hour_count_ip, hour_count_user)
+                minute_count = max(result.counts[0::2])
+                hour_count = max(result.counts[1::2])
 
-                if minute_count > self.requests_per_minute or hour_count > self.requests_per_hour:
+                if result.exceeded is not None:
                     limit_type = (
                         "minute" if minute_count > self.requests_per_minute else "hour"
                     )
@@ -266,7 +229,8 @@ class RateLimiter:
                         hour_count,
                         limit_type,
                     )
-                    await self._register_violation_and_maybe_ban(client_ip, user_id)
+                    if result.banned_now:
+                        self._record_ban(client_ip, user_id)
 
                     if minute_count > self.requests_per_minute:
                         return (
@@ -282,33 +246,10 @@ class RateLimiter:
                     )
 
                 return True, "OK"
-            except Exception as e:
-                logger.error(f"Redis rate limit error: {e}")
-                self.redis_client = None
-
-        # Clean old requests
-        self.minute_requests[client_ip] = (
-            self._clean_old_requests(
-                self.minute_requests[client_ip],
-                60  # 1 minute
-            )
-        )
-        self.hour_requests[client_ip] = (
-            self._clean_old_requests(
-                self.hour_requests[client_ip],
-                3600  # 1 hour
-            )
-        )
 
         # Count requests
-        minute_count = sum(
-            count
-            for _, count in self.minute_requests[client_ip]
-        )
-        hour_count = sum(
-            count
-            for _, count in self.hour_requests[client_ip]
-        )
+        minute_count = self.minute_requests.count(client_ip, current_time)
+        hour_count = self.hour_requests.count(client_ip, current_time)
 
         # Check limits
         if minute_count >= self.requests_per_minute or hour_count >= self.requests_per_hour:
@@ -338,8 +279,8 @@ class RateLimiter:
             )
 
         # Add current request
-        self.minute_requests[client_ip].append((current_time, 1))
-        self.hour_requests[client_ip].append((current_time, 1))
+        self.minute_requests.add(client_ip, current_time)
+        self.hour_requests.add(client_ip, current_time)
 
         return True, "OK"
 
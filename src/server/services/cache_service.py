@@ -1,15 +1,21 @@
 """
 Cache Service
-Redis caching service
+Two-tier cache: per-process L1 LRU in front of Redis (L2)
 """
+import asyncio
 import json
 import logging
+import math
 import os
+import random
 import time
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
 
 from prometheus_client import Counter, Histogram
 
+from ..config.settings import settings
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -21,6 +27,10 @@ except ImportError:
     logger.warning("Redis not available, caching disabled")
 
 
+# A background refresh found another process holding the key's lock
+_REFRESH_SKIPPED = object()
+
+
 CACHE_HITS_TOTAL = Counter(
     "redis_cache_hits_total",
     "Total Redis cache hits",
@@ -42,12 +52,102 @@ REDIS_OPERATION_DURATION_SECONDS = Histogram(
 )
 
 
+CACHE_TIER_HITS_TOTAL = Counter(
+    "cache_tier_hits_total",
+    "Cache hits by tier (l1 = in-process, l2 = Redis)",
+    ["cache", "tier"],
+)
+
+
+CACHE_TIER_MISSES_TOTAL = Counter(
+    "cache_tier_misses_total",
+    "Cache misses by tier (l1 = in-process, l2 = Redis)",
+    ["cache", "tier"],
+)
+
+
+CACHE_REFRESHES_TOTAL = Counter(
+    "cache_refreshes_total",
+    "Cache value recomputations by reason (miss, early, stale)",
+    ["cache", "reason"],
+)
+
+
+def _cache_label(key: str) -> str:
+    if key.startswith("player:analysis:"):
+        return "player_analysis"
+    if key.startswith("player:stats:"):
+        return "player_stats"
+    return "generic"
+
+
+def _record_tier(key: str, tier: str, hit: bool) -> None:
+    try:
+        counter = CACHE_TIER_HITS_TOTAL if hit else CACHE_TIER_MISSES_TOTAL
+        counter.labels(cache=_cache_label(key), tier=tier).inc()
+    except Exception:
+        # Metrics must not affect cache behavior
+        pass
+
+
+class LocalLRUCache:
+    """Bounded in-process LRU with per-entry expiry (L1 tier).
+
+    Entries are JSON-serialized on write, so callers never share mutable
+    objects with the cache.
+    """
+
+    def __init__(self, max_items: int, max_ttl: int) -> None:
+        self.max_items = max_items
+        self.max_ttl = max_ttl
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return raw
+
+    def set(self, key: str, raw: str, ttl: int) -> None:
+        if self.max_items <= 0:
+            return
+        # L1 is not invalidated across processes, so keep it short-lived
+        ttl = min(ttl, self.max_ttl) if self.max_ttl > 0 else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, raw)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
 class CacheService:
     """Caching service"""
 
     def __init__(self):
         self.redis_client: Any | None = None
         self.enabled = False
+        self.local = LocalLRUCache(
+            max_items=settings.CACHE_L1_MAX_ITEMS,
+            max_ttl=settings.CACHE_L1_TTL_SECONDS,
+        )
+        # Keys currently being recomputed by this process
+        self._refreshing: Dict[str, "asyncio.Future[Any]"] = {}
+        self._background: Set["asyncio.Task[Any]"] = set()
 
         if REDIS_AVAILABLE:
             redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -64,7 +164,13 @@ class CacheService:
                 self.enabled = False
 
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
+        """Get value from cache (L1 first, then Redis)"""
+        raw = self.local.get(key)
+        if raw is not None:
+            _record_tier(key, "l1", True)
+            return json.loads(raw)
+        _record_tier(key, "l1", False)
+
         if not self.enabled or self.redis_client is None:
             return None
 
@@ -77,11 +183,7 @@ class CacheService:
             except Exception:
                 # Metrics must not affect cache behavior
                 pass
-            cache_label = "generic"
-            if key.startswith("player:analysis:"):
-                cache_label = "player_analysis"
-            elif key.startswith("player:stats:"):
-                cache_label = "player_stats"
+            cache_label = _cache_label(key)
 
             if value is not None:
                 try:
@@ -89,12 +191,15 @@ class CacheService:
                 except Exception:
                     # Metrics must not affect cache behavior
                     pass
+                _record_tier(key, "l2", True)
+                self._fill_local(key, value)
                 return json.loads(value)
 
             try:
                 CACHE_MISSES_TOTAL.labels(cache=cache_label).inc()
             except Exception:
                 pass
+            _record_tier(key, "l2", False)
             return None
         except Exception as e:
             logger.error(f"Cache get error: {e}")
@@ -106,12 +211,18 @@ class CacheService:
         value: Any,
         ttl: int = 3600  # 1 hour by default
     ) -> bool:
-        """Save value to cache"""
+        """Save value to cache (both tiers); returns whether Redis accepted it"""
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Cache set error: {e}")
+            return False
+        self.local.set(key, serialized, ttl)
+
         if not self.enabled or self.redis_client is None:
             return False
 
         try:
-            serialized = json.dumps(value)
             start = time.perf_counter()
             await self.redis_client.setex(key, ttl, serialized)
             duration = time.perf_counter() - start
@@ -127,6 +238,7 @@ class CacheService:
 
     async def delete(self, key: str) -> bool:
         """Delete value from cache"""
+        self.local.delete(key)
         if not self.enabled or self.redis_client is None:
             return False
 
@@ -163,10 +275,183 @@ class CacheService:
             logger.error(f"Cache exists error: {e}")
             return False
 
-    def get_player_cache_key(self, nickname: str) -> str:
+    def _fill_local(self, key: str, raw: str) -> None:
+        """Copy a Redis hit into L1, bounded by the key's remaining Redis TTL."""
+        ttl = self.local.max_ttl
+        try:
+            envelope = json.loads(raw)
+            if isinstance(envelope, dict) and "__exp" in envelope:
+                ttl = min(ttl, int(envelope["__exp"] + envelope.get("__stale", 0) - time.time()))
+        except Exception:
+            pass
+        self.local.set(key, raw, ttl)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 3600,
+        stale_ttl: int = 0,
+        beta: float = 1.0,
+        lock_timeout: float = 10.0,
+    ) -> Any:
+        """Return a cached value or compute it with ``loader``.
+
+        Hot keys are protected from stampedes in three ways:
+
+        * probabilistic early refresh (XFetch): shortly before expiry a single
+          request recomputes the value in the background;
+        * stale-while-revalidate: for ``stale_ttl`` seconds after expiry the old
+          value is served while one background task refreshes it;
+        * on a real miss only one caller per process recomputes, and across
+          processes a short Redis lock makes the others wait for its result.
+
+        ``None`` from the loader is returned but not cached. Values are stored
+        in an envelope, so keys used here should not be read with ``get()``.
+        """
+        envelope = await self.get(key)
+        now = time.time()
+        if isinstance(envelope, dict) and "__exp" in envelope:
+            expires_at = float(envelope["__exp"])
+            delta = float(envelope.get("__delta", 0.0))
+            if now < expires_at:
+                # XFetch: refresh early with probability growing towards expiry
+                if delta > 0 and now - delta * beta * math.log(random.random() or 1e-12) >= expires_at:
+                    self._refresh_in_background(key, loader, ttl, stale_ttl, "early")
+                return envelope.get("v")
+            if now < expires_at + stale_ttl:
+                self._refresh_in_background(key, loader, ttl, stale_ttl, "stale")
+                return envelope.get("v")
+
+        return await self._recompute(key, loader, ttl, stale_ttl, "miss", lock_timeout)
+
+    async def _recompute(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        reason: str,
+        lock_timeout: float = 10.0,
+    ) -> Any:
+        pending = self._refreshing.get(key)
+        if pending is not None:
+            value = await asyncio.shield(pending)
+            if value is _REFRESH_SKIPPED and reason == "miss":
+                # Nothing was computed here: wait for the other process ourselves
+                return await self._recompute(key, loader, ttl, stale_ttl, reason, lock_timeout)
+            return value
+
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._refreshing[key] = future
+        try:
+            value = await self._recompute_locked(key, loader, ttl, stale_ttl, reason, lock_timeout)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark retrieved: waiters re-raise it, a lone caller raises it below
+            future.exception()
+            raise
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def _recompute_locked(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        reason: str,
+        lock_timeout: float,
+    ) -> Any:
+        lock_key = f"lock:{key}"
+        token = f"{os.getpid()}:{id(self)}:{time.monotonic()}"
+        locked = False
+        if self.enabled and self.redis_client is not None:
+            try:
+                locked = bool(
+                    await self.redis_client.set(lock_key, token, nx=True, px=int(lock_timeout * 1000))
+                )
+            except Exception:
+                # No Redis lock available: just compute
+                locked = True
+            if not locked and reason != "miss":
+                # Another process already refreshes this key in the background
+                return _REFRESH_SKIPPED
+            if not locked:
+                # Another process is computing: wait for its value
+                deadline = time.monotonic() + lock_timeout
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                    envelope = await self._get_l2(key)
+                    if isinstance(envelope, dict) and "__exp" in envelope:
+                        return envelope.get("v")
+
+        try:
+            try:
+                CACHE_REFRESHES_TOTAL.labels(cache=_cache_label(key), reason=reason).inc()
+            except Exception:
+                pass
+            started = time.time()
+            value = await loader()
+            if value is not None:
+                envelope = {
+                    "v": value,
+                    "__exp": time.time() + ttl,
+                    "__delta": time.time() - started,
+                    "__stale": stale_ttl,
+                }
+                await self.set(key, envelope, ttl=ttl + stale_ttl)
+            return value
+        finally:
+            if locked and self.enabled and self.redis_client is not None:
+                try:
+                    if await self.redis_client.get(lock_key) == token:
+                        await self.redis_client.delete(lock_key)
+                except Exception:
+                    pass
+
+    async def _get_l2(self, key: str) -> Optional[Any]:
+        try:
+            value = await self.redis_client.get(key)  # type: ignore[union-attr]
+        except Exception:
+            return None
+        if value is None:
+            return None
+        self._fill_local(key, value)
+        return json.loads(value)
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int,
+        reason: str,
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def _run() -> None:
+            try:
+                await self._recompute(key, loader, ttl, stale_ttl, reason)
+            except Exception:
+                logger.warning(f"Background cache refresh failed for {key}", exc_info=True)
+
+        task = asyncio.ensure_future(_run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def clear_local(self) -> None:
+        """Drop all L1 entries of this process."""
+        self.local.clear()
+
+    def get_player_cache_key(self, nickname: str, language: Optional[str] = None) -> str:
         """Get cache key for player"""
         # Versioned key to avoid using stale cached analysis when logic changes
-        return f"player:analysis:v2:{nickname.lower()}"
+        key = f"player:analysis:v2:{nickname.lower()}"
+        return f"{key}:{language}" if language else key
 
     def get_stats_cache_key(self, nickname: str) -> str:
         """Get cache key for stats"""
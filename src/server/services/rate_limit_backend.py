@@ -0,0 +1,226 @@
+"""Atomic Redis rate limiting and its in-process fallback.
+
+All checks for one request (active bans, window counters, violation counters
+and autoban) run in a single Lua script, i.e. one Redis round trip that
+cannot interleave with concurrent requests.
+"""
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+
+try:
+    from redis.exceptions import NoScriptError
+except ImportError:  # pragma: no cover - optional dependency
+    NoScriptError = None  # type: ignore[assignment,misc]
+
+
+# KEYS: ban keys, then counter keys, then violation keys
+# ARGV: n_ban, n_counters, stop_on_exceed, violation_window, ban_threshold,
+#       ban_ttl, force_violation, then one (window, limit) pair per counter key
+# Returns: {banned, ban_ttl, exceeded_index, banned_now, count_1, ..., count_n}
+RATE_LIMIT_LUA = """
+local n_ban = tonumber(ARGV[1])
+local n_counters = tonumber(ARGV[2])
+local stop_on_exceed = tonumber(ARGV[3]) == 1
+local violation_window = tonumber(ARGV[4])
+local ban_threshold = tonumber(ARGV[5])
+local ban_ttl = tonumber(ARGV[6])
+local force_violation = tonumber(ARGV[7]) == 1
+
+if not force_violation then
+    for i = 1, n_ban do
+        local ttl = redis.call('TTL', KEYS[i])
+        if ttl ~= -2 then
+            return {1, ttl, 0, 0}
+        end
+    end
+end
+
+local result = {0, 0, 0, 0}
+local exceeded = 0
+for i = 1, n_counters do
+    local key = KEYS[n_ban + i]
+    local window = tonumber(ARGV[6 + i * 2])
+    local limit = tonumber(ARGV[7 + i * 2])
+    local count = redis.call('INCR', key)
+    if count == 1 then
+        redis.call('EXPIRE', key, window)
+    end
+    result[4 + i] = count
+    if limit > 0 and count > limit and exceeded == 0 then
+        exceeded = i
+        if stop_on_exceed then
+            break
+        end
+    end
+end
+result[3] = exceeded
+
+if (exceeded > 0 or force_violation) and ban_threshold > 0 then
+    local worst = 0
+    for i = n_ban + n_counters + 1, #KEYS do
+        local violations = redis.call('INCR', KEYS[i])
+        if violations == 1 then
+            redis.call('EXPIRE', KEYS[i], violation_window)
+        end
+        if violations > worst then
+            worst = violations
+        end
+    end
+    if worst >= ban_threshold then
+        for i = 1, n_ban do
+            redis.call('SET', KEYS[i], '1', 'EX', ban_ttl)
+        end
+        result[4] = 1
+    end
+end
+
+return result
+"""
+
+RATE_LIMIT_LUA_SHA = hashlib.sha1(RATE_LIMIT_LUA.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RateLimitCounter:
+    key: str
+    window: int
+    limit: int
+
+
+@dataclass
+class RateLimitResult:
+    banned: bool = False
+    ban_ttl: int = 0
+    # Index into the counters list of the first exceeded limit, or None
+    exceeded: Optional[int] = None
+    banned_now: bool = False
+    counts: List[int] = field(default_factory=list)
+
+
+async def run_rate_limit_script(
+    redis_client: Any,
+    counters: Sequence[RateLimitCounter],
+    ban_keys: Sequence[str] = (),
+    violation_keys: Sequence[str] = (),
+    violation_window: int = 0,
+    ban_threshold: int = 0,
+    ban_ttl: int = 0,
+    stop_on_exceed: bool = False,
+    force_violation: bool = False,
+) -> RateLimitResult:
+    """Run the rate limit script (EVALSHA, falling back to EVAL once on NOSCRIPT).
+
+    ``force_violation`` records a violation (and possibly a ban) without any
+    counters, e.g. for failed logins.
+    """
+    keys = [*ban_keys, *(c.key for c in counters), *violation_keys]
+    args: List[Any] = [
+        len(ban_keys),
+        len(counters),
+        1 if stop_on_exceed else 0,
+        violation_window,
+        ban_threshold if violation_keys else 0,
+        ban_ttl,
+        1 if force_violation else 0,
+    ]
+    for counter in counters:
+        args.extend((counter.window, counter.limit))
+
+    try:
+        raw = await redis_client.evalsha(RATE_LIMIT_LUA_SHA, len(keys), *keys, *args)
+    except Exception as exc:
+        # Script cache is empty after a Redis restart/failover: load it with EVAL
+        is_noscript = NoScriptError is not None and isinstance(exc, NoScriptError)
+        if not is_noscript and "NOSCRIPT" not in str(exc):
+            raise
+        raw = await redis_client.eval(RATE_LIMIT_LUA, len(keys), *keys, *args)
+
+    values = [int(v) for v in raw]
+    if values[0] == 1:
+        return RateLimitResult(banned=True, ban_ttl=values[1])
+
+    counts = values[4:]
+    # Counters after an early stop were not incremented
+    counts.extend([0] * (len(counters) - len(counts)))
+    return RateLimitResult(
+        exceeded=values[2] - 1 if values[2] > 0 else None,
+        banned_now=values[3] == 1,
+        counts=counts,
+    )
+
+
+class _Ring:
+    __slots__ = ("counts", "epoch", "total")
+
+    def __init__(self, buckets: int, epoch: int) -> None:
+        self.counts = array("I", bytes(4 * buckets))
+        self.epoch = epoch
+        self.total = 0
+
+
+class BucketedWindowCounter:
+    """Fixed-memory in-process sliding window, used when Redis is unavailable.
+
+    Each key keeps ``buckets`` counters in a ring buffer covering ``window``
+    seconds, so counting and recording a hit cost O(buckets) at worst and
+    O(1) in the steady state. At most ``max_keys`` keys are tracked; the least
+    recently used key is evicted first. The window is approximated to bucket
+    granularity (``window / buckets`` seconds).
+    """
+
+    def __init__(self, window: int, buckets: int = 12, max_keys: int = 100_000) -> None:
+        self.window = window
+        self.buckets = max(1, buckets)
+        self.bucket_seconds = window / self.buckets
+        self.max_keys = max(1, max_keys)
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def _epoch(self, now: Optional[float]) -> int:
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def _advance(self, ring: _Ring, epoch: int) -> None:
+        elapsed = epoch - ring.epoch
+        if elapsed <= 0:
+            return
+        if elapsed >= self.buckets:
+            ring.counts = array("I", bytes(4 * self.buckets))
+            ring.total = 0
+        else:
+            # Zero the buckets that slid out of the window
+            for step in range(1, elapsed + 1):
+                idx = (ring.epoch + step) % self.buckets
+                ring.total -= ring.counts[idx]
+                ring.counts[idx] = 0
+        ring.epoch = epoch
+
+    def count(self, key: str, now: Optional[float] = None) -> int:
+        ring = self._rings.get(key)
+        if ring is None:
+            return 0
+        self._advance(ring, self._epoch(now))
+        self._rings.move_to_end(key)
+        return ring.total
+
+    def add(self, key: str, now: Optional[float] = None) -> None:
+        epoch = self._epoch(now)
+        ring = self._rings.get(key)
+        if ring is None:
+            if len(self._rings) >= self.max_keys:
+                self._rings.popitem(last=False)
+            ring = _Ring(self.buckets, epoch)
+            self._rings[key] = ring
+        else:
+            self._advance(ring, epoch)
+            self._rings.move_to_end(key)
+        ring.counts[epoch % self.buckets] += 1
+        ring.total += 1
+
+    def clear(self) -> None:
+        self._rings.clear()
@@ -1,4 +1,5 @@
 import logging
+import time
 from datetime import datetime
 from typing import Dict, Optional
 
@@ -6,6 +7,7 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 from .cache_service import cache_service
+from .rate_limit_backend import BucketedWindowCounter, RateLimitCounter, run_rate_limit_script
 from ..config.settings import settings
 from ..database.models import Subscription, SubscriptionTier
 from ..metrics_business import RATE_LIMIT_EXCEEDED
@@ -17,9 +19,9 @@ logger = logging.getLogger(__name__)
 class RateLimitService:
     """Per-user operation rate limiting based on subscription tier.
 
-    Uses Redis (via cache_service) to store counters per user and operation.
-    Fallback: if Redis is not available, limits are not enforced here
-    (only global IP/user limits in middleware remain).
+    Uses Redis (via cache_service) to store counters per user and operation,
+    updated atomically by a Lua script. Fallback: if Redis is not available,
+    limits are enforced per process with an in-memory sliding window.
     """
 
     def __init__(self) -> None:
@@ -28,6 +30,8 @@ class RateLimitService:
             if getattr(cache_service, "enabled", False)
             else None
         )
+        # In-process fallback counters, one per window length
+        self.local_windows: Dict[int, BucketedWindowCounter] = {}
 
         # Per-operation limits per subscription tier.
         # Values are chosen to be sufficient for users and safe for the server.
@@ -68,9 +72,6 @@ class RateLimitService:
         if bypass_user_id is not None and str(user_id) == str(bypass_user_id):
             return
 
-        if self.redis_client is None:
-            return
-
         op_limits = self.operation_limits.get(operation)
         if not op_limits:
             return
@@ -81,67 +82,94 @@ class RateLimitService:
             return
 
         now = datetime.utcnow()
-
-        # Per-minute limit
         per_min = limits.get("per_min") or 0
-        if per_min > 0:
-            minute_key = f"rl:op:{operation}:user:{user_id}:minute"
-            try:
-                minute_count = await self.redis_client.incr(minute_key)
-                if minute_count == 1:
-                    await self.redis_client.expire(minute_key, 60)
-                if minute_count > per_min:
-                    try:
-                        RATE_LIMIT_EXCEEDED.labels(
-                            operation=operation,
-                            tier=tier_key,
-                            window="minute",
-                        ).inc()
-                    except Exception:
-                        # Metrics must not affect rate limiting behavior
-                        pass
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail=(
-                            "Превышен лимит запросов для этой операции. "
-                            "Попробуйте позже."
-                        ),
-                    )
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.error("Rate limit (minute) error: %s", e)
-
-        # Per-day limit
         per_day = limits.get("per_day") or 0
+
+        windows: list[tuple[str, RateLimitCounter]] = []
+        if per_min > 0:
+            windows.append(
+                ("minute", RateLimitCounter(f"rl:op:{operation}:user:{user_id}:minute", 60, per_min))
+            )
         if per_day > 0:
             day_suffix = now.strftime("%Y%m%d")
-            day_key = f"rl:op:{operation}:user:{user_id}:day:{day_suffix}"
+            windows.append(
+                (
+                    "day",
+                    RateLimitCounter(
+                        f"rl:op:{operation}:user:{user_id}:day:{day_suffix}", 86400, per_day
+                    ),
+                )
+            )
+        if not windows:
+            return
+
+        exceeded: Optional[str] = None
+        if self.redis_client is not None:
             try:
-                day_count = await self.redis_client.incr(day_key)
-                if day_count == 1:
-                    await self.redis_client.expire(day_key, 86400)
-                if day_count > per_day:
-                    try:
-                        RATE_LIMIT_EXCEEDED.labels(
-                            operation=operation,
-                            tier=tier_key,
-                            window="day",
-                        ).inc()
-                    except Exception:
-                        # Metrics must not affect rate limiting behavior
-                        pass
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail=(
-                            "Достигнут дневной лимит для этой операции "
-                            "на вашем тарифе. Попробуйте завтра или обновите подписку."
-                        ),
-                    )
-            except HTTPException:
-                raise
+                # Minute and day counters in one atomic round trip; a rejected
+                # request does not consume the daily quota
+                result = await run_rate_limit_script(
+                    self.redis_client,
+                    [counter for _, counter in windows],
+                    stop_on_exceed=True,
+                )
+                if result.exceeded is not None:
+                    exceeded = windows[result.exceeded][0]
             except Exception as e:
-                logger.error("Rate limit (day) error: %s", e)
+                logger.error("Rate limit error, using in-process limits: %s", e)
+                exceeded = self._check_local(windows)
+        else:
+            exceeded = self._check_local(windows)
+
+        if exceeded is None:
+            return
+
+        try:
+            RATE_LIMIT_EXCEEDED.labels(
+                operation=operation,
+                tier=tier_key,
+                window=exceeded,
+            ).inc()
+        except Exception:
+            # Metrics must not affect rate limiting behavior
+            pass
+
+        if exceeded == "minute":
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=(
+                    "Превышен лимит запросов для этой операции. "
+                    "Попробуйте позже."
+                ),
+            )
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=(
+                "Достигнут дневной лимит для этой операции "
+                "на вашем тарифе. Попробуйте завтра или обновите подписку."
+            ),
+        )
+
+    def _check_local(self, windows: list[tuple[str, RateLimitCounter]]) -> Optional[str]:
+        """Per-process sliding window used while Redis is unavailable."""
+        now = time.time()
+        for name, counter in windows:
+            if self._local_counter(counter.window).count(counter.key, now) >= counter.limit:
+                return name
+        for _, counter in windows:
+            self._local_counter(counter.window).add(counter.key, now)
+        return None
+
+    def _local_counter(self, window: int) -> BucketedWindowCounter:
+        counter = self.local_windows.get(window)
+        if counter is None:
+            counter = BucketedWindowCounter(
+                window,
+                buckets=24,
+                max_keys=settings.RATE_LIMIT_LOCAL_MAX_KEYS,
+            )
+            self.local_windows[window] = counter
+        return counter
 
     async def _get_user_tier_key(self, db: Session, user_id: int) -> str:
         """Get user's subscription tier as lower-case key (free/basic/pro/elite)."""
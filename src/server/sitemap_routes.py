@@ -1,13 +1,16 @@
+import asyncio
 import io
 import gzip
 import logging
-import math
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import Response
 from fastapi.routing import APIRoute
+from sqlalchemy import func
 
 from .config.settings import settings
 from .database.connection import SessionLocal
@@ -18,57 +21,222 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 DYNAMIC_CHUNK_SIZE = 50000
-CACHE_TTL = 600
+# Rows fetched per round trip from the server-side cursor
+SCAN_BATCH_SIZE = 5000
+# Re-read rows this far behind the last scan to catch late commits
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+_SITEMAP_HEADER = (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+    "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n"
+)
+
+
+class SitemapStore:
+    """Player analysis URLs split into fixed sitemap chunks.
+
+    A nickname keeps its chunk once assigned and new nicknames fill the last
+    chunk, so a changed demo or profile only invalidates the gzip bytes of
+    one chunk. ``refresh`` reads only rows updated since the previous scan;
+    ``rebuild`` rescans everything (to drop deleted players) and runs on a
+    much longer interval.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any] = SessionLocal,
+        chunk_size: int = DYNAMIC_CHUNK_SIZE,
+        refresh_interval: float = 60.0,
+        rebuild_interval: float = 24 * 3600.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.chunk_size = max(1, chunk_size)
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._scan_lock = threading.Lock()
+        self._chunks: List[Dict[str, str]] = []
+        self._location: Dict[str, int] = {}
+        # Chunk index -> (base URL, gzip bytes); one rendering per chunk
+        self._rendered: Dict[int, Tuple[str, bytes]] = {}
+        self._changes = 0
+        self._scanned_at: Optional[datetime] = None
+        self._refreshed: float = 0.0
+        self._rebuilt: float = 0.0
+
+    def touch(self, nickname: str, lastmod: str) -> None:
+        """Add ``nickname`` or move its lastmod forward."""
+        with self._lock:
+            self._touch(self._chunks, self._location, nickname, lastmod)
+
+    def _touch(
+        self,
+        chunks: List[Dict[str, str]],
+        location: Dict[str, int],
+        nickname: str,
+        lastmod: str,
+    ) -> None:
+        idx = location.get(nickname)
+        if idx is None:
+            if not chunks or len(chunks[-1]) >= self.chunk_size:
+                chunks.append({})
+            idx = len(chunks) - 1
+            location[nickname] = idx
+        elif chunks[idx][nickname] >= lastmod:
+            return
+        chunks[idx][nickname] = lastmod
+        if chunks is self._chunks:
+            self._rendered.pop(idx, None)
+            self._changes += 1
+
+    def _scan(self, since: Optional[datetime]) -> Iterator[Tuple[str, str]]:
+        session = self.session_factory()
+        try:
+            for model in (ProDemo, TeammateProfile):
+                stamp = func.coalesce(model.updated_at, model.created_at)
+                query = session.query(model.faceit_nickname, stamp).filter(
+                    model.faceit_nickname.isnot(None),
+                    model.faceit_nickname != "",
+                )
+                if since is not None:
+                    query = query.filter(stamp >= since)
+                for nickname, ts in query.yield_per(SCAN_BATCH_SIZE):
+                    yield nickname, (ts or datetime.utcnow()).strftime("%Y-%m-%d")
+        finally:
+            session.close()
+
+    def rebuild(self) -> None:
+        """Rescan all demos and profiles and replace every chunk."""
+        started = datetime.utcnow()
+        chunks: List[Dict[str, str]] = []
+        location: Dict[str, int] = {}
+        for nickname, lastmod in self._scan(None):
+            self._touch(chunks, location, nickname, lastmod)
+        with self._lock:
+            self._chunks = chunks
+            self._location = location
+            self._rendered = {}
+            self._changes += 1
+            self._scanned_at = started
+            self._rebuilt = self._refreshed = time.monotonic()
+
+    def refresh(self) -> None:
+        """Apply rows changed since the previous scan."""
+        if self._scanned_at is None:
+            self.rebuild()
+            return
+        started = datetime.utcnow()
+        for nickname, lastmod in self._scan(self._scanned_at - REFRESH_OVERLAP):
+            self.touch(nickname, lastmod)
+        with self._lock:
+            self._scanned_at = started
+            self._refreshed = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        # One scan at a time; callers that waited see the fresh state
+        with self._scan_lock:
+            now = time.monotonic()
+            if self._scanned_at is None or now - self._rebuilt >= self.rebuild_interval:
+                self.rebuild()
+            elif now - self._refreshed >= self.refresh_interval:
+                self.refresh()
+
+    def chunk_lastmods(self) -> List[str]:
+        """Newest lastmod of every chunk, in chunk order."""
+        with self._lock:
+            return [max(chunk.values()) for chunk in self._chunks]
+
+    def chunk_gzip(self, chunk: int, base_url: str) -> Optional[bytes]:
+        """Gzipped sitemap for 1-based ``chunk``, rendered once per change.
+
+        Only one rendering is kept per chunk: asking for another
+        ``base_url`` replaces it, so request hosts cannot grow the cache.
+        """
+        with self._lock:
+            if chunk < 1 or chunk > len(self._chunks):
+                return None
+            cached = self._rendered.get(chunk - 1)
+            if cached is not None and cached[0] == base_url:
+                return cached[1]
+            entries = list(self._chunks[chunk - 1].items())
+            changes = self._changes
+        data = _gzip_sitemap(
+            base_url,
+            ({"url": f"/players/{nickname}/analysis", "lastmod": lastmod} for nickname, lastmod in entries),
+        )
+        with self._lock:
+            # Dropped if the sitemap changed while rendering
+            if self._changes == changes:
+                self._rendered[chunk - 1] = (base_url, data)
+        return data
 
 
-class SimpleCache:
-    def __init__(self, ttl_seconds: int = CACHE_TTL) -> None:
-        self.ttl = ttl_seconds
-        self.data: dict[str, str] = {}
-        self.expiry: float = 0.0
+_sitemap_store: Optional[SitemapStore] = None
+_sitemap_store_lock = threading.Lock()
 
-    def get(self, key: str) -> str | None:
-        if time.time() < self.expiry:
-            return self.data.get(key)
-        return None
 
-    def set(self, key: str, value: str) -> None:
-        self.data[key] = value
-        self.expiry = time.time() + self.ttl
+def get_sitemap_store() -> SitemapStore:
+    """Return the process-wide sitemap store (created on first use)."""
+    global _sitemap_store
+    with _sitemap_store_lock:
+        if _sitemap_store is None:
+            _sitemap_store = SitemapStore(
+                refresh_interval=float(settings.SITEMAP_REFRESH_SECONDS),
+                rebuild_interval=float(settings.SITEMAP_REBUILD_SECONDS),
+            )
+        return _sitemap_store
 
 
-sitemap_cache = SimpleCache()
+async def _fresh_sitemap_store() -> SitemapStore:
+    store = get_sitemap_store()
+    try:
+        await asyncio.to_thread(store.ensure_fresh)
+    except Exception:
+        # Serve the last good state
+        logger.exception("Failed to refresh dynamic sitemap")
+    return store
 
 
 def _get_base_url(request: Request) -> str:
+    if settings.SITEMAP_BASE_URL:
+        return settings.SITEMAP_BASE_URL.rstrip("/")
     host = request.url.hostname or "localhost"
     return f"https://{host}"
 
 
+def _url_xml(base_url: str, item: dict, today: str) -> str:
+    path = item.get("url") or "/"
+    lastmod = item.get("lastmod") or today
+    priority = item.get("priority") or 0.8
+    changefreq = item.get("changefreq") or "weekly"
+    return (
+        "  <url>\n"
+        f"    <loc>{base_url}{path}</loc>\n"
+        f"    <lastmod>{lastmod}</lastmod>\n"
+        f"    <priority>{priority}</priority>\n"
+        f"    <changefreq>{changefreq}</changefreq>\n"
+        "  </url>"
+    )
+
+
 def _generate_sitemap_xml(base_url: str, urls: list[dict]) -> str:
-    items: list[str] = []
     today = datetime.utcnow().strftime("%Y-%m-%d")
-    for item in urls:
-        path = item.get("url") or "/"
-        lastmod = item.get("lastmod") or today
-        priority = item.get("priority") or 0.8
-        changefreq = item.get("changefreq") or "weekly"
-        items.append(
-            "  <url>\n"
-            f"    <loc>{base_url}{path}</loc>\n"
-            f"    <lastmod>{lastmod}</lastmod>\n"
-            f"    <priority>{priority}</priority>\n"
-            f"    <changefreq>{changefreq}</changefreq>\n"
-            "  </url>"
-        )
+    body = "\n".join(_url_xml(base_url, item, today) for item in urls)
+    return f"{_SITEMAP_HEADER}{body}\n</urlset>"
 
-    body = "\n".join(items)
-    return (
-        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
-        "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n"
-        f"{body}\n"
-        "</urlset>"
-    )
+
+def _gzip_sitemap(base_url: str, urls: Iterator[dict]) -> bytes:
+    """Like ``_gzip_bytes(_generate_sitemap_xml(...))`` without the full XML string."""
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(_SITEMAP_HEADER.encode("utf-8"))
+        separator = b""
+        for item in urls:
+            f.write(separator + _url_xml(base_url, item, today).encode("utf-8"))
+            separator = b"\n"
+        f.write(b"\n</urlset>")
+    return buf.getvalue()
 
 
 def _gzip_bytes(content: str) -> bytes:
@@ -95,72 +263,9 @@ def _get_static_routes(request: Request) -> list[dict]:
     return urls
 
 
-async def _get_dynamic_routes() -> list[dict]:
-    session = SessionLocal()
-    try:
-        routes: list[dict] = []
-        seen: set[str] = set()
-
-        demos = (
-            session.query(ProDemo)
-            .order_by(ProDemo.updated_at.desc())
-            .limit(200000)
-            .all()
-        )
-        for demo in demos:
-            raw_nickname = getattr(demo, "faceit_nickname", None)
-            if (
-                not isinstance(raw_nickname, str)
-                or not raw_nickname
-                or raw_nickname in seen
-            ):
-                continue
-            nickname = raw_nickname
-            seen.add(nickname)
-            ts = demo.updated_at or demo.created_at or datetime.utcnow()
-            routes.append(
-                {
-                    "url": f"/players/{nickname}/analysis",
-                    "lastmod": ts.strftime("%Y-%m-%d"),
-                }
-            )
-
-        profiles = (
-            session.query(TeammateProfile)
-            .order_by(TeammateProfile.updated_at.desc())
-            .limit(200000)
-            .all()
-        )
-        for profile in profiles:
-            raw_nickname = getattr(profile, "faceit_nickname", None)
-            if (
-                not isinstance(raw_nickname, str)
-                or not raw_nickname
-                or raw_nickname in seen
-            ):
-                continue
-            nickname = raw_nickname
-            seen.add(nickname)
-            ts = profile.updated_at or profile.created_at or datetime.utcnow()
-            routes.append(
-                {
-                    "url": f"/players/{nickname}/analysis",
-                    "lastmod": ts.strftime("%Y-%m-%d"),
-                }
-            )
-
-        return routes
-    except Exception:
-        logger.exception("Failed to build dynamic sitemap routes")
-        return []
-    finally:
-        session.close()
-
-
 @router.get("/robots.txt", include_in_schema=False)
 async def robots(request: Request) -> Response:
-    host = request.url.hostname or "localhost"
-    sitemap_url = f"https://{host}/sitemap_index.xml"
+    sitemap_url = f"{_get_base_url(request)}/sitemap_index.xml"
     content = (
         "User-agent: *\n"
         "Disallow: /admin\n"
@@ -174,26 +279,18 @@ async def robots(request: Request) -> Response:
 
 @router.get("/sitemap_index.xml", include_in_schema=False)
 async def sitemap_index(request: Request) -> Response:
-    cached = sitemap_cache.get("index")
-    if cached is not None:
-        return Response(cached, media_type="application/xml")
-
     base_url = _get_base_url(request)
-    dynamic_routes = await _get_dynamic_routes()
-    count = len(dynamic_routes)
-    chunks = 0
-    if count > 0:
-        chunks = math.ceil(count / DYNAMIC_CHUNK_SIZE)
+    store = await _fresh_sitemap_store()
 
     parts: list[str] = []
     today = datetime.utcnow().strftime("%Y-%m-%d")
 
-    for i in range(1, chunks + 1):
+    for i, lastmod in enumerate(store.chunk_lastmods(), start=1):
         loc = f"{base_url}/sitemap_{i}.xml.gz"
         parts.append(
             "  <sitemap>\n"
             f"    <loc>{loc}</loc>\n"
-            f"    <lastmod>{today}</lastmod>\n"
+            f"    <lastmod>{lastmod}</lastmod>\n"
             "  </sitemap>"
         )
 
@@ -214,7 +311,6 @@ async def sitemap_index(request: Request) -> Response:
         f"{body}\n"
         "</sitemapindex>"
     )
-    sitemap_cache.set("index", index_xml)
     return Response(index_xml, media_type="application/xml")
 
 
@@ -235,20 +331,10 @@ async def sitemap_chunk(request: Request, chunk: int) -> Response:
     if chunk < 1:
         raise HTTPException(status_code=404, detail="Not found")
 
-    dynamic_routes = await _get_dynamic_routes()
-    count = len(dynamic_routes)
-    if count == 0:
+    store = await _fresh_sitemap_store()
+    gz = await asyncio.to_thread(store.chunk_gzip, chunk, _get_base_url(request))
+    if gz is None:
         raise HTTPException(status_code=404, detail="Not found")
-
-    max_chunk = math.ceil(count / DYNAMIC_CHUNK_SIZE)
-    if chunk > max_chunk:
-        raise HTTPException(status_code=404, detail="Not found")
-
-    start = (chunk - 1) * DYNAMIC_CHUNK_SIZE
-    end = min(start + DYNAMIC_CHUNK_SIZE, count)
-    base_url = _get_base_url(request)
-    xml = _generate_sitemap_xml(base_url, dynamic_routes[start:end])
-    gz = _gzip_bytes(xml)
     return Response(gz, media_type="application/gzip")
 
 
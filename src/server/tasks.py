@@ -1,28 +1,72 @@
 """Background tasks"""
 import logging
-import asyncio
 import os
 from typing import Dict, Any
 
 from celery import Task
+from celery.signals import worker_process_init, worker_process_shutdown
 from fastapi import UploadFile
 
+from .ai.sample_store import close_sample_store
 from .celery_app import celery_app
-from .features.demo_analyzer.service import DemoAnalyzer
+from .core.task_events import task_event_publisher
+from .core.task_results import get_task_result_store
+from .core.worker_runtime import get_worker_runtime
+from .features.demo_analyzer.parse_executor import get_parse_executor
 
 logger = logging.getLogger(__name__)
 
 
+@worker_process_init.connect
+def _start_worker_runtime(**_kwargs: Any) -> None:
+    # Event loop and DemoAnalyzer are created once per worker process
+    runtime = get_worker_runtime()
+    runtime.start()
+    try:
+        runtime.analyzer()
+    except Exception:
+        # Retried lazily by the first task that needs it
+        logger.exception("Failed to warm up DemoAnalyzer in worker")
+
+
+@worker_process_shutdown.connect
+def _flush_ai_samples(**_kwargs: Any) -> None:
+    # Prefork children may exit without running atexit hooks
+    close_sample_store()
+
+
+@worker_process_shutdown.connect
+def _stop_worker_runtime(**_kwargs: Any) -> None:
+    get_worker_runtime().stop()
+    # Don't leave demo parser processes behind the worker
+    get_parse_executor().shutdown(wait=False)
+
+
 class CallbackTask(Task):
-    """Base task with callbacks"""
+    """Base task with callbacks.
+
+    State changes are published to Redis (``core.task_events``) so API
+    clients waiting on a task are woken up instead of polling the result
+    backend. Celery stores the result before calling these hooks.
+    """
+
+    def before_start(self, task_id, args, kwargs):
+        """Start callback"""
+        task_event_publisher.publish(task_id, "STARTED")
+
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        """Retry callback"""
+        task_event_publisher.publish(task_id, "RETRY")
 
     def on_success(self, retval, task_id, args, kwargs):
         """Success callback"""
         logger.info(f"Task {task_id} completed successfully")
+        task_event_publisher.publish(task_id, "SUCCESS")
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """Failure callback"""
         logger.error(f"Task {task_id} failed: {exc}")
+        task_event_publisher.publish(task_id, "FAILURE")
 
 
 @celery_app.task(
@@ -36,6 +80,7 @@ def analyze_demo_task(
     demo_file_path: str,
     user_id: str | None = None,
     language: str = "ru",
+    file_hash: str | None = None,
 ) -> Dict:
     """Analyze demo file in background.
 
@@ -43,9 +88,13 @@ def analyze_demo_task(
         demo_file_path: Path to demo file
         user_id: Optional user ID (for logging/trace)
         language: Target language for analysis ("ru" or "en")
+        file_hash: SHA-256 of the file when already known (chunked uploads),
+            so the analyzer parses it in place without re-hashing
 
     Returns:
-        JSON-serializable dict with analysis results
+        JSON-serializable dict with analysis results; a large one is kept in
+        the task result store and only a ``result_ref`` pointer is returned
+        (the tasks API expands it)
     """
     try:
         logger.info(
@@ -64,7 +113,8 @@ def analyze_demo_task(
                 "demo_path": demo_file_path,
             }
 
-        analyzer = DemoAnalyzer()
+        runtime = get_worker_runtime()
+        analyzer = runtime.analyzer()
 
         with open(demo_file_path, "rb") as file_obj:
             upload = UploadFile(
@@ -72,8 +122,16 @@ def analyze_demo_task(
                 file=file_obj,
             )
 
-            demo_analysis = asyncio.run(
-                analyzer.analyze_demo(demo_file=upload, language=language)
+            stored_file = None
+            if file_hash:
+                stored_file = (demo_file_path, os.path.getsize(demo_file_path), file_hash)
+
+            demo_analysis = runtime.run(
+                analyzer.analyze_demo(
+                    demo_file=upload,
+                    language=language,
+                    stored_file=stored_file,
+                )
             )
 
         result = {
@@ -88,7 +146,7 @@ def analyze_demo_task(
             user_id,
             demo_file_path,
         )
-        return result
+        return get_task_result_store().offload(self.request.id, result)
 
     except Exception as exc:
         logger.exception("Demo analysis failed: %s", exc)
@@ -62,9 +62,9 @@ def health_check_all_services():
         db.close()
 
         # Check Redis connectivity
-        from ..middleware.cache_middleware import redis_client
+        from ..middleware.cache_middleware import sync_redis_client
 
-        redis_client.ping()
+        sync_redis_client.ping()
 
         logger.info("Service health checks completed")
         return True
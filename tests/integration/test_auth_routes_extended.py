@@ -315,6 +315,42 @@ class TestAuthRoutesExtended:
                 self.storage[key] = value
                 self.expires[key] = ttl
 
+            async def evalsha(self, sha: str, numkeys: int, *keys_and_args):  # noqa: ARG002
+                # Python emulation of the rate limit Lua script
+                keys = [str(k) for k in keys_and_args[:numkeys]]
+                argv = [int(a) for a in keys_and_args[numkeys:]]
+                n_ban, n_counters, _, violation_window, ban_threshold, ban_ttl, force = argv[:7]
+                ban_keys = keys[:n_ban]
+                counter_keys = keys[n_ban : n_ban + n_counters]
+                violation_keys = keys[n_ban + n_counters :]
+
+                if not force:
+                    for key in ban_keys:
+                        if key in self.storage:
+                            return [1, self.expires.get(key, -1), 0, 0]
+
+                result = [0, 0, 0, 0]
+                for i, key in enumerate(counter_keys, start=1):
+                    count = await self.incr(key)
+                    if count == 1:
+                        await self.expire(key, argv[5 + i * 2])
+                    result.append(count)
+                    if count > argv[6 + i * 2] > 0 and result[2] == 0:
+                        result[2] = i
+
+                if (result[2] or force) and ban_threshold > 0:
+                    worst = 0
+                    for key in violation_keys:
+                        violations = await self.incr(key)
+                        if violations == 1:
+                            await self.expire(key, violation_window)
+                        worst = max(worst, violations)
+                    if worst >= ban_threshold:
+                        for key in ban_keys:
+                            await self.setex(key, ban_ttl, "1")
+                        result[3] = 1
+                return result
+
         dummy = _DummyRedis()
 
         monkeypatch.setattr(auth_routes.rate_limiter, "redis_client", dummy)
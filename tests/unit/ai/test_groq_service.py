@@ -1,16 +1,27 @@
-from typing import Any, Dict
+from typing import Any, Dict, List
 import json
 
 import pytest
 
 import src.server.ai.groq_service as groq_module
+import src.server.ai.llm_transport as transport_module
 from src.server.ai.groq_service import GroqService
+from src.server.ai.llm_cache import LLMResponseCache
+from src.server.ai.llm_transport import LLMStreamIncomplete, LLMTransport
 from src.server.config.settings import settings
 
 
 pytestmark = pytest.mark.asyncio
 
 
+@pytest.fixture(autouse=True)
+def _fresh_llm_cache(monkeypatch: pytest.MonkeyPatch) -> LLMResponseCache:
+    """Process-local response cache, so tests neither share hits nor need Redis."""
+    cache = LLMResponseCache(redis_url=None, ttl_seconds=3600, max_entries=100)
+    monkeypatch.setattr(groq_module, "llm_response_cache", cache)
+    return cache
+
+
 def _force_remote_without_key(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(settings, "LOCAL_LLM_BASE_URL", None, raising=False)
     monkeypatch.setattr(settings, "LOCAL_LLM_MODEL", None, raising=False)
@@ -35,16 +46,31 @@ def _force_openrouter(
     monkeypatch.setattr(settings, "GROQ_API_KEY", None, raising=False)
 
 
+class _AsyncLines:
+    def __init__(self, lines: List[bytes]) -> None:
+        self._lines = list(lines)
+
+    def __aiter__(self) -> "_AsyncLines":
+        return self
+
+    async def __anext__(self) -> bytes:
+        if not self._lines:
+            raise StopAsyncIteration
+        return self._lines.pop(0)
+
+
 class DummyResponse:
     def __init__(
         self,
         status: int = 200,
         json_data: Dict[str, Any] | None = None,
         text_data: str = "",
+        stream_lines: List[bytes] | None = None,
     ) -> None:
         self.status = status
         self._json_data = json_data or {}
         self._text_data = text_data
+        self.content = _AsyncLines(stream_lines or [])
 
     async def __aenter__(self) -> "DummyResponse":
         return self
@@ -65,6 +91,7 @@ class DummySession:
         self.last_url: str | None = None
         self.last_headers: Dict[str, Any] | None = None
         self.last_json: Dict[str, Any] | None = None
+        self.calls = 0
 
     async def __aenter__(self) -> "DummySession":
         return self
@@ -79,12 +106,22 @@ class DummySession:
         headers: Dict[str, Any] | None = None,
         json: Dict[str, Any] | None = None,
     ) -> DummyResponse:
+        self.calls += 1
         self.last_url = url
         self.last_headers = headers
         self.last_json = json
         return self._response
 
 
+def _use_session(monkeypatch: pytest.MonkeyPatch, session: "DummySession") -> LLMTransport:
+    """Route GroqService through a fresh transport whose pooled session is ``session``."""
+    monkeypatch.setattr(transport_module.aiohttp, "TCPConnector", lambda **kwargs: None)
+    monkeypatch.setattr(transport_module.aiohttp, "ClientSession", lambda **kwargs: session)
+    transport = LLMTransport(rate_per_second=0, backoff_base=0)
+    monkeypatch.setattr(groq_module, "llm_transport", transport)
+    return transport
+
+
 class TestGroqServiceHelpers:
     def test_normalize_language_and_default_training_plan(self) -> None:
         service = GroqService(api_key="dummy")
@@ -234,11 +271,7 @@ class TestGroqServiceWithHttpMock:
         dummy_response = DummyResponse(status=200, json_data=response_json)
         dummy_session = DummySession(dummy_response)
 
-        monkeypatch.setattr(
-            groq_module.aiohttp,
-            "ClientSession",
-            lambda: dummy_session,
-        )
+        _use_session(monkeypatch, dummy_session)
 
         service = GroqService(api_key=None)
 
@@ -264,6 +297,38 @@ class TestGroqServiceWithHttpMock:
         assert dummy_session.last_json is not None
         assert dummy_session.last_json.get("model") == service.model
 
+    async def test_analyze_player_performance_reuses_cached_answer(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        _force_openrouter(monkeypatch, api_key="test-openrouter-key")
+        logged = []
+        monkeypatch.setattr(
+            GroqService, "_log_sample", lambda self, *args, **kwargs: logged.append(kwargs)
+        )
+        dummy_response = DummyResponse(
+            status=200,
+            json_data={"choices": [{"message": {"content": "cached analysis"}}]},
+        )
+        dummy_session = DummySession(dummy_response)
+        _use_session(monkeypatch, dummy_session)
+        service = GroqService(api_key=None)
+
+        results = [
+            await service.analyze_player_performance(
+                stats={"kd_ratio": kd, "win_rate": 60.0, "matches_played": 20},
+                match_history=[],
+                language="en",
+            )
+            # Same 0.05 bucket: the second prompt is served from the cache
+            for kd in (1.21, 1.22)
+        ]
+
+        assert results[0] == results[1]
+        assert "cached analysis" in results[0]
+        assert dummy_session.calls == 1
+        assert [entry.get("cached", False) for entry in logged] == [False, True]
+
     async def test_analyze_player_performance_http_error(
         self,
         monkeypatch: pytest.MonkeyPatch,
@@ -272,11 +337,7 @@ class TestGroqServiceWithHttpMock:
         dummy_response = DummyResponse(status=500, text_data="server error")
         dummy_session = DummySession(dummy_response)
 
-        monkeypatch.setattr(
-            groq_module.aiohttp,
-            "ClientSession",
-            lambda: dummy_session,
-        )
+        _use_session(monkeypatch, dummy_session)
 
         service = GroqService(api_key=None)
 
@@ -314,11 +375,7 @@ class TestGroqServiceWithHttpMock:
         )
         dummy_session = DummySession(dummy_response)
 
-        monkeypatch.setattr(
-            groq_module.aiohttp,
-            "ClientSession",
-            lambda: dummy_session,
-        )
+        _use_session(monkeypatch, dummy_session)
 
         service = GroqService(api_key=None)
 
@@ -329,6 +386,64 @@ class TestGroqServiceWithHttpMock:
 
         assert result == report_body
 
+    async def test_stream_demo_coach_report_yields_sections_and_fills_cache(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        _force_openrouter(monkeypatch, api_key="demo-key")
+        monkeypatch.setattr(GroqService, "_log_sample", lambda self, **kwargs: None)
+
+        content = json.dumps({"overview": "ok", "strengths": [{"title": "Aim"}], "summary": "done"})
+        lines = [
+            b"data: " + json.dumps({"choices": [{"delta": {"content": content[i : i + 7]}}]}).encode()
+            for i in range(0, len(content), 7)
+        ] + [b"data: [DONE]"]
+        dummy_session = DummySession(DummyResponse(status=200, stream_lines=lines))
+        _use_session(monkeypatch, dummy_session)
+        service = GroqService(api_key=None)
+
+        streamed = [
+            section
+            async for section in service.stream_demo_coach_report(
+                demo_input={"match_id": "123"}, language="en"
+            )
+        ]
+        replayed = [
+            section
+            async for section in service.stream_demo_coach_report(
+                demo_input={"match_id": "123"}, language="en"
+            )
+        ]
+
+        assert streamed == [("overview", "ok"), ("strengths", [{"title": "Aim"}]), ("summary", "done")]
+        assert replayed == streamed
+        assert dummy_session.calls == 1
+        assert dummy_session.last_json is not None
+        assert dummy_session.last_json.get("stream") is True
+
+    async def test_stream_demo_coach_report_raises_when_cut_off(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        _force_openrouter(monkeypatch, api_key="demo-key")
+        monkeypatch.setattr(GroqService, "_log_sample", lambda self, **kwargs: None)
+
+        # The provider stops after the first section, before the JSON closes
+        content = '{"overview": "ok", "strengths": [{"title": "Ai'
+        lines = [b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode()]
+        dummy_session = DummySession(DummyResponse(status=200, stream_lines=lines))
+        _use_session(monkeypatch, dummy_session)
+        service = GroqService(api_key=None)
+
+        streamed = []
+        with pytest.raises(LLMStreamIncomplete):
+            async for section in service.stream_demo_coach_report(
+                demo_input={"match_id": "123"}, language="en"
+            ):
+                streamed.append(section)
+
+        assert streamed == [("overview", "ok")]
+
     async def test_generate_training_plan_success_parses_json(
         self,
         monkeypatch: pytest.MonkeyPatch,
@@ -354,11 +469,7 @@ class TestGroqServiceWithHttpMock:
         )
         dummy_session = DummySession(dummy_response)
 
-        monkeypatch.setattr(
-            groq_module.aiohttp,
-            "ClientSession",
-            lambda: dummy_session,
-        )
+        _use_session(monkeypatch, dummy_session)
 
         service = GroqService(api_key=None)
 
@@ -394,11 +505,7 @@ class TestGroqServiceWithHttpMock:
         )
         dummy_session = DummySession(dummy_response)
 
-        monkeypatch.setattr(
-            groq_module.aiohttp,
-            "ClientSession",
-            lambda: dummy_session,
-        )
+        _use_session(monkeypatch, dummy_session)
 
         service = GroqService(api_key=None)
 
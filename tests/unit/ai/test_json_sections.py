@@ -0,0 +1,47 @@
+import json
+
+from src.server.ai.json_sections import JSONSectionParser
+
+
+REPORT = {
+    "overview": "Solid game, {braces} and \"quotes\" inside strings",
+    "strengths": [{"title": "Aim", "example_rounds": [3, 7]}],
+    "weaknesses": [],
+    "training_plan": [{"goal": "Utility", "exercises": ["nades, smokes"]}],
+    "summary": "Keep going",
+}
+
+
+def _feed_all(parser: JSONSectionParser, chunks):
+    sections = []
+    for chunk in chunks:
+        sections.extend(parser.feed(chunk))
+    return sections
+
+
+def test_sections_are_emitted_as_soon_as_they_close() -> None:
+    text = json.dumps(REPORT, ensure_ascii=False)
+    parser = JSONSectionParser()
+
+    comma = text.index(', "strengths"')
+    assert parser.feed(text[:comma]) == []
+    assert parser.feed(text[comma : comma + 1]) == [("overview", REPORT["overview"])]
+
+
+def test_char_by_char_stream_yields_every_section_in_order() -> None:
+    text = "```json\n" + json.dumps(REPORT, ensure_ascii=False, indent=2) + "\n```"
+    parser = JSONSectionParser()
+
+    sections = _feed_all(parser, list(text))
+
+    assert sections == list(REPORT.items())
+    assert parser.done
+    assert parser.feed('{"extra": 1}') == []
+
+
+def test_malformed_section_is_skipped() -> None:
+    parser = JSONSectionParser()
+
+    sections = _feed_all(parser, ['{"overview": "ok", "broken": nope, "summary": "s"}'])
+
+    assert sections == [("overview", "ok"), ("summary", "s")]
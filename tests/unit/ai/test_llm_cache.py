@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from src.server.ai.llm_cache import (
+    LLMResponseCache,
+    canonicalize_prompt,
+    estimate_tokens,
+    request_cache_key,
+)
+
+
+class DummyPipeline:
+    def __init__(self, redis: "DummyAsyncRedis") -> None:
+        self.redis = redis
+        self.ops: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def _queue(*args: Any, **kwargs: Any) -> "DummyPipeline":
+            self.ops.append((name, args, kwargs))
+            return self
+
+        return _queue
+
+    async def execute(self) -> List[Any]:
+        results = []
+        for name, args, kwargs in self.ops:
+            results.append(await getattr(self.redis, name)(*args, **kwargs))
+        self.ops = []
+        return results
+
+
+class DummyAsyncRedis:
+    def __init__(self) -> None:
+        self.store: Dict[str, str] = {}
+        self.zsets: Dict[str, Dict[str, float]] = {}
+
+    def pipeline(self, transaction: bool = True) -> DummyPipeline:  # noqa: ARG002
+        return DummyPipeline(self)
+
+    async def get(self, key: str) -> Any:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> bool:  # noqa: ARG002
+        self.store[key] = value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+    async def zadd(self, key: str, mapping: Dict[str, float], xx: bool = False) -> int:
+        zset = self.zsets.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            if xx and member not in zset:
+                continue
+            added += member not in zset
+            zset[member] = score
+        return added
+
+    async def zcard(self, key: str) -> int:
+        return len(self.zsets.get(key, {}))
+
+    async def zpopmin(self, key: str, count: int = 1) -> List[Tuple[str, float]]:
+        zset = self.zsets.get(key, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+
+
+def _payload(prompt: str, model: str = "m") -> Dict[str, Any]:
+    return {
+        "model": model,
+        "temperature": 0.7,
+        "max_tokens": 100,
+        "messages": [
+            {"role": "system", "content": "coach"},
+            {"role": "user", "content": prompt},
+        ],
+    }
+
+
+def test_canonicalize_prompt_buckets_decimals_and_whitespace() -> None:
+    assert canonicalize_prompt("K/D:  1.21\n\nWR 55.0") == "K/D: 1.20 WR 55.00"
+    assert canonicalize_prompt("K/D: 1.22") == canonicalize_prompt("K/D: 1.19")
+    assert canonicalize_prompt("K/D: 1.22") != canonicalize_prompt("K/D: 1.30")
+
+
+def test_request_cache_key_depends_on_task_model_and_bucketed_prompt() -> None:
+    base = request_cache_key("groq:analysis", _payload("K/D 1.21"))
+
+    assert base == request_cache_key("groq:analysis", _payload("K/D   1.22"))
+    assert base != request_cache_key("groq:analysis", _payload("K/D 1.40"))
+    assert base != request_cache_key("groq:teammates", _payload("K/D 1.21"))
+    assert base != request_cache_key("groq:analysis", _payload("K/D 1.21", model="other"))
+
+
+def test_estimate_tokens_prefers_provider_usage() -> None:
+    payload = _payload("x" * 40)
+    assert estimate_tokens(payload, {"usage": {"total_tokens": 321}}) == 321
+    assert estimate_tokens(payload, {"choices": [{"message": {"content": "y" * 40}}]}) == 21
+
+
+@pytest.mark.asyncio
+async def test_local_cache_roundtrip_without_redis() -> None:
+    cache = LLMResponseCache(redis_url=None, ttl_seconds=60, max_entries=10)
+    data = {"choices": [{"message": {"content": "hi"}}]}
+
+    assert await cache.get("k", "analysis") is None
+    await cache.set("k", data, tokens=10, latency=1.5)
+
+    assert await cache.get("k", "analysis") == data
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_serves_other_processes_and_evicts_oldest(monkeypatch) -> None:
+    redis = DummyAsyncRedis()
+    writer = LLMResponseCache(redis_url="redis://test", ttl_seconds=60, max_entries=2)
+    monkeypatch.setattr(writer, "_get_client", lambda: redis)
+
+    for idx in range(3):
+        await writer.set(f"k{idx}", {"idx": idx}, tokens=1, latency=0.1)
+
+    assert "k0" not in redis.store
+    assert set(redis.zsets[LLMResponseCache.INDEX_KEY]) == {"k1", "k2"}
+
+    # A fresh process starts with an empty L1 and reads through to Redis
+    reader = LLMResponseCache(redis_url="redis://test", ttl_seconds=60, max_entries=2)
+    monkeypatch.setattr(reader, "_get_client", lambda: redis)
+    assert await reader.get("k2", "analysis") == {"idx": 2}
+    assert await reader.get("k0", "analysis") is None
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import time
+from email.utils import formatdate
+from typing import Any, Dict, List
+
+import pytest
+
+import src.server.ai.llm_transport as transport_module
+from src.server.ai.llm_transport import (
+    LLMStreamError,
+    LLMTransport,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class _Lines:
+    """Async line iterator standing in for ``aiohttp.StreamReader``."""
+
+    def __init__(self, lines: List[bytes]) -> None:
+        self._lines = list(lines)
+
+    def __aiter__(self) -> "_Lines":
+        return self
+
+    async def __anext__(self) -> bytes:
+        if not self._lines:
+            raise StopAsyncIteration
+        return self._lines.pop(0)
+
+
+def _sse_line(content: str) -> bytes:
+    return b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode() + b"\n"
+
+
+class ScriptedResponse:
+    def __init__(
+        self,
+        status: int = 200,
+        json_data: Dict[str, Any] | None = None,
+        headers: Dict[str, str] | None = None,
+        lines: List[bytes] | None = None,
+    ) -> None:
+        self.status = status
+        self.headers = headers or {}
+        self._json_data = json_data or {"ok": True}
+        self.content = _Lines(lines or [])
+
+    async def __aenter__(self) -> "ScriptedResponse":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    async def json(self) -> Dict[str, Any]:
+        return self._json_data
+
+    async def text(self) -> str:
+        return f"status {self.status}"
+
+
+class ScriptedSession:
+    """Returns scripted responses in order (the last one repeats)."""
+
+    def __init__(self, responses: List[ScriptedResponse], delay: float = 0.0) -> None:
+        self.responses = responses
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def post(self, url: str, *, headers=None, json=None):  # noqa: ARG002
+        session = self
+
+        class _Request:
+            async def __aenter__(self) -> ScriptedResponse:
+                session.calls += 1
+                session.in_flight += 1
+                session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                try:
+                    await asyncio.sleep(session.delay)
+                finally:
+                    session.in_flight -= 1
+                index = min(session.calls - 1, len(session.responses) - 1)
+                return session.responses[index]
+
+            async def __aexit__(self, exc_type, exc, tb) -> None:
+                return None
+
+        return _Request()
+
+
+def _transport(monkeypatch: pytest.MonkeyPatch, session: ScriptedSession, **kwargs: Any) -> LLMTransport:
+    monkeypatch.setattr(transport_module.aiohttp, "TCPConnector", lambda **kw: None)
+    monkeypatch.setattr(transport_module.aiohttp, "ClientSession", lambda **kw: session)
+    kwargs.setdefault("rate_per_second", 0)
+    kwargs.setdefault("backoff_base", 0)
+    return LLMTransport(**kwargs)
+
+
+def test_parse_retry_after_seconds_and_http_date() -> None:
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    in_ten = parse_retry_after(formatdate(time.time() + 10, usegmt=True))
+    assert in_ten is not None and 8 <= in_ten <= 10
+
+
+def test_token_bucket_spends_burst_then_waits() -> None:
+    bucket = TokenBucket(rate=2.0, burst=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.05)
+
+    bucket.pause_for(5)
+    assert bucket.reserve() >= 4.9
+
+
+@pytest.mark.asyncio
+async def test_retries_429_and_pauses_bucket_for_retry_after(monkeypatch) -> None:
+    session = ScriptedSession(
+        [
+            ScriptedResponse(429, headers={"Retry-After": "0"}),
+            ScriptedResponse(200, {"answer": 42}),
+        ]
+    )
+    transport = _transport(monkeypatch, session, max_retries=2)
+    pauses: List[float] = []
+    original_pause = transport.bucket.pause_for
+    monkeypatch.setattr(
+        transport.bucket, "pause_for", lambda seconds: (pauses.append(seconds), original_pause(seconds))
+    )
+
+    response = await transport.post_json("https://llm.test", {}, {"prompt": "x"})
+
+    assert response.status == 200
+    assert response.data == {"answer": 42}
+    assert session.calls == 2
+    assert pauses == [0.0]
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries_and_returns_last_status(monkeypatch) -> None:
+    session = ScriptedSession([ScriptedResponse(503)])
+    transport = _transport(monkeypatch, session, max_retries=2)
+
+    response = await transport.post_json("https://llm.test", {}, {"prompt": "x"})
+
+    assert response.status == 503
+    assert response.text == "status 503"
+    assert session.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(monkeypatch) -> None:
+    session = ScriptedSession([ScriptedResponse(400)])
+    transport = _transport(monkeypatch, session, max_retries=3)
+
+    response = await transport.post_json("https://llm.test", {}, {"prompt": "x"})
+
+    assert response.status == 400
+    assert session.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_in_flight_requests_are_coalesced(monkeypatch) -> None:
+    session = ScriptedSession([ScriptedResponse(200, {"answer": "shared"})], delay=0.05)
+    transport = _transport(monkeypatch, session)
+
+    results = await asyncio.gather(
+        *(transport.post_json("https://llm.test", {"A": "1"}, {"prompt": "same"}) for _ in range(5)),
+        transport.post_json("https://llm.test", {"A": "1"}, {"prompt": "other"}),
+    )
+
+    assert session.calls == 2
+    assert all(result.data == {"answer": "shared"} for result in results)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped(monkeypatch) -> None:
+    session = ScriptedSession([ScriptedResponse(200)], delay=0.02)
+    transport = _transport(monkeypatch, session, max_concurrency=2)
+
+    await asyncio.gather(
+        *(transport.post_json("https://llm.test", {}, {"prompt": idx}) for idx in range(6))
+    )
+
+    assert session.calls == 6
+    assert session.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_chat_yields_deltas_after_retrying_start(monkeypatch) -> None:
+    session = ScriptedSession(
+        [
+            ScriptedResponse(503),
+            ScriptedResponse(
+                200,
+                lines=[
+                    b": keep-alive\n",
+                    _sse_line('{"overview": '),
+                    b"\n",
+                    b"data: {not json}\n",
+                    _sse_line('"ok"}'),
+                    b"data: [DONE]\n",
+                    _sse_line("ignored"),
+                ],
+            ),
+        ]
+    )
+    transport = _transport(monkeypatch, session, max_retries=1)
+
+    deltas = [delta async for delta in transport.stream_chat("https://llm.test", {}, {"prompt": "x"})]
+
+    assert deltas == ['{"overview": ', '"ok"}']
+    assert session.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_chat_raises_with_final_status(monkeypatch) -> None:
+    session = ScriptedSession([ScriptedResponse(401)])
+    transport = _transport(monkeypatch, session, max_retries=3)
+
+    with pytest.raises(LLMStreamError) as excinfo:
+        async for _ in transport.stream_chat("https://llm.test", {}, {"prompt": "x"}):
+            pass
+
+    assert excinfo.value.status == 401
+    assert session.calls == 1
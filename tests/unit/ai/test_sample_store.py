@@ -0,0 +1,110 @@
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import src.server.ai.sample_store as store_module
+from src.server.ai.sample_store import SampleWriter
+
+
+def _lines(path: Path) -> list:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_samples_are_written_in_batches_on_flush(tmp_path: Path) -> None:
+    writer = SampleWriter(str(tmp_path), batch_size=100, flush_interval=60)
+
+    for idx in range(3):
+        assert writer.append({"task": "analysis", "idx": idx})
+
+    assert writer.flush(timeout=5)
+    assert [record["idx"] for record in _lines(tmp_path / "ai_samples.jsonl")] == [0, 1, 2]
+    writer.close()
+
+
+def test_full_batch_is_written_without_waiting_for_the_interval(tmp_path: Path) -> None:
+    writer = SampleWriter(str(tmp_path), batch_size=2, flush_interval=60)
+    writer.append({"idx": 0})
+    writer.append({"idx": 1})
+
+    path = tmp_path / "ai_samples.jsonl"
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(_lines(path)) == 2
+    writer.close()
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path: Path, monkeypatch) -> None:
+    writer = SampleWriter(str(tmp_path), max_queue=2, flush_interval=60)
+    # Keep the writer thread from draining the queue
+    monkeypatch.setattr(writer, "_ensure_thread", lambda: None)
+    dropped = []
+    monkeypatch.setattr(store_module, "_record_dropped", lambda reason, count=1: dropped.append(reason))
+
+    results = [writer.append({"idx": idx}) for idx in range(3)]
+
+    assert results == [True, True, False]
+    assert dropped == ["queue_full"]
+
+
+def test_close_writes_pending_samples_and_rejects_new_ones(tmp_path: Path) -> None:
+    writer = SampleWriter(str(tmp_path), batch_size=100, flush_interval=60)
+    writer.append({"idx": 0})
+
+    writer.close()
+
+    assert len(_lines(tmp_path / "ai_samples.jsonl")) == 1
+    assert writer.append({"idx": 1}) is False
+
+
+def test_rotation_by_size_and_day_compresses_closed_segments(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(store_module, "zstandard", None)
+    writer = SampleWriter(str(tmp_path), max_bytes=10, flush_interval=60)
+    active = tmp_path / "ai_samples.jsonl"
+
+    writer._write([json.dumps({"idx": 0})])
+    writer._write([json.dumps({"idx": 1})])
+
+    segments = sorted(tmp_path.glob("ai_samples-*.jsonl.gz"))
+    assert len(segments) == 1
+    with gzip.open(segments[0], "rt", encoding="utf-8") as f:
+        assert json.loads(f.read()) == {"idx": 0}
+    assert _lines(active) == [{"idx": 1}]
+
+    # A segment from a previous UTC day is rotated even when small
+    daily = SampleWriter(str(tmp_path), max_bytes=0, flush_interval=60)
+    old = time.time() - 2 * 86400
+    os.utime(active, (old, old))
+    daily._write([json.dumps({"idx": 2})])
+
+    assert len(list(tmp_path.glob("ai_samples-*.jsonl.gz"))) == 2
+    assert _lines(active) == [{"idx": 2}]
+
+
+def _write_batches(directory: str, worker: int) -> None:
+    store_module.zstandard = None
+    writer = SampleWriter(directory, max_bytes=300, flush_interval=60)
+    for batch in range(40):
+        writer._write([json.dumps({"worker": worker, "batch": batch, "line": line}) for line in range(5)])
+
+
+def test_processes_sharing_the_store_rotate_without_losing_lines(tmp_path: Path) -> None:
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_write_batches, args=(str(tmp_path), idx)) for idx in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    records = _lines(tmp_path / "ai_samples.jsonl")
+    for segment in tmp_path.glob("ai_samples-*.jsonl.gz"):
+        with gzip.open(segment, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f.read().splitlines())
+
+    assert not list(tmp_path.glob("ai_samples-*.jsonl"))
+    assert len({(r["worker"], r["batch"], r["line"]) for r in records}) == len(records) == 4 * 40 * 5
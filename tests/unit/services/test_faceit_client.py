@@ -158,3 +158,92 @@ class TestFaceitAPIClient:
             await client.get_player_stats("player-id")
 
         assert exc_info.value.status_code == 404
+
+
+class TestFaceitHTTPPool:
+    async def test_session_is_reused_between_calls(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        import src.server.integrations.faceit_client as faceit_client_module
+
+        created: list[Dict[str, Any]] = []
+
+        def _factory(*args: Any, **kwargs: Any) -> _DummySession:  # noqa: ARG001
+            created.append(kwargs)
+            return _DummySession(_DummyResponse(status=200, json_data={"items": []}))
+
+        monkeypatch.setattr(faceit_client_module.aiohttp, "ClientSession", _factory)
+
+        client = FaceitAPIClient(api_key="test_key")
+        other_client = FaceitAPIClient(api_key="test_key")
+        await client.get_match_history("player-id")
+        await client.search_players("nick")
+        await other_client.get_match_history("player-id")
+
+        assert len(created) == 1
+        assert isinstance(created[0]["connector"], aiohttp.TCPConnector)
+
+        await faceit_client_module.faceit_http_pool.close()
+
+    async def test_concurrency_is_limited(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        import asyncio
+
+        import src.server.integrations.faceit_client as faceit_client_module
+
+        monkeypatch.setattr(faceit_client_module.settings, "FACEIT_HTTP_MAX_CONCURRENCY", 2)
+        monkeypatch.setattr(
+            faceit_client_module.aiohttp,
+            "ClientSession",
+            lambda *args, **kwargs: _DummySession(None),  # noqa: ARG005
+        )
+        pool = faceit_client_module.FaceitHTTPPool()
+        active = 0
+        peak = 0
+
+        async def _use() -> None:
+            nonlocal active, peak
+            async with pool.session():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(_use() for _ in range(6)))
+
+        assert peak == 2
+
+
+class TestFaceitSingleFlight:
+    async def test_concurrent_lookups_share_one_request(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        import asyncio
+
+        import src.server.integrations.faceit_client as faceit_client_module
+
+        calls = 0
+
+        class _SlowResponse(_DummyResponse):
+            async def json(self) -> Dict[str, Any]:
+                await asyncio.sleep(0.01)
+                return dict(self._json)
+
+        class _CountingSession(_DummySession):
+            def get(self, *args: Any, **kwargs: Any):  # noqa: ANN002, ANN003
+                nonlocal calls
+                calls += 1
+                return super().get(*args, **kwargs)
+
+        response = _SlowResponse(status=200, json_data={"player_id": "p1"})
+        monkeypatch.setattr(
+            faceit_client_module.aiohttp,
+            "ClientSession",
+            lambda *args, **kwargs: _CountingSession(response),  # noqa: ARG005
+        )
+
+        client = FaceitAPIClient(api_key="test_key")
+        results = await asyncio.gather(
+            *(client.get_player_by_nickname("streamer") for _ in range(10)),
+            client.get_player_by_nickname("someone_else"),
+        )
+
+        assert calls == 2
+        assert all(r == {"player_id": "p1"} for r in results)
+        # Every caller gets its own copy of the shared result
+        assert results[0] is not results[1]
@@ -1,49 +1,153 @@
+import asyncio
+import fnmatch
+import time
+
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+import src.server.core.cache_tags as cache_tags
 import src.server.middleware.cache_middleware as cache_mw
 from src.server.middleware.cache_middleware import CacheMiddleware
 
 
+class DummyPipeline:
+    def __init__(self, redis: "DummyAsyncRedis") -> None:
+        self.redis = redis
+        self.commands: list[tuple[str, tuple, dict]] = []
+
+    def hset(self, *args, **kwargs) -> None:
+        self.commands.append(("hset", args, kwargs))
+
+    def expire(self, *args, **kwargs) -> None:
+        self.commands.append(("expire", args, kwargs))
+
+    def zadd(self, *args, **kwargs) -> None:
+        self.commands.append(("zadd", args, kwargs))
+
+    def zremrangebyscore(self, *args, **kwargs) -> None:
+        self.commands.append(("zremrangebyscore", args, kwargs))
+
+    def unlink(self, *args, **kwargs) -> None:
+        self.commands.append(("unlink", args, kwargs))
+
+    def zpopmin(self, *args, **kwargs) -> None:
+        self.commands.append(("zpopmin", args, kwargs))
+
+    async def execute(self) -> list:
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class DummyAsyncRedis:
+    """Async Redis stub for the middleware (hash commands + pipeline)."""
+
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[bytes, bytes]] = {}
+        self.sets: dict[str, dict[str, float]] = {}
+        self.expires: dict[str, int] = {}
+        self.hgetall_calls = 0
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+    async def hset(self, key: str, mapping: dict) -> int:
+        self.hashes.setdefault(key, {}).update(
+            {self._bytes(k): self._bytes(v) for k, v in mapping.items()}
+        )
+        return len(mapping)
+
+    async def expire(self, key: str, ttl: int) -> bool:
+        self.expires[key] = ttl
+        return True
+
+    async def hget(self, key: str, field: str) -> bytes | None:
+        return self.hashes.get(key, {}).get(self._bytes(field))
+
+    async def hgetall(self, key: str) -> dict[bytes, bytes]:
+        self.hgetall_calls += 1
+        return dict(self.hashes.get(key, {}))
+
+    async def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        self.sets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zremrangebyscore(self, key: str, low: str, high: float) -> int:  # noqa: ARG002
+        members = self.sets.get(key, {})
+        stale = [member for member, score in members.items() if score <= high]
+        for member in stale:
+            del members[member]
+        return len(stale)
+
+    async def zpopmin(self, key: str, count: int) -> list[tuple[str, float]]:
+        members = self.sets.get(key, {})
+        popped = sorted(members.items(), key=lambda item: item[1])[:count]
+        for member, _score in popped:
+            del members[member]
+        return popped
+
+    async def unlink(self, *keys: str) -> int:
+        return sum(1 for key in keys if self.hashes.pop(key, None) is not None)
+
+    def pipeline(self, transaction: bool = True) -> DummyPipeline:  # noqa: ARG002
+        return DummyPipeline(self)
+
+
+class DummyAsyncRedisError(DummyAsyncRedis):
+    async def hset(self, key: str, mapping: dict) -> int:
+        raise RuntimeError("hset error")
+
+
+class DummySyncPipeline:
+    def __init__(self, redis: "DummyRedis") -> None:
+        self.redis = redis
+        self.commands: list[tuple[str, tuple]] = []
+
+    def unlink(self, *keys: str) -> None:
+        self.commands.append(("unlink", keys))
+
+    def zpopmin(self, *args) -> None:
+        self.commands.append(("zpopmin", args))
+
+    def execute(self) -> list:
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
 class DummyRedis:
+    """Sync Redis stub for the invalidation helpers."""
+
     def __init__(self) -> None:
         self.store: dict[str, str] = {}
-
-    def get(self, key: str) -> str | None:
-        return self.store.get(key)
+        self.sets: dict[str, dict[str, float]] = {}
+        self.scanned = 0
 
     def setex(self, key: str, ttl: int, value: str) -> None:
         # TTL is ignored in the dummy implementation
         self.store[key] = value
 
-    def keys(self, pattern: str) -> list[str]:
-        # Support patterns used by invalidate_cache / clear_all_cache
-        if pattern == "api_cache:*":
-            return [k for k in self.store.keys() if k.startswith("api_cache:")]
-        if pattern.startswith("api_cache:*") and pattern.endswith("*"):
-            inner = pattern[len("api_cache:*") : -1]
-            return [
-                k
-                for k in self.store.keys()
-                if k.startswith("api_cache:") and inner in k
-            ]
-        return []
-
-    def delete(self, *keys: str) -> int:
-        deleted = 0
-        for key in keys:
-            if key in self.store:
-                del self.store[key]
-                deleted += 1
-        return deleted
-
-
-class DummyRedisError(DummyRedis):
-    def setex(self, key: str, ttl: int, value: str) -> None:
-        raise RuntimeError("setex error")
+    def tag(self, tag: str, *keys: str) -> None:
+        self.sets.setdefault(f"api_cache:tags:{tag}", {}).update({key: time.time() + 60 for key in keys})
+
+    def scan_iter(self, match: str, count: int):  # noqa: ARG002
+        for key in list(self.store):
+            self.scanned += 1
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def zpopmin(self, key: str, count: int) -> list[tuple[str, float]]:
+        members = self.sets.get(key, {})
+        popped = sorted(members.items(), key=lambda item: item[1])[:count]
+        for member, _score in popped:
+            del members[member]
+        return popped
+
+    def unlink(self, *keys: str) -> int:
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
 
+    def pipeline(self, transaction: bool = True) -> DummySyncPipeline:  # noqa: ARG002
+        return DummySyncPipeline(self)
 
-def create_app_with_cache(dummy_redis: DummyRedis) -> FastAPI:
+
+def create_app_with_cache(dummy_redis: DummyAsyncRedis) -> FastAPI:
     app = FastAPI()
     cache_mw.redis_client = dummy_redis  # type: ignore[assignment]
     app.add_middleware(CacheMiddleware, cache_ttl=60)
@@ -52,11 +156,15 @@ def create_app_with_cache(dummy_redis: DummyRedis) -> FastAPI:
     def get_items() -> dict:
         return {"value": "data"}
 
+    @app.get("/large")
+    def get_large() -> dict:
+        return {"values": ["x" * 32] * 200}
+
     return app
 
 
 def test_cache_middleware_miss_then_hit() -> None:
-    dummy = DummyRedis()
+    dummy = DummyAsyncRedis()
     app = create_app_with_cache(dummy)
 
     with TestClient(app) as client:
@@ -72,7 +180,7 @@ def test_cache_middleware_miss_then_hit() -> None:
 
 
 def test_cache_middleware_skips_auth_and_metrics_paths() -> None:
-    dummy = DummyRedis()
+    dummy = DummyAsyncRedis()
     app = FastAPI()
     cache_mw.redis_client = dummy  # type: ignore[assignment]
     app.add_middleware(CacheMiddleware, cache_ttl=60)
@@ -94,7 +202,7 @@ def test_cache_middleware_skips_auth_and_metrics_paths() -> None:
 
 
 def test_cache_middleware_marks_error_on_redis_failure() -> None:
-    dummy = DummyRedisError()
+    dummy = DummyAsyncRedisError()
     app = create_app_with_cache(dummy)
 
     with TestClient(app) as client:
@@ -106,10 +214,11 @@ def test_cache_middleware_marks_error_on_redis_failure() -> None:
 
 def test_cache_invalidation_helpers_use_redis_client() -> None:
     dummy = DummyRedis()
-    cache_mw.redis_client = dummy  # type: ignore[assignment]
+    cache_mw.sync_redis_client = dummy  # type: ignore[assignment]
 
     dummy.setex("api_cache:foo1", 60, "{}")
     dummy.setex("api_cache:foo2", 60, "{}")
+    dummy.tag("all", "api_cache:foo1", "api_cache:foo2")
 
     cache_mw.invalidate_cache("*1*")
     assert "api_cache:foo1" not in dummy.store
@@ -117,3 +226,128 @@ def test_cache_invalidation_helpers_use_redis_client() -> None:
 
     cache_mw.clear_all_cache()
     assert dummy.store == {}
+
+
+def test_tag_invalidation_only_touches_tagged_entries() -> None:
+    dummy = DummyRedis()
+    cache_mw.sync_redis_client = dummy  # type: ignore[assignment]
+
+    for idx in range(1200):
+        dummy.setex(f"api_cache:other{idx}", 60, "{}")
+    user_keys = [f"api_cache:user42_{idx}" for idx in range(3)]
+    for key in user_keys:
+        dummy.setex(key, 60, "{}")
+    dummy.tag("user:42", *user_keys)
+
+    cache_mw.invalidate_user_cache("42")
+
+    assert not any(key in dummy.store for key in user_keys)
+    assert len(dummy.store) == 1200
+    assert dummy.scanned == 0
+
+
+def test_cache_middleware_registers_route_and_user_tags(monkeypatch) -> None:
+    dummy = DummyAsyncRedis()
+    app = create_app_with_cache(dummy)
+    monkeypatch.setattr(cache_mw, "decode_access_token", lambda token: {"sub": 42})
+
+    @app.get("/players/{nickname}/stats")
+    def stats(nickname: str) -> dict:
+        return {"nickname": nickname}
+
+    with TestClient(app) as client:
+        client.get("/players/s1mple/stats", headers={"Authorization": "Bearer token"})
+        client.get("/players/zywoo/stats")
+
+    route_tag = "api_cache:tags:route:/players/{nickname}/stats"
+    assert len(dummy.sets[route_tag]) == 2
+    assert len(dummy.sets["api_cache:tags:user:42"]) == 1
+    assert set(dummy.sets["api_cache:tags:all"]) == set(dummy.hashes)
+
+    removed = asyncio.run(
+        cache_mw.invalidate_cache_tags_async("route:/players/{nickname}/stats", client=dummy)
+    )
+    assert removed == 2
+    assert dummy.hashes == {}
+
+
+def test_cache_middleware_stores_compressed_body_and_serves_it_encoded() -> None:
+    dummy = DummyAsyncRedis()
+    app = create_app_with_cache(dummy)
+
+    with TestClient(app) as client:
+        first = client.get("/large")
+        # httpx decodes Content-Encoding: gzip transparently
+        second = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        third = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    (stored,) = dummy.hashes.values()
+    assert stored[b"codec"] in (b"gzip", b"zstd")
+    assert len(stored[b"body"]) < len(first.content)
+    assert second.headers["X-Cache"] == "HIT"
+    assert third.headers["X-Cache"] == "HIT"
+    assert "content-encoding" not in third.headers
+    assert second.json() == third.json() == first.json()
+    if stored[b"codec"] == b"gzip":
+        assert second.headers["content-encoding"] == "gzip"
+
+
+def test_cache_middleware_if_none_match_returns_304_without_body_read() -> None:
+    dummy = DummyAsyncRedis()
+    app = create_app_with_cache(dummy)
+
+    with TestClient(app) as client:
+        first = client.get("/items")
+        etag = first.headers["ETag"]
+        reads_before = dummy.hgetall_calls
+
+        second = client.get("/items", headers={"If-None-Match": etag})
+        third = client.get("/items", headers={"If-None-Match": '"stale"'})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+    assert dummy.hgetall_calls == reads_before + 1  # only the stale revalidation
+    assert third.status_code == 200
+    assert third.headers["X-Cache"] == "HIT"
+
+
+def test_cache_middleware_skips_status_endpoints() -> None:
+    dummy = DummyAsyncRedis()
+    app = FastAPI()
+    cache_mw.redis_client = dummy  # type: ignore[assignment]
+    app.add_middleware(CacheMiddleware, cache_ttl=60)
+
+    @app.get("/tasks/status/{task_id}")
+    def task_status(task_id: str) -> dict:
+        return {"task_id": task_id}
+
+    with TestClient(app) as client:
+        response = client.get("/tasks/status/abc")
+
+    assert response.status_code == 200
+    assert "X-Cache" not in response.headers
+    assert dummy.hashes == {}
+
+
+def test_tag_sets_prune_members_of_expired_entries(monkeypatch) -> None:
+    dummy = DummyAsyncRedis()
+    app = create_app_with_cache(dummy)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(cache_tags.time, "time", lambda: clock[0])
+
+    @app.get("/players/{nickname}/stats")
+    def stats(nickname: str) -> dict:
+        return {"nickname": nickname}
+
+    with TestClient(app) as client:
+        for idx in range(5):
+            client.get(f"/players/p{idx}/stats")
+        # Every earlier entry has expired by the next write (cache_ttl=60)
+        clock[0] += 61
+        client.get("/players/late/stats")
+
+    route_tag = "api_cache:tags:route:/players/{nickname}/stats"
+    assert len(dummy.sets[route_tag]) == 1
+    assert len(dummy.sets["api_cache:tags:all"]) == 1
+    assert list(dummy.sets[route_tag].values()) == [clock[0] + 60]
@@ -1,3 +1,7 @@
+import asyncio
+import json
+import time
+
 import pytest
 from typing import Any
 
@@ -5,6 +9,8 @@ from src.server.services.cache_service import (
     CacheService,
     CACHE_HITS_TOTAL,
     CACHE_MISSES_TOTAL,
+    CACHE_TIER_HITS_TOTAL,
+    LocalLRUCache,
     REDIS_OPERATION_DURATION_SECONDS,
 )
 
@@ -28,6 +34,14 @@ class DummyRedis:
         return 1 if key in self.store else 0
 
 
+class DummyLockRedis(DummyRedis):
+    async def set(self, key: str, value: str, nx: bool = False, px: int | None = None) -> bool:
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+
 class DummyRedisError(DummyRedis):
     async def setex(self, key: str, ttl: int, value: str) -> None:
         raise RuntimeError("setex error")
@@ -39,6 +53,13 @@ class DummyRedisError(DummyRedis):
         raise RuntimeError("exists error")
 
 
+def _make_service(redis_client: Any = None) -> CacheService:
+    service = CacheService()
+    service.redis_client = redis_client
+    service.enabled = redis_client is not None
+    return service
+
+
 @pytest.mark.asyncio
 async def test_get_returns_none_when_disabled() -> None:
     service = CacheService()
@@ -184,7 +205,192 @@ def test_cache_key_helpers() -> None:
         service.get_player_cache_key("NickName")
         == "player:analysis:v2:nickname"
     )
+    assert (
+        service.get_player_cache_key("NickName", "en")
+        == "player:analysis:v2:nickname:en"
+    )
     assert (
         service.get_stats_cache_key("NickName")
         == "player:stats:nickname"
     )
+
+
+def test_local_lru_evicts_oldest_and_expires() -> None:
+    cache = LocalLRUCache(max_items=2, max_ttl=60)
+    cache.set("a", "1", ttl=60)
+    cache.set("b", "2", ttl=60)
+    assert cache.get("a") == "1"  # "a" becomes most recently used
+    cache.set("c", "3", ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+    cache.set("short", "x", ttl=60)
+    cache._data["short"] = (time.monotonic() - 1, "x")
+    assert cache.get("short") is None
+
+
+@pytest.mark.asyncio
+async def test_l1_serves_hits_without_redis_roundtrip() -> None:
+    dummy = DummyRedis()
+    service = _make_service(dummy)
+
+    await service.set("player:stats:foo", {"kd": 1.2}, ttl=60)
+    dummy.store.clear()
+
+    l1_hits = CACHE_TIER_HITS_TOTAL.labels(cache="player_stats", tier="l1")
+    before = l1_hits._value.get()
+    assert await service.get("player:stats:foo") == {"kd": 1.2}
+    assert l1_hits._value.get() == before + 1
+
+    await service.delete("player:stats:foo")
+    assert await service.get("player:stats:foo") is None
+
+
+@pytest.mark.asyncio
+async def test_l2_hit_populates_l1() -> None:
+    dummy = DummyRedis()
+    service = _make_service(dummy)
+    dummy.store["k"] = json.dumps({"v": 1})
+
+    assert await service.get("k") == {"v": 1}
+    dummy.store.clear()
+    assert await service.get("k") == {"v": 1}
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_computes_once_for_concurrent_misses() -> None:
+    service = _make_service(DummyLockRedis())
+    calls = 0
+
+    async def loader() -> dict:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(*(service.get_or_set("hot", loader, ttl=60) for _ in range(10)))
+
+    assert calls == 1
+    assert results == [{"value": 1}] * 10
+    assert await service.get_or_set("hot", loader, ttl=60) == {"value": 1}
+    assert "lock:hot" not in service.redis_client.store
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_waits_for_other_process_holding_lock() -> None:
+    shared = DummyLockRedis()
+    first = _make_service(shared)
+    second = _make_service(shared)
+    calls = 0
+
+    async def loader() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "computed"
+
+    results = await asyncio.gather(
+        first.get_or_set("shared", loader, ttl=60),
+        second.get_or_set("shared", loader, ttl=60),
+    )
+
+    assert results == ["computed", "computed"]
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_serves_stale_value_and_refreshes_in_background() -> None:
+    service = _make_service(None)
+    stale = {"v": "old", "__exp": time.time() - 5, "__delta": 0.0, "__stale": 60}
+    service.local.set("swr", json.dumps(stale), ttl=60)
+
+    async def loader() -> str:
+        return "new"
+
+    assert await service.get_or_set("swr", loader, ttl=60, stale_ttl=60) == "old"
+    await asyncio.gather(*service._background)
+    assert await service.get_or_set("swr", loader, ttl=60, stale_ttl=60) == "new"
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_recomputes_after_stale_window() -> None:
+    service = _make_service(None)
+    expired = {"v": "old", "__exp": time.time() - 120, "__delta": 0.0, "__stale": 60}
+    service.local.set("gone", json.dumps(expired), ttl=60)
+
+    async def loader() -> str:
+        return "new"
+
+    assert await service.get_or_set("gone", loader, ttl=60, stale_ttl=60) == "new"
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_refreshes_early_near_expiry() -> None:
+    service = _make_service(None)
+    # Recompute took 10s and only 1s of freshness is left: XFetch refreshes early
+    entry = {"v": "old", "__exp": time.time() + 1, "__delta": 10.0, "__stale": 0}
+    service.local.set("early", json.dumps(entry), ttl=60)
+    calls = 0
+
+    async def loader() -> str:
+        nonlocal calls
+        calls += 1
+        return "new"
+
+    assert await service.get_or_set("early", loader, ttl=60, beta=100.0) == "old"
+    await asyncio.gather(*service._background)
+    assert calls == 1
+    assert await service.get_or_set("early", loader, ttl=60) == "new"
+
+
+class DummySlowLockRedis(DummyLockRedis):
+    async def set(self, key: str, value: str, nx: bool = False, px: int | None = None) -> bool:
+        await asyncio.sleep(0)
+        return await super().set(key, value, nx=nx, px=px)
+
+
+@pytest.mark.asyncio
+async def test_miss_joining_a_skipped_background_refresh_waits_for_the_lock_holder() -> None:
+    shared = DummySlowLockRedis()
+    service = _make_service(shared)
+    # Another process is already refreshing the key
+    shared.store["lock:busy"] = "other"
+    stale = {"v": "old", "__exp": time.time() - 5, "__delta": 0.0, "__stale": 60}
+    service.local.set("busy", json.dumps(stale), ttl=60)
+
+    async def loader() -> str:
+        raise AssertionError("the lock holder computes the value")
+
+    async def other_process_finishes() -> None:
+        await asyncio.sleep(0.1)
+        fresh = {"v": "new", "__exp": time.time() + 60, "__delta": 0.0, "__stale": 60}
+        shared.store["busy"] = json.dumps(fresh)
+
+    assert await service.get_or_set("busy", loader, ttl=60, stale_ttl=60) == "old"
+    service.local.delete("busy")
+    value, _ = await asyncio.gather(
+        service.get_or_set("busy", loader, ttl=60, stale_ttl=60, lock_timeout=2.0),
+        other_process_finishes(),
+    )
+    await asyncio.gather(*service._background)
+
+    assert value == "new"
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_does_not_cache_none_and_propagates_errors() -> None:
+    service = _make_service(None)
+
+    async def empty() -> None:
+        return None
+
+    async def broken() -> None:
+        raise RuntimeError("upstream down")
+
+    assert await service.get_or_set("none", empty, ttl=60) is None
+    assert service.local.get("none") is None
+
+    with pytest.raises(RuntimeError):
+        await service.get_or_set("err", broken, ttl=60)
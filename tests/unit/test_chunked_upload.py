@@ -0,0 +1,183 @@
+"""Unit tests for resumable chunked demo uploads."""
+
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import src.server.features.demo_analyzer.routes as demo_routes
+from src.server.features.demo_analyzer.chunked_upload import (
+    ChunkTooLarge,
+    UploadHashes,
+    write_chunk,
+)
+from src.server.middleware.rate_limiter import rate_limiter
+
+DEMO_BYTES = b"HL2DEMO\x00" + bytes(range(256)) * 40
+
+
+async def _body(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+class DummyRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):  # noqa: ARG002
+        self.data[key] = value
+
+    async def set(self, key, value, nx=False, ex=None):  # noqa: ARG002
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_write_chunk_skips_overlap_and_truncates_stale_tail(tmp_path: Path):
+    path = tmp_path / "demo.dem"
+    path.write_bytes(b"abcdXXXX")
+    digest = hashlib.sha256(b"abcd")
+
+    written = asyncio.run(write_chunk(str(path), 4, 2, _body(b"cd", b"ef"), 10, digest))
+
+    assert written == 2
+    assert path.read_bytes() == b"abcdef"
+    assert digest.hexdigest() == hashlib.sha256(b"abcdef").hexdigest()
+
+
+def test_write_chunk_rejects_oversized_chunk(tmp_path: Path):
+    path = tmp_path / "demo.dem"
+    path.write_bytes(b"")
+
+    with pytest.raises(ChunkTooLarge):
+        asyncio.run(write_chunk(str(path), 0, 0, _body(b"abc", b"def"), 4, hashlib.sha256()))
+
+
+def test_upload_hashes_rebuild_state_from_file(tmp_path: Path):
+    path = tmp_path / "demo.dem"
+    path.write_bytes(b"abcdef")
+    hashes = UploadHashes(max_items=1)
+
+    rebuilt = hashes.at("session", str(path), 4)
+    assert rebuilt.hexdigest() == hashlib.sha256(b"abcd").hexdigest()
+
+    hashes.store("session", 6, hashlib.sha256(b"abcdef"))
+    hashes.store("other", 1, hashlib.sha256(b"a"))
+    # Evicted: falls back to re-reading the prefix
+    assert hashes.at("session", str(path), 6).hexdigest() == hashlib.sha256(b"abcdef").hexdigest()
+
+
+@pytest.fixture
+def upload_env(tmp_path: Path, monkeypatch):
+    redis_client = DummyRedis()
+
+    async def _redis():
+        return redis_client
+
+    monkeypatch.setattr(demo_routes, "_get_redis_client", _redis)
+    monkeypatch.setattr(demo_routes, "_SHARED_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(demo_routes, "_CHUNK_MAX_BYTES", 4096)
+
+    app = FastAPI()
+    app.include_router(demo_routes.router)
+    app.dependency_overrides[rate_limiter] = lambda: None
+
+    token = "token-1"
+    session = {"status": "pending", "platform_user_id": "42", "language": "en", "auto_analyze": True}
+    redis_client.data[demo_routes._upload_session_key(token)] = json.dumps(session)
+
+    with TestClient(app) as client:
+        yield SimpleNamespace(client=client, redis=redis_client, token=token, tmp_path=tmp_path)
+
+
+def test_chunked_upload_resumes_and_starts_analysis(upload_env, monkeypatch):
+    submitted = []
+
+    def submit(**kwargs):
+        submitted.append(kwargs)
+        return SimpleNamespace(id="task-9")
+
+    monkeypatch.setattr(demo_routes, "submit_demo_analysis", submit)
+    client, token = upload_env.client, upload_env.token
+    url = f"/demo/uploads/{token}"
+
+    created = client.post(url, headers={"Upload-Length": str(len(DEMO_BYTES))})
+    assert created.status_code == 201
+    assert created.headers["Upload-Offset"] == "0"
+
+    first = client.patch(url, content=DEMO_BYTES[:4000], headers={"Upload-Offset": "0"})
+    assert first.json()["offset"] == 4000
+
+    # Connection dropped: the client asks where to resume
+    head = client.head(url)
+    assert head.headers["Upload-Offset"] == "4000"
+
+    ahead = client.patch(url, content=DEMO_BYTES[8000:], headers={"Upload-Offset": "8000"})
+    assert ahead.status_code == 409
+    assert ahead.headers["Upload-Offset"] == "4000"
+
+    # A retried chunk overlapping stored bytes is trimmed
+    second = client.patch(url, content=DEMO_BYTES[3000:7000], headers={"Upload-Offset": "3000"})
+    assert second.json()["offset"] == 7000
+
+    last = client.patch(url, content=DEMO_BYTES[7000:], headers={"Upload-Offset": "7000"})
+    state = last.json()
+    assert state["status"] == "ready"
+    assert state["ranges"] == [[0, len(DEMO_BYTES)]]
+    assert state["task_id"] == "task-9"
+
+    stored = json.loads(upload_env.redis.data[demo_routes._upload_session_key(token)])
+    assert stored["file_hash"] == hashlib.sha256(DEMO_BYTES).hexdigest()
+    assert Path(stored["tmp_path"]).read_bytes() == DEMO_BYTES
+    assert submitted[0]["file_hash"] == stored["file_hash"]
+    assert Path(submitted[0]["demo_file_path"]).read_bytes() == DEMO_BYTES
+    assert submitted[0]["demo_file_path"] != stored["tmp_path"]
+
+    # Lost response to the last chunk: retrying it is harmless
+    retry = client.patch(url, content=DEMO_BYTES[7000:], headers={"Upload-Offset": "7000"})
+    assert retry.json()["status"] == "ready"
+    assert len(submitted) == 1
+
+
+def test_chunk_keeps_a_lock_taken_over_by_another_request(upload_env, monkeypatch):
+    client, token, redis_client = upload_env.client, upload_env.token, upload_env.redis
+    url = f"/demo/uploads/{token}"
+    lock_key = f"{demo_routes._upload_session_key(token)}:lock"
+    client.post(url, headers={"Upload-Length": str(len(DEMO_BYTES))})
+
+    async def slow_write_chunk(*args, **kwargs):
+        # Our lock expired mid-chunk and another request took it
+        redis_client.data[lock_key] = "other-request"
+        return await write_chunk(*args, **kwargs)
+
+    monkeypatch.setattr(demo_routes, "write_chunk", slow_write_chunk)
+
+    response = client.patch(url, content=DEMO_BYTES[:4000], headers={"Upload-Offset": "0"})
+
+    assert response.json()["offset"] == 4000
+    assert redis_client.data[lock_key] == "other-request"
+
+
+def test_chunked_upload_rejects_script_content(upload_env):
+    client, token = upload_env.client, upload_env.token
+    url = f"/demo/uploads/{token}"
+    payload = b"#!/bin/bash\nrm -rf /\n"
+
+    client.post(url, headers={"Upload-Length": str(len(payload))})
+    response = client.patch(url, content=payload, headers={"Upload-Offset": "0"})
+
+    assert response.status_code == 400
+    assert list(upload_env.tmp_path.iterdir()) == []
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import io
+from typing import Any, Dict
+
+import pandas as pd
+from fastapi import UploadFile
+
+import src.server.features.demo_analyzer.parse_executor as parse_executor_module
+import src.server.features.demo_analyzer.service as service_module
+
+from src.server.features.demo_analyzer.columnar import (
+    ColumnarDemo,
+    EventTable,
+    KILL_COLUMNS,
+)
+from src.server.features.demo_analyzer.models import PlayerPerformance
+from src.server.features.demo_analyzer.result_cache import DemoResultCache
+from src.server.features.demo_analyzer.service import DemoAnalyzer
+
+
+def _make_demo_analyzer() -> DemoAnalyzer:
+    """Create DemoAnalyzer instance without running heavy __init__ (Groq, Faceit)."""
+    return DemoAnalyzer.__new__(DemoAnalyzer)
+
+
+def _make_events() -> ColumnarDemo:
+    kills = pd.DataFrame(
+        {
+            "attacker_name": ["PlayerOne", "PlayerOne", "Enemy", "PlayerOne", "Enemy"],
+            "victim_name": ["Enemy", "Enemy2", "PlayerOne", "Enemy", "Mate"],
+            "assister_name": [None, "Mate", None, None, "PlayerOne"],
+            "headshot": [True, False, True, True, False],
+            "total_rounds_played": [0, 0, 1, 2, 2],
+            "tick": [100, 150, 5000, 9000, 8900],
+            "weapon": ["ak47", "ak47", "awp", "m4a1", "deagle"],
+        }
+    )
+    damage = pd.DataFrame(
+        {
+            "attacker_name": ["PlayerOne", "PlayerOne", "Enemy"],
+            "dmg_health": [100, 27, 90],
+            "total_rounds_played": [0, 1, 1],
+        }
+    )
+    rounds = pd.DataFrame({"winner": ["T", "CT", "T"], "round": [1, 2, 3]})
+    return ColumnarDemo.from_parser_output(kills=kills, damage=damage, rounds=rounds)
+
+
+def test_event_table_normalizes_aliases_and_keeps_only_needed_columns() -> None:
+    frame = pd.DataFrame(
+        {
+            "attackername": ["a", "b"],
+            "victimname": ["b", "a"],
+            "is_headshot": [1, 0],
+            "weapon": ["ak47", "awp"],
+        }
+    )
+
+    table = EventTable.from_any(frame, KILL_COLUMNS)
+
+    assert len(table) == 2
+    assert set(table.columns) == {"attacker_name", "victim_name", "headshot"}
+    assert table.get("headshot").dtype == bool
+
+
+def test_event_table_accepts_legacy_records() -> None:
+    records = [
+        {"attacker": "a", "victim": "b", "headshot": True, "round": "3"},
+        {"attacker": "b", "victim": "a", "headshot": None, "round": 4},
+        "garbage",
+    ]
+
+    table = EventTable.from_any(records, KILL_COLUMNS)
+
+    assert len(table) == 2
+    assert table.max_int("round") == 4
+    assert table.get("headshot").tolist() == [True, False]
+
+
+def test_columnar_demo_player_stats_and_rounds() -> None:
+    events = _make_events()
+
+    stats = events.player_stats("PlayerOne")
+    assert stats["kills"] == 3
+    assert stats["deaths"] == 1
+    assert stats["headshots"] == 2
+    assert stats["assists"] == 1
+    assert stats["total_damage"] == 127.0
+
+    assert events.rounds_won_by("T") == 2
+    assert events.max_round() == 3
+
+    per_round = events.player_rounds("PlayerOne", 3)
+    assert per_round is not None
+    assert per_round["kills"].tolist() == [2, 0, 1]
+    assert per_round["deaths"].tolist() == [0, 1, 0]
+
+    # Round 3: Enemy's kill at tick 8900 comes before PlayerOne's at 9000
+    assert events.opening_duels("PlayerOne") == (1, 1)
+
+
+def test_analyzer_uses_columnar_events_end_to_end() -> None:
+    analyzer = _make_demo_analyzer()
+    demo_data: Dict[str, Any] = {
+        "main_player": "PlayerOne",
+        "map": "de_inferno",
+        "score": {"team1": 2, "team2": 1},
+        "total_rounds": 3,
+        "events": _make_events(),
+    }
+
+    stats = analyzer._aggregate_demo_stats(demo_data)
+    assert stats["kills"] == 3
+    assert stats["first_kills"] == 1
+    assert round(float(stats["headshot_percentage"]), 2) == 66.67
+
+    perf = PlayerPerformance(
+        player_id="PlayerOne",
+        kills=3,
+        deaths=1,
+        assists=1,
+        headshot_percentage=66.0,
+        entry_kills=1,
+        clutches_won=0,
+        damage_per_round=42.0,
+        utility_damage=0.0,
+        flash_assists=0,
+    )
+
+    rounds = asyncio.run(analyzer._analyze_rounds(demo_data, {"PlayerOne": perf}))
+    assert [r.player_performances["PlayerOne"].kills for r in rounds] == [2, 0, 1]
+
+    demo_input = analyzer._build_demo_analysis_input(
+        demo_data=demo_data,
+        player_performances={"PlayerOne": perf},
+        round_analysis=rounds,
+        key_moments=[],
+        language="en",
+    )
+    assert demo_input.aggregate_stats["multi_kill_rounds"] == 1
+    assert demo_input.aggregate_stats["first_kills"] == 1
+    assert demo_input.aggregate_stats["first_deaths"] == 1
+
+
+def test_parse_demo_file_builds_columnar_events(monkeypatch) -> None:
+    class FakeParser:
+        def __init__(self, path: str) -> None:
+            self.path = path
+
+        def parse_header(self) -> Dict[str, Any]:
+            return {"mapname": "de_nuke", "tickrate": 64, "duration": 1800}
+
+        def parse_event(self, event_name: str, other: Any = None) -> Any:
+            frames = {
+                "round_end": pd.DataFrame({"winner": ["T", "T", "CT"]}),
+                "player_death": pd.DataFrame(
+                    {"attacker_name": ["PlayerOne"], "victim_name": ["Enemy"], "headshot": [True]}
+                ),
+                "player_hurt": pd.DataFrame({"attacker_name": ["PlayerOne"], "dmg_health": [100]}),
+            }
+            return frames.get(event_name)
+
+    monkeypatch.setattr(parse_executor_module, "DemoParser", FakeParser)
+    # FakeParser is local to the test and cannot be pickled into a worker process
+    executor = parse_executor_module.DemoParseExecutor(max_workers=0, queue_depth=1)
+    monkeypatch.setattr(service_module, "get_parse_executor", lambda: executor)
+    monkeypatch.setattr(
+        service_module, "get_demo_result_cache", lambda: DemoResultCache(None)
+    )
+
+    analyzer = _make_demo_analyzer()
+    upload = UploadFile(filename="PlayerOne_match.dem", file=io.BytesIO(b"demo-bytes"))
+
+    demo_data = asyncio.run(analyzer._parse_demo_file(upload))
+
+    assert demo_data["map"] == "de_nuke"
+    assert demo_data["total_rounds"] == 3
+    assert demo_data["score"] == {"team1": 2, "team2": 1}
+    assert "kills_data" not in demo_data
+    assert demo_data["file_hash"] == hashlib.sha256(b"demo-bytes").hexdigest()
+    assert isinstance(demo_data["events"], ColumnarDemo)
+    assert demo_data["events"].player_stats("PlayerOne")["total_damage"] == 100.0
@@ -0,0 +1,167 @@
+import asyncio
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from fastapi import UploadFile
+
+import src.server.features.demo_analyzer.service as service_module
+from src.server.features.demo_analyzer.models import (
+    DemoAnalysis,
+    DemoAnalysisInput,
+    DemoMetadata,
+)
+from src.server.features.demo_analyzer.service import DemoAnalyzer, _PreparedAnalysis
+
+
+class DummyResultCache:
+    def __init__(self) -> None:
+        self.stored: List[DemoAnalysis] = []
+
+    async def set_analysis(self, file_hash: str, language: str, player: str, analysis: DemoAnalysis) -> None:
+        self.stored.append(analysis)
+
+
+class DummyCoachModel:
+    def __init__(self, sections: List[Tuple[str, Any]], fail_after: bool = False) -> None:
+        self.sections = sections
+        self.fail_after = fail_after
+
+    async def stream_coach_report(self, demo_input: DemoAnalysisInput, language: str = "ru") -> AsyncIterator[Tuple[str, Any]]:
+        for section in self.sections:
+            yield section
+        if self.fail_after:
+            raise RuntimeError("stream dropped")
+
+
+def _prepared() -> _PreparedAnalysis:
+    analysis = DemoAnalysis(
+        demo_id="PlayerOne_match",
+        metadata=DemoMetadata(
+            match_id="PlayerOne_match",
+            map_name="de_inferno",
+            game_mode="competitive",
+            date_played=datetime(2024, 1, 1),
+            duration=1800,
+            score={"team1": 13, "team2": 7},
+        ),
+        overall_performance={},
+        round_analysis=[],
+        key_moments=[],
+        recommendations=["Hold angles"],
+        improvement_areas=[],
+        demo_input=DemoAnalysisInput(
+            language="en",
+            player={"nickname": "PlayerOne"},
+            match={"map": "de_inferno", "score": "13-7"},
+            aggregate_stats={},
+            flags=[],
+            key_rounds=[],
+        ),
+    )
+    return _PreparedAnalysis(
+        analysis=analysis,
+        file_hash="abc",
+        main_player="PlayerOne",
+        language="en",
+        cacheable=True,
+    )
+
+
+def _collect(analyzer: DemoAnalyzer) -> List[Tuple[str, Dict[str, Any]]]:
+    async def _run() -> List[Tuple[str, Dict[str, Any]]]:
+        upload = UploadFile(filename="PlayerOne_match.dem", file=io.BytesIO(b"demo"))
+        return [event async for event in analyzer.analyze_demo_stream(upload, language="en")]
+
+    return asyncio.run(_run())
+
+
+def _analyzer(monkeypatch, coach_model: DummyCoachModel) -> Tuple[DemoAnalyzer, DummyResultCache]:
+    cache = DummyResultCache()
+    monkeypatch.setattr(service_module, "get_demo_result_cache", lambda: cache)
+    analyzer = DemoAnalyzer.__new__(DemoAnalyzer)
+    analyzer.demo_coach_model = coach_model
+
+    async def _prepare(*_: Any, **__: Any) -> _PreparedAnalysis:
+        return _prepared()
+
+    monkeypatch.setattr(analyzer, "_prepare_analysis", _prepare)
+    return analyzer, cache
+
+
+def test_stream_emits_analysis_then_sections_then_done(monkeypatch) -> None:
+    analyzer, cache = _analyzer(
+        monkeypatch,
+        DummyCoachModel([("overview", "Good game"), ("strengths", [{"title": "Aim"}])]),
+    )
+
+    events = _collect(analyzer)
+
+    assert [name for name, _ in events] == ["analysis", "section", "section", "done"]
+    assert "coach_report" not in events[0][1]
+    assert events[0][1]["recommendations"] == ["Hold angles"]
+    assert events[1][1] == {"name": "overview", "value": "Good game"}
+    assert events[-1][1]["source"] == "model"
+    assert events[-1][1]["coach_report"]["strengths"] == [{"title": "Aim"}]
+    assert len(cache.stored) == 1
+    assert cache.stored[0].coach_report.overview == "Good game"
+
+
+def test_stream_fills_missing_sections_from_stub_and_skips_cache(monkeypatch) -> None:
+    analyzer, cache = _analyzer(
+        monkeypatch,
+        DummyCoachModel([("weaknesses", [{"title": "Trades"}])], fail_after=True),
+    )
+
+    events = _collect(analyzer)
+
+    sections = [data["name"] for name, data in events if name == "section"]
+    assert sections[0] == "weaknesses"
+    assert {"overview", "training_plan", "summary"} <= set(sections)
+    assert sections.count("weaknesses") == 1
+    assert events[-1][0] == "done"
+    assert events[-1][1]["source"] == "partial"
+    assert events[-1][1]["coach_report"]["weaknesses"] == [{"title": "Trades"}]
+    assert cache.stored == []
+
+
+def test_cut_off_report_is_not_cached_for_the_next_upload(monkeypatch) -> None:
+    cache = DummyResultCache()
+    monkeypatch.setattr(service_module, "get_demo_result_cache", lambda: cache)
+    analyzer = DemoAnalyzer.__new__(DemoAnalyzer)
+
+    async def _prepare(*_: Any, **__: Any) -> _PreparedAnalysis:
+        # Same lookup as _prepare_analysis: a stored analysis is replayed
+        if cache.stored:
+            return _PreparedAnalysis(
+                analysis=cache.stored[-1],
+                file_hash="abc",
+                main_player="PlayerOne",
+                language="en",
+                cacheable=False,
+                from_cache=True,
+            )
+        return _prepared()
+
+    monkeypatch.setattr(analyzer, "_prepare_analysis", _prepare)
+
+    # The stream dies right after "overview"
+    analyzer.demo_coach_model = DummyCoachModel([("overview", "Cut"), ("strengths", [])], fail_after=True)
+    first = _collect(analyzer)
+
+    assert first[-1][1]["source"] == "partial"
+    assert first[-1][1]["coach_report"]["overview"] == "Cut"
+    assert first[-1][1]["coach_report"]["summary"]
+    assert cache.stored == []
+
+    # Same demo again: the model is asked again instead of replaying the partial report
+    analyzer.demo_coach_model = DummyCoachModel([("overview", "Full"), ("summary", "Done")])
+    second = _collect(analyzer)
+
+    assert second[-1][1]["source"] == "model"
+    assert second[-1][1]["coach_report"]["overview"] == "Full"
+    assert len(cache.stored) == 1
+
+    third = _collect(analyzer)
+    assert third[-1][1]["source"] == "cache"
+    assert third[-1][1]["coach_report"]["overview"] == "Full"
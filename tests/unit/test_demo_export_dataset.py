@@ -0,0 +1,116 @@
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Set
+
+from src.server.features.demo_analyzer import export_dataset
+from src.server.features.demo_analyzer.models import (
+    CoachReport,
+    DemoAnalysis,
+    DemoAnalysisInput,
+    DemoMetadata,
+)
+
+
+class FakeAnalyzer:
+    def __init__(self, failing: Set[str] | None = None, delay: float = 0.01) -> None:
+        self.failing = failing or set()
+        self.delay = delay
+        self.seen: List[str] = []
+        self.chunk_sizes: List[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def analyze_demo(self, upload: Any, language: str = "ru") -> DemoAnalysis:
+        self.seen.append(upload.filename)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            while True:
+                chunk = await upload.read(4)
+                if not chunk:
+                    break
+                self.chunk_sizes.append(len(chunk))
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if upload.filename in self.failing:
+            raise RuntimeError("parse failed")
+        return DemoAnalysis(
+            demo_id=upload.filename,
+            metadata=DemoMetadata(
+                match_id=upload.filename,
+                map_name="de_mirage",
+                game_mode="competitive",
+                date_played=datetime(2024, 1, 1),
+                duration=1800,
+                score={"team1": 13, "team2": 9},
+            ),
+            overall_performance={},
+            round_analysis=[],
+            key_moments=[],
+            recommendations=[],
+            improvement_areas=[],
+            coach_report=CoachReport(overview="ok"),
+            demo_input=DemoAnalysisInput(
+                language=language,
+                player={},
+                match={},
+                aggregate_stats={},
+                flags=[],
+                key_rounds=[],
+            ),
+        )
+
+
+def _demos(tmp_path: Path, count: int) -> List[Path]:
+    demo_dir = tmp_path / "demos"
+    demo_dir.mkdir()
+    paths = []
+    for idx in range(count):
+        path = demo_dir / f"match_{idx}.dem"
+        path.write_bytes(b"demo-bytes-%d" % idx)
+        paths.append(path)
+    return paths
+
+
+def test_export_runs_workers_in_parallel_and_streams_files(tmp_path: Path) -> None:
+    demos = _demos(tmp_path, 6)
+    output = tmp_path / "out.jsonl"
+    analyzer = FakeAnalyzer(delay=0.05)
+
+    processed, errors, skipped = asyncio.run(
+        export_dataset.export_demos(
+            demos, output, analyzer, source="test", manifest_path=tmp_path / "m.jsonl", workers=3
+        )
+    )
+
+    assert (processed, errors, skipped) == (6, 0, 0)
+    assert analyzer.max_in_flight == 3
+    assert max(analyzer.chunk_sizes) == 4
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 6
+
+
+def test_export_resumes_from_manifest_and_retries_failures(tmp_path: Path) -> None:
+    demos = _demos(tmp_path, 4)
+    output = tmp_path / "out.jsonl"
+    manifest = tmp_path / "m.jsonl"
+
+    first = FakeAnalyzer(failing={"match_2.dem"})
+    assert asyncio.run(
+        export_dataset.export_demos(demos, output, first, source="test", manifest_path=manifest, workers=2)
+    ) == (3, 1, 0)
+    # A crash can leave a truncated last line behind
+    with manifest.open("a", encoding="utf-8") as f:
+        f.write('{"key": "trunc')
+
+    second = FakeAnalyzer()
+    assert asyncio.run(
+        export_dataset.export_demos(demos, output, second, source="test", manifest_path=manifest, workers=2)
+    ) == (1, 0, 3)
+
+    assert second.seen == ["match_2.dem"]
+    assert export_dataset.load_manifest(manifest)[export_dataset._manifest_key(demos[2])] == "ok"
+    samples = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert len(samples) == 4
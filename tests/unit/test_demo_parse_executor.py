@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from typing import Any, Dict
+
+import pytest
+
+import src.server.features.demo_analyzer.parse_executor as parse_executor_module
+from src.server.exceptions import DemoAnalysisException
+from src.server.features.demo_analyzer.columnar import ColumnarDemo
+from src.server.features.demo_analyzer.parse_executor import DemoParseExecutor
+
+
+class _BlockingParser:
+    started = threading.Event()
+    release = threading.Event()
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def parse_header(self) -> Dict[str, Any]:
+        _BlockingParser.started.set()
+        _BlockingParser.release.wait(timeout=5)
+        return {"mapname": "de_mirage", "tickrate": 64, "duration": 100}
+
+    def parse_event(self, event_name: str, other: Any = None) -> Any:
+        return None
+
+
+def test_parse_demo_path_returns_columnar_events(monkeypatch) -> None:
+    class FakeParser:
+        def __init__(self, path: str) -> None:
+            self.path = path
+
+        def parse_header(self) -> Dict[str, Any]:
+            return {"mapname": "de_ancient", "duration": "42", "matchid": "m1"}
+
+        def parse_kills(self) -> Any:
+            return {"attacker_name": ["a"], "victim_name": ["b"]}
+
+        def parse_event(self, event_name: str, other: Any = None) -> Any:
+            raise TypeError("unsupported")
+
+    monkeypatch.setattr(parse_executor_module, "DemoParser", FakeParser)
+
+    parsed = parse_executor_module.parse_demo_path("/tmp/demo.dem")
+
+    assert parsed["map"] == "de_ancient"
+    assert parsed["duration"] == 42
+    assert parsed["tickrate"] == 128
+    assert parsed["header_match_id"] == "m1"
+    assert isinstance(parsed["events"], ColumnarDemo)
+    assert parsed["events"].player_stats("a")["kills"] == 1
+
+
+def test_parse_demo_path_requires_demoparser(monkeypatch) -> None:
+    monkeypatch.setattr(parse_executor_module, "DemoParser", None)
+
+    with pytest.raises(RuntimeError):
+        parse_executor_module.parse_demo_path("/tmp/demo.dem")
+
+
+def test_executor_rejects_when_queue_is_full(monkeypatch) -> None:
+    monkeypatch.setattr(parse_executor_module, "DemoParser", _BlockingParser)
+    _BlockingParser.started.clear()
+    _BlockingParser.release.clear()
+
+    executor = DemoParseExecutor(max_workers=0, queue_depth=0)
+
+    async def _run() -> None:
+        first = asyncio.create_task(executor.parse("/tmp/first.dem"))
+        await asyncio.get_running_loop().run_in_executor(None, _BlockingParser.started.wait, 5)
+
+        with pytest.raises(DemoAnalysisException) as exc_info:
+            await executor.parse("/tmp/second.dem")
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.detail["error_code"] == "PARSE_QUEUE_FULL"
+
+        _BlockingParser.release.set()
+        parsed = await first
+        assert parsed["map"] == "de_mirage"
+
+        # The slot is released once the first parse finishes
+        _BlockingParser.release.set()
+        parsed = await executor.parse("/tmp/third.dem")
+        assert parsed["map"] == "de_mirage"
+
+    try:
+        asyncio.run(_run())
+    finally:
+        executor.shutdown()
@@ -0,0 +1,108 @@
+"""Unit tests for demo analysis queue priority and backpressure."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import src.server.features.tasks.demo_queue as demo_queue
+from src.server.database.models import SubscriptionTier
+
+
+class StaticDepthMonitor(demo_queue.DemoQueueMonitor):
+    def __init__(self, depth, cache_seconds=0.0):
+        super().__init__(cache_seconds=cache_seconds)
+        self.broker_depth = depth
+        self.reads = 0
+
+    def _read_depth(self):
+        self.reads += 1
+        if isinstance(self.broker_depth, Exception):
+            raise self.broker_depth
+        return self.broker_depth
+
+
+def _subscription(tier, is_active=True, expires_in_days=None):
+    expires_at = None
+    if expires_in_days is not None:
+        expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
+    return SimpleNamespace(tier=tier, is_active=is_active, expires_at=expires_at)
+
+
+def test_subscription_tier_picks_best_active_subscription():
+    user = SimpleNamespace(
+        subscription=[
+            _subscription(SubscriptionTier.FREE),
+            _subscription(SubscriptionTier.ELITE, expires_in_days=-1),
+            _subscription(SubscriptionTier.BASIC, is_active=False),
+            _subscription(SubscriptionTier.PRO, expires_in_days=10),
+        ]
+    )
+
+    assert demo_queue.subscription_tier(user) is SubscriptionTier.PRO
+    assert demo_queue.subscription_tier(None) is SubscriptionTier.FREE
+
+
+def test_paid_tiers_are_consumed_first():
+    priorities = [demo_queue.TIER_PRIORITY[tier] for tier in (
+        SubscriptionTier.ELITE,
+        SubscriptionTier.PRO,
+        SubscriptionTier.BASIC,
+        SubscriptionTier.FREE,
+    )]
+
+    # Redis broker: lower priority values are delivered first
+    assert priorities == sorted(priorities)
+    assert len(set(priorities)) == len(priorities)
+
+
+def test_admit_uses_tier_limits(monkeypatch):
+    monkeypatch.setattr(demo_queue.settings, "DEMO_QUEUE_MAX_DEPTH", 5)
+    monkeypatch.setattr(demo_queue.settings, "DEMO_QUEUE_PAID_MAX_DEPTH", 20)
+    monkeypatch.setattr(demo_queue.settings, "DEMO_ANALYSIS_EXPECTED_SECONDS", 30)
+    monkeypatch.setattr(demo_queue.settings, "CELERY_DEMO_CONCURRENCY", 1)
+    monitor = StaticDepthMonitor(6)
+
+    with pytest.raises(demo_queue.DemoQueueFull) as excinfo:
+        monitor.admit(SubscriptionTier.FREE)
+    assert excinfo.value.retry_after == 60
+
+    monitor.admit(SubscriptionTier.PRO)
+
+
+def test_admit_lets_submissions_through_when_depth_unknown(monkeypatch):
+    monkeypatch.setattr(demo_queue.settings, "DEMO_QUEUE_MAX_DEPTH", 1)
+    monitor = StaticDepthMonitor(ConnectionError("broker down"))
+
+    monitor.admit(SubscriptionTier.FREE)
+
+    assert monitor.depth() is None
+
+
+def test_depth_is_cached_between_submissions():
+    monitor = StaticDepthMonitor(3, cache_seconds=60)
+
+    assert monitor.depth() == 3
+    monitor.broker_depth = 50
+    assert monitor.depth() == 3
+    assert monitor.reads == 1
+
+
+def test_submit_demo_analysis_enqueues_with_tier_priority(monkeypatch):
+    calls = []
+    monkeypatch.setattr(demo_queue, "demo_queue_monitor", StaticDepthMonitor(0))
+    monkeypatch.setattr(
+        demo_queue.analyze_demo_task,
+        "apply_async",
+        lambda **kwargs: calls.append(kwargs) or SimpleNamespace(id="task-1"),
+    )
+
+    task = demo_queue.submit_demo_analysis("/tmp/demo.dem", "7", "en", SubscriptionTier.ELITE)
+
+    assert task.id == "task-1"
+    assert calls == [
+        {
+            "kwargs": {"demo_file_path": "/tmp/demo.dem", "user_id": "7", "language": "en"},
+            "priority": demo_queue.TIER_PRIORITY[SubscriptionTier.ELITE],
+        }
+    ]
@@ -0,0 +1,223 @@
+import asyncio
+import io
+import os
+import pickle
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import pytest
+from fastapi import UploadFile
+
+import src.server.features.demo_analyzer.result_cache as result_cache_module
+import src.server.features.demo_analyzer.service as service_module
+from src.server.features.demo_analyzer.columnar import ColumnarDemo
+from src.server.features.demo_analyzer.models import DemoAnalysis, DemoMetadata
+from src.server.features.demo_analyzer.result_cache import (
+    DemoResultCache,
+    DiskDemoCacheBackend,
+    RedisDemoCacheBackend,
+    parsed_key,
+)
+from src.server.features.demo_analyzer.service import DemoAnalyzer
+
+
+class DummyBackend:
+    def __init__(self) -> None:
+        self.store: Dict[str, bytes] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.store[key] = value
+
+
+class FailingBackend:
+    async def get(self, key: str) -> Optional[bytes]:
+        raise ConnectionError("redis down")
+
+    async def set(self, key: str, value: bytes) -> None:
+        raise ConnectionError("redis down")
+
+
+def _make_analysis(demo_id: str = "PlayerOne_match") -> DemoAnalysis:
+    return DemoAnalysis(
+        demo_id=demo_id,
+        metadata=DemoMetadata(
+            match_id=demo_id,
+            map_name="de_inferno",
+            game_mode="competitive",
+            date_played=datetime(2024, 1, 1),
+            duration=1800,
+            score={"team1": 13, "team2": 7},
+        ),
+        overall_performance={},
+        round_analysis=[],
+        key_moments=[],
+        recommendations=["Hold angles"],
+        improvement_areas=[],
+    )
+
+
+def test_disk_backend_roundtrip_and_size_eviction(tmp_path: Path) -> None:
+    backend = DiskDemoCacheBackend(str(tmp_path), max_bytes=250, ttl_seconds=0)
+
+    async def _run() -> None:
+        await backend.set("a", b"x" * 100)
+        await backend.set("b", b"y" * 100)
+        os.utime(backend._path("a"), (1, 1))
+        os.utime(backend._path("b"), (2, 2))
+
+        await backend.set("c", b"z" * 100)
+
+        assert await backend.get("a") is None
+        assert await backend.get("b") == b"y" * 100
+        assert await backend.get("c") == b"z" * 100
+        # Entries larger than the whole budget are not stored
+        await backend.set("huge", b"h" * 300)
+        assert await backend.get("huge") is None
+
+    asyncio.run(_run())
+
+
+def test_redis_backend_keeps_one_client_per_event_loop(monkeypatch) -> None:
+    created: List[object] = []
+
+    class DummyRedisModule:
+        @staticmethod
+        def from_url(url: str, decode_responses: bool = False) -> object:  # noqa: ARG004
+            created.append(object())
+            return created[-1]
+
+    monkeypatch.setattr(result_cache_module, "redis", DummyRedisModule)
+    backend = RedisDemoCacheBackend("redis://cache", max_bytes=1024, ttl_seconds=60)
+
+    async def client() -> object:
+        return backend._get_client()
+
+    api_loop = asyncio.new_event_loop()
+    other_loop = asyncio.new_event_loop()
+    try:
+        first = api_loop.run_until_complete(client())
+        other = other_loop.run_until_complete(client())
+        assert api_loop.run_until_complete(client()) is first
+        assert other_loop.run_until_complete(client()) is other
+    finally:
+        api_loop.close()
+        other_loop.close()
+
+    assert len(created) == 2
+
+
+def test_result_cache_roundtrips_analysis_and_parsed() -> None:
+    cache = DemoResultCache(DummyBackend())
+    events = ColumnarDemo.from_parser_output(
+        kills=pd.DataFrame({"attacker_name": ["a", "a"], "victim_name": ["b", "c"]})
+    )
+
+    async def _run() -> None:
+        assert await cache.get_analysis("abc", "en", "PlayerOne") is None
+
+        await cache.set_analysis("abc", "en", "PlayerOne", _make_analysis())
+        cached = await cache.get_analysis("abc", "en", "PlayerOne")
+        assert cached is not None and cached.recommendations == ["Hold angles"]
+        assert await cache.get_analysis("abc", "ru", "PlayerOne") is None
+
+        await cache.set_parsed("abc", {"map": "de_nuke", "events": events})
+        parsed = await cache.get_parsed("abc")
+        assert parsed is not None
+        assert parsed["events"].player_stats("a")["kills"] == 2
+
+    asyncio.run(_run())
+
+
+def test_parsed_entries_keep_column_types_and_never_unpickle() -> None:
+    backend = DummyBackend()
+    cache = DemoResultCache(backend)
+    events = ColumnarDemo.from_parser_output(
+        kills=pd.DataFrame(
+            {
+                "attacker_name": ["a", None, "b"],
+                "victim_name": ["b", "c", "a"],
+                "headshot": [True, False, True],
+                "round": [1, 1, 2],
+                "tick": [10, 20, 30],
+            }
+        ),
+        damage=pd.DataFrame({"attacker_name": ["a"], "hp_damage": [27.5], "round": [1]}),
+    )
+
+    class Exploit:
+        def __reduce__(self):
+            return (os.system, ("exit 1",))
+
+    async def _run() -> None:
+        await cache.set_parsed("abc", {"map": "de_nuke", "tickrate": 64, "events": events})
+        parsed = await cache.get_parsed("abc")
+        assert parsed is not None
+        assert (parsed["map"], parsed["tickrate"]) == ("de_nuke", 64)
+        kills = parsed["events"].kills
+        assert kills.get("attacker_name").tolist() == ["a", None, "b"]
+        assert kills.get("headshot").dtype == events.kills.get("headshot").dtype
+        assert kills.get("round").dtype == events.kills.get("round").dtype
+        assert len(parsed["events"].rounds) == 0
+        assert parsed["events"].player_stats("a") == events.player_stats("a")
+
+        backend.store[parsed_key("evil")] = zlib.compress(pickle.dumps({"events": Exploit()}))
+        assert await cache.get_parsed("evil") is None
+
+    asyncio.run(_run())
+
+
+def test_result_cache_treats_backend_errors_as_miss() -> None:
+    cache = DemoResultCache(FailingBackend())
+
+    async def _run() -> None:
+        await cache.set_analysis("abc", "en", "PlayerOne", _make_analysis())
+        assert await cache.get_analysis("abc", "en", "PlayerOne") is None
+        assert await cache.get_parsed("abc") is None
+
+    asyncio.run(_run())
+
+
+def test_analyze_demo_returns_cached_analysis_without_parsing(monkeypatch) -> None:
+    cache = DemoResultCache(DummyBackend())
+    monkeypatch.setattr(service_module, "get_demo_result_cache", lambda: cache)
+
+    analyzer = DemoAnalyzer.__new__(DemoAnalyzer)
+
+    async def _fail_parse(*_: Any, **__: Any) -> Dict[str, Any]:
+        raise AssertionError("demo must not be parsed on a cache hit")
+
+    monkeypatch.setattr(analyzer, "_parse_demo_file", _fail_parse)
+
+    async def _run() -> DemoAnalysis:
+        spool_upload = UploadFile(filename="PlayerOne_first.dem", file=io.BytesIO(b"same-bytes"))
+        tmp_path, _, file_hash = await analyzer._spool_demo_file(spool_upload)
+        os.unlink(tmp_path)
+        await cache.set_analysis(file_hash, "en", "PlayerOne", _make_analysis("PlayerOne_first"))
+
+        upload = UploadFile(filename="PlayerOne_again.dem", file=io.BytesIO(b"same-bytes"))
+        return await analyzer.analyze_demo(upload, language="en")
+
+    analysis = asyncio.run(_run())
+
+    assert analysis.recommendations == ["Hold angles"]
+    assert analysis.demo_id == "PlayerOne_again"
+    assert analysis.metadata.match_id == "PlayerOne_again"
+
+
+def test_spool_demo_file_rejects_oversized_upload_and_cleans_up(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(service_module.settings, "MAX_DEMO_FILE_MB", 0)
+    monkeypatch.setattr(service_module.tempfile, "tempdir", str(tmp_path))
+
+    analyzer = DemoAnalyzer.__new__(DemoAnalyzer)
+    upload = UploadFile(filename="PlayerOne_big.dem", file=io.BytesIO(b"x" * 10))
+
+    with pytest.raises(service_module.DemoAnalysisException):
+        asyncio.run(analyzer._spool_demo_file(upload))
+
+    assert list(tmp_path.iterdir()) == []
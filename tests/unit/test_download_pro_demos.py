@@ -0,0 +1,199 @@
+import asyncio
+import base64
+import bz2
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from scripts import download_pro_demos as downloader
+from src.server.database.models import Base, ProDemo, ProDemoStatus
+
+DEMO = b"PBDEMS2\x00" + bytes(range(256)) * 40
+
+
+class DummyContent:
+    def __init__(self, data: bytes, fail_after: Optional[int]) -> None:
+        self.data = data
+        self.fail_after = fail_after
+
+    async def iter_chunked(self, size: int):
+        sent = 0
+        for start in range(0, len(self.data), size):
+            if self.fail_after is not None and sent >= self.fail_after:
+                raise aiohttp.ClientPayloadError("connection reset")
+            chunk = self.data[start : start + size]
+            sent += len(chunk)
+            yield chunk
+
+
+class DummyResponse:
+    def __init__(self, status: int, headers: Dict[str, str], data: bytes, fail_after: Optional[int]) -> None:
+        self.status = status
+        self.headers = headers
+        self.content = DummyContent(data, fail_after)
+
+    async def __aenter__(self) -> "DummyResponse":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+
+class DummySession:
+    """Serves ``body`` with Range/If-Range support; the first response can be cut short."""
+
+    def __init__(
+        self,
+        body: bytes,
+        fail_first_after: Optional[int] = None,
+        extra_headers=None,
+        etag: Optional[str] = '"v1"',
+    ) -> None:
+        self.body = body
+        self.fail_first_after = fail_first_after
+        self.extra_headers = extra_headers or {}
+        self.etag = etag
+        self.requests: List[Dict[str, str]] = []
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> DummyResponse:
+        headers = headers or {}
+        self.requests.append(headers)
+        fail_after, self.fail_first_after = self.fail_first_after, None
+        total = len(self.body)
+        base_headers = {"ETag": self.etag} if self.etag else {}
+        if "Range" in headers and headers.get("If-Range", self.etag) == self.etag:
+            start = int(headers["Range"].split("=")[1].rstrip("-"))
+            response_headers = {
+                "Content-Range": f"bytes {start}-{total - 1}/{total}",
+                "Content-Length": str(total - start),
+                **base_headers,
+                **self.extra_headers,
+            }
+            return DummyResponse(206, response_headers, self.body[start:], fail_after)
+        response_headers = {"Content-Length": str(total), **base_headers, **self.extra_headers}
+        return DummyResponse(200, response_headers, self.body, fail_after)
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_with_range_after_interruption(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    sha1 = hashlib.sha1(DEMO).hexdigest()
+    session = DummySession(DEMO, fail_first_after=4096, extra_headers={"x-bz-content-sha1": sha1})
+    dest = tmp_path / "match.dem"
+
+    result = await downloader.download_file(session, "https://cdn/match.dem", dest, chunk_size=1024)
+
+    assert dest.read_bytes() == DEMO
+    assert result.sha256 == hashlib.sha256(DEMO).hexdigest()
+    assert session.requests == [{}, {"Range": "bytes=4096-", "If-Range": '"v1"'}]
+    assert not (tmp_path / "match.dem.part").exists()
+    assert not (tmp_path / "match.dem.part.meta").exists()
+
+
+@pytest.mark.asyncio
+async def test_download_restarts_when_the_object_changed_between_runs(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    old = b"PBDEMS2\x00" + b"old" * 2000
+    dest = tmp_path / "match.dem"
+    first = DummySession(old, fail_first_after=2048)
+    with pytest.raises(downloader.DownloadError):
+        await downloader.download_file(first, "https://cdn/match.dem", dest, chunk_size=1024, max_attempts=1)
+    assert (tmp_path / "match.dem.part").stat().st_size == 2048
+
+    # Same size, new content, no checksum header: only If-Range catches it
+    new = b"PBDEMS2\x00" + b"new" * 2000
+    second = DummySession(new, etag='"v2"')
+    await downloader.download_file(second, "https://cdn/match.dem", dest, chunk_size=1024)
+
+    assert second.requests == [{"Range": "bytes=2048-", "If-Range": '"v1"'}]
+    assert dest.read_bytes() == new
+
+
+@pytest.mark.asyncio
+async def test_download_without_validator_does_not_resume(tmp_path: Path) -> None:
+    dest = tmp_path / "match.dem"
+    (tmp_path / "match.dem.part").write_bytes(b"stale prefix")
+    session = DummySession(DEMO, etag=None)
+
+    result = await downloader.download_file(session, "https://cdn/match.dem", dest)
+
+    assert session.requests == [{}]
+    assert result.resumed_from == 0
+    assert dest.read_bytes() == DEMO
+
+
+@pytest.mark.asyncio
+async def test_download_decompresses_bz2_and_checks_md5(tmp_path: Path) -> None:
+    packed = bz2.compress(DEMO)
+    md5 = base64.b64encode(hashlib.md5(packed).digest()).decode()
+    session = DummySession(packed, extra_headers={"Content-MD5": md5})
+    dest = tmp_path / downloader.demo_filename("https://cdn/m.dem.bz2?sig=1", "x.dem")
+
+    await downloader.download_file(session, "https://cdn/m.dem.bz2?sig=1", dest)
+
+    assert dest.name == "m.dem"
+    assert dest.read_bytes() == DEMO
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["m.dem"]
+
+
+@pytest.mark.asyncio
+async def test_download_rejects_checksum_mismatch(tmp_path: Path) -> None:
+    session = DummySession(DEMO, extra_headers={"x-bz-content-sha1": "0" * 40})
+    dest = tmp_path / "match.dem"
+
+    with pytest.raises(downloader.DownloadError, match="sha1 mismatch"):
+        await downloader.download_file(session, "https://cdn/match.dem", dest)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+class DummyFaceitClient:
+    def __init__(self, urls: Dict[str, Optional[str]]) -> None:
+        self.urls = urls
+
+    async def get_match_details(self, match_id: str) -> Dict[str, Any]:
+        url = self.urls[match_id]
+        return {"demo_url": [url] if url else []}
+
+
+@pytest.mark.asyncio
+async def test_download_pending_pro_demos_sets_statuses(tmp_path: Path) -> None:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all(
+        [
+            ProDemo(faceit_match_id="m1", status=ProDemoStatus.QUEUED),
+            ProDemo(faceit_match_id="m2", status=ProDemoStatus.QUEUED),
+        ]
+    )
+    db.commit()
+    db.close()
+
+    client = DummyFaceitClient({"m1": "https://cdn/m1.dem", "m2": None})
+    result = await downloader.download_pending_pro_demos(
+        tmp_path / "demos",
+        limit=10,
+        concurrency=2,
+        session_factory=session_factory,
+        client=client,
+        http_session=DummySession(DEMO),
+    )
+
+    assert result == (1, 1)
+    db = session_factory()
+    demos = {demo.faceit_match_id: demo for demo in db.query(ProDemo).all()}
+    assert demos["m1"].status == ProDemoStatus.DOWNLOADED
+    assert Path(demos["m1"].storage_path).read_bytes() == DEMO
+    assert demos["m2"].status == ProDemoStatus.FAILED
+    db.close()
+
+
+async def _no_sleep(_delay: float) -> None:
+    return None
@@ -0,0 +1,143 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from scripts import extract_pro_demo_features as extract_script
+from src.server.database.models import Base, DemoFeature, ProDemo, ProDemoStatus
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _add_demos(session_factory, tmp_path: Path, names: List[str]) -> None:
+    db = session_factory()
+    for idx, name in enumerate(names):
+        path = tmp_path / f"{name}.dem"
+        if name != "missing":
+            path.write_bytes(b"demo")
+        db.add(
+            ProDemo(
+                faceit_match_id=f"match-{idx}",
+                storage_path=str(path),
+                status=ProDemoStatus.DOWNLOADED,
+            )
+        )
+    db.commit()
+    db.close()
+
+
+def _fake_rows(demo_path: Path) -> List[Dict[str, Any]]:
+    if demo_path.stem == "broken":
+        raise RuntimeError("bad demo")
+    if demo_path.stem == "empty":
+        return []
+    return [
+        {"steam_id": f"{demo_path.stem}-{player}", "kills": player, "deaths": 1, "adr": 80.0}
+        for player in range(3)
+    ]
+
+
+def test_process_pro_demos_bulk_inserts_and_sets_statuses(
+    session_factory, tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(extract_script, "extract_player_feature_rows", _fake_rows)
+    monkeypatch.setattr(extract_script, "INSERT_CHUNK_ROWS", 2)
+    _add_demos(session_factory, tmp_path, ["a", "broken", "missing", "b", "empty"])
+
+    processed, failed = extract_script.process_pro_demos(
+        limit=10, source="pro", batch_size=2, session_factory=session_factory
+    )
+
+    assert (processed, failed) == (2, 3)
+    db = session_factory()
+    statuses = {demo.faceit_match_id: demo.status for demo in db.query(ProDemo).all()}
+    assert statuses == {
+        "match-0": ProDemoStatus.PARSED,
+        "match-1": ProDemoStatus.FAILED,
+        "match-2": ProDemoStatus.FAILED,
+        "match-3": ProDemoStatus.PARSED,
+        "match-4": ProDemoStatus.FAILED,
+    }
+    features = db.query(DemoFeature).order_by(DemoFeature.id).all()
+    assert [f.steam_id for f in features] == ["a-0", "a-1", "a-2", "b-0", "b-1", "b-2"]
+    assert {f.source for f in features} == {"pro"}
+    db.close()
+
+
+def test_process_pro_demos_respects_limit_and_skips_parsed(
+    session_factory, tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(extract_script, "extract_player_feature_rows", _fake_rows)
+    _add_demos(session_factory, tmp_path, ["a", "b", "c"])
+
+    assert extract_script.process_pro_demos(
+        limit=2, source="pro", batch_size=5, session_factory=session_factory
+    ) == (2, 0)
+    # The next run only claims what is still unparsed
+    assert extract_script.process_pro_demos(
+        limit=10, source="pro", session_factory=session_factory
+    ) == (1, 0)
+    assert extract_script.process_pro_demos(
+        limit=10, source="pro", session_factory=session_factory
+    ) == (0, 0)
+
+
+class DummyCrashingExecutor:
+    """Runs tasks inline; a "crash" demo breaks the pool for itself and later tasks."""
+
+    def __init__(self) -> None:
+        self.broken = False
+        self.shut_down = False
+
+    def submit(self, fn, path: str) -> Future:
+        future: Future = Future()
+        if Path(path).stem == "crash":
+            self.broken = True
+        if self.broken:
+            future.set_exception(BrokenProcessPool("worker died"))
+        else:
+            future.set_result(fn(path))
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:  # noqa: ARG002
+        self.shut_down = True
+
+
+def test_broken_pool_leaves_unfinished_demos_for_the_next_run(
+    session_factory, tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(extract_script, "extract_player_feature_rows", _fake_rows)
+    executors: List[DummyCrashingExecutor] = []
+
+    def make_executor(workers: int) -> DummyCrashingExecutor:  # noqa: ARG001
+        executors.append(DummyCrashingExecutor())
+        return executors[-1]
+
+    monkeypatch.setattr(extract_script, "_make_executor", make_executor)
+    _add_demos(session_factory, tmp_path, ["a", "crash", "b", "c", "d"])
+
+    processed, failed = extract_script.process_pro_demos(
+        limit=10, source="pro", workers=2, batch_size=3, session_factory=session_factory
+    )
+
+    assert (processed, failed) == (3, 0)
+    assert len(executors) == 2 and executors[0].shut_down
+    db = session_factory()
+    statuses = {demo.faceit_match_id: demo.status for demo in db.query(ProDemo).all()}
+    assert statuses == {
+        "match-0": ProDemoStatus.PARSED,
+        "match-1": ProDemoStatus.DOWNLOADED,
+        "match-2": ProDemoStatus.DOWNLOADED,
+        "match-3": ProDemoStatus.PARSED,
+        "match-4": ProDemoStatus.PARSED,
+    }
+    db.close()
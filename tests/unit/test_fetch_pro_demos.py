@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from scripts import fetch_pro_demos as fetcher
+from src.server.database.models import Base, ProDemo, ProDemoStatus
+
+BASE_TS = 1_700_000_000
+
+
+class DummyFaceitClient:
+    def __init__(self, histories: Dict[str, List[Dict[str, Any]]]) -> None:
+        self.histories = histories
+        self.calls: List[Dict[str, Any]] = []
+
+    async def get_player_by_nickname(self, nickname: str) -> Optional[Dict[str, Any]]:
+        return {"player_id": f"id-{nickname}"}
+
+    async def get_match_history(
+        self, player_id: str, limit: int, offset: int = 0, from_ts: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        self.calls.append({"player_id": player_id, "limit": limit, "offset": offset, "from_ts": from_ts})
+        items = [
+            item
+            for item in self.histories.get(player_id, [])
+            if from_ts is None or item["started_at"] >= from_ts
+        ]
+        return items[offset : offset + limit]
+
+
+def _history(prefix: str, count: int) -> List[Dict[str, Any]]:
+    # Newest first, like the FACEIT API
+    return [
+        {"match_id": f"{prefix}-{idx}", "started_at": BASE_TS + idx * 3600}
+        for idx in reversed(range(count))
+    ]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.mark.asyncio
+async def test_fetch_pages_history_and_upserts_shared_matches(
+    session_factory, tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(fetcher, "HISTORY_PAGE_SIZE", 2)
+    config = tmp_path / "pros.json"
+    config.write_text(json.dumps([{"nickname": "a"}, {"faceit_id": "id-b"}, {"nickname": None}]))
+    shared = {"match_id": "shared", "started_at": BASE_TS + 99 * 3600}
+    client = DummyFaceitClient({"id-a": [shared] + _history("a", 4), "id-b": [shared] + _history("b", 1)})
+
+    created = await fetcher.fetch_pro_demos(
+        config, limit=10, concurrency=2, session_factory=session_factory, client=client
+    )
+
+    assert created == 6
+    assert [call["offset"] for call in client.calls if call["player_id"] == "id-a"] == [0, 2, 4]
+    db = session_factory()
+    demos = {demo.faceit_match_id: demo for demo in db.query(ProDemo).all()}
+    assert set(demos) == {"shared", "a-0", "a-1", "a-2", "a-3", "b-0"}
+    assert demos["a-3"].status == ProDemoStatus.QUEUED
+    assert demos["a-3"].started_at == datetime.utcfromtimestamp(BASE_TS + 3 * 3600)
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_is_incremental_from_latest_started_at(
+    session_factory, tmp_path: Path
+) -> None:
+    config = tmp_path / "pros.json"
+    config.write_text(json.dumps([{"faceit_id": "id-a"}]))
+    client = DummyFaceitClient({"id-a": _history("a", 3)})
+    await fetcher.fetch_pro_demos(config, limit=10, session_factory=session_factory, client=client)
+
+    client.histories["id-a"] = _history("a", 5)
+    client.calls.clear()
+    created = await fetcher.fetch_pro_demos(config, limit=10, session_factory=session_factory, client=client)
+
+    assert created == 2
+    assert client.calls[0]["from_ts"] == BASE_TS + 2 * 3600 + 1
@@ -0,0 +1,88 @@
+import src.server.core.performance as performance
+from src.server.core.performance import CacheManager, cached, invalidate_user_cache
+
+
+class DummyPipeline:
+    def __init__(self, redis: "DummyRedis") -> None:
+        self.redis = redis
+        self.commands: list[tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args) -> None:
+            self.commands.append((name, args))
+
+        return queue
+
+    def execute(self) -> list:
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
+class DummyRedis:
+    def __init__(self) -> None:
+        self.store: dict[str, str] = {}
+        self.sets: dict[str, dict[str, float]] = {}
+
+    def get(self, key: str):
+        return self.store.get(key)
+
+    def setex(self, key: str, ttl: int, value: str) -> bool:  # noqa: ARG002
+        self.store[key] = value
+        return True
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        self.sets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zremrangebyscore(self, key: str, low: str, high: float) -> int:  # noqa: ARG002
+        members = self.sets.get(key, {})
+        stale = [member for member, score in members.items() if score <= high]
+        for member in stale:
+            del members[member]
+        return len(stale)
+
+    def expire(self, key: str, ttl: int) -> bool:  # noqa: ARG002
+        return True
+
+    def zpopmin(self, key: str, count: int) -> list[tuple[str, float]]:
+        members = self.sets.get(key, {})
+        popped = sorted(members.items(), key=lambda item: item[1])[:count]
+        for member, _score in popped:
+            del members[member]
+        return popped
+
+    def unlink(self, *keys: str) -> int:
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+    def pipeline(self, transaction: bool = True) -> DummyPipeline:  # noqa: ARG002
+        return DummyPipeline(self)
+
+
+def test_invalidate_user_cache_drops_entries_tagged_by_cached(monkeypatch) -> None:
+    manager = CacheManager.__new__(CacheManager)
+    manager.redis_client = DummyRedis()
+    monkeypatch.setattr(performance, "cache_manager", manager)
+    calls = []
+
+    @cached(ttl=60, key_prefix="profile", tags=lambda user_id: [f"user:{user_id}"])
+    def load_profile(user_id: int) -> dict:
+        calls.append(user_id)
+        return {"id": user_id}
+
+    @cached(ttl=60, key_prefix="profile")
+    def load_untagged(user_id: int) -> dict:
+        return {"id": user_id}
+
+    assert load_profile(42) == {"id": 42}
+    assert load_profile(42) == {"id": 42}
+    load_profile(7)
+    load_untagged(42)
+    assert calls == [42, 7]
+
+    invalidate_user_cache(42)
+
+    keys = set(manager.redis_client.store)
+    assert not any("load_profile:(42,)" in key for key in keys)
+    assert any("load_profile:(7,)" in key for key in keys)
+    assert any("load_untagged" in key for key in keys)
+    load_profile(42)
+    assert calls == [42, 7, 42]
@@ -5,6 +5,7 @@ import pytest
 from unittest.mock import Mock, AsyncMock
 from fastapi import HTTPException
 from src.server.features.player_analysis.service import PlayerAnalysisService
+from src.server.services.cache_service import cache_service
 from src.server.features.player_analysis.schemas import (
     PlayerStats,
     PlayerWeaknesses,
@@ -12,6 +13,16 @@ from src.server.features.player_analysis.schemas import (
 )
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch):
+    """Player analysis is cached: start every test with an empty cache."""
+    monkeypatch.setattr(cache_service, "enabled", False, raising=False)
+    monkeypatch.setattr(cache_service, "redis_client", None, raising=False)
+    cache_service.clear_local()
+    yield
+    cache_service.clear_local()
+
+
 @pytest.fixture
 def mock_faceit_client():
     """Mock Faceit API client"""
@@ -87,6 +98,22 @@ async def test_analyze_player_success(mock_faceit_client, mock_ai_service):
     assert result.stats.win_rate == 55.0
 
 
+@pytest.mark.asyncio
+async def test_analyze_player_is_cached_per_language(mock_faceit_client, mock_ai_service):
+    """Repeated analysis is served from cache; another language is computed separately."""
+    service = PlayerAnalysisService()
+    service.faceit_client = mock_faceit_client
+    service.ai_service = mock_ai_service
+
+    first = await service.analyze_player("TestPlayer")
+    second = await service.analyze_player("testplayer")
+    other_language = await service.analyze_player("TestPlayer", language="en")
+
+    assert first is not None and second is not None and other_language is not None
+    assert second.player_id == first.player_id
+    assert mock_ai_service.analyze_player_with_ai.await_count == 2
+
+
 @pytest.mark.asyncio
 async def test_analyze_player_not_found(mock_faceit_client, mock_ai_service):
     """Test player not found"""
@@ -0,0 +1,86 @@
+import pandas as pd
+
+from src.ml.features.pro_demo_extractor import TRADE_WINDOW_TICKS, compute_player_feature_rows
+
+
+def _kills() -> pd.DataFrame:
+    rows = [
+        # round 1: alice opens, later avenges bob
+        ("alice", "carol", None, False, True, 1, 100),
+        ("carol2", "bob", "dave", False, False, 1, 150),
+        ("alice", "carol2", None, True, False, 1, 200),
+        # round 2: dave opens on alice, bob trades within the window
+        ("dave", "alice", None, True, False, 2, 1000),
+        ("bob", "dave", "alice", True, True, 2, 1000 + TRADE_WINDOW_TICKS - 1),
+        # round 3: a late revenge kill is not a trade
+        ("dave", "bob", None, False, False, 3, 5000),
+        ("alice", "dave", None, False, False, 3, 5000 + TRADE_WINDOW_TICKS + 1),
+    ]
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "attackername",
+            "victimname",
+            "assistername",
+            "headshot",
+            "assistedflash",
+            "total_rounds_played",
+            "tick",
+        ],
+    )
+
+
+def _damage() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "attackername": ["alice", "alice", "bob", "erin"],
+            "hp_damage": [100, 50, 100, 30],
+        }
+    )
+
+
+def _by_player(rows):
+    return {row["steam_id"]: row for row in rows}
+
+
+def test_core_stats_match_per_player_counts() -> None:
+    rows = _by_player(compute_player_feature_rows(_kills(), _damage(), total_rounds=3))
+
+    assert sorted(rows) == ["alice", "bob", "carol", "carol2", "dave", "erin"]
+    alice = rows["alice"]
+    assert (alice["kills"], alice["deaths"], alice["damage"]) == (3, 1, 150.0)
+    assert alice["adr"] == 50.0
+    assert alice["round_impact_score"] == 3 + 0.003 * 150
+    # Players that only dealt damage still get a row
+    assert rows["erin"]["kills"] == 0 and rows["erin"]["damage"] == 30.0
+
+
+def test_per_round_columns_are_filled_from_the_same_pass() -> None:
+    rows = _by_player(compute_player_feature_rows(_kills(), _damage(), total_rounds=3))
+
+    assert rows["alice"]["multikills"] == 1
+    assert rows["bob"]["multikills"] == 0
+    assert rows["alice"]["opening_duels_won"] == 1
+    assert rows["dave"]["opening_duels_won"] == 2
+    # alice avenges bob (round 1), bob avenges alice (round 2); round 3 is too late
+    assert rows["alice"]["trade_kills"] == 1
+    assert rows["bob"]["trade_kills"] == 1
+    assert rows["dave"]["trade_kills"] == 0
+    assert rows["dave"]["assists"] == 1
+    assert rows["alice"]["flash_assists"] == 1
+    assert rows["dave"]["flash_assists"] == 0
+
+
+def test_per_round_columns_stay_none_without_round_data() -> None:
+    kills = _kills().drop(columns=["total_rounds_played", "assistername", "assistedflash"])
+
+    rows = _by_player(compute_player_feature_rows(kills, pd.DataFrame(), total_rounds=0))
+
+    assert rows["alice"]["kills"] == 3
+    assert rows["alice"]["adr"] == 0.0
+    for key in ("multikills", "opening_duels_won", "trade_kills", "assists", "flash_assists"):
+        assert rows["alice"][key] is None
+
+
+def test_empty_tables_yield_no_rows() -> None:
+    assert compute_player_feature_rows(pd.DataFrame(), pd.DataFrame(), total_rounds=10) == []
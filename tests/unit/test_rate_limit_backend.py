@@ -0,0 +1,39 @@
+"""Unit tests for the in-process fallback counter in services.rate_limit_backend."""
+
+from src.server.services.rate_limit_backend import BucketedWindowCounter
+
+
+def test_bucketed_counter_counts_within_window():
+    counter = BucketedWindowCounter(60, buckets=12)
+
+    for offset in (0.0, 1.0, 30.0):
+        counter.add("1.2.3.4", now=1000.0 + offset)
+
+    assert counter.count("1.2.3.4", now=1030.0) == 3
+    assert counter.count("5.6.7.8", now=1030.0) == 0
+
+
+def test_bucketed_counter_drops_expired_buckets():
+    counter = BucketedWindowCounter(60, buckets=12)
+
+    counter.add("ip", now=1000.0)
+    counter.add("ip", now=1040.0)
+
+    # The first hit slides out after one window, the second is still counted
+    assert counter.count("ip", now=1065.0) == 1
+    assert counter.count("ip", now=1200.0) == 0
+
+
+def test_bucketed_counter_evicts_least_recently_used_key():
+    counter = BucketedWindowCounter(60, buckets=12, max_keys=2)
+
+    counter.add("a", now=1000.0)
+    counter.add("b", now=1000.0)
+    # Touch "a" so "b" becomes the eviction candidate
+    counter.count("a", now=1001.0)
+    counter.add("c", now=1002.0)
+
+    assert len(counter) == 2
+    assert counter.count("a", now=1003.0) == 1
+    assert counter.count("b", now=1003.0) == 0
+    assert counter.count("c", now=1003.0) == 1
@@ -28,6 +28,24 @@ class DummyRedis:
     async def expire(self, key: str, ttl: int) -> None:
         self.expires[key] = ttl
 
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args):  # noqa: ARG002
+        """Python emulation of the rate limit Lua script (counters only)."""
+        keys = keys_and_args[:numkeys]
+        argv = [int(a) for a in keys_and_args[numkeys:]]
+        stop_on_exceed = argv[2] == 1
+        result = [0, 0, 0, 0]
+        for i, key in enumerate(keys, start=1):
+            window, limit = argv[5 + i * 2], argv[6 + i * 2]
+            count = await self.incr(key)
+            if count == 1:
+                await self.expire(key, window)
+            result.append(count)
+            if limit > 0 and count > limit and result[2] == 0:
+                result[2] = i
+                if stop_on_exceed:
+                    break
+        return result
+
 
 @pytest.fixture
 def db_session():
@@ -81,7 +99,7 @@ def service_with_redis(monkeypatch):
 
 
 @pytest.mark.asyncio
-async def test_enforce_user_operation_limit_no_redis_does_nothing(monkeypatch, db_session):
+async def test_enforce_user_operation_limit_no_redis_allows_first_request(monkeypatch, db_session):
     # Simulate disabled cache/Redis so RateLimitService has no redis_client
     monkeypatch.setattr(cache_service, "enabled", False, raising=False)
     monkeypatch.setattr(cache_service, "redis_client", None, raising=False)
@@ -247,3 +265,30 @@ async def test_enforce_user_operation_limit_exceeds_day_limit_raises(monkeypatch
         )
 
     assert exc.value.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_enforce_user_operation_limit_no_redis_uses_local_window(monkeypatch, db_session):
+    monkeypatch.setattr(cache_service, "enabled", False, raising=False)
+    monkeypatch.setattr(cache_service, "redis_client", None, raising=False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BYPASS_USER_ID", None, raising=False)
+
+    service = RateLimitService()
+    user = create_user(db_session)
+    add_subscription(db_session, user, SubscriptionTier.FREE, expired=False)
+
+    # Free tier allows one player analysis per minute
+    await service.enforce_user_operation_limit(
+        db=db_session,
+        user_id=user.id,
+        operation="player_analysis",
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await service.enforce_user_operation_limit(
+            db=db_session,
+            user_id=user.id,
+            operation="player_analysis",
+        )
+
+    assert exc.value.status_code == 429
@@ -38,9 +38,50 @@ class DummyRedis:
         self.storage[key] = value
         self.expires[key] = ttl
 
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args):  # noqa: ARG002
+        """Python emulation of the rate limit Lua script."""
+        keys = [str(k) for k in keys_and_args[:numkeys]]
+        argv = [int(a) for a in keys_and_args[numkeys:]]
+        n_ban, n_counters, stop_on_exceed, violation_window, ban_threshold, ban_ttl, force = argv[:7]
+        ban_keys = keys[:n_ban]
+        counter_keys = keys[n_ban : n_ban + n_counters]
+        violation_keys = keys[n_ban + n_counters :]
+
+        if not force:
+            for key in ban_keys:
+                if key in self.storage:
+                    return [1, self.expires.get(key, -1), 0, 0]
+
+        result = [0, 0, 0, 0]
+        exceeded = 0
+        for i, key in enumerate(counter_keys, start=1):
+            window, limit = argv[5 + i * 2], argv[6 + i * 2]
+            count = await self.incr(key)
+            if count == 1:
+                await self.expire(key, window)
+            result.append(count)
+            if limit > 0 and count > limit and exceeded == 0:
+                exceeded = i
+                if stop_on_exceed:
+                    break
+        result[2] = exceeded
+
+        if (exceeded or force) and ban_threshold > 0:
+            worst = 0
+            for key in violation_keys:
+                violations = await self.incr(key)
+                if violations == 1:
+                    await self.expire(key, violation_window)
+                worst = max(worst, violations)
+            if worst >= ban_threshold:
+                for key in ban_keys:
+                    await self.setex(key, ban_ttl, "1")
+                result[3] = 1
+        return result
+
 
 class FailingRedis:
-    """Redis stub that always fails on incr to simulate connection errors."""
+    """Redis stub that always fails to simulate connection errors."""
 
     async def incr(self, key: str) -> int:  # noqa: ARG002
         raise RuntimeError("redis unavailable")
@@ -49,6 +90,9 @@ class FailingRedis:
         # Expire is a no-op in the failing stub
         return None
 
+    async def evalsha(self, *args):  # noqa: ARG002
+        raise RuntimeError("redis unavailable")
+
 
 def make_request(path: str = "/test", headers: dict[str, str] | None = None) -> Request:
     if headers is None:
@@ -199,3 +243,62 @@ async def test_rate_limiter_redis_error_falls_back_to_memory(monkeypatch):
     assert "1 requests per minute" in exc.value.detail
     # Redis client should be disabled after the first error
     assert limiter.redis_client is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_redis_checks_use_single_script_call(monkeypatch):
+    """Minute and hour counters for IP and user are updated by one script call."""
+    limiter = RateLimiter(requests_per_minute=10, requests_per_hour=1000)
+
+    dummy = DummyRedis()
+    calls = []
+    original = dummy.evalsha
+
+    async def counting_evalsha(*args):
+        calls.append(args)
+        return await original(*args)
+
+    dummy.evalsha = counting_evalsha  # type: ignore[method-assign]
+    limiter.redis_client = dummy
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_BAN_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BYPASS_USER_ID", None, raising=False)
+    monkeypatch.setattr(rl_mod, "decode_access_token", lambda token: {"sub": "123"})
+
+    request = make_request(headers={"Authorization": "Bearer sometoken"})
+    allowed, _ = await limiter.check_rate_limit(request)
+
+    assert allowed is True
+    assert len(calls) == 1
+    assert len(dummy.counters) == 4
+    assert all(value == 1 for value in dummy.counters.values())
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_script_reloaded_after_noscript(monkeypatch):
+    """EVALSHA NOSCRIPT errors (e.g. after a Redis restart) fall back to EVAL."""
+    limiter = RateLimiter(requests_per_minute=10, requests_per_hour=1000)
+
+    dummy = DummyRedis()
+    emulate = dummy.evalsha
+    evals = []
+
+    async def noscript_evalsha(*args):  # noqa: ARG001
+        raise RuntimeError("NOSCRIPT No matching script. Please use EVAL.")
+
+    async def eval_script(script, numkeys, *keys_and_args):
+        evals.append(script)
+        return await emulate("", numkeys, *keys_and_args)
+
+    dummy.evalsha = noscript_evalsha  # type: ignore[method-assign]
+    dummy.eval = eval_script  # type: ignore[attr-defined]
+    limiter.redis_client = dummy
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_BAN_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BYPASS_USER_ID", None, raising=False)
+
+    allowed, _ = await limiter.check_rate_limit(make_request())
+
+    assert allowed is True
+    assert len(evals) == 1
+    assert limiter.redis_client is dummy
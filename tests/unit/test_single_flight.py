@@ -0,0 +1,117 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import pytest
+
+from src.server.core.single_flight import RedisSingleFlight, SingleFlight
+
+
+class DummyRedis:
+    def __init__(self) -> None:
+        self.store: Dict[str, Any] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: Any, nx: bool = False, px: Optional[int] = None) -> bool:
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    async def delete(self, key: str) -> int:
+        return 1 if self.store.pop(key, None) is not None else 0
+
+    async def exists(self, key: str) -> int:
+        return 1 if key in self.store else 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls() -> None:
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch() -> Dict[str, int]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+    assert calls == 1
+    assert results == [{"value": 1}] * 5
+    assert flight.inflight() == 0
+
+    # Once finished, the next call goes upstream again
+    await flight.do("k", fetch)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_to_all_callers() -> None:
+    flight = SingleFlight("test")
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.inflight() == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_leader_cancellation() -> None:
+    flight = SingleFlight("test")
+
+    async def fetch() -> str:
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    leader = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "ok"
+
+
+@pytest.mark.asyncio
+async def test_redis_single_flight_reuses_result_from_other_process() -> None:
+    shared = DummyRedis()
+    first = RedisSingleFlight("test", poll_interval=0.005)
+    second = RedisSingleFlight("test", poll_interval=0.005)
+    first._get_client = lambda: shared  # type: ignore[method-assign]
+    second._get_client = lambda: shared  # type: ignore[method-assign]
+    calls = 0
+
+    async def fetch() -> Dict[str, str]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return {"nickname": "s1mple"}
+
+    results = await asyncio.gather(first.do("k", fetch), second.do("k", fetch))
+
+    assert calls == 1
+    assert results == [{"nickname": "s1mple"}] * 2
+    # The lock is released after the leader publishes its result
+    assert "sf:test:lock:k" not in shared.store
+
+
+@pytest.mark.asyncio
+async def test_redis_single_flight_falls_back_when_redis_fails() -> None:
+    flight = RedisSingleFlight("test")
+
+    def _broken_client() -> Any:
+        raise ConnectionError("redis down")
+
+    flight._get_client = _broken_client  # type: ignore[method-assign]
+
+    async def fetch() -> int:
+        return 42
+
+    assert await flight.do("k", fetch) == 42
@@ -0,0 +1,87 @@
+import gzip
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.server.database.models import Base, ProDemo, ProDemoStatus
+from src.server.sitemap_routes import SitemapStore
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _add_demo(session_factory, match_id: str, nickname: str, updated_at: datetime) -> None:
+    db = session_factory()
+    db.add(
+        ProDemo(
+            faceit_match_id=match_id,
+            faceit_nickname=nickname,
+            status=ProDemoStatus.QUEUED,
+            updated_at=updated_at,
+        )
+    )
+    db.commit()
+    db.close()
+
+
+def _urls(data: bytes) -> list[str]:
+    xml = gzip.decompress(data).decode("utf-8")
+    return [line.strip()[5:-6] for line in xml.splitlines() if "<loc>" in line]
+
+
+def test_rebuild_dedupes_nicknames_into_fixed_chunks(session_factory) -> None:
+    _add_demo(session_factory, "m1", "alpha", datetime(2024, 1, 1))
+    _add_demo(session_factory, "m2", "alpha", datetime(2024, 3, 1))
+    _add_demo(session_factory, "m3", "bravo", datetime(2024, 2, 1))
+    _add_demo(session_factory, "m4", "charlie", datetime(2024, 1, 5))
+    store = SitemapStore(session_factory=session_factory, chunk_size=2)
+
+    store.ensure_fresh()
+
+    assert store.chunk_lastmods() == ["2024-03-01", "2024-01-05"]
+    assert _urls(store.chunk_gzip(1, "https://x")) == [
+        "https://x/players/alpha/analysis",
+        "https://x/players/bravo/analysis",
+    ]
+    assert store.chunk_gzip(3, "https://x") is None
+
+
+def test_refresh_only_rerenders_changed_chunks(session_factory) -> None:
+    _add_demo(session_factory, "m1", "alpha", datetime(2024, 1, 1))
+    _add_demo(session_factory, "m2", "bravo", datetime(2024, 1, 1))
+    _add_demo(session_factory, "m3", "charlie", datetime(2024, 1, 1))
+    store = SitemapStore(session_factory=session_factory, chunk_size=2, refresh_interval=0)
+    store.ensure_fresh()
+    first = store.chunk_gzip(1, "https://x")
+    second = store.chunk_gzip(2, "https://x")
+
+    now = datetime.utcnow()
+    _add_demo(session_factory, "m4", "delta", now)
+    _add_demo(session_factory, "m5", "echo", now)
+    store.ensure_fresh()
+
+    assert store.chunk_gzip(1, "https://x") is first
+    assert store.chunk_gzip(2, "https://x") is not second
+    assert _urls(store.chunk_gzip(2, "https://x"))[-1] == "https://x/players/delta/analysis"
+    assert _urls(store.chunk_gzip(3, "https://x")) == ["https://x/players/echo/analysis"]
+    assert store.chunk_lastmods()[1] == now.strftime("%Y-%m-%d")
+
+
+def test_chunk_keeps_one_rendering_whatever_the_host(session_factory) -> None:
+    _add_demo(session_factory, "m1", "alpha", datetime(2024, 1, 1))
+    store = SitemapStore(session_factory=session_factory)
+    store.rebuild()
+
+    first = store.chunk_gzip(1, "https://x")
+    for idx in range(50):
+        assert _urls(store.chunk_gzip(1, f"https://evil{idx}")) == [f"https://evil{idx}/players/alpha/analysis"]
+
+    assert len(store._rendered) == 1
+    assert store.chunk_gzip(1, "https://evil49") is store.chunk_gzip(1, "https://evil49")
+    assert store.chunk_gzip(1, "https://x") == first
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from typing import Dict, List
+
+import pytest
+
+from src.server.core import task_events
+from src.server.core.task_events import TaskEventHub, TaskEventPublisher
+
+
+class DummySyncRedis:
+    def __init__(self) -> None:
+        self.published: List[tuple] = []
+
+    def publish(self, channel: str, message: str) -> int:
+        self.published.append((channel, json.loads(message)))
+        return 1
+
+
+class DummyPubSub:
+    def __init__(self, messages: "asyncio.Queue[Dict[str, str]]") -> None:
+        self.messages = messages
+        self.patterns: List[str] = []
+
+    async def psubscribe(self, pattern: str) -> None:
+        self.patterns.append(pattern)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def aclose(self) -> None:
+        return None
+
+
+class DummyAsyncRedis:
+    def __init__(self) -> None:
+        self.messages: "asyncio.Queue[Dict[str, str]]" = asyncio.Queue()
+        self.pubsubs: List[DummyPubSub] = []
+
+    def pubsub(self) -> DummyPubSub:
+        pubsub = DummyPubSub(self.messages)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    def publish(self, task_id: str, state: str) -> None:
+        data = json.dumps({"task_id": task_id, "state": state})
+        self.messages.put_nowait({"type": "pmessage", "data": data})
+
+    async def aclose(self) -> None:
+        return None
+
+
+def test_publisher_sends_state_to_task_channel(monkeypatch) -> None:
+    client = DummySyncRedis()
+    publisher = TaskEventPublisher(redis_url="redis://test")
+    monkeypatch.setattr(publisher, "_get_client", lambda: client)
+
+    publisher.publish("abc", "SUCCESS")
+
+    assert client.published == [("task-events:abc", {"task_id": "abc", "state": "SUCCESS"})]
+
+
+@pytest.mark.asyncio
+async def test_hub_fans_out_events_only_to_matching_waiters(monkeypatch) -> None:
+    if task_events.redis_async is None:
+        pytest.skip("redis not installed")
+    redis = DummyAsyncRedis()
+    hub = TaskEventHub(redis_url="redis://test")
+    monkeypatch.setattr(hub, "_client", lambda: redis)
+
+    async with hub.subscribe("a") as first, hub.subscribe("a") as second, hub.subscribe("b") as other:
+        assert hub.connected
+        redis.publish("a", "STARTED")
+        redis.publish("a", "SUCCESS")
+        redis.publish("c", "SUCCESS")
+
+        assert [await asyncio.wait_for(first.get(), 1) for _ in range(2)] == ["STARTED", "SUCCESS"]
+        assert [await asyncio.wait_for(second.get(), 1) for _ in range(2)] == ["STARTED", "SUCCESS"]
+        assert other.empty()
+
+    assert redis.pubsubs[0].patterns == ["task-events:*"]
+    await hub.close()
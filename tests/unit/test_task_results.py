@@ -0,0 +1,118 @@
+"""Unit tests for out-of-band task result storage."""
+
+import pytest
+
+from src.server.core.task_results import (
+    RESULT_REF_KEY,
+    DiskTaskResultBackend,
+    TaskResultStore,
+    decode_section,
+    encode_section,
+    parse_fields,
+    project,
+)
+
+
+class DummyBackend:
+    def __init__(self):
+        self.data = {}
+        self.requested = []
+
+    def put(self, key, sections, ttl_seconds):  # noqa: ARG002
+        self.data[key] = dict(sections)
+
+    def get(self, key, names):
+        self.requested.append(list(names))
+        stored = self.data.get(key, {})
+        return {name: stored[name] for name in names if name in stored}
+
+
+def _analysis_result():
+    return {
+        "status": "completed",
+        "user_id": "42",
+        "analysis": {
+            "metadata": {"map_name": "de_mirage", "score": {"ct": 13, "t": 7}},
+            "coach_report": {"summary": "Trade your entries", "drills": ["a"] * 50},
+            "round_analysis": [{"round": i, "events": ["kill"] * 20} for i in range(30)],
+        },
+    }
+
+
+def test_section_codec_roundtrip():
+    value = {"text": "привет", "items": [1, 2.5, None, True]}
+
+    assert decode_section(encode_section(value)) == value
+
+
+def test_small_results_stay_inline():
+    store = TaskResultStore(DummyBackend(), min_bytes=1 << 20, ttl_seconds=60)
+    result = {"status": "completed"}
+
+    assert store.offload("task-1", result) is result
+
+
+def test_offload_returns_pointer_and_load_restores_result():
+    backend = DummyBackend()
+    store = TaskResultStore(backend, min_bytes=0, ttl_seconds=60)
+    result = _analysis_result()
+
+    pointer = store.offload("task-1", result)
+
+    assert set(pointer) == {RESULT_REF_KEY}
+    assert pointer[RESULT_REF_KEY]["key"] == "task-result:task-1"
+    assert "analysis.round_analysis" in pointer[RESULT_REF_KEY]["sections"]
+    assert store.load(pointer) == result
+
+
+def test_projection_reads_only_needed_sections():
+    backend = DummyBackend()
+    store = TaskResultStore(backend, min_bytes=0, ttl_seconds=60)
+    pointer = store.offload("task-1", _analysis_result())
+
+    projected = store.load(pointer, ["analysis.metadata", "analysis.coach_report.summary", "missing.path"])
+
+    assert projected == {
+        "analysis": {
+            "metadata": {"map_name": "de_mirage", "score": {"ct": 13, "t": 7}},
+            "coach_report": {"summary": "Trade your entries"},
+        }
+    }
+    assert sorted(backend.requested[-1]) == ["analysis.coach_report", "analysis.metadata"]
+
+
+def test_load_raises_when_sections_expired():
+    backend = DummyBackend()
+    store = TaskResultStore(backend, min_bytes=0, ttl_seconds=60)
+    pointer = store.offload("task-1", _analysis_result())
+    backend.data.clear()
+
+    with pytest.raises(LookupError):
+        store.load(pointer)
+
+
+def test_storage_error_keeps_result_inline():
+    class BrokenBackend(DummyBackend):
+        def put(self, key, sections, ttl_seconds):
+            raise OSError("disk full")
+
+    store = TaskResultStore(BrokenBackend(), min_bytes=0, ttl_seconds=60)
+    result = _analysis_result()
+
+    assert store.offload("task-1", result) is result
+
+
+def test_disk_backend_roundtrip(tmp_path):
+    store = TaskResultStore(DiskTaskResultBackend(str(tmp_path)), min_bytes=0, ttl_seconds=3600)
+    result = _analysis_result()
+
+    pointer = store.offload("task/1", result)
+
+    assert store.load(pointer) == result
+    assert store.load(pointer, ["user_id"]) == {"user_id": "42"}
+
+
+def test_project_and_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields(" a.b , ,c ") == ["a.b", "c"]
+    assert project({"a": {"b": 1, "c": 2}, "d": 3}, ["a.b", "d", "x.y"]) == {"a": {"b": 1}, "d": 3}
@@ -1,5 +1,8 @@
 """Unit tests for background tasks routes (/tasks)."""
 
+import asyncio
+import json
+from contextlib import asynccontextmanager
 from types import SimpleNamespace
 from typing import Any, cast
 
@@ -7,9 +10,12 @@ import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+import src.server.features.tasks.demo_queue as demo_queue
+import src.server.features.tasks.routes as tasks_routes
 from src.server.features.tasks.routes import router, TaskSubmitRequest
 import src.server.tasks as tasks_module
 from src.server.celery_app import celery_app
+from src.server.database.models import SubscriptionTier
 
 analyze_demo_task = cast(Any, tasks_module).analyze_demo_task
 analyze_player_task = cast(Any, tasks_module).analyze_player_task
@@ -44,9 +50,27 @@ class DummyResult:
         return self._successful
 
 
+class DummyQueueMonitor(demo_queue.DemoQueueMonitor):
+    """Reports a fixed queue depth instead of asking the broker."""
+
+    def __init__(self, depth=0):
+        super().__init__(cache_seconds=0)
+        self.broker_depth = depth
+
+    def _read_depth(self):
+        return self.broker_depth
+
+
 def test_submit_task_analyze_demo_success(client, monkeypatch):
     dummy_task = SimpleNamespace(id="task-1")
-    monkeypatch.setattr(analyze_demo_task, "delay", lambda *_, **__: dummy_task)
+    calls = []
+
+    def apply_async(*_, **kwargs):
+        calls.append(kwargs)
+        return dummy_task
+
+    monkeypatch.setattr(demo_queue, "demo_queue_monitor", DummyQueueMonitor(depth=0))
+    monkeypatch.setattr(analyze_demo_task, "apply_async", apply_async)
 
     payload = {
         "task_type": "analyze_demo",
@@ -60,6 +84,29 @@ def test_submit_task_analyze_demo_success(client, monkeypatch):
     assert body["task_id"] == "task-1"
     assert body["task_type"] == "analyze_demo"
     assert body["status"] == "submitted"
+    assert calls[0]["kwargs"]["demo_file_path"] == "/tmp/demo.dem"
+    assert calls[0]["priority"] == demo_queue.TIER_PRIORITY[SubscriptionTier.FREE]
+
+
+def test_submit_task_analyze_demo_rejected_when_queue_full(client, monkeypatch):
+    monkeypatch.setattr(demo_queue.settings, "DEMO_QUEUE_MAX_DEPTH", 10)
+    monkeypatch.setattr(demo_queue.settings, "DEMO_ANALYSIS_EXPECTED_SECONDS", 60)
+    monkeypatch.setattr(demo_queue.settings, "CELERY_DEMO_CONCURRENCY", 2)
+    monkeypatch.setattr(demo_queue, "demo_queue_monitor", DummyQueueMonitor(depth=13))
+
+    def apply_async(*_, **__):  # pragma: no cover - must not be reached
+        raise AssertionError("task must not be enqueued")
+
+    monkeypatch.setattr(analyze_demo_task, "apply_async", apply_async)
+
+    response = client.post(
+        "/tasks/submit",
+        json={"task_type": "analyze_demo", "params": {"demo_path": "/tmp/demo.dem"}},
+    )
+
+    assert response.status_code == 503
+    # 4 demos over the limit, 60 s each, 2 workers
+    assert response.headers["Retry-After"] == "120"
 
 
 def test_submit_task_analyze_player_success(client, monkeypatch):
@@ -112,7 +159,8 @@ def test_submit_task_internal_error_returns_500(client, monkeypatch):
     def boom(*_, **__):  # noqa: ARG001, ARG002
         raise RuntimeError("boom")
 
-    monkeypatch.setattr(analyze_demo_task, "delay", boom)
+    monkeypatch.setattr(demo_queue, "demo_queue_monitor", DummyQueueMonitor(depth=0))
+    monkeypatch.setattr(analyze_demo_task, "apply_async", boom)
 
     payload = {
         "task_type": "analyze_demo",
@@ -185,3 +233,134 @@ def test_get_task_status_internal_error_returns_500(client, monkeypatch):
 
     assert response.status_code == 500
     assert response.json()["detail"] == "Failed to get task status"
+
+
+class DummyEventHub:
+    """Stands in for the Redis subscription: replays ``states`` in order."""
+
+    def __init__(self, states):
+        self.states = states
+        self.connected = True
+
+    @asynccontextmanager
+    async def subscribe(self, task_id):  # noqa: ARG002
+        queue = asyncio.Queue()
+        for state in self.states:
+            queue.put_nowait(state)
+        yield queue
+
+
+class SequenceResults:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, task_id):  # noqa: ARG002
+        self.calls += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+def test_wait_task_status_returns_on_published_completion(client, monkeypatch):
+    results = SequenceResults(
+        [
+            DummyResult(status="PENDING"),
+            DummyResult(status="SUCCESS", result={"status": "completed"}, ready=True, successful=True),
+        ]
+    )
+    monkeypatch.setattr(celery_app, "AsyncResult", results)
+    monkeypatch.setattr(tasks_routes, "task_event_hub", DummyEventHub(["STARTED", "SUCCESS"]))
+
+    response = client.get("/tasks/wait/task-1", params={"timeout": 5})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "SUCCESS"
+    assert response.json()["result"] == {"status": "completed"}
+    # One read up front, one after the completion event; STARTED needs none
+    assert results.calls == 2
+
+
+def test_wait_task_status_times_out_with_current_state(client, monkeypatch):
+    monkeypatch.setattr(celery_app, "AsyncResult", SequenceResults([DummyResult(status="PENDING")]))
+    monkeypatch.setattr(tasks_routes, "task_event_hub", DummyEventHub([]))
+
+    response = client.get("/tasks/wait/task-1", params={"timeout": 0.05})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "PENDING"
+
+
+def test_stream_task_status_emits_sse_until_finished(client, monkeypatch):
+    results = SequenceResults(
+        [
+            DummyResult(status="PENDING"),
+            DummyResult(status="FAILURE", info="Boom", ready=True, successful=False),
+        ]
+    )
+    monkeypatch.setattr(celery_app, "AsyncResult", results)
+    monkeypatch.setattr(tasks_routes, "task_event_hub", DummyEventHub(["STARTED", "FAILURE"]))
+
+    response = client.get("/tasks/events/task-1")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert [event["status"] for event in events] == ["PENDING", "STARTED", "FAILURE"]
+    assert events[-1]["error"] == "Boom"
+
+
+@pytest.mark.asyncio
+async def test_wait_for_task_client_reconnects_until_finished():
+    import httpx
+
+    from src.server.features.tasks.client import wait_for_task
+
+    bodies = [
+        'event: status\ndata: {"status": "PENDING"}\n\n',
+        ': keep-alive\n\nevent: status\ndata: {"status": "SUCCESS", "result": {"ok": true}}\n\n',
+    ]
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        return httpx.Response(200, text=bodies.pop(0), headers={"content-type": "text/event-stream"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        status = await wait_for_task(http, "http://api", "task-1", max_wait=5)
+
+    assert status == {"status": "SUCCESS", "result": {"ok": True}}
+    assert seen == ["/tasks/events/task-1", "/tasks/events/task-1"]
+
+
+def test_get_task_status_expands_offloaded_result_with_fields(client, monkeypatch):
+    from src.server.core.task_results import TaskResultStore
+
+    class DictBackend:
+        def __init__(self):
+            self.data = {}
+
+        def put(self, key, sections, ttl_seconds):  # noqa: ARG002
+            self.data.update({(key, name): value for name, value in sections.items()})
+
+        def get(self, key, names):
+            return {name: self.data[(key, name)] for name in names}
+
+    store = TaskResultStore(DictBackend(), min_bytes=0, ttl_seconds=60)
+    pointer = store.offload(
+        "task-big",
+        {"status": "completed", "analysis": {"metadata": {"map_name": "de_nuke"}, "rounds": [1, 2]}},
+    )
+    monkeypatch.setattr(tasks_routes, "get_task_result_store", lambda: store)
+    monkeypatch.setattr(
+        celery_app,
+        "AsyncResult",
+        lambda task_id: DummyResult(status="SUCCESS", result=pointer, ready=True, successful=True),
+    )
+
+    response = client.get("/tasks/status/task-big", params={"fields": "analysis.metadata"})
+
+    assert response.status_code == 200
+    assert response.json()["result"] == {"analysis": {"metadata": {"map_name": "de_nuke"}}}
@@ -0,0 +1,83 @@
+import asyncio
+from pathlib import Path
+from typing import Any, List
+
+import src.server.tasks as tasks_module
+from src.server.core.worker_runtime import WorkerRuntime
+
+
+class DummyAnalysis:
+    def model_dump(self, mode: str = "python") -> dict:  # noqa: ARG002
+        return {"ok": True}
+
+
+class DummyAnalyzer:
+    def __init__(self) -> None:
+        self.loops: List[asyncio.AbstractEventLoop] = []
+
+    async def analyze_demo(self, demo_file: Any, language: str = "ru", stored_file: Any = None) -> DummyAnalysis:  # noqa: ARG002
+        self.loops.append(asyncio.get_running_loop())
+        await demo_file.read()
+        return DummyAnalysis()
+
+
+def test_runtime_reuses_one_loop_and_restarts_after_stop(monkeypatch) -> None:
+    runtime = WorkerRuntime()
+    closed: List[asyncio.AbstractEventLoop] = []
+
+    async def _close_pools() -> None:
+        closed.append(asyncio.get_running_loop())
+
+    monkeypatch.setattr(runtime, "_close_pools", _close_pools)
+
+    async def current_loop() -> asyncio.AbstractEventLoop:
+        await asyncio.sleep(0)
+        return asyncio.get_running_loop()
+
+    first = runtime.run(current_loop())
+    assert runtime.run(current_loop()) is first
+
+    runtime.stop()
+    assert closed == [first]
+    assert first.is_closed()
+
+    assert runtime.run(current_loop()) is not first
+    runtime.stop()
+
+
+def test_analyze_demo_task_uses_process_wide_analyzer(tmp_path: Path, monkeypatch) -> None:
+    runtime = WorkerRuntime()
+    analyzer = DummyAnalyzer()
+    runtime.start()
+    runtime._analyzer = analyzer
+    monkeypatch.setattr(tasks_module, "get_worker_runtime", lambda: runtime)
+
+    results = []
+    for idx in range(2):
+        demo = tmp_path / f"demo_{idx}.dem"
+        demo.write_bytes(b"demo")
+        results.append(tasks_module.analyze_demo_task(str(demo), "user-1", "en"))
+
+    assert [result["analysis"] for result in results] == [{"ok": True}, {"ok": True}]
+    assert len(analyzer.loops) == 2 and analyzer.loops[0] is analyzer.loops[1]
+    assert runtime.analyzer() is analyzer
+    runtime.stop()
+
+
+def test_worker_shutdown_stops_runtime_and_parse_executor(monkeypatch) -> None:
+    calls: List[Any] = []
+
+    class DummyRuntime:
+        def stop(self) -> None:
+            calls.append("runtime")
+
+    class DummyExecutor:
+        def shutdown(self, wait: bool = True) -> None:
+            calls.append(("executor", wait))
+
+    monkeypatch.setattr(tasks_module, "get_worker_runtime", lambda: DummyRuntime())
+    monkeypatch.setattr(tasks_module, "get_parse_executor", lambda: DummyExecutor())
+
+    tasks_module._stop_worker_runtime()
+
+    assert calls == ["runtime", ("executor", False)]